@@ -2,6 +2,9 @@ import pandas as pd
 import logging
 
 import electricitylci.model_config as config
+import electricitylci.schema as schema
+import electricitylci.instrumentation as instrumentation
+from electricitylci.instrumentation import instrumented
 
 
 formatter = logging.Formatter(
@@ -14,6 +17,7 @@ logging.basicConfig(
 logger = logging.getLogger("electricitylci")
 
 
+@instrumented
 def get_generation_process_df(regions=None, **kwargs):
     """
     Create a dataframe of emissions from power generation by fuel type in each
@@ -44,13 +48,20 @@ def get_generation_process_df(regions=None, **kwargs):
     if config.model_specs.include_renewable_generation is True:
         generation_process_df=get_gen_plus_netl()
     else:
-        generation_process_df = create_generation_process_df()
+        generation_process_df = instrumentation.call(
+            create_generation_process_df
+        )
     if config.model_specs.include_netl_water is True:
         import electricitylci.plant_water_use as water
-        water_df = water.generate_plant_water_use(config.model_specs.eia_gen_year)
-        generation_process_df=concat_clean_upstream_and_plant(generation_process_df,water_df)
+        water_df = instrumentation.call(
+            water.generate_plant_water_use, config.model_specs.eia_gen_year
+        )
+        generation_process_df = instrumentation.call(
+            concat_clean_upstream_and_plant, generation_process_df, water_df
+        )
     
     if config.model_specs.include_upstream_processes is True:
+        from electricitylci.factored_inventory import FactoredInventory
         try:
             upstream_df = kwargs['upstream_df']
             upstream_dict = kwargs['upstream_dict']
@@ -59,6 +70,8 @@ def get_generation_process_df(regions=None, **kwargs):
                 "A kwarg named 'upstream_dict' must be included if include_upstream_processes"
                 "is True"
             )
+        if isinstance(upstream_df, FactoredInventory):
+            upstream_df = instrumentation.call(upstream_df.expand)
 #        upstream_dict = write_upstream_process_database_to_dict(
 #            upstream_df
 #        )
@@ -71,8 +84,12 @@ def get_generation_process_df(regions=None, **kwargs):
         )
     else:
         import electricitylci.import_impacts as import_impacts
-        canadian_gen_df = import_impacts.generate_canadian_mixes(generation_process_df)
-        generation_process_df = pd.concat([generation_process_df, canadian_gen_df], ignore_index=True)
+        canadian_gen_df = instrumentation.call(
+            import_impacts.generate_canadian_mixes, generation_process_df
+        )
+        generation_process_df = schema.enforce_schema(schema.concat(
+            [generation_process_df, canadian_gen_df], ignore_index=True
+        ))
         gen_plus_fuels=generation_process_df
         #This change has been made to accomodate the new method of generating
         #consumption mixes for FERC regions. They now pull BAs to provide
@@ -95,6 +112,7 @@ def get_generation_process_df(regions=None, **kwargs):
     return generation_process_df
 
 
+@instrumented
 def get_generation_mix_process_df(regions=None):
     """
     Create a dataframe of generation mixes by fuel type in each subregion.
@@ -148,23 +166,27 @@ def get_generation_mix_process_df(regions=None):
                 f"support aggregating to the US."
                 )
         print("EIA923 generation data is used when replacing eGRID")
-        generation_data = build_generation_data(
+        generation_data = instrumentation.call(
+            build_generation_data,
             generation_years=[config.model_specs.eia_gen_year]
         )
-        generation_mix_process_df = create_generation_mix_process_df_from_model_generation_data(
+        generation_mix_process_df = instrumentation.call(
+            create_generation_mix_process_df_from_model_generation_data,
             generation_data, regions
         )
     else:
         if config.model_specs.gen_mix_from_model_generation_data:
-            generation_mix_process_df = create_generation_mix_process_df_from_model_generation_data(
+            generation_mix_process_df = instrumentation.call(
+                create_generation_mix_process_df_from_model_generation_data,
                 electricity_for_selected_egrid_facilities, regions
             )
         else:
-            generation_mix_process_df = create_generation_mix_process_df_from_egrid_ref_data(
-                regions
+            generation_mix_process_df = instrumentation.call(
+                create_generation_mix_process_df_from_egrid_ref_data, regions
             )
     return generation_mix_process_df
 
+@instrumented
 def write_generation_process_database_to_dict(gen_database, regions=None):
     """
     Create olca formatted dictionaries of individual processes
@@ -188,11 +210,14 @@ def write_generation_process_database_to_dict(gen_database, regions=None):
     if regions is None:
         regions = config.model_specs.regional_aggregation
 
-    gen_dict = olcaschema_genprocess(gen_database, subregion=regions)
+    gen_dict = instrumentation.call(
+        olcaschema_genprocess, gen_database, subregion=regions
+    )
 
     return gen_dict
 
 
+@instrumented
 def write_generation_mix_database_to_dict(
     genmix_database, gen_dict, regions=None
 ):
@@ -200,16 +225,17 @@ def write_generation_mix_database_to_dict(
     if regions is None:
         regions = config.model_specs.regional_aggregation
     if regions in ["FERC","US","BA"]:
-        genmix_dict = olcaschema_genmix(
-                genmix_database, gen_dict, subregion="BA"
+        genmix_dict = instrumentation.call(
+            olcaschema_genmix, genmix_database, gen_dict, subregion="BA"
         )
     else:
-        genmix_dict = olcaschema_genmix(
-            genmix_database, gen_dict, subregion=regions
+        genmix_dict = instrumentation.call(
+            olcaschema_genmix, genmix_database, gen_dict, subregion=regions
         )
     return genmix_dict
 
 
+@instrumented
 def write_surplus_pool_and_consumption_mix_dict():
     """
     Create olca formatted dictionaries for the consumption mix as calculated by
@@ -228,32 +254,48 @@ def write_surplus_pool_and_consumption_mix_dict():
     return surplus_pool_and_con_mix
 
 
+@instrumented
 def write_distribution_dict():
     from electricitylci.distribution import distribution_mix_dictionary
 
-    return distribution_mix_dictionary()
+    return instrumentation.call(distribution_mix_dictionary)
 
 
+@instrumented
 def write_process_dicts_to_jsonld(*process_dicts):
     """
     Send one or more process dictionaries to be written to json-ld
 
     """
-    from electricitylci.olca_jsonld_writer import write
+    from electricitylci.olca_jsonld_writer import write, workers
     
     all_process_dicts = dict()
     for d in process_dicts:
         all_process_dicts = {**all_process_dicts, **d}
 
-    olca_dicts = write(all_process_dicts, config.model_specs.namestr)
+    olca_dicts = instrumentation.call(
+        write, all_process_dicts, config.model_specs.namestr,
+        max_workers=workers
+    )
     return olca_dicts
 
 
-def get_upstream_process_df(eia_gen_year):
+@instrumented
+def get_upstream_process_df(eia_gen_year, factored=False):
     """
     Automatically load all of the upstream emissions data from the various
     modules. Will return a dataframe with upstream emissions from
     coal, natural gas, petroleum, nuclear, and plant construction.
+
+    Parameters
+    ----------
+    eia_gen_year : int
+        Year of EIA data to use.
+    factored : bool, optional
+        If True, return the upstream inventory as a FactoredInventory (the
+        flows per unit of fuel or capacity and the quantity of each plant)
+        rather than a dataframe with the flows of every plant, by default
+        False. write_upstream_process_database_to_dict accepts either.
     """
     import electricitylci.coal_upstream as coal
     import electricitylci.natural_gas_upstream as ng
@@ -261,21 +303,35 @@ def get_upstream_process_df(eia_gen_year):
     import electricitylci.nuclear_upstream as nuke
     import electricitylci.power_plant_construction as const
     from electricitylci.combinator import concat_map_upstream_databases
+    from electricitylci.factored_inventory import FactoredInventory
     
     print("Generating upstream inventories...")
-    coal_df = coal.generate_upstream_coal(eia_gen_year)
-    ng_df = ng.generate_upstream_ng(eia_gen_year)
-    petro_df = petro.generate_petroleum_upstream(eia_gen_year)
-    nuke_df = nuke.generate_upstream_nuc(eia_gen_year)
-    const = const.generate_power_plant_construction(eia_gen_year)
+    coal_inventory = instrumentation.call(coal.coal_inventory, eia_gen_year)
+    ng_inventory = instrumentation.call(ng.ng_inventory, eia_gen_year)
+    petro_inventory = instrumentation.call(
+        petro.petroleum_inventory, eia_gen_year
+    )
+    nuke_inventory = instrumentation.call(
+        nuke.nuclear_inventory, eia_gen_year
+    )
+    const_inventory = instrumentation.call(
+        const.construction_inventory, eia_gen_year
+    )
     #coal and ng already conform to mapping so no mapping needed
-    upstream_df = concat_map_upstream_databases(eia_gen_year,
-        petro_df, nuke_df, const
+    upstream_inventory = instrumentation.call(
+        concat_map_upstream_databases, eia_gen_year,
+        petro_inventory, nuke_inventory, const_inventory
+    )
+    upstream_inventory = instrumentation.call(
+        FactoredInventory.concat,
+        [upstream_inventory, coal_inventory, ng_inventory]
     )
-    upstream_df=pd.concat([upstream_df,coal_df,ng_df],sort=False,ignore_index=True)
-    return upstream_df
+    if factored:
+        return upstream_inventory
+    return instrumentation.call(upstream_inventory.expand)
 
 
+@instrumented
 def write_upstream_process_database_to_dict(upstream_df):
     """
     Convert the upstream dataframe generated by get_upstream_process_df to
@@ -283,7 +339,7 @@ def write_upstream_process_database_to_dict(upstream_df):
 
     Parameters
     ----------
-    upstream_df : dataframe
+    upstream_df : dataframe or FactoredInventory
         Combined dataframe as generated by gen_upstream_process_df
 
     Returns
@@ -293,10 +349,13 @@ def write_upstream_process_database_to_dict(upstream_df):
     import electricitylci.upstream_dict as upd
 
     print("Writing upstream processes to dictionaries")
-    upstream_dicts = upd.olcaschema_genupstream_processes(upstream_df)
+    upstream_dicts = instrumentation.call(
+        upd.olcaschema_genupstream_processes, upstream_df
+    )
     return upstream_dicts
 
 
+@instrumented
 def write_upstream_dicts_to_jsonld(upstream_dicts):
     """
     Write the upstream dictionary to jsonld.
@@ -311,6 +370,7 @@ def write_upstream_dicts_to_jsonld(upstream_dicts):
     return upstream_dicts
 
 
+@instrumented
 def combine_upstream_and_gen_df(gen_df, upstream_df):
     """
     Combine the generation and upstream dataframes into a single dataframe.
@@ -332,12 +392,19 @@ def combine_upstream_and_gen_df(gen_df, upstream_df):
     import electricitylci.import_impacts as import_impacts
 
     print("Combining upstream and generation inventories")
-    combined_df = combine.concat_clean_upstream_and_plant(gen_df, upstream_df)
-    canadian_gen = import_impacts.generate_canadian_mixes(combined_df)
-    combined_df = pd.concat([combined_df, canadian_gen], ignore_index=True)
+    combined_df = instrumentation.call(
+        combine.concat_clean_upstream_and_plant, gen_df, upstream_df
+    )
+    canadian_gen = instrumentation.call(
+        import_impacts.generate_canadian_mixes, combined_df
+    )
+    combined_df = schema.enforce_schema(
+        schema.concat([combined_df, canadian_gen], ignore_index=True)
+    )
     return combined_df, canadian_gen
 
 
+@instrumented
 def get_gen_plus_netl():
     """
     This will combine the netl life cycle data for solar, solar thermal, 
@@ -367,25 +434,36 @@ def get_gen_plus_netl():
     print(
         "Generating inventories for geothermal, solar, wind, hydro, and solar thermal..."
     )
-    geo_df = geo.generate_upstream_geo(eia_gen_year)
-    solar_df = solar.generate_upstream_solar(eia_gen_year)
-    wind_df = wind.generate_upstream_wind(eia_gen_year)
-    hydro_df = hydro.generate_hydro_emissions()
-    solartherm_df = solartherm.generate_upstream_solarthermal(eia_gen_year)
-    netl_gen = concat_map_upstream_databases(eia_gen_year,
-        geo_df, solar_df, wind_df, solartherm_df,
+    geo_inventory = instrumentation.call(
+        geo.geothermal_inventory, eia_gen_year
+    )
+    solar_inventory = instrumentation.call(
+        solar.solar_inventory, eia_gen_year
     )
+    wind_inventory = instrumentation.call(wind.wind_inventory, eia_gen_year)
+    hydro_df = instrumentation.call(hydro.generate_hydro_emissions)
+    solartherm_inventory = instrumentation.call(
+        solartherm.solarthermal_inventory, eia_gen_year
+    )
+    netl_gen = instrumentation.call(
+        concat_map_upstream_databases, eia_gen_year,
+        geo_inventory, solar_inventory, wind_inventory, solartherm_inventory,
+    )
+    netl_gen = instrumentation.call(netl_gen.expand)
     netl_gen["DataCollection"] = 5
     netl_gen["GeographicalCorrelation"] = 1
     netl_gen["TechnologicalCorrelation"] = 1
     netl_gen["ReliabilityScore"] = 1
     netl_gen=pd.concat([netl_gen,hydro_df[netl_gen.columns]],ignore_index=True,sort=False)
     print("Getting reported emissions for generators...")
-    gen_df = gen.create_generation_process_df()
-    combined_gen = concat_clean_upstream_and_plant(gen_df, netl_gen)
+    gen_df = instrumentation.call(gen.create_generation_process_df)
+    combined_gen = instrumentation.call(
+        concat_clean_upstream_and_plant, gen_df, netl_gen
+    )
     return combined_gen
 
 
+@instrumented
 def aggregate_gen(gen_df, subregion="BA"):
     """
     Runs the aggregation routine to place all emissions and fuel
@@ -412,10 +490,13 @@ def aggregate_gen(gen_df, subregion="BA"):
         #Or it could be possible but would requir running through aggregate twice.
         subregion="BA"
     print(f"Aggregating to subregion - {subregion}")
-    aggregate_df = gen.aggregate_data(gen_df, subregion=subregion)
+    aggregate_df = instrumentation.call(
+        gen.aggregate_data, gen_df, subregion=subregion
+    )
     return aggregate_df
 
 
+@instrumented
 def add_fuels_to_gen(gen_df, fuel_df, canadian_gen, upstream_dict):
     """
     Add the upstream fuels to the generation dataframe as fuel inputs.
@@ -436,11 +517,16 @@ def add_fuels_to_gen(gen_df, fuel_df, canadian_gen, upstream_dict):
     from electricitylci.combinator import add_fuel_inputs
 
     print("Adding fuel inputs to generator emissions...")
-    gen_plus_fuel = add_fuel_inputs(gen_df, fuel_df, upstream_dict)
-    gen_plus_fuel = pd.concat([gen_plus_fuel, canadian_gen], ignore_index=True)
+    gen_plus_fuel = instrumentation.call(
+        add_fuel_inputs, gen_df, fuel_df, upstream_dict
+    )
+    gen_plus_fuel = schema.enforce_schema(
+        schema.concat([gen_plus_fuel, canadian_gen], ignore_index=True)
+    )
     return gen_plus_fuel
 
 
+@instrumented
 def write_gen_fuel_database_to_dict(
     gen_plus_fuel_df, upstream_dict, subregion=None
 ):
@@ -478,51 +564,61 @@ def write_gen_fuel_database_to_dict(
     # if subregion in ["BA","FERC","US"]:    
     #     subregion="BA"
     print("Converting generator dataframe to dictionaries...")
-    gen_plus_fuel_dict = olcaschema_genprocess(
-        gen_plus_fuel_df, upstream_dict, subregion=subregion
+    gen_plus_fuel_dict = instrumentation.call(
+        olcaschema_genprocess, gen_plus_fuel_df, upstream_dict,
+        subregion=subregion
     )
     return gen_plus_fuel_dict
 
 
+@instrumented
 def get_distribution_mix_df(combined_df, subregion=None):
     import electricitylci.eia_trans_dist_grid_loss as tnd
     if subregion is None:
         subregion = config.model_specs.regional_aggregation
 
-    td_loss_df = tnd.generate_regional_grid_loss(
+    td_loss_df = instrumentation.call(
+        tnd.generate_regional_grid_loss,
         combined_df, config.model_specs.eia_gen_year, subregion=subregion
     )
     return td_loss_df
 
 
+@instrumented
 def write_distribution_mix_to_dict(dist_mix_df, gen_mix_dict, subregion=None):
     import electricitylci.eia_trans_dist_grid_loss as tnd
     if subregion is None:
         subregion = config.model_specs.regional_aggregation
 
-    dist_mix_dict = tnd.olca_schema_distribution_mix(
+    dist_mix_dict = instrumentation.call(
+        tnd.olca_schema_distribution_mix,
         dist_mix_df, gen_mix_dict, subregion=subregion
     )
     return dist_mix_dict
 
 
+@instrumented
 def get_consumption_mix_df(subregion=None, regions_to_keep=None):
     import electricitylci.eia_io_trading as trade
     if subregion is None:
         subregion = config.model_specs.regional_aggregation
 
-    io_trade_df = trade.ba_io_trading_model(
-        year=config.model_specs.eia_gen_year, subregion=subregion, regions_to_keep=regions_to_keep
+    io_trade_df = instrumentation.call(
+        trade.ba_io_trading_model,
+        year=config.model_specs.eia_gen_year, subregion=subregion,
+        regions_to_keep=regions_to_keep
     )
     return io_trade_df
 
 
+@instrumented
 def write_consumption_mix_to_dict(cons_mix_df, dist_mix_dict, subregion=None):
     import electricitylci.eia_io_trading as trade
     if subregion is None:
         subregion = config.model_specs.regional_aggregation
 
-    cons_mix_dict = trade.olca_schema_consumption_mix(
+    cons_mix_dict = instrumentation.call(
+        trade.olca_schema_consumption_mix,
         cons_mix_df, dist_mix_dict, subregion=subregion
     )
     return cons_mix_dict
@@ -1,3 +1,24 @@
+"""
+Plant-level emissions from EPA air markets program data (CEMS) and EIA-923
+fuel use with AP-42 emission factors.
+
+The calculation is split into stages that only depend on the input data:
+
+- net_gen: annual net generation and primary fuel category of each plant
+- co2_ch4_n2o, so2, nox: emission factor estimates from the EIA-923
+  generation and fuel and boiler fuel data
+- ampd: measured emissions and heat input from CEMS
+
+These stages are independent of each other, so they are run at the same time
+in a thread pool, and each of them is saved to (and loaded from) the stage
+cache when caching is enabled. reconcile_emissions then chooses between the
+measured and estimated emissions for each plant.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
 from electricitylci.globals import data_dir, output_dir
@@ -5,693 +26,500 @@ import electricitylci.PhysicalQuantities as pq
 import electricitylci.cems_data as cems
 import electricitylci.eia923_generation as eia923
 import electricitylci.eia860_facilities as eia860
+import electricitylci.stage_cache as stage_cache
 import fedelemflowlist
 from electricitylci.model_config import model_specs
 
-import logging
-
-
-def generate_plant_emissions(year):
+module_logger = logging.getLogger("ampd_plant_emissions.py")
+
+COMPARTMENT_MAP = {"emission/air": "air"}
+FUELCAT_MAP = {
+    "AB": "BIOMASS",
+    #            "BFG",
+    "BIT": "COAL",
+    #            "BLQ",
+    "DFO": "OIL",
+    "GEO": "GEOTHERMAL",
+    #            "JF",
+    #            "KER",
+    #            "LFG",
+    "LIG": "COAL",
+    #            "MSB",
+    #            "MSN",
+    #            "MWH",
+    "NG": "GAS",
+    "NUC": "NUCLEAR",
+    "OBG": "BIOMASS",
+    "OBL": "BIOMASS",
+    "OBS": "BIOMASS",
+    #            "OG",
+    #            "OTH",
+    #            "PC",
+    #            "PG",
+    #            "PUR",
+    "RC": "COAL",
+    "RFO": "OIL",
+    #            "SC",
+    #            "SGC",
+    #            "SGP",
+    #            "SLW",
+    "SUB": "COAL",
+    "SUN": "SOLAR",
+    #            "TDF",
+    "WAT": "HYDRO",
+    "WC": "COAL",
+    "WDL": "BIOMASS",
+    "WDS": "BIOMASS",
+    #            "WH",
+    "WND": "WIND",
+    "WO": "OIL",
+    "Mixed Fuel Type": "MIXED",
+}
+
+# EIA-923 fuel codes that a plant's primary fuel is chosen from.
+PRIMARY_FUEL_CODES = [
+    "AB",
+    "BFG",
+    "BIT",
+    "BLQ",
+    "DFO",
+    "GEO",
+    "JF",
+    "KER",
+    "LFG",
+    "LIG",
+    "MSB",
+    "MSN",
+    "MWH",
+    "NG",
+    "NUC",
+    "OBG",
+    "OBL",
+    "OBS",
+    "OG",
+    "OTH",
+    "PC",
+    "PG",
+    "PUR",
+    "RC",
+    "RFO",
+    "SC",
+    "SGC",
+    "SGP",
+    "SLW",
+    "SUB",
+    "SUN",
+    "TDF",
+    "WAT",
+    "WC",
+    "WDL",
+    "WDS",
+    "WH",
+    "WND",
+    "WO",
+]
+
+MONTHS = [
+    "january",
+    "february",
+    "march",
+    "april",
+    "may",
+    "june",
+    "july",
+    "august",
+    "september",
+    "october",
+    "november",
+    "december",
+]
+NET_GEN_MONTHLY = [f"netgen_{m}" for m in MONTHS]
+FUEL_HEATING_VALUE_MONTHLY = [f"mmbtu_per_unit_{m}" for m in MONTHS]
+FUEL_QUANTITY_MONTHLY = [f"quantity_of_fuel_consumed_{m}" for m in MONTHS]
+SULFUR_CONTENT_MONTHLY = [f"sulfur_content_{m}" for m in MONTHS]
+FUEL_HEAT_QUANTITY_MONTHLY = [f"MMBtu {m.capitalize()}" for m in MONTHS]
+
+PLANT_COLUMNS = ["plant_id", "plant_name", "operator_name"]
+
+
+def _merge_fuel_factors(df, factors, factor_columns):
     """
-    Reads data from EPA air markets program data and fuel use from EIA 923 Page 1
-    or Page 5 data (generator vs boiler-level data). Emissions factors from AP42
-    are used to calculate emissions from the plant if the fuel input from EPA
-    air markets program data does not matche EIA 923 data. This data is meant
-    to replace the eGRID-sourced data provided by STEWi.
+    Attach the emission factors for each fuel code to the rows of df.
+
+    The rows and their order are the same as selecting the rows of df with
+    each factor's EIA_Fuel_Type_Code in turn (compared as strings) and
+    concatenating the selections, so aggregating the result gives the same
+    sums.
 
     Parameters
     ----------
-    year : int
-        Year of data to use (Air Markets Program Data, EIA 923, etc.)
+    df : dataframe
+        EIA-923 data with a reported_fuel_type_code column.
+    factors : dataframe
+        Emission factor table with an EIA_Fuel_Type_Code column.
+    factor_columns : list
+        Columns of the factor table to add to df.
 
     Returns
     -------
     dataframe
-        Returns a dataframe with emissions for all power plants reporting to
-        AMPD or EIA923. Emissions are either actual measured emissions (marked
-        as Source = "cems") or from ap42 emission factors applied at either
-        the boiler or generator fuel type level (marked as Source = "ap42").
     """
-    COMPARTMENT_MAP = {"emission/air": "air"}
-    FUELCAT_MAP = {
-        "AB": "BIOMASS",
-        #            "BFG",
-        "BIT": "COAL",
-        #            "BLQ",
-        "DFO": "OIL",
-        "GEO": "GEOTHERMAL",
-        #            "JF",
-        #            "KER",
-        #            "LFG",
-        "LIG": "COAL",
-        #            "MSB",
-        #            "MSN",
-        #            "MWH",
-        "NG": "GAS",
-        "NUC": "NUCLEAR",
-        "OBG": "BIOMASS",
-        "OBL": "BIOMASS",
-        "OBS": "BIOMASS",
-        #            "OG",
-        #            "OTH",
-        #            "PC",
-        #            "PG",
-        #            "PUR",
-        "RC": "COAL",
-        "RFO": "OIL",
-        #            "SC",
-        #            "SGC",
-        #            "SGP",
-        #            "SLW",
-        "SUB": "COAL",
-        "SUN": "SOLAR",
-        #            "TDF",
-        "WAT": "HYDRO",
-        "WC": "COAL",
-        "WDL": "BIOMASS",
-        "WDS": "BIOMASS",
-        #            "WH",
-        "WND": "WIND",
-        "WO": "OIL",
-        "Mixed Fuel Type": "MIXED",
-    }
-
-    def emissions_check_gen_fuel(df):
-        emissions_check = eia923_gen_fuel_sub_agg.merge(
-            df, on="plant_id", how="left"
-        )
-        emissions_check["Check Heat Input MMBtu"] = emissions_check[
-            "total_fuel_consumption_mmbtu"
-        ].fillna(0) - emissions_check[
-            "Sheet 1_Total Fuel Consumption (MMBtu)"
-        ].fillna(
-            0
-        )
-        emissions_check["Check Heat Input Quantity"] = emissions_check[
-            "total_fuel_consumption_quantity"
-        ].fillna(0) - emissions_check[
-            "Sheet 1_total_fuel_consumption_quantity"
-        ].fillna(
-            0
-        )
-        emissions_check["Check Heat Input MMBtu Ratio"] = emissions_check[
-            "total_fuel_consumption_mmbtu"
-        ].fillna(0) / emissions_check[
-            "Sheet 1_Total Fuel Consumption (MMBtu)"
-        ].fillna(
-            0
-        )
-        emissions_check["Check Heat Input Quantity Ratio"] = emissions_check[
-            "total_fuel_consumption_quantity"
-        ].fillna(0) / emissions_check[
-            "Sheet 1_total_fuel_consumption_quantity"
-        ].fillna(
-            0
-        )
-
-        return emissions_check
-
-    def emissions_check_boiler(df):
-        df_list = [
-            eia923_gen_fuel_boiler_agg,
-            df,
-            eia923_boiler_sub_agg,
-            eia923_gen_fuel_union_boiler_agg,
-        ]
-        emissions_check = df_list[0]
-        for df_ in df_list[1:]:
-            emissions_check = emissions_check.merge(
-                df_, on=["plant_id"], how="left"
-            )
-        emissions_check["Check Heat Input MMBtu_Boiler"] = emissions_check[
-            "total_fuel_consumption_mmbtu"
-        ].fillna(0) - emissions_check[
-            "Sheet 3_Total Fuel Consumption (MMBtu)"
-        ].fillna(
-            0
-        )
-        emissions_check["Check Heat Input Quantity_Boiler"] = emissions_check[
-            "total_fuel_consumption_quantity"
-        ].fillna(0) - emissions_check[
-            "Sheet 3_total_fuel_consumption_quantity"
-        ].fillna(
-            0
-        )
-        emissions_check[
-            "Check Heat Input MMBtu_Boiler Ratio"
-        ] = emissions_check["total_fuel_consumption_mmbtu"].fillna(
-            0
-        ) / emissions_check[
-            "Sheet 3_Total Fuel Consumption (MMBtu)"
-        ].fillna(
-            0
-        )
-        emissions_check[
-            "Check Heat Input Quantity_Boiler Ratio"
-        ] = emissions_check["total_fuel_consumption_quantity"].fillna(
-            0
-        ) / emissions_check[
-            "Sheet 3_total_fuel_consumption_quantity"
-        ].fillna(
-            0
-        )
-        emissions_check["Check Heat Input MMBtu_Boiler_Gen"] = (
-            emissions_check["total_fuel_consumption_mmbtu"].fillna(0)
-            + emissions_check[
-                "Sheet 1_Union Total Fuel Consumption (MMBtu)"
-            ].fillna(0)
-        ) - emissions_check["Sheet 1_Total Fuel Consumption (MMBtu)"].fillna(0)
-        emissions_check["Check Heat Input Quantity_Boiler_Gen"] = (
-            emissions_check["total_fuel_consumption_quantity"].fillna(0)
-            + emissions_check[
-                "Sheet 1_Union total_fuel_consumption_quantity"
-            ].fillna(0)
-        ) - emissions_check["Sheet 1_total_fuel_consumption_quantity"].fillna(
-            0
-        )
-        emissions_check["Check Heat Input MMBtu_Boiler_Gen Ratio"] = (
-            emissions_check["total_fuel_consumption_mmbtu"].fillna(0)
-            + emissions_check[
-                "Sheet 1_Union Total Fuel Consumption (MMBtu)"
-            ].fillna(0)
-        ) / emissions_check["Sheet 1_Total Fuel Consumption (MMBtu)"].fillna(0)
-        emissions_check["Check Heat Input Quantity_Boiler_Gen Ratio"] = (
-            emissions_check["total_fuel_consumption_quantity"].fillna(0)
-            + emissions_check[
-                "Sheet 1_Union total_fuel_consumption_quantity"
-            ].fillna(0)
-        ) / emissions_check["Sheet 1_total_fuel_consumption_quantity"].fillna(
-            0
-        )
-
-        return emissions_check
-
-    def eia_gen_fuel_co2_ch4_n2o_emissions(eia923_gen_fuel):
-
-        emissions = pd.DataFrame()
-
-        for row in ef_co2_ch4_n2o.itertuples():
-
-            fuel_type = eia923_gen_fuel_sub.loc[
-                eia923_gen_fuel_sub["reported_fuel_type_code"].astype(str)
-                == str(row.EIA_Fuel_Type_Code)
-            ].copy()
+    left = df.assign(
+        _fuel_code=df["reported_fuel_type_code"].astype(str),
+        _row=np.arange(len(df)),
+    )
+    right = factors[factor_columns].assign(
+        _fuel_code=factors["EIA_Fuel_Type_Code"].astype(str).values,
+        _factor_row=np.arange(len(factors)),
+    )
+    merged = left.merge(right, on="_fuel_code", how="inner")
+    merged = merged.sort_values(["_factor_row", "_row"], kind="stable")
+    return merged.drop(columns=["_fuel_code", "_row", "_factor_row"])
 
-            fuel_type["CO2 (Tons)"] = (row.ton_CO2_mmBtu) * fuel_type[
-                "total_fuel_consumption_mmbtu"
-            ].astype(float, errors="ignore")
-            fuel_type["CH4 (lbs)"] = (row.pound_methane_per_mmbtu) * fuel_type[
-                "total_fuel_consumption_mmbtu"
-            ].astype(float, errors="ignore")
-            fuel_type["N2O (lbs)"] = (row.pound_n2o_per_mmBtu) * fuel_type[
-                "total_fuel_consumption_mmbtu"
-            ].astype(float, errors="ignore")
 
-            emissions = pd.concat([emissions, fuel_type])
+def _row_dot(a, b):
+    """
+    Dot product of each row of a with the same row of b, with missing values
+    treated as 0.
+    """
+    a = np.nan_to_num(a.to_numpy(dtype=float))
+    b = np.nan_to_num(b.to_numpy(dtype=float))
+    return np.einsum("ij,ij->i", a, b)
+
+
+def eia_gen_fuel_co2_ch4_n2o_emissions(eia923_gen_fuel_sub, ef_co2_ch4_n2o):
+    """CO2, CH4, and N2O emissions of each plant from the EIA-923 generation
+    and fuel data that is not also in the boiler fuel data."""
+    emissions = _merge_fuel_factors(
+        eia923_gen_fuel_sub,
+        ef_co2_ch4_n2o,
+        ["ton_CO2_mmBtu", "pound_methane_per_mmbtu", "pound_n2o_per_mmBtu"],
+    )
+    fuel_mmbtu = emissions["total_fuel_consumption_mmbtu"].astype(
+        float, errors="ignore"
+    )
+    emissions["CO2 (Tons)"] = emissions["ton_CO2_mmBtu"] * fuel_mmbtu
+    emissions["CH4 (lbs)"] = emissions["pound_methane_per_mmbtu"] * fuel_mmbtu
+    emissions["N2O (lbs)"] = emissions["pound_n2o_per_mmBtu"] * fuel_mmbtu
 
-        emissions_agg = emissions.groupby(
-            ["plant_id", "plant_name", "operator_name"]
-        )[
+    emissions_agg = emissions.groupby(PLANT_COLUMNS)[
+        [
             "CO2 (Tons)",
             "CH4 (lbs)",
             "N2O (lbs)",
             "total_fuel_consumption_mmbtu",
             "total_fuel_consumption_quantity",
-        ].sum()
-        emissions_agg = emissions_agg.reset_index()
-        emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
-
-        return emissions_agg
-
-    def eia_boiler_co2_ch4_n2o_emissions(eia923_boiler):
-
-        emissions = pd.DataFrame()
-
-        for row in ef_co2_ch4_n2o.itertuples():
-
-            fuel_type = eia923_boiler_sub.loc[
-                eia923_boiler_sub["reported_fuel_type_code"].astype(str)
-                == str(row.EIA_Fuel_Type_Code)
-            ].copy()
-
-            fuel_heating_value_monthly = [
-                "mmbtu_per_unit_january",
-                "mmbtu_per_unit_february",
-                "mmbtu_per_unit_march",
-                "mmbtu_per_unit_april",
-                "mmbtu_per_unit_may",
-                "mmbtu_per_unit_june",
-                "mmbtu_per_unit_july",
-                "mmbtu_per_unit_august",
-                "mmbtu_per_unit_september",
-                "mmbtu_per_unit_october",
-                "mmbtu_per_unit_november",
-                "mmbtu_per_unit_december",
-            ]
-            fuel_quantity_monthly = [
-                "quantity_of_fuel_consumed_january",
-                "quantity_of_fuel_consumed_february",
-                "quantity_of_fuel_consumed_march",
-                "quantity_of_fuel_consumed_april",
-                "quantity_of_fuel_consumed_may",
-                "quantity_of_fuel_consumed_june",
-                "quantity_of_fuel_consumed_july",
-                "quantity_of_fuel_consumed_august",
-                "quantity_of_fuel_consumed_september",
-                "quantity_of_fuel_consumed_october",
-                "quantity_of_fuel_consumed_november",
-                "quantity_of_fuel_consumed_december",
-            ]
+        ]
+    ].sum()
+    emissions_agg = emissions_agg.reset_index()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
+
+    return emissions_agg
+
+
+def eia_boiler_co2_ch4_n2o_emissions(eia923_boiler_sub, ef_co2_ch4_n2o):
+    """CO2, CH4, and N2O emissions of each plant from the EIA-923 boiler
+    fuel data."""
+    emissions = _merge_fuel_factors(
+        eia923_boiler_sub,
+        ef_co2_ch4_n2o,
+        ["ton_CO2_mmBtu", "pound_methane_per_mmbtu", "pound_n2o_per_mmBtu"],
+    )
+    emissions["total_fuel_consumption_mmbtu"] = (
+        np.multiply(
+            emissions[FUEL_HEATING_VALUE_MONTHLY],
+            np.asarray(emissions[FUEL_QUANTITY_MONTHLY]),
+        )
+    ).sum(axis=1, skipna=True)
+    fuel_mmbtu = emissions["total_fuel_consumption_mmbtu"].astype(
+        float, errors="ignore"
+    )
+    emissions["CO2 (Tons)"] = emissions["ton_CO2_mmBtu"] * fuel_mmbtu
+    emissions["CH4 (lbs)"] = emissions["pound_methane_per_mmbtu"] * fuel_mmbtu
+    emissions["N2O (lbs)"] = emissions["pound_n2o_per_mmBtu"] * fuel_mmbtu
 
-            fuel_type["total_fuel_consumption_mmbtu"] = (
-                np.multiply(
-                    fuel_type[fuel_heating_value_monthly],
-                    fuel_type[fuel_quantity_monthly],
-                )
-            ).sum(axis=1, skipna=True)
-
-            fuel_type["CO2 (Tons)"] = (row.ton_CO2_mmBtu) * fuel_type[
-                "total_fuel_consumption_mmbtu"
-            ].astype(float, errors="ignore")
-            fuel_type["CH4 (lbs)"] = (row.pound_methane_per_mmbtu) * fuel_type[
-                "total_fuel_consumption_mmbtu"
-            ].astype(float, errors="ignore")
-            fuel_type["N2O (lbs)"] = (row.pound_n2o_per_mmBtu) * fuel_type[
-                "total_fuel_consumption_mmbtu"
-            ].astype(float, errors="ignore")
-
-            emissions = pd.concat([emissions, fuel_type])
-
-        emissions_agg = emissions.groupby(
-            ["plant_id", "plant_name", "operator_name"], as_index=False
-        )[
+    emissions_agg = emissions.groupby(PLANT_COLUMNS, as_index=False)[
+        [
             "CH4 (lbs)",
             "N2O (lbs)",
             "CO2 (Tons)",
             "total_fuel_consumption_mmbtu",
             "total_fuel_consumption_quantity",
-        ].sum()
-        emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
-
-        return emissions_agg
-
-    def eia_gen_fuel_net_gen(eia923_gen_fuel):
-
-        net_gen_monthly = [
-            "netgen_january",
-            "netgen_february",
-            "netgen_march",
-            "netgen_april",
-            "netgen_may",
-            "netgen_june",
-            "netgen_july",
-            "netgen_august",
-            "netgen_september",
-            "netgen_october",
-            "netgen_november",
-            "netgen_december",
         ]
-        eia923_gen_fuel["Annual Net Generation (MWh)"] = eia923_gen_fuel[
-            net_gen_monthly
-        ].sum(axis=1, skipna=True)
-        eia_923_gen_fuel_agg = eia923_gen_fuel.groupby(
-            ["plant_id", "plant_name", "operator_name"]
-        )["Annual Net Generation (MWh)"].sum()
-        eia_923_gen_fuel_agg = eia_923_gen_fuel_agg.reset_index()
-        eia_923_gen_fuel_agg_fuel_type = eia923_gen_fuel.groupby(
-            [
-                "plant_id",
-                "plant_name",
-                "operator_name",
-                "reported_fuel_type_code",
-            ]
-        )["Annual Net Generation (MWh)"].sum()
-        eia_923_gen_fuel_agg_fuel_type = (
-            eia_923_gen_fuel_agg_fuel_type.reset_index()
-        )
-        eia_923_gen_fuel_agg_fuel_type_pivot = eia_923_gen_fuel_agg_fuel_type.pivot(
-            index="plant_id",
-            columns="reported_fuel_type_code",
-            values="Annual Net Generation (MWh)",
-        )
-        eia_923_gen_fuel_agg_fuel_type_pivot = (
-            eia_923_gen_fuel_agg_fuel_type_pivot.reset_index()
-        )
-        eia_923_gen_fuel_agg = eia_923_gen_fuel_agg.merge(
-            eia_923_gen_fuel_agg_fuel_type_pivot, on="plant_id", how="left"
-        )
-        eia_923_gen_fuel_agg["plant_id"] = eia_923_gen_fuel_agg[
-            "plant_id"
-        ].astype(str)
+    ].sum()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
 
-        return eia_923_gen_fuel_agg
+    return emissions_agg
 
-    def eia_gen_fuel_so2_emissions(eia923_gen_fuel_sub):
 
-        #        emissions = pd.DataFrame()
-        emissions = eia923_gen_fuel_sub.merge(
-            ef_so2.loc[ef_so2["Boiler_Firing_Type_Code"] == "None", :],
-            left_on=["reported_prime_mover", "reported_fuel_type_code"],
-            right_on=["Reported_Prime_Mover", "Reported_Fuel_Type_Code"],
-            how="left",
-        )
-        emissions = emissions.merge(
-            wtd_sulfur_content_fuel,
-            left_on=["Reported_Fuel_Type_Code"],
-            right_index=True,
-            how="left",
-        )
-        emissions["SO2_Emissions"] = None
-        criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "No"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = (
-            emissions.loc[criteria, "total_fuel_consumption_quantity"]
-            * emissions.loc[criteria, "Emission_Factor"]
-        )
-        criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "No"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = (
-            emissions.loc[criteria, "total_fuel_consumption_mmbtu"]
-            * emissions.loc[criteria, "Emission_Factor"]
-        )
-        criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "Yes"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = (
-            emissions.loc[criteria, "Avg Sulfur Content (%)"]
-            * emissions.loc[criteria, "Emission_Factor"]
-            * emissions.loc[criteria, "total_fuel_consumption_mmbtu"]
-        )
-        criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "Yes"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = (
-            emissions.loc[criteria, "Avg Sulfur Content (%)"]
-            * emissions.loc[criteria, "Emission_Factor"]
-            * emissions.loc[criteria, "total_fuel_consumption_quantity"]
-        )
+def eia_gen_fuel_net_gen(eia923_gen_fuel):
+    """Annual net generation of each plant, in total and by fuel code."""
+    eia923_gen_fuel = eia923_gen_fuel.assign(
+        **{
+            "Annual Net Generation (MWh)": eia923_gen_fuel[
+                NET_GEN_MONTHLY
+            ].sum(axis=1, skipna=True)
+        }
+    )
+    eia_923_gen_fuel_agg = eia923_gen_fuel.groupby(PLANT_COLUMNS)[
+        "Annual Net Generation (MWh)"
+    ].sum()
+    eia_923_gen_fuel_agg = eia_923_gen_fuel_agg.reset_index()
+    eia_923_gen_fuel_agg_fuel_type = eia923_gen_fuel.groupby(
+        PLANT_COLUMNS + ["reported_fuel_type_code"]
+    )["Annual Net Generation (MWh)"].sum()
+    eia_923_gen_fuel_agg_fuel_type = (
+        eia_923_gen_fuel_agg_fuel_type.reset_index()
+    )
+    eia_923_gen_fuel_agg_fuel_type_pivot = eia_923_gen_fuel_agg_fuel_type.pivot(
+        index="plant_id",
+        columns="reported_fuel_type_code",
+        values="Annual Net Generation (MWh)",
+    )
+    eia_923_gen_fuel_agg_fuel_type_pivot = (
+        eia_923_gen_fuel_agg_fuel_type_pivot.reset_index()
+    )
+    eia_923_gen_fuel_agg = eia_923_gen_fuel_agg.merge(
+        eia_923_gen_fuel_agg_fuel_type_pivot, on="plant_id", how="left"
+    )
+    eia_923_gen_fuel_agg["plant_id"] = eia_923_gen_fuel_agg["plant_id"].astype(
+        str
+    )
+
+    return eia_923_gen_fuel_agg
 
-        emissions_agg = emissions.groupby(
-            ["plant_id", "plant_name", "operator_name"], as_index=False
-        )[
+
+def eia_gen_fuel_so2_emissions(
+    eia923_gen_fuel_sub, ef_so2, wtd_sulfur_content_fuel
+):
+    """SO2 emissions of each plant from the EIA-923 generation and fuel data
+    that is not also in the boiler fuel data."""
+    emissions = eia923_gen_fuel_sub.merge(
+        ef_so2.loc[ef_so2["Boiler_Firing_Type_Code"] == "None", :],
+        left_on=["reported_prime_mover", "reported_fuel_type_code"],
+        right_on=["Reported_Prime_Mover", "Reported_Fuel_Type_Code"],
+        how="left",
+    )
+    emissions = emissions.merge(
+        wtd_sulfur_content_fuel,
+        left_on=["Reported_Fuel_Type_Code"],
+        right_index=True,
+        how="left",
+    )
+    emissions["SO2_Emissions"] = None
+    criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "No"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = (
+        emissions.loc[criteria, "total_fuel_consumption_quantity"]
+        * emissions.loc[criteria, "Emission_Factor"]
+    )
+    criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "No"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = (
+        emissions.loc[criteria, "total_fuel_consumption_mmbtu"]
+        * emissions.loc[criteria, "Emission_Factor"]
+    )
+    criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "Yes"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = (
+        emissions.loc[criteria, "Avg Sulfur Content (%)"]
+        * emissions.loc[criteria, "Emission_Factor"]
+        * emissions.loc[criteria, "total_fuel_consumption_mmbtu"]
+    )
+    criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "Yes"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = (
+        emissions.loc[criteria, "Avg Sulfur Content (%)"]
+        * emissions.loc[criteria, "Emission_Factor"]
+        * emissions.loc[criteria, "total_fuel_consumption_quantity"]
+    )
+
+    emissions_agg = emissions.groupby(PLANT_COLUMNS, as_index=False)[
+        [
             "SO2 (lbs)",
             "total_fuel_consumption_quantity",
             "total_fuel_consumption_mmbtu",
-        ].sum()
-        emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
-
-        return emissions_agg
-
-    def eia_boiler_so2_emissions(eia923_boiler_firing_type):
-
-        fuel_heating_value_monthly = [
-            "mmbtu_per_unit_january",
-            "mmbtu_per_unit_february",
-            "mmbtu_per_unit_march",
-            "mmbtu_per_unit_april",
-            "mmbtu_per_unit_may",
-            "mmbtu_per_unit_june",
-            "mmbtu_per_unit_july",
-            "mmbtu_per_unit_august",
-            "mmbtu_per_unit_september",
-            "mmbtu_per_unit_october",
-            "mmbtu_per_unit_november",
-            "mmbtu_per_unit_december",
-        ]
-        fuel_quantity_monthly = [
-            "quantity_of_fuel_consumed_january",
-            "quantity_of_fuel_consumed_february",
-            "quantity_of_fuel_consumed_march",
-            "quantity_of_fuel_consumed_april",
-            "quantity_of_fuel_consumed_may",
-            "quantity_of_fuel_consumed_june",
-            "quantity_of_fuel_consumed_july",
-            "quantity_of_fuel_consumed_august",
-            "quantity_of_fuel_consumed_september",
-            "quantity_of_fuel_consumed_october",
-            "quantity_of_fuel_consumed_november",
-            "quantity_of_fuel_consumed_december",
-        ]
-        so2_emissions_monthly = [
-            "SO2 (lbs) January",
-            "SO2 (lbs) February",
-            "SO2 (lbs) March",
-            "SO2 (lbs) April",
-            "SO2 (lbs) May",
-            "SO2 (lbs) June",
-            "SO2 (lbs) July",
-            "SO2 (lbs) August",
-            "SO2 (lbs) September",
-            "SO2 (lbs) October",
-            "SO2 (lbs) November",
-            "SO2 (lbs) December",
-        ]
-        sulfur_content_monthly = [
-            "sulfur_content_january",
-            "sulfur_content_february",
-            "sulfur_content_march",
-            "sulfur_content_april",
-            "sulfur_content_may",
-            "sulfur_content_june",
-            "sulfur_content_july",
-            "sulfur_content_august",
-            "sulfur_content_september",
-            "sulfur_content_october",
-            "sulfur_content_november",
-            "sulfur_content_december",
-        ]
-        fuel_heat_quantity_monthly = [
-            "MMBtu January",
-            "MMBtu February",
-            "MMBtu March",
-            "MMBtu April",
-            "MMBtu May",
-            "MMBtu June",
-            "MMBtu July",
-            "MMBtu August",
-            "MMBtu September",
-            "MMBtu October",
-            "MMBtu November",
-            "MMBtu December",
         ]
+    ].sum()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
 
-        eia923_boiler_firing_type[
-            fuel_heating_value_monthly
-        ] = eia923_boiler_firing_type[fuel_heating_value_monthly].apply(
-            pd.to_numeric, errors="coerce"
-        )
-        eia923_boiler_firing_type[
-            fuel_quantity_monthly
-        ] = eia923_boiler_firing_type[fuel_quantity_monthly].apply(
-            pd.to_numeric, errors="coerce"
-        )
-        eia923_boiler_firing_type[
-            sulfur_content_monthly
-        ] = eia923_boiler_firing_type[sulfur_content_monthly].apply(
-            pd.to_numeric, errors="coerce"
-        )
-        eia923_boiler_firing_type[fuel_heat_quantity_monthly] = np.multiply(
-            eia923_boiler_firing_type[fuel_heating_value_monthly],
-            eia923_boiler_firing_type[fuel_quantity_monthly],
-        )
-        emissions = eia923_boiler_firing_type.merge(
-            ef_so2,
-            left_on=[
-                "reported_prime_mover",
-                "reported_fuel_type_code",
-                "firing_type_1",
-            ],
-            right_on=[
-                "Reported_Prime_Mover",
-                "Reported_Fuel_Type_Code",
-                "Boiler_Firing_Type_Code",
-            ],
-            how="left",
-        )
+    return emissions_agg
 
-        emissions["SO2_Emissions"] = None
-        criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "No"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = (
-            emissions.loc[criteria, fuel_quantity_monthly].sum(axis=1)
-            * emissions.loc[criteria, "Emission_Factor"]
-        )
-        criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "No"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = (
-            emissions.loc[criteria, fuel_heat_quantity_monthly].sum(axis=1)
-            * emissions.loc[criteria, "Emission_Factor"]
-        )
-        criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "Yes"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = np.multiply(
-            np.diagonal(
-                np.dot(
-                    emissions.loc[criteria, fuel_heat_quantity_monthly].fillna(
-                        0
-                    ),
-                    emissions.loc[criteria, sulfur_content_monthly]
-                    .fillna(0)
-                    .T,
-                )
-            ),
-            emissions.loc[criteria, "Emission_Factor"],
-        )
-        criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
-            emissions["Multiply_by_S_Content"] == "Yes"
-        )
-        emissions.loc[criteria, "SO2 (lbs)"] = np.multiply(
-            np.diagonal(
-                np.dot(
-                    emissions.loc[criteria, fuel_quantity_monthly].fillna(0),
-                    emissions.loc[criteria, sulfur_content_monthly]
-                    .fillna(0)
-                    .T,
-                )
-            ),
-            emissions.loc[criteria, "Emission_Factor"],
-        )
-        #        emissions["SO2 (lbs)"] = (emissions[so2_emissions_monthly]).sum(
-        #            axis=1, skipna=True
-        #        )
-        emissions["total_fuel_consumption_mmbtu"] = emissions[
-            fuel_heat_quantity_monthly
-        ].sum(axis=1)
-        emissions_merge = emissions.merge(
-            eia_so2_rem_eff, on=["plant_id", "boiler_id"], how="left"
-        )
-        emissions_merge[
-            "so2_removal_efficiency_rate_at_annual_operating_factor"
-        ] = emissions_merge[
+
+def eia_boiler_so2_emissions(eia923_boiler_firing_type, ef_so2, eia_so2_rem_eff):
+    """SO2 emissions of each plant from the EIA-923 boiler fuel data, net of
+    the plant's SO2 controls."""
+    emissions = eia923_boiler_firing_type.merge(
+        ef_so2,
+        left_on=[
+            "reported_prime_mover",
+            "reported_fuel_type_code",
+            "firing_type_1",
+        ],
+        right_on=[
+            "Reported_Prime_Mover",
+            "Reported_Fuel_Type_Code",
+            "Boiler_Firing_Type_Code",
+        ],
+        how="left",
+    )
+
+    emissions["SO2_Emissions"] = None
+    criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "No"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = (
+        emissions.loc[criteria, FUEL_QUANTITY_MONTHLY].sum(axis=1)
+        * emissions.loc[criteria, "Emission_Factor"]
+    )
+    criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "No"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = (
+        emissions.loc[criteria, FUEL_HEAT_QUANTITY_MONTHLY].sum(axis=1)
+        * emissions.loc[criteria, "Emission_Factor"]
+    )
+    criteria = (emissions["Emission_Factor_Denominator"] == "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "Yes"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = np.multiply(
+        _row_dot(
+            emissions.loc[criteria, FUEL_HEAT_QUANTITY_MONTHLY],
+            emissions.loc[criteria, SULFUR_CONTENT_MONTHLY],
+        ),
+        emissions.loc[criteria, "Emission_Factor"],
+    )
+    criteria = (emissions["Emission_Factor_Denominator"] != "MMBtu") & (
+        emissions["Multiply_by_S_Content"] == "Yes"
+    )
+    emissions.loc[criteria, "SO2 (lbs)"] = np.multiply(
+        _row_dot(
+            emissions.loc[criteria, FUEL_QUANTITY_MONTHLY],
+            emissions.loc[criteria, SULFUR_CONTENT_MONTHLY],
+        ),
+        emissions.loc[criteria, "Emission_Factor"],
+    )
+    emissions["total_fuel_consumption_mmbtu"] = emissions[
+        FUEL_HEAT_QUANTITY_MONTHLY
+    ].sum(axis=1)
+    emissions_merge = emissions.merge(
+        eia_so2_rem_eff, on=["plant_id", "boiler_id"], how="left"
+    )
+    emissions_merge[
+        "so2_removal_efficiency_rate_at_annual_operating_factor"
+    ] = emissions_merge[
+        "so2_removal_efficiency_rate_at_annual_operating_factor"
+    ].fillna(
+        0
+    )
+    emissions_merge["SO2 (lbs) with AEC"] = emissions_merge["SO2 (lbs)"] * (
+        1
+        - emissions_merge[
             "so2_removal_efficiency_rate_at_annual_operating_factor"
-        ].fillna(
-            0
-        )
-        emissions_merge["SO2 (lbs) with AEC"] = emissions_merge[
-            "SO2 (lbs)"
-        ] * (
-            1
-            - emissions_merge[
-                "so2_removal_efficiency_rate_at_annual_operating_factor"
-            ]
-        )
-        emissions_agg = emissions_merge.groupby(
-            ["plant_id", "plant_name", "operator_name"], as_index=False
-        )[
+        ]
+    )
+    emissions_agg = emissions_merge.groupby(PLANT_COLUMNS, as_index=False)[
+        [
             "SO2 (lbs) with AEC",
             "total_fuel_consumption_quantity",
             "total_fuel_consumption_mmbtu",
-        ].sum()
-        emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
-        emissions_agg = emissions_agg.rename(
-            columns={"SO2 (lbs) with AEC": "SO2 (lbs)"}
-        )
+        ]
+    ].sum()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
+    emissions_agg = emissions_agg.rename(
+        columns={"SO2 (lbs) with AEC": "SO2 (lbs)"}
+    )
 
-        return emissions_agg
+    return emissions_agg
 
-    def eia_gen_fuel_nox_emissions(eia923_gen_fuel_sub):
 
-        #        emissions = pd.DataFrame()
-        emissions = eia923_gen_fuel_sub.merge(
-            ef_nox,
-            left_on=["reported_fuel_type_code", "reported_prime_mover"],
-            right_on=["Reported_Fuel_Type_Code", "Reported_Prime_Mover"],
-            how="left",
-        )
-        emissions["NOx (lbs)"] = None
-        criteria = emissions["Emission_Factor_Denominator"] == "MMBtu"
-        emissions.loc[criteria, "NOx (lbs)"] = (
-            emissions.loc[criteria, "Emission_Factor"]
-            * emissions.loc[criteria, "total_fuel_consumption_mmbtu"]
-        )
-        criteria = emissions["Emission_Factor_Denominator"] != "MMBtu"
-        emissions.loc[criteria, "NOx (lbs)"] = (
-            emissions.loc[criteria, "Emission_Factor"]
-            * emissions.loc[criteria, "total_fuel_consumption_quantity"]
-        )
-        emissions_agg = emissions.groupby(
-            ["plant_id", "plant_name", "operator_name"], as_index=False
-        )[
+def eia_gen_fuel_nox_emissions(eia923_gen_fuel_sub, ef_nox):
+    """NOx emissions of each plant from the EIA-923 generation and fuel data
+    that is not also in the boiler fuel data."""
+    emissions = eia923_gen_fuel_sub.merge(
+        ef_nox,
+        left_on=["reported_fuel_type_code", "reported_prime_mover"],
+        right_on=["Reported_Fuel_Type_Code", "Reported_Prime_Mover"],
+        how="left",
+    )
+    emissions["NOx (lbs)"] = None
+    criteria = emissions["Emission_Factor_Denominator"] == "MMBtu"
+    emissions.loc[criteria, "NOx (lbs)"] = (
+        emissions.loc[criteria, "Emission_Factor"]
+        * emissions.loc[criteria, "total_fuel_consumption_mmbtu"]
+    )
+    criteria = emissions["Emission_Factor_Denominator"] != "MMBtu"
+    emissions.loc[criteria, "NOx (lbs)"] = (
+        emissions.loc[criteria, "Emission_Factor"]
+        * emissions.loc[criteria, "total_fuel_consumption_quantity"]
+    )
+    emissions_agg = emissions.groupby(PLANT_COLUMNS, as_index=False)[
+        [
             "NOx (lbs)",
             "total_fuel_consumption_quantity",
             "total_fuel_consumption_mmbtu",
-        ].sum()
-        emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
-
-        return emissions_agg
-
-    def eia_boiler_nox(row):
-        if row["nox_emission_rate_entire_year_lbs_mmbtu"] > 0:
-            return row["NOx Based on Annual Rate (lbs)"]
-        else:
-            return row["NOx (lbs)"]
-
-    def eia_boiler_nox_emissions(eia923_boiler_firing_type):
-        fuel_heat_quantity_monthly = [
-            "MMBtu January",
-            "MMBtu February",
-            "MMBtu March",
-            "MMBtu April",
-            "MMBtu May",
-            "MMBtu June",
-            "MMBtu July",
-            "MMBtu August",
-            "MMBtu September",
-            "MMBtu October",
-            "MMBtu November",
-            "MMBtu December",
         ]
-        emissions = pd.DataFrame()
-        emissions = eia923_boiler_firing_type.merge(
-            ef_nox,
-            left_on=[
-                "reported_fuel_type_code",
-                "reported_prime_mover",
-                "firing_type_1",
-            ],
-            right_on=[
-                "Reported_Fuel_Type_Code",
-                "Reported_Prime_Mover",
-                "Boiler_Firing_Type_Code",
-            ],
-            how="left",
-        )
-        emissions["NOx (lbs)"] = emissions["Emission_Factor"] * emissions[
-            "total_fuel_consumption_quantity"
-        ].astype(float, errors="ignore")
-
-        emissions.dropna(subset=["NOx (lbs)"], inplace=True)
-        emissions["total_fuel_consumption_mmbtu"] = emissions[
-            fuel_heat_quantity_monthly
-        ].sum(axis=1)
-        emissions_boiler = emissions.merge(
-            eia_nox_rate, on=["plant_id", "boiler_id"], how="left"
-        )
-        emissions_boiler["NOx Based on Annual Rate (lbs)"] = (
-            emissions_boiler["total_fuel_consumption_mmbtu"]
-            * emissions_boiler["nox_emission_rate_entire_year_lbs_mmbtu"]
-        )
-        emissions_boiler = emissions_boiler.assign(
-            NOx_lbs=emissions_boiler.apply(eia_boiler_nox, axis=1)
-        )
-        emissions_agg = emissions_boiler.groupby(
-            ["plant_id", "plant_name", "operator_name"], as_index=False
-        )[
+    ].sum()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
+
+    return emissions_agg
+
+
+def eia_boiler_nox_emissions(eia923_boiler_firing_type, ef_nox, eia_nox_rate):
+    """NOx emissions of each plant from the EIA-923 boiler fuel data, using
+    the annual NOx emission rate of the boiler where there is one."""
+    emissions = eia923_boiler_firing_type.merge(
+        ef_nox,
+        left_on=[
+            "reported_fuel_type_code",
+            "reported_prime_mover",
+            "firing_type_1",
+        ],
+        right_on=[
+            "Reported_Fuel_Type_Code",
+            "Reported_Prime_Mover",
+            "Boiler_Firing_Type_Code",
+        ],
+        how="left",
+    )
+    emissions["NOx (lbs)"] = emissions["Emission_Factor"] * emissions[
+        "total_fuel_consumption_quantity"
+    ].astype(float, errors="ignore")
+
+    emissions.dropna(subset=["NOx (lbs)"], inplace=True)
+    emissions["total_fuel_consumption_mmbtu"] = emissions[
+        FUEL_HEAT_QUANTITY_MONTHLY
+    ].sum(axis=1)
+    emissions_boiler = emissions.merge(
+        eia_nox_rate, on=["plant_id", "boiler_id"], how="left"
+    )
+    emissions_boiler["NOx Based on Annual Rate (lbs)"] = (
+        emissions_boiler["total_fuel_consumption_mmbtu"]
+        * emissions_boiler["nox_emission_rate_entire_year_lbs_mmbtu"]
+    )
+    emissions_boiler["NOx_lbs"] = np.where(
+        emissions_boiler["nox_emission_rate_entire_year_lbs_mmbtu"] > 0,
+        emissions_boiler["NOx Based on Annual Rate (lbs)"],
+        emissions_boiler["NOx (lbs)"],
+    )
+    emissions_agg = emissions_boiler.groupby(PLANT_COLUMNS, as_index=False)[
+        [
             "NOx_lbs",
             "total_fuel_consumption_quantity",
             "total_fuel_consumption_mmbtu",
-        ].sum()
-        emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
-        emissions_agg = emissions_agg.rename(columns={"NOx_lbs": "NOx (lbs)"})
-        return emissions_agg
+        ]
+    ].sum()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
+    emissions_agg = emissions_agg.rename(columns={"NOx_lbs": "NOx (lbs)"})
+    return emissions_agg
+
 
-    def eia_wtd_sulfur_content(eia923_boiler):
-        """This function determines the weighted average sulfur content of all reported fuel types
+def eia_wtd_sulfur_content(eia923_boiler):
+    """This function determines the weighted average sulfur content of all reported fuel types
     reported in EIA-923 Monthly Boiler Fuel Consumption and Emissions Time Series File.
     Weighted average fuel sulfur content is derived via monthly fuel quantities and sulfur content reported
     in 'EIA-923 Monthly Boiler Fuel Consumption and Emissions Time Series File'. This approach implicitly
@@ -708,499 +536,268 @@ def generate_plant_emissions(year):
         [sulfur_content_agg] -- A 39x1 dataframe, the index represents all unqiue EIA reported fuel
         code types in the 'EIA-923 Monthly Boiler Fuel Consumption and Emissions Time Series File'.
         The rows represent the weigthed average sulfur fuel content for the select fuel.
-        """
-
-        sulfur_content = pd.DataFrame()
-        eia923_boiler_drop_na = eia923_boiler.dropna(
-            subset=["reported_fuel_type_code"]
-        )
-        eia923_boiler_unique_fuel_codes = (
-            eia923_boiler[["reported_fuel_type_code"]]
-            .drop_duplicates()
-            .dropna()
-        )
-        eia923_boiler_unique_fuel_codes.columns = ["reported_fuel_type_code"]
-
-        for row in eia923_boiler_unique_fuel_codes.itertuples():
-            fuel_type = eia923_boiler_drop_na.loc[
-                eia923_boiler_drop_na["reported_fuel_type_code"].astype(str)
-                == str(row.reported_fuel_type_code)
-            ].copy()
-            fuel_quantity_monthly = [
-                "quantity_of_fuel_consumed_january",
-                "quantity_of_fuel_consumed_february",
-                "quantity_of_fuel_consumed_march",
-                "quantity_of_fuel_consumed_april",
-                "quantity_of_fuel_consumed_may",
-                "quantity_of_fuel_consumed_june",
-                "quantity_of_fuel_consumed_july",
-                "quantity_of_fuel_consumed_august",
-                "quantity_of_fuel_consumed_september",
-                "quantity_of_fuel_consumed_october",
-                "quantity_of_fuel_consumed_november",
-                "quantity_of_fuel_consumed_december",
-            ]
-            sulfur_content_monthly = [
-                "sulfur_content_january",
-                "sulfur_content_february",
-                "sulfur_content_march",
-                "sulfur_content_april",
-                "sulfur_content_may",
-                "sulfur_content_june",
-                "sulfur_content_july",
-                "sulfur_content_august",
-                "sulfur_content_september",
-                "sulfur_content_october",
-                "sulfur_content_november",
-                "sulfur_content_december",
-            ]
-            fuel_type["Sulfur Weighted"] = (
-                np.multiply(
-                    fuel_type[fuel_quantity_monthly],
-                    fuel_type[sulfur_content_monthly],
-                )
-            ).sum(axis=1, skipna=True)
-            frames = [sulfur_content, fuel_type]
-            sulfur_content = pd.concat(frames)
-        sulfur_content_agg = sulfur_content.groupby(
-            ["reported_fuel_type_code"], as_index=False
-        )["Sulfur Weighted", "total_fuel_consumption_quantity"].sum()
-        sulfur_content_agg["Avg Sulfur Content (%)"] = (
-            sulfur_content_agg["Sulfur Weighted"]
-            / sulfur_content_agg["total_fuel_consumption_quantity"]
+    """
+    sulfur_content = eia923_boiler.dropna(
+        subset=["reported_fuel_type_code"]
+    ).copy()
+    sulfur_content["Sulfur Weighted"] = (
+        np.multiply(
+            sulfur_content[FUEL_QUANTITY_MONTHLY],
+            np.asarray(sulfur_content[SULFUR_CONTENT_MONTHLY]),
         )
-        sulfur_content_agg = sulfur_content_agg[
-            ["reported_fuel_type_code", "Avg Sulfur Content (%)"]
-        ]
+    ).sum(axis=1, skipna=True)
+    sulfur_content_agg = sulfur_content.groupby(
+        ["reported_fuel_type_code"], as_index=False
+    )[["Sulfur Weighted", "total_fuel_consumption_quantity"]].sum()
+    sulfur_content_agg["Avg Sulfur Content (%)"] = (
+        sulfur_content_agg["Sulfur Weighted"]
+        / sulfur_content_agg["total_fuel_consumption_quantity"]
+    )
+    sulfur_content_agg = sulfur_content_agg[
+        ["reported_fuel_type_code", "Avg Sulfur Content (%)"]
+    ]
 
-        return sulfur_content_agg
+    return sulfur_content_agg
 
-    def eia_primary_fuel(row):
-        if row["Primary Fuel %"] < model_specs.min_plant_percent_generation_from_primary_fuel_category/100:
-            return "Mixed Fuel Type"
-        else:
-            return row["Primary Fuel"]
 
-    def emissions_logic_CO2(row):
-        if (
-            (
-                row["ampd Heat Input (MMBtu)"]
-                < row["total_fuel_consumption_mmbtu"] * 1.2
-            )
-            | (
-                row["ampd Heat Input (MMBtu)"]
-                > row["total_fuel_consumption_mmbtu"] * 0.8
-            )
-        ) & (
-            (row["ampd CO2 (Tons)"] < row["CO2 (Tons)"] * 100)
-            | (row["ampd CO2 (Tons)"] > row["CO2 (Tons)"] * (1 / 100))
-        ):
-            row["Source"] = "ampd"
-            return row["ampd CO2 (Tons)"], row["Source"]
-        else:
-            row["Source"] = "ap42"
-            return row["CO2 (Tons)"], row["Source"]
-
-    def emissions_logic_SO2(row):
-        if (
-            (
-                row["ampd Heat Input (MMBtu)"]
-                < row["total_fuel_consumption_mmbtu"] * 1.2
-            )
-            | (
-                row["ampd Heat Input (MMBtu)"]
-                > row["total_fuel_consumption_mmbtu"] * 0.8
-            )
-        ) & (
-            (row["ampd SO2 (lbs)"] < row["SO2 (lbs)"] * 100)
-            | (row["ampd SO2 (lbs)"] > row["SO2 (lbs)"] * (1 / 100))
-        ):
-            row["Source"] = "ampd"
-            return row["ampd SO2 (lbs)"], row["Source"]
-        else:
-            row["Source"] = "ap42"
-            return row["SO2 (lbs)"], row["Source"]
-
-    def emissions_logic_NOx(row):
-        if (
-            (
-                row["ampd Heat Input (MMBtu)"]
-                < row["total_fuel_consumption_mmbtu"] * 1.2
-            )
-            | (
-                row["ampd Heat Input (MMBtu)"]
-                > row["total_fuel_consumption_mmbtu"] * 0.8
-            )
-        ) & (
-            (row["ampd NOX (lbs)"] < row["NOx (lbs)"] * 100)
-            | (row["ampd NOX (lbs)"] > row["NOx (lbs)"] * (1 / 100))
-        ):
-            row["Source"] = "ampd"
-            return row["ampd NOX (lbs)"], row["Source"]
-        else:
-            row["Source"] = "ap42"
-            return row["NOx (lbs)"], row["Source"]
+class PlantEmissionInputs:
+    """
+    The data used to calculate plant emissions for one year. Each data set
+    is loaded (or derived from the others) the first time it is used, so
+    stages that are loaded from the stage cache don't read their inputs.
 
-    print(
-        "Generating power plant emissions from CEMS data or emission factors..."
-    )
-    logging.info("Loading data")
-    ampd = cems.build_cems_df(year)
-    eia923_gen_fuel = eia923.eia923_generation_and_fuel(year)
-    #    eia923_gen_fuel = pd.read_pickle(
-    #        f"{data_dir}/EIA 923/Pickle Files/Generation and Fuel/EIA 923 Generation and Fuel {year}.pkl"
-    #    )
-    eia923_boiler = eia923.eia923_boiler_fuel(year)
-    #    eia923_boiler = pd.read_pickle(
-    #        f"{data_dir}/EIA 923/Pickle Files/Boiler Fuel/EIA 923 Boiler Fuel {year}.pkl"
-    #    )
-    eia923_aec = eia923.eia923_sched8_aec(year)
-    #    eia923_aec = pd.read_pickle(
-    #        f"{data_dir}/EIA 923/Pickle Files/Air Emissions Control/EIA 923 AEC {year}.pkl"
-    #    )
-    eia860_env_assoc_boiler_NOx = eia860.eia860_EnviroAssoc_nox(year)
-    #    eia860_env_assoc_boiler_NOx = pd.read_pickle(
-    #        f"{data_dir}/EIA 860/Pickle Files/Environmental Associations/EIA 860 Boiler NOx {year}.pkl"
-    #    )
-    eia860_env_assoc_boiler_SO2 = eia860.eia860_EnviroAssoc_so2(year)
-    #    eia860_env_assoc_boiler_SO2 = pd.read_pickle(
-    #        f"{data_dir}/EIA 860/Pickle Files/Environmental Associations/EIA 860 Boiler SO2 {year}.pkl"
-    #    )
-    eia860_boiler_design = eia860.eia860_boiler_info_design(year)
-    #    eia860_boiler_design = pd.read_pickle(
-    #        f"{data_dir}/EIA 860/Pickle Files/Boiler Info & Design Parameters/EIA 860 Boiler Design {year}.pkl"
-    #    )
-    ef_co2_ch4_n2o = pd.read_excel(
-        f"{data_dir}/EFs/eLCI EFs.xlsx", sheet_name="CO2,CH4,N2O"
-    )
-    ef_so2 = pd.read_csv(f"{data_dir}/EFs/eLCI EFs_SO2.csv", index_col=0)
-    ef_nox = pd.read_csv(f"{data_dir}/EFs/eLCI EFs_NOx.csv", index_col=0)
-    eia_nox_rate = eia923_aec[
-        [
-            "plant_id",
-            "nox_control_id",
-            "nox_emission_rate_entire_year_lbs_mmbtu",
-        ]
-    ].copy()
+    The stages share one instance when they run in different threads, and a
+    data set that several of them need is only loaded once. The stages must
+    not modify the data sets.
 
-    eia_nox_rate["nox_emission_rate_entire_year_lbs_mmbtu"] = eia_nox_rate[
-        "nox_emission_rate_entire_year_lbs_mmbtu"
-    ].apply(pd.to_numeric, errors="coerce")
-    eia_nox_rate = eia_nox_rate.dropna().drop_duplicates()
-    eia_nox_rate["nox_control_id"] = eia_nox_rate["nox_control_id"].astype(str)
-    eia_nox_rate["plant_id"] = eia_nox_rate["plant_id"].astype(str)
-    eia_nox_rate = eia_nox_rate.merge(
-        eia860_env_assoc_boiler_NOx[
-            ["plant_id", "nox_control_id", "boiler_id"]
-        ],
-        on=["plant_id", "nox_control_id"],
-        how="left",
-    )
-    eia_nox_rate = eia_nox_rate.dropna()
-    eia_nox_rate = eia_nox_rate[
-        ["plant_id", "nox_emission_rate_entire_year_lbs_mmbtu", "boiler_id"]
-    ].drop_duplicates(["plant_id", "boiler_id"])
+    Parameters
+    ----------
+    year : int
+        Year of data to use (Air Markets Program Data, EIA 923, etc.)
+    """
 
-    eia_so2_rem_eff = eia923_aec[
-        [
-            "plant_id",
-            "so2_control_id",
-            "so2_removal_efficiency_rate_at_annual_operating_factor",
-        ]
-    ].copy()
-    eia_so2_rem_eff[
-        "so2_removal_efficiency_rate_at_annual_operating_factor"
-    ] = eia_so2_rem_eff[
-        "so2_removal_efficiency_rate_at_annual_operating_factor"
-    ].apply(
-        pd.to_numeric, errors="coerce"
-    )
-    eia_so2_rem_eff = eia_so2_rem_eff.dropna().drop_duplicates()
-    eia_so2_rem_eff["so2_control_id"] = eia_so2_rem_eff[
-        "so2_control_id"
-    ].astype(str)
-    eia_so2_rem_eff["plant_id"] = eia_so2_rem_eff["plant_id"].astype(str)
-    eia_so2_rem_eff = eia_so2_rem_eff.merge(
-        eia860_env_assoc_boiler_SO2[
-            ["plant_id", "so2_control_id", "boiler_id"]
-        ],
-        on=["plant_id", "so2_control_id"],
-        how="left",
-    )
-    eia_so2_rem_eff = eia_so2_rem_eff.dropna()
-    eia_so2_rem_eff = eia_so2_rem_eff[
-        [
-            "plant_id",
-            "so2_removal_efficiency_rate_at_annual_operating_factor",
-            "boiler_id",
-        ]
-    ].drop_duplicates(["plant_id", "boiler_id"])
-
-    eia923_gen_fuel_unique_fuel_codes = (
-        eia923_gen_fuel[["reported_fuel_type_code"]].drop_duplicates().dropna()
-    )
-    wtd_sulfur_content_fuel = eia923_gen_fuel_unique_fuel_codes.merge(
-        # Check this routine
-        eia_wtd_sulfur_content(eia923_boiler),
-        on=["reported_fuel_type_code"],
-        how="outer",
-    ).fillna(0)
-    wtd_sulfur_content_fuel.set_index("reported_fuel_type_code", inplace=True)
-
-    #    eia923_gen_fuel = eia923_gen_fuel.rename(
-    #        columns={"prime_mover": "Reported Prime Mover"}
-    #    )
-    index1 = pd.MultiIndex.from_arrays(
-        [
-            eia923_gen_fuel[col]
-            for col in [
-                "plant_id",
-                "reported_prime_mover",
-                "reported_fuel_type_code",
-            ]
-        ]
-    )
-    index2 = pd.MultiIndex.from_arrays(
-        [
-            eia923_boiler[col]
-            for col in [
-                "plant_id",
-                "reported_prime_mover",
-                "reported_fuel_type_code",
-            ]
-        ]
-    )
-    eia923_gen_fuel_sub = eia923_gen_fuel.loc[~index1.isin(index2)]
-    eia923_boiler_sub = eia923_boiler.loc[index2.isin(index1)]
+    def __init__(self, year):
+        self.year = year
+        self._data = {}
+        self._locks = {}
+        self._lock = threading.Lock()
 
-    del index1, index2
+    def __getitem__(self, name):
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._data:
+                module_logger.info(f"Loading {name}")
+                self._data[name] = getattr(self, f"_load_{name}")()
+        return self._data[name]
 
-    index1 = pd.MultiIndex.from_arrays(
-        [
-            eia923_gen_fuel[col]
-            for col in ["reported_prime_mover", "reported_fuel_type_code"]
-        ]
-    )
-    index2 = pd.MultiIndex.from_arrays(
-        [
-            eia923_boiler[col]
-            for col in ["reported_prime_mover", "reported_fuel_type_code"]
-        ]
-    )
-    eia923_gen_fuel_union_boiler = eia923_gen_fuel.loc[~index1.isin(index2)]
-    eia923_gen_fuel_union_boiler = eia923_gen_fuel_union_boiler.loc[
-        eia923_gen_fuel_union_boiler["plant_id"].isin(
-            eia923_boiler["plant_id"]
-        )
-    ]
+    def _load_gen_fuel(self):
+        return eia923.eia923_generation_and_fuel(self.year)
 
-    del index1, index2
-    logging.info("Summing eia923 fuel generation")
-    eia923_gen_fuel_sub_agg = eia923_gen_fuel_sub.groupby(
-        ["plant_id"], as_index=False
-    )["total_fuel_consumption_mmbtu", "total_fuel_consumption_quantity"].sum()
-    eia923_gen_fuel_sub_agg.columns = [
-        "plant_id",
-        "Sheet 1_Total Fuel Consumption (MMBtu)",
-        "Sheet 1_total_fuel_consumption_quantity",
-    ]
-    eia923_gen_fuel_sub_agg["plant_id"] = eia923_gen_fuel_sub_agg[
-        "plant_id"
-    ].astype(str)
+    def _load_boiler(self):
+        return eia923.eia923_boiler_fuel(self.year)
 
-    eia923_boiler_sub_agg = eia923_boiler_sub.copy()
-    fuel_heating_value_monthly = [
-        "mmbtu_per_unit_january",
-        "mmbtu_per_unit_february",
-        "mmbtu_per_unit_march",
-        "mmbtu_per_unit_april",
-        "mmbtu_per_unit_may",
-        "mmbtu_per_unit_june",
-        "mmbtu_per_unit_july",
-        "mmbtu_per_unit_august",
-        "mmbtu_per_unit_september",
-        "mmbtu_per_unit_october",
-        "mmbtu_per_unit_november",
-        "mmbtu_per_unit_december",
-    ]
-    fuel_quantity_monthly = [
-        "quantity_of_fuel_consumed_january",
-        "quantity_of_fuel_consumed_february",
-        "quantity_of_fuel_consumed_march",
-        "quantity_of_fuel_consumed_april",
-        "quantity_of_fuel_consumed_may",
-        "quantity_of_fuel_consumed_june",
-        "quantity_of_fuel_consumed_july",
-        "quantity_of_fuel_consumed_august",
-        "quantity_of_fuel_consumed_september",
-        "quantity_of_fuel_consumed_october",
-        "quantity_of_fuel_consumed_november",
-        "quantity_of_fuel_consumed_december",
-    ]
-    logging.info("Summing eia923 boiler data")
-    eia923_boiler_sub_agg["total_fuel_consumption_mmbtu"] = (
-        np.multiply(
-            eia923_boiler_sub_agg[fuel_heating_value_monthly],
-            eia923_boiler_sub_agg[fuel_quantity_monthly],
+    def _load_aec(self):
+        return eia923.eia923_sched8_aec(self.year)
+
+    def _load_env_assoc_nox(self):
+        return eia860.eia860_EnviroAssoc_nox(self.year)
+
+    def _load_env_assoc_so2(self):
+        return eia860.eia860_EnviroAssoc_so2(self.year)
+
+    def _load_boiler_design(self):
+        return eia860.eia860_boiler_info_design(self.year)
+
+    def _load_cems(self):
+        return cems.build_cems_df(self.year)
+
+    def _load_ef_co2_ch4_n2o(self):
+        return pd.read_excel(
+            f"{data_dir}/EFs/eLCI EFs.xlsx", sheet_name="CO2,CH4,N2O"
         )
-    ).sum(axis=1, skipna=True)
-    eia923_boiler_sub_agg = eia923_boiler_sub_agg.groupby(
-        ["plant_id"], as_index=False
-    )["total_fuel_consumption_mmbtu", "total_fuel_consumption_quantity"].sum()
-    eia923_boiler_sub_agg.columns = [
-        "plant_id",
-        "Sheet 3_Total Fuel Consumption (MMBtu)",
-        "Sheet 3_total_fuel_consumption_quantity",
-    ]
-    eia923_boiler_sub_agg["plant_id"] = eia923_boiler_sub_agg[
-        "plant_id"
-    ].astype(str)
 
-    eia923_gen_fuel_union_boiler_agg = eia923_gen_fuel_union_boiler.groupby(
-        ["plant_id"], as_index=False
-    )["total_fuel_consumption_mmbtu", "total_fuel_consumption_quantity"].sum()
-    eia923_gen_fuel_union_boiler_agg.columns = [
-        "plant_id",
-        "Sheet 1_Union Total Fuel Consumption (MMBtu)",
-        "Sheet 1_Union total_fuel_consumption_quantity",
-    ]
-    eia923_gen_fuel_union_boiler_agg[
-        "plant_id"
-    ] = eia923_gen_fuel_union_boiler_agg["plant_id"].astype(str)
+    def _load_ef_so2(self):
+        return pd.read_csv(f"{data_dir}/EFs/eLCI EFs_SO2.csv", index_col=0)
 
-    eia923_gen_fuel_boiler_agg = eia923_gen_fuel.loc[
-        eia923_gen_fuel["plant_id"].isin(eia923_boiler["plant_id"])
-    ]
-    eia923_gen_fuel_boiler_agg = eia923_gen_fuel_boiler_agg.groupby(
-        ["plant_id"], as_index=False
-    )["total_fuel_consumption_mmbtu", "total_fuel_consumption_quantity"].sum()
-    eia923_gen_fuel_boiler_agg.columns = [
-        "plant_id",
-        "Sheet 1_Total Fuel Consumption (MMBtu)",
-        "Sheet 1_total_fuel_consumption_quantity",
-    ]
-    eia923_gen_fuel_boiler_agg["plant_id"] = eia923_gen_fuel_boiler_agg[
-        "plant_id"
-    ].astype(str)
+    def _load_ef_nox(self):
+        return pd.read_csv(f"{data_dir}/EFs/eLCI EFs_NOx.csv", index_col=0)
+
+    def _load_nox_rate(self):
+        """Annual NOx emission rate of each boiler."""
+        eia_nox_rate = self["aec"][
+            [
+                "plant_id",
+                "nox_control_id",
+                "nox_emission_rate_entire_year_lbs_mmbtu",
+            ]
+        ].copy()
+        eia_nox_rate["nox_emission_rate_entire_year_lbs_mmbtu"] = pd.to_numeric(
+            eia_nox_rate["nox_emission_rate_entire_year_lbs_mmbtu"],
+            errors="coerce",
+        )
+        eia_nox_rate = eia_nox_rate.dropna().drop_duplicates()
+        eia_nox_rate["nox_control_id"] = eia_nox_rate["nox_control_id"].astype(
+            str
+        )
+        eia_nox_rate["plant_id"] = eia_nox_rate["plant_id"].astype(str)
+        eia_nox_rate = eia_nox_rate.merge(
+            self["env_assoc_nox"][["plant_id", "nox_control_id", "boiler_id"]],
+            on=["plant_id", "nox_control_id"],
+            how="left",
+        )
+        eia_nox_rate = eia_nox_rate.dropna()
+        return eia_nox_rate[
+            ["plant_id", "nox_emission_rate_entire_year_lbs_mmbtu", "boiler_id"]
+        ].drop_duplicates(["plant_id", "boiler_id"])
+
+    def _load_so2_rem_eff(self):
+        """SO2 removal efficiency of each boiler."""
+        eia_so2_rem_eff = self["aec"][
+            [
+                "plant_id",
+                "so2_control_id",
+                "so2_removal_efficiency_rate_at_annual_operating_factor",
+            ]
+        ].copy()
+        eia_so2_rem_eff[
+            "so2_removal_efficiency_rate_at_annual_operating_factor"
+        ] = pd.to_numeric(
+            eia_so2_rem_eff[
+                "so2_removal_efficiency_rate_at_annual_operating_factor"
+            ],
+            errors="coerce",
+        )
+        eia_so2_rem_eff = eia_so2_rem_eff.dropna().drop_duplicates()
+        eia_so2_rem_eff["so2_control_id"] = eia_so2_rem_eff[
+            "so2_control_id"
+        ].astype(str)
+        eia_so2_rem_eff["plant_id"] = eia_so2_rem_eff["plant_id"].astype(str)
+        eia_so2_rem_eff = eia_so2_rem_eff.merge(
+            self["env_assoc_so2"][["plant_id", "so2_control_id", "boiler_id"]],
+            on=["plant_id", "so2_control_id"],
+            how="left",
+        )
+        eia_so2_rem_eff = eia_so2_rem_eff.dropna()
+        return eia_so2_rem_eff[
+            [
+                "plant_id",
+                "so2_removal_efficiency_rate_at_annual_operating_factor",
+                "boiler_id",
+            ]
+        ].drop_duplicates(["plant_id", "boiler_id"])
+
+    def _load_wtd_sulfur_content(self):
+        """Weighted average sulfur content of each generation and fuel
+        fuel code, indexed by the fuel code."""
+        eia923_gen_fuel = self["gen_fuel"]
+        eia923_gen_fuel_unique_fuel_codes = (
+            eia923_gen_fuel[["reported_fuel_type_code"]]
+            .drop_duplicates()
+            .dropna()
+        )
+        wtd_sulfur_content_fuel = eia923_gen_fuel_unique_fuel_codes.merge(
+            # Check this routine
+            eia_wtd_sulfur_content(self["boiler"]),
+            on=["reported_fuel_type_code"],
+            how="outer",
+        ).fillna(0)
+        return wtd_sulfur_content_fuel.set_index("reported_fuel_type_code")
+
+    def _load_gen_fuel_sub(self):
+        """Generation and fuel rows whose plant, prime mover, and fuel are not
+        in the boiler fuel data."""
+        eia923_gen_fuel = self["gen_fuel"]
+        eia923_boiler = self["boiler"]
+        columns = ["plant_id", "reported_prime_mover", "reported_fuel_type_code"]
+        index1 = pd.MultiIndex.from_arrays(
+            [eia923_gen_fuel[col] for col in columns]
+        )
+        index2 = pd.MultiIndex.from_arrays(
+            [eia923_boiler[col] for col in columns]
+        )
+        return eia923_gen_fuel.loc[~index1.isin(index2)]
+
+    def _load_boiler_sub(self):
+        """Boiler fuel rows whose plant, prime mover, and fuel are in the
+        generation and fuel data."""
+        eia923_gen_fuel = self["gen_fuel"]
+        eia923_boiler = self["boiler"]
+        columns = ["plant_id", "reported_prime_mover", "reported_fuel_type_code"]
+        index1 = pd.MultiIndex.from_arrays(
+            [eia923_gen_fuel[col] for col in columns]
+        )
+        index2 = pd.MultiIndex.from_arrays(
+            [eia923_boiler[col] for col in columns]
+        )
+        return eia923_boiler.loc[index2.isin(index1)]
+
+    def _load_boiler_firing_type(self):
+        """boiler_sub with the firing type of each boiler and its monthly
+        heat input."""
+        eia_860_boiler_firing_type = self["boiler_design"][
+            ["plant_id", "boiler_id", "firing_type_1"]
+        ].copy()
+        eia_860_boiler_firing_type["plant_id"] = eia_860_boiler_firing_type[
+            "plant_id"
+        ].astype(str, errors="ignore")
+        eia923_boiler_firing_type = self["boiler_sub"].merge(
+            eia_860_boiler_firing_type, on=["plant_id", "boiler_id"], how="left"
+        )
+        eia923_boiler_firing_type["firing_type_1"] = eia923_boiler_firing_type[
+            "firing_type_1"
+        ].fillna("None")
+        eia923_boiler_firing_type["plant_id"] = eia923_boiler_firing_type[
+            "plant_id"
+        ].astype(str)
+        for columns in [
+            FUEL_HEATING_VALUE_MONTHLY,
+            FUEL_QUANTITY_MONTHLY,
+            SULFUR_CONTENT_MONTHLY,
+        ]:
+            eia923_boiler_firing_type[columns] = eia923_boiler_firing_type[
+                columns
+            ].apply(pd.to_numeric, errors="coerce")
+        eia923_boiler_firing_type[FUEL_HEAT_QUANTITY_MONTHLY] = np.multiply(
+            eia923_boiler_firing_type[FUEL_HEATING_VALUE_MONTHLY],
+            np.asarray(eia923_boiler_firing_type[FUEL_QUANTITY_MONTHLY]),
+        )
+        return eia923_boiler_firing_type
 
-    del fuel_heating_value_monthly, fuel_quantity_monthly
 
-    eia_860_boiler_firing_type = eia860_boiler_design[
-        ["plant_id", "boiler_id", "firing_type_1"]
-    ].copy()
-    eia_860_boiler_firing_type["plant_id"] = eia_860_boiler_firing_type[
-        "plant_id"
-    ].astype(str, errors="ignore")
-    eia923_boiler_firing_type = eia923_boiler_sub.merge(
-        eia_860_boiler_firing_type, on=["plant_id", "boiler_id"], how="left"
-    )
-    eia923_boiler_firing_type["firing_type_1"] = eia923_boiler_firing_type[
-        "firing_type_1"
-    ].fillna("None")
-    eia923_boiler_firing_type["plant_id"] = eia923_boiler_firing_type[
-        "plant_id"
-    ].astype(str)
+def net_generation_stage(inputs):
+    """
+    Annual net generation and primary fuel category of each plant.
+
+    Parameters
+    ----------
+    inputs : PlantEmissionInputs
 
+    Returns
+    -------
+    dict
+        "plant_fuel_class" with the primary fuel of each plant and
+        "plant_generation" with its net generation and fuel consumption.
+    """
+    eia923_gen_fuel = inputs["gen_fuel"]
     eia_gen_fuel_net_gen_output = eia_gen_fuel_net_gen(eia923_gen_fuel)
     eia_gen_fuel_net_gen_output["Primary Fuel"] = eia_gen_fuel_net_gen_output[
-        [
-            "AB",
-            "BFG",
-            "BIT",
-            "BLQ",
-            "DFO",
-            "GEO",
-            "JF",
-            "KER",
-            "LFG",
-            "LIG",
-            "MSB",
-            "MSN",
-            "MWH",
-            "NG",
-            "NUC",
-            "OBG",
-            "OBL",
-            "OBS",
-            "OG",
-            "OTH",
-            "PC",
-            "PG",
-            "PUR",
-            "RC",
-            "RFO",
-            "SC",
-            "SGC",
-            "SGP",
-            "SLW",
-            "SUB",
-            "SUN",
-            "TDF",
-            "WAT",
-            "WC",
-            "WDL",
-            "WDS",
-            "WH",
-            "WND",
-            "WO",
-        ]
+        PRIMARY_FUEL_CODES
     ].idxmax(axis=1)
     eia_gen_fuel_net_gen_output[
         "Primary Fuel Net Generation (MWh)"
-    ] = eia_gen_fuel_net_gen_output[
-        [
-            "AB",
-            "BFG",
-            "BIT",
-            "BLQ",
-            "DFO",
-            "GEO",
-            "JF",
-            "KER",
-            "LFG",
-            "LIG",
-            "MSB",
-            "MSN",
-            "MWH",
-            "NG",
-            "NUC",
-            "OBG",
-            "OBL",
-            "OBS",
-            "OG",
-            "OTH",
-            "PC",
-            "PG",
-            "PUR",
-            "RC",
-            "RFO",
-            "SC",
-            "SGC",
-            "SGP",
-            "SLW",
-            "SUB",
-            "SUN",
-            "TDF",
-            "WAT",
-            "WC",
-            "WDL",
-            "WDS",
-            "WH",
-            "WND",
-            "WO",
-        ]
-    ].max(
-        axis=1
-    )
+    ] = eia_gen_fuel_net_gen_output[PRIMARY_FUEL_CODES].max(axis=1)
     eia_gen_fuel_net_gen_output["Primary Fuel %"] = (
         eia_gen_fuel_net_gen_output["Primary Fuel Net Generation (MWh)"]
         / eia_gen_fuel_net_gen_output["Annual Net Generation (MWh)"]
     )
 
-    eia_gen_fuel_net_gen_output = eia_gen_fuel_net_gen_output.assign(
-        Primary_Fuel=eia_gen_fuel_net_gen_output.apply(
-            eia_primary_fuel, axis=1
-        )
+    eia_gen_fuel_net_gen_output["Primary_Fuel"] = np.where(
+        eia_gen_fuel_net_gen_output["Primary Fuel %"]
+        < model_specs.min_plant_percent_generation_from_primary_fuel_category
+        / 100,
+        "Mixed Fuel Type",
+        eia_gen_fuel_net_gen_output["Primary Fuel"],
     )
     if not model_specs.keep_mixed_plant_category:
         eia_gen_fuel_net_gen_output = eia_gen_fuel_net_gen_output.loc[
@@ -1210,24 +807,105 @@ def generate_plant_emissions(year):
         ["plant_id", "Primary_Fuel", "Primary Fuel %"]
     ].copy()
     plant_fuel_class["plant_id"] = plant_fuel_class["plant_id"].astype(str)
-    logging.info("Generating co2, ch4, n2o from gen fuel")
-    eia_gen_fuel_co2_ch4_n2o_output = eia_gen_fuel_co2_ch4_n2o_emissions(
-        eia923_gen_fuel
-    )
-    logging.info("Generating so2 emissions from gen fuel")
-    eia_gen_fuel_so2_output = eia_gen_fuel_so2_emissions(eia923_gen_fuel_sub)
-    logging.info("Generating nox emissions from gen fuel")
-    eia_gen_fuel_nox_output = eia_gen_fuel_nox_emissions(eia923_gen_fuel_sub)
-    logging.info("Generating co2, ch4, n2o emissions from boiler")
-    eia_boiler_co2_ch4_n2o_output = eia_boiler_co2_ch4_n2o_emissions(
-        eia923_boiler
-    )
-    # This seems to be the long one.
-    logging.info("Generating so2 emissions from boiler fuel")
-    eia_boiler_so2_output = eia_boiler_so2_emissions(eia923_boiler_firing_type)
-    logging.info("Generating nox emissions from boiler fuel")
-    eia_boiler_nox_output = eia_boiler_nox_emissions(eia923_boiler_firing_type)
 
+    eia_923_gen_fuel_plant = eia923_gen_fuel.groupby(
+        PLANT_COLUMNS, as_index=False
+    )[["net_generation_megawatthours", "total_fuel_consumption_mmbtu"]].sum()
+    eia_923_gen_fuel_plant["plant_id"] = eia_923_gen_fuel_plant[
+        "plant_id"
+    ].astype(str)
+    return {
+        "plant_fuel_class": plant_fuel_class,
+        "plant_generation": eia_923_gen_fuel_plant,
+    }
+
+
+def co2_ch4_n2o_stage(inputs):
+    """
+    CO2, CH4, and N2O emissions of each plant from emission factors.
+
+    Parameters
+    ----------
+    inputs : PlantEmissionInputs
+
+    Returns
+    -------
+    dict
+        "gen_fuel" and "boiler" emissions.
+    """
+    module_logger.info("Generating co2, ch4, n2o from gen fuel")
+    gen_fuel = eia_gen_fuel_co2_ch4_n2o_emissions(
+        inputs["gen_fuel_sub"], inputs["ef_co2_ch4_n2o"]
+    )
+    module_logger.info("Generating co2, ch4, n2o emissions from boiler")
+    boiler = eia_boiler_co2_ch4_n2o_emissions(
+        inputs["boiler_sub"], inputs["ef_co2_ch4_n2o"]
+    )
+    return {"gen_fuel": gen_fuel, "boiler": boiler}
+
+
+def so2_stage(inputs):
+    """
+    SO2 emissions of each plant from emission factors.
+
+    Parameters
+    ----------
+    inputs : PlantEmissionInputs
+
+    Returns
+    -------
+    dict
+        "gen_fuel" and "boiler" emissions.
+    """
+    module_logger.info("Generating so2 emissions from gen fuel")
+    gen_fuel = eia_gen_fuel_so2_emissions(
+        inputs["gen_fuel_sub"], inputs["ef_so2"], inputs["wtd_sulfur_content"]
+    )
+    module_logger.info("Generating so2 emissions from boiler fuel")
+    boiler = eia_boiler_so2_emissions(
+        inputs["boiler_firing_type"], inputs["ef_so2"], inputs["so2_rem_eff"]
+    )
+    return {"gen_fuel": gen_fuel, "boiler": boiler}
+
+
+def nox_stage(inputs):
+    """
+    NOx emissions of each plant from emission factors.
+
+    Parameters
+    ----------
+    inputs : PlantEmissionInputs
+
+    Returns
+    -------
+    dict
+        "gen_fuel" and "boiler" emissions.
+    """
+    module_logger.info("Generating nox emissions from gen fuel")
+    gen_fuel = eia_gen_fuel_nox_emissions(
+        inputs["gen_fuel_sub"], inputs["ef_nox"]
+    )
+    module_logger.info("Generating nox emissions from boiler fuel")
+    boiler = eia_boiler_nox_emissions(
+        inputs["boiler_firing_type"], inputs["ef_nox"], inputs["nox_rate"]
+    )
+    return {"gen_fuel": gen_fuel, "boiler": boiler}
+
+
+def ampd_stage(inputs):
+    """
+    Measured emissions, gross generation, and heat input of each plant from
+    CEMS, for the plants that report all of them.
+
+    Parameters
+    ----------
+    inputs : PlantEmissionInputs
+
+    Returns
+    -------
+    dataframe
+    """
+    ampd = inputs["cems"]
     ampd_rev = ampd[
         (ampd["co2_mass_tons"] > 0)
         & (ampd["so2_mass_tons"] > 0)
@@ -1258,40 +936,109 @@ def generate_plant_emissions(year):
             "ampd Gross Generation (MWh)",
             "ampd Heat Input (MMBtu)",
         ]
-    ]
+    ].copy()
     ampd_rev["plant_id"] = ampd_rev["plant_id_eia"].astype(str)
+    return ampd_rev
 
-    eia_923_gen_fuel_plant = eia923_gen_fuel.groupby(
-        ["plant_id", "plant_name", "operator_name"], as_index=False
-    )["net_generation_megawatthours", "total_fuel_consumption_mmbtu"].sum()
-    eia_923_gen_fuel_plant["plant_id"] = eia_923_gen_fuel_plant[
-        "plant_id"
-    ].astype(str)
 
-    df_list = [
-        eia_gen_fuel_co2_ch4_n2o_output,
-        eia_gen_fuel_so2_output,
-        eia_gen_fuel_nox_output,
-        eia_boiler_co2_ch4_n2o_output,
-        eia_boiler_so2_output,
-        eia_boiler_nox_output,
-    ]
-    logging.info("Choosing emission sources")
-    emissions_comparer = pd.concat(df_list, sort=True)
-    eia_plant = emissions_comparer.groupby(
-        ["plant_id", "plant_name", "operator_name"], as_index=False
-    )["CO2 (Tons)", "CH4 (lbs)", "N2O (lbs)", "SO2 (lbs)", "NOx (lbs)"].sum()
-    eia_plant = eia_plant.merge(
-        eia_923_gen_fuel_plant,
-        on=["plant_id", "plant_name", "operator_name"],
-        how="left",
-    )
-    result_agg = eia_plant.merge(ampd_rev, on=["plant_id"], how="left")
-    result_agg = result_agg.merge(
-        plant_fuel_class, on=["plant_id"], how="left"
-    )
-    result_agg["plant_id"] = result_agg["plant_id"].astype(int)
+# The stages that reconcile_emissions combines. None of them depends on
+# another, so they can run in any order or at the same time.
+EMISSION_STAGES = {
+    "net_gen": net_generation_stage,
+    "co2_ch4_n2o": co2_ch4_n2o_stage,
+    "so2": so2_stage,
+    "nox": nox_stage,
+    "ampd": ampd_stage,
+}
+# Stages that start worker processes (reading the CEMS data).
+_PROCESS_STAGES = ["ampd"]
+
+
+def run_emission_stages(
+    year, stages=None, use_cache=False, max_workers=None, inputs=None
+):
+    """
+    Run stages of the plant emissions calculation, at the same time in a
+    thread pool. The ampd stage, which reads the CEMS data in worker
+    processes, runs before the others start.
 
+    Parameters
+    ----------
+    year : int
+        Year of data to use (Air Markets Program Data, EIA 923, etc.)
+    stages : list, optional
+        Names of the stages (keys of EMISSION_STAGES) to run, by default all
+        of them.
+    use_cache : bool, optional
+        If True, each stage is loaded from the stage cache if it has been
+        run with the same model specs and input files, and saved to it
+        otherwise, by default False.
+    max_workers : int, optional
+        Number of stages to run at a time, by default the executor's
+        default. 1 runs them one after another in this thread.
+    inputs : PlantEmissionInputs, optional
+        Data already loaded for the year.
+
+    Returns
+    -------
+    dict
+        The result of each stage.
+    """
+    if stages is None:
+        stages = list(EMISSION_STAGES)
+    if inputs is None:
+        inputs = PlantEmissionInputs(year)
+
+    def run(name):
+        func = EMISSION_STAGES[name]
+        if use_cache:
+            return stage_cache.cached_stage(
+                f"plant_emissions_{name}",
+                model_specs,
+                func,
+                inputs,
+                key_parts=(year,),
+                source_year=year,
+            )
+        return func(inputs)
+
+    if max_workers == 1:
+        return {name: run(name) for name in stages}
+    # The CEMS data are summed in a pool of worker processes, which must not
+    # be started from the threads of the pool below, so the stage that uses
+    # them runs first, in this thread.
+    results = {name: run(name) for name in stages if name in _PROCESS_STAGES}
+    threaded = [name for name in stages if name not in _PROCESS_STAGES]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(run, name) for name in threaded}
+        results.update(
+            {name: future.result() for name, future in futures.items()}
+        )
+    return {name: results[name] for name in stages}
+
+
+def choose_emission_sources(result_agg):
+    """
+    Choose the measured (CEMS) or emission factor (AP-42) CO2, SO2, and NOx
+    emissions of each plant.
+
+    Measured emissions are used when the CEMS heat input is within 20% of
+    the EIA-923 fuel consumption and the measured emissions are within a
+    factor of 100 of the emission factor estimate.
+
+    Parameters
+    ----------
+    result_agg : dataframe
+        The emission factor estimates, EIA-923 fuel consumption, and CEMS
+        data of each plant.
+
+    Returns
+    -------
+    dataframe
+        result_agg with the chosen emissions (CO2_emissions_tons,
+        SO2_emissions_lbs, NOx_emissions_lbs) and their sources (CO2_Source,
+        SO2_Source, NOx_Source).
+    """
     result_agg_final = result_agg.copy()
     result_agg_final["CO2_emissions_tons"] = result_agg_final["CO2 (Tons)"]
     result_agg_final["CO2_Source"] = "ap42"
@@ -1333,6 +1080,58 @@ def generate_plant_emissions(year):
     ] = result_agg_final.loc[total_criteria, "ampd NOX (lbs)"]
     result_agg_final.loc[
         total_criteria, "NOx_Source"] = "ampd"
+    return result_agg_final
+
+
+def reconcile_emissions(stage_results, year):
+    """
+    Choose the measured (CEMS) or emission factor (AP-42) emissions of each
+    plant and map them to the federal elementary flow list.
+
+    Measured emissions are used when the CEMS heat input is within 20% of
+    the EIA-923 fuel consumption and the measured emissions are within a
+    factor of 100 of the emission factor estimate.
+
+    Parameters
+    ----------
+    stage_results : dict
+        The result of each stage in EMISSION_STAGES.
+    year : int
+        Year of the data.
+
+    Returns
+    -------
+    dataframe
+    """
+    net_gen = stage_results["net_gen"]
+    co2_ch4_n2o = stage_results["co2_ch4_n2o"]
+    so2 = stage_results["so2"]
+    nox = stage_results["nox"]
+    ampd_rev = stage_results["ampd"]
+
+    df_list = [
+        co2_ch4_n2o["gen_fuel"],
+        so2["gen_fuel"],
+        nox["gen_fuel"],
+        co2_ch4_n2o["boiler"],
+        so2["boiler"],
+        nox["boiler"],
+    ]
+    module_logger.info("Choosing emission sources")
+    emissions_comparer = pd.concat(df_list, sort=True)
+    eia_plant = emissions_comparer.groupby(PLANT_COLUMNS, as_index=False)[
+        ["CO2 (Tons)", "CH4 (lbs)", "N2O (lbs)", "SO2 (lbs)", "NOx (lbs)"]
+    ].sum()
+    eia_plant = eia_plant.merge(
+        net_gen["plant_generation"], on=PLANT_COLUMNS, how="left"
+    )
+    result_agg = eia_plant.merge(ampd_rev, on=["plant_id"], how="left")
+    result_agg = result_agg.merge(
+        net_gen["plant_fuel_class"], on=["plant_id"], how="left"
+    )
+    result_agg["plant_id"] = result_agg["plant_id"].astype(int)
+
+    result_agg_final = choose_emission_sources(result_agg)
 
     result_agg_final["Net Efficiency"] = (
         result_agg_final["net_generation_megawatthours"]
@@ -1374,7 +1173,7 @@ def generate_plant_emissions(year):
             "total_fuel_consumption_mmbtu": "Total Fuel Consumption (MMBtu)",
         }
     )
-    logging.info("Melting and mapping")
+    module_logger.info("Melting and mapping")
     netl_harmonized_melt = netl_harmonized.melt(
         id_vars=[
             "plant_id",
@@ -1504,6 +1303,61 @@ def generate_plant_emissions(year):
     return netl_harmonized_melt
 
 
+def _build_plant_emissions(year, use_cache, max_workers):
+    stage_results = run_emission_stages(
+        year, use_cache=use_cache, max_workers=max_workers
+    )
+    return reconcile_emissions(stage_results, year)
+
+
+def generate_plant_emissions(year, use_cache=None, max_workers=None):
+    """
+    Reads data from EPA air markets program data and fuel use from EIA 923 Page 1
+    or Page 5 data (generator vs boiler-level data). Emissions factors from AP42
+    are used to calculate emissions from the plant if the fuel input from EPA
+    air markets program data does not matche EIA 923 data. This data is meant
+    to replace the eGRID-sourced data provided by STEWi.
+
+    Parameters
+    ----------
+    year : int
+        Year of data to use (Air Markets Program Data, EIA 923, etc.)
+    use_cache : bool, optional
+        If True, the result and each stage in EMISSION_STAGES are loaded from
+        the stage cache if they have been built with the same model specs and
+        input files, and saved to it otherwise. By default
+        stage_cache.enabled, which main.py sets from its --stage_cache option.
+    max_workers : int, optional
+        Number of stages to run at a time, by default the executor's
+        default. 1 runs them one after another.
+
+    Returns
+    -------
+    dataframe
+        Returns a dataframe with emissions for all power plants reporting to
+        AMPD or EIA923. Emissions are either actual measured emissions (marked
+        as Source = "cems") or from ap42 emission factors applied at either
+        the boiler or generator fuel type level (marked as Source = "ap42").
+    """
+    if use_cache is None:
+        use_cache = stage_cache.enabled
+    print(
+        "Generating power plant emissions from CEMS data or emission factors..."
+    )
+    if use_cache:
+        return stage_cache.cached_stage(
+            "plant_emissions",
+            model_specs,
+            _build_plant_emissions,
+            year,
+            use_cache,
+            max_workers,
+            key_parts=(year,),
+            source_year=year,
+        )
+    return _build_plant_emissions(year, use_cache, max_workers)
+
+
 if __name__ == "__main__":
     netl_harmonized_melt = generate_plant_emissions(2016)
     netl_harmonized_melt.to_csv(f"{output_dir}/netl_harmonized.csv")
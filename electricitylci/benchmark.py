@@ -0,0 +1,751 @@
+"""
+Benchmarks of the slowest stages of the model, run on synthetic inputs.
+
+The inputs are generated here rather than downloaded, so the benchmarks can
+be run offline and repeated at any size. They have the columns and types of
+the data the stages normally read (EIA-923, EIA-860, CEMS, the EIA-930 bulk
+data, and the facility-flow tables built from eGRID and the other
+inventories) and are scaled by the number of plants, flows, regions, and
+hours. The values are random but in plausible ranges, so the stages take
+the same paths through their code as they do with the real data.
+
+Each benchmark times its stage over a number of repeats and reports the
+fastest wall time, the CPU time of that repeat, and the peak memory
+allocated during a separate run (under tracemalloc, which slows the run
+down, so it isn't timed). Benchmarks whose modules can't be imported (e.g.,
+the olca package isn't installed) are reported as skipped.
+
+Usage::
+
+    python -m electricitylci.benchmark -c ELCI_1 --plants 500 2000 --json results.json
+
+Each of --plants, --flows, --regions, and --hours can be given more than one
+value, and every combination of them is run.
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zipfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from electricitylci.globals import data_dir
+import electricitylci.model_config as config
+
+module_logger = logging.getLogger("benchmark.py")
+
+MONTHS = [
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+]
+# EIA-923 fuel codes and a prime mover each one is commonly reported with,
+# the FuelCategory they are aggregated to, and their share of plants.
+FUELS = pd.DataFrame(
+    [
+        ("BIT", "ST", "COAL", 0.10),
+        ("SUB", "ST", "COAL", 0.08),
+        ("LIG", "ST", "COAL", 0.02),
+        ("NG", "CT", "GAS", 0.22),
+        ("NG", "GT", "GAS", 0.10),
+        ("DFO", "IC", "OIL", 0.06),
+        ("RFO", "ST", "OIL", 0.02),
+        ("WDS", "ST", "BIOMASS", 0.04),
+        ("NUC", "ST", "NUCLEAR", 0.02),
+        ("WAT", "HY", "HYDRO", 0.12),
+        ("SUN", "PV", "SOLAR", 0.12),
+        ("WND", "WT", "WIND", 0.10),
+    ],
+    columns=["fuel_code", "prime_mover", "FuelCategory", "share"],
+)
+# The other fuel codes of EIA-923. Every code is reported by some plant in
+# the real data, so each one is given to a plant as a minor second fuel.
+MINOR_FUEL_CODES = [
+    "AB", "BFG", "BLQ", "GEO", "JF", "KER", "LFG", "MSB", "MSN", "MWH", "OBG",
+    "OBL", "OBS", "OG", "OTH", "PC", "PG", "PUR", "RC", "SC", "SGC", "SGP",
+    "SLW", "TDF", "WC", "WDL", "WH", "WO",
+]
+COMBUSTION_FUELS = ["BIT", "SUB", "LIG", "NG", "DFO", "RFO", "WDS"]
+BOILER_FIRING_TYPES = ["TF", "WF", "CY", "FB", "OT"]
+COMPARTMENTS = ["air", "water", "soil", "input", "output"]
+SOURCES = ["eGRID", "NEI", "TRI", "RCRAInfo"]
+
+
+@contextmanager
+def _patched(obj, **attributes):
+    """Set attributes of an object (e.g., a module's data_dir) for the
+    duration of the block, restoring them afterwards."""
+    missing = object()
+    old = {name: getattr(obj, name, missing) for name in attributes}
+    for name, value in attributes.items():
+        setattr(obj, name, value)
+    try:
+        yield obj
+    finally:
+        for name, value in old.items():
+            if value is missing:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, value)
+
+
+def _plant_fuels(n_plants, rng):
+    """Return the index into FUELS of the primary fuel of each plant."""
+    share = FUELS["share"].to_numpy()
+    return rng.choice(len(FUELS), size=n_plants, p=share / share.sum())
+
+
+def _us_balancing_authorities():
+    """Return the US balancing authority codes and names from the EIA-930
+    list that ships with the model."""
+    df_BA = pd.read_excel(
+        f"{data_dir}/BA_Codes_930.xlsx", sheet_name="US", header=4
+    )
+    return df_BA[["etag ID", "Entity Name"]].dropna().drop_duplicates(
+        subset="etag ID"
+    )
+
+
+def synthetic_facility_flows(n_plants, n_flows, n_regions, year, rng):
+    """
+    Build a facility-flow table like the one get_generation_process_df
+    passes to aggregate_data: one row per plant, flow, and source.
+
+    Each plant reports about half of the flows, from one of the inventory
+    sources. Plants are spread over the first n_regions balancing
+    authorities.
+
+    Parameters
+    ----------
+    n_plants : int
+    n_flows : int
+        Number of distinct flows (name and compartment).
+    n_regions : int
+        Number of balancing authorities.
+    year : int
+    rng : numpy.random.Generator
+
+    Returns
+    -------
+    dataframe
+        In the dtypes of electricitylci.schema.
+    """
+    import electricitylci.schema as schema
+
+    bas = _us_balancing_authorities().head(n_regions)
+    plant_ids = np.arange(1, n_plants + 1)
+    plant_fuel = FUELS["FuelCategory"].to_numpy()[_plant_fuels(n_plants, rng)]
+    plant_ba = rng.integers(0, len(bas), n_plants)
+    electricity = rng.lognormal(12, 1.5, n_plants)
+
+    flow_index = np.arange(n_flows)
+    flow_names = np.array([f"Synthetic flow {i}" for i in flow_index])
+    flow_uuids = np.array(
+        [str(uuid.uuid3(uuid.NAMESPACE_OID, name)) for name in flow_names]
+    )
+    flow_compartments = np.array(COMPARTMENTS)[flow_index % len(COMPARTMENTS)]
+
+    plant_of_row = np.repeat(np.arange(n_plants), n_flows)
+    flow_of_row = np.tile(flow_index, n_plants)
+    keep = rng.random(len(plant_of_row)) < 0.5
+    plant_of_row = plant_of_row[keep]
+    flow_of_row = flow_of_row[keep]
+    n_rows = len(plant_of_row)
+
+    ba_of_row = plant_ba[plant_of_row]
+    compartment = flow_compartments[flow_of_row]
+    df = pd.DataFrame(
+        {
+            "eGRID_ID": plant_ids[plant_of_row],
+            "FacilityID": plant_ids[plant_of_row],
+            "Balancing Authority Code": bas["etag ID"].to_numpy()[ba_of_row],
+            "Balancing Authority Name": (
+                bas["Entity Name"].to_numpy()[ba_of_row]
+            ),
+            "FuelCategory": plant_fuel[plant_of_row],
+            "PrimaryFuel": plant_fuel[plant_of_row],
+            "stage_code": "Power plant",
+            "FlowName": flow_names[flow_of_row],
+            "FlowUUID": flow_uuids[flow_of_row],
+            "Compartment": compartment,
+            "Compartment_path": compartment,
+            "ElementaryFlowPrimeContext": np.where(
+                np.isin(compartment, ["input", "output"]),
+                "technosphere",
+                "emission",
+            ),
+            "Unit": "kg",
+            "Year": year,
+            "Source": rng.choice(SOURCES, n_rows),
+            "FlowAmount": (
+                electricity[plant_of_row] * rng.lognormal(-4, 2, n_rows)
+            ),
+            "Electricity": electricity[plant_of_row],
+            "ReliabilityScore": rng.integers(1, 6, n_rows).astype(float),
+            "TemporalCorrelation": rng.integers(1, 6, n_rows).astype(float),
+            "TechnologicalCorrelation": 1.0,
+            "GeographicalCorrelation": 1.0,
+            "DataCollection": rng.integers(1, 6, n_rows).astype(float),
+        }
+    )
+    return schema.enforce_schema(df)
+
+
+def synthetic_plant_emission_inputs(n_plants, year, rng):
+    """
+    Build the EIA-923, EIA-860, and CEMS data sets that the plant emissions
+    stages read (see ampd_plant_emissions.PlantEmissionInputs).
+
+    Each plant reports one or two prime mover and fuel combinations in the
+    generation and fuel data. Steam turbines that burn fuel also report one
+    or two boilers in the boiler fuel data, some of which have NOx or SO2
+    controls, and most fossil plants report measured emissions.
+
+    Parameters
+    ----------
+    n_plants : int
+    year : int
+    rng : numpy.random.Generator
+
+    Returns
+    -------
+    dict
+        Data sets keyed by the names PlantEmissionInputs uses.
+    """
+    plant_ids = np.arange(1, n_plants + 1).astype(str)
+    fuel_of_plant = _plant_fuels(n_plants, rng)
+    # Some plants also burn a second fuel.
+    second = rng.random(n_plants) < 0.2
+    gen_plant = np.concatenate(
+        [np.arange(n_plants), np.flatnonzero(second)]
+    )
+    gen_fuel_index = np.concatenate(
+        [fuel_of_plant, _plant_fuels(int(second.sum()), rng)]
+    )
+    minor_plant = np.arange(len(MINOR_FUEL_CODES)) % n_plants
+    gen_plant = np.concatenate([gen_plant, minor_plant])
+    gen_fuel = pd.DataFrame(
+        {
+            "plant_id": plant_ids[gen_plant],
+            "plant_name": np.char.add("Plant ", plant_ids[gen_plant]),
+            "operator_name": np.char.add(
+                "Operator ", (gen_plant % 97).astype(str)
+            ),
+            "reported_prime_mover": np.concatenate(
+                [
+                    FUELS["prime_mover"].to_numpy()[gen_fuel_index],
+                    np.full(len(minor_plant), "OT"),
+                ]
+            ),
+            "reported_fuel_type_code": np.concatenate(
+                [
+                    FUELS["fuel_code"].to_numpy()[gen_fuel_index],
+                    MINOR_FUEL_CODES,
+                ]
+            ),
+        }
+    ).drop_duplicates(
+        subset=["plant_id", "reported_prime_mover", "reported_fuel_type_code"]
+    ).reset_index(drop=True)
+    n_gen = len(gen_fuel)
+    monthly_gen = rng.lognormal(9, 1.5, (n_gen, 12))
+    # The minor fuels are a small part of their plant's generation.
+    minor = gen_fuel["reported_fuel_type_code"].isin(MINOR_FUEL_CODES)
+    monthly_gen[minor.to_numpy()] *= 0.01
+    for i, month in enumerate(MONTHS):
+        gen_fuel[f"netgen_{month}"] = monthly_gen[:, i]
+    combustion = gen_fuel["reported_fuel_type_code"].isin(COMBUSTION_FUELS)
+    heat_rate = rng.uniform(7, 12, n_gen) * combustion
+    gen_fuel["net_generation_megawatthours"] = monthly_gen.sum(axis=1)
+    gen_fuel["total_fuel_consumption_mmbtu"] = (
+        gen_fuel["net_generation_megawatthours"] * heat_rate
+    )
+    gen_fuel["total_fuel_consumption_quantity"] = (
+        gen_fuel["total_fuel_consumption_mmbtu"] / rng.uniform(1, 25, n_gen)
+    )
+
+    # Boilers of the steam turbines that burn fuel.
+    steam = gen_fuel.loc[
+        combustion & (gen_fuel["reported_prime_mover"] == "ST"), :
+    ]
+    n_boilers = rng.integers(1, 3, len(steam))
+    boiler = steam.loc[
+        steam.index.repeat(n_boilers),
+        ["plant_id", "plant_name", "operator_name", "reported_prime_mover",
+         "reported_fuel_type_code"],
+    ].reset_index(drop=True)
+    boiler["boiler_id"] = (
+        boiler.groupby("plant_id").cumcount() + 1
+    ).astype(str)
+    n_boiler = len(boiler)
+    heating_value = rng.uniform(10, 25, (n_boiler, 12))
+    quantity = rng.lognormal(10, 1, (n_boiler, 12))
+    sulfur = rng.uniform(0.1, 3, (n_boiler, 12))
+    for i, month in enumerate(MONTHS):
+        boiler[f"mmbtu_per_unit_{month}"] = heating_value[:, i]
+        boiler[f"quantity_of_fuel_consumed_{month}"] = quantity[:, i]
+        boiler[f"sulfur_content_{month}"] = sulfur[:, i]
+    boiler["total_fuel_consumption_quantity"] = quantity.sum(axis=1)
+
+    boiler_design = boiler[["plant_id", "boiler_id"]].copy()
+    boiler_design["firing_type_1"] = rng.choice(BOILER_FIRING_TYPES, n_boiler)
+
+    controlled = boiler.loc[
+        rng.random(n_boiler) < 0.6, ["plant_id", "boiler_id"]
+    ].reset_index(drop=True)
+    control_ids = np.char.add("C", controlled["boiler_id"].to_numpy(str))
+    aec = pd.DataFrame(
+        {
+            "plant_id": controlled["plant_id"],
+            "nox_control_id": control_ids,
+            "nox_emission_rate_entire_year_lbs_mmbtu": rng.uniform(
+                0.05, 0.5, len(controlled)
+            ),
+            "so2_control_id": control_ids,
+            "so2_removal_efficiency_rate_at_annual_operating_factor": (
+                rng.uniform(0.5, 0.99, len(controlled))
+            ),
+        }
+    )
+    env_assoc_nox = pd.DataFrame(
+        {
+            "plant_id": controlled["plant_id"],
+            "nox_control_id": control_ids,
+            "boiler_id": controlled["boiler_id"],
+        }
+    )
+    env_assoc_so2 = env_assoc_nox.rename(
+        columns={"nox_control_id": "so2_control_id"}
+    )
+
+    # Measured emissions of most of the plants that burn fuel.
+    fossil = gen_fuel.loc[combustion, :].groupby(
+        "plant_id", as_index=False
+    )[["net_generation_megawatthours", "total_fuel_consumption_mmbtu"]].sum()
+    fossil = fossil.loc[rng.random(len(fossil)) < 0.8, :]
+    heat_input = fossil["total_fuel_consumption_mmbtu"].to_numpy() * (
+        rng.uniform(0.85, 1.15, len(fossil))
+    )
+    cems = pd.DataFrame(
+        {
+            "plant_id_eia": fossil["plant_id"].astype(int).to_numpy(),
+            "gross_load_mwh": (
+                fossil["net_generation_megawatthours"].to_numpy() * 1.05
+            ),
+            "heat_content_mmbtu": heat_input,
+            "co2_mass_tons": heat_input * rng.uniform(0.05, 0.11, len(fossil)),
+            "so2_mass_tons": heat_input * rng.uniform(1e-5, 1e-3, len(fossil)),
+            "nox_mass_tons": heat_input * rng.uniform(1e-5, 5e-4, len(fossil)),
+        }
+    )
+    return {
+        "gen_fuel": gen_fuel,
+        "boiler": boiler,
+        "aec": aec,
+        "env_assoc_nox": env_assoc_nox,
+        "env_assoc_so2": env_assoc_so2,
+        "boiler_design": boiler_design,
+        "cems": cems,
+    }
+
+
+def write_synthetic_eba_zip(path, bas, year, hours, rng):
+    """
+    Write an EIA-930 bulk data file (EBA.zip) with hourly net generation and
+    demand for each balancing authority and the interchange between each
+    one and up to three others, reported by both sides.
+
+    Parameters
+    ----------
+    path : str
+        Path of the zip file.
+    bas : list
+        Balancing authority codes.
+    year : int
+    hours : int
+        Number of hours of data in each series, from the start of the year.
+    rng : numpy.random.Generator
+
+    Returns
+    -------
+    int
+        Number of series written.
+    """
+    dates = pd.date_range(f"{year}-01-01", periods=hours, freq="H")
+    dates = dates.strftime("%Y%m%dT%HZ").to_numpy()[::-1]
+
+    def line(series_id, values):
+        data = [[d, round(float(v), 1)] for d, v in zip(dates, values)]
+        return json.dumps({"series_id": series_id, "data": data}) + "\n"
+
+    lines = []
+    for ba in bas:
+        generation = rng.lognormal(8, 1) * rng.uniform(0.6, 1.2, hours)
+        lines.append(line(f"EBA.{ba}-ALL.NG.H", generation))
+        lines.append(line(f"EBA.{ba}-ALL.D.H", generation * 0.95))
+    n_bas = len(bas)
+    for i in range(n_bas):
+        for j in rng.choice(n_bas, size=min(3, n_bas - 1), replace=False):
+            if j <= i:
+                continue
+            exchange = rng.normal(rng.normal(0, 200), 50, hours)
+            reported = exchange * rng.uniform(0.95, 1.05)
+            lines.append(line(f"EBA.{bas[i]}-{bas[j]}.ID.H", exchange))
+            lines.append(line(f"EBA.{bas[j]}-{bas[i]}.ID.H", -reported))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("EBA.txt", "".join(lines))
+    return len(lines)
+
+
+def synthetic_trading_data_dir(folder, n_plants, n_regions, year, hours, rng):
+    """
+    Set up a data folder for ba_io_trading_model: the balancing authority
+    and Canadian import files that ship with the model, and a synthetic
+    EBA.zip for n_regions US balancing authorities (at least the ones that
+    Canadian imports come from).
+
+    Returns
+    -------
+    tuple
+        Replacements for the eia923 and eia860 modules that return
+        synthetic generation of n_plants plants in those balancing
+        authorities, and the number of hourly values in EBA.zip.
+    """
+    for name in [
+        "BA_Codes_930.xlsx",
+        "CA_Imports_Gen.csv",
+        "CA_Imports_Rows.csv",
+        "CA_Imports_Cols.csv",
+    ]:
+        shutil.copy(os.path.join(data_dir, name), folder)
+    os.makedirs(os.path.join(folder, "bulk_data"), exist_ok=True)
+    # The US balancing authorities that the Canadian ones export to come
+    # first, otherwise the Canadian ones have no trade.
+    ca_rows = pd.read_csv(os.path.join(data_dir, "CA_Imports_Rows.csv"))
+    partners = ca_rows.loc[ca_rows[str(year)] > 0, "us_ba"].unique().tolist()
+    codes = _us_balancing_authorities()["etag ID"].tolist()
+    bas = partners + [ba for ba in codes if ba not in partners]
+    bas = bas[:max(n_regions, len(partners))]
+    n_series = write_synthetic_eba_zip(
+        os.path.join(folder, "bulk_data", "EBA.zip"), bas, year, hours, rng
+    )
+    plant_ids = np.arange(1, n_plants + 1)
+    generation = pd.DataFrame(
+        {
+            "FacilityID": plant_ids,
+            "Electricity": rng.lognormal(12, 1.5, n_plants),
+            "Year": np.int32(year),
+        }
+    )
+    plant_ba = np.array(bas)[rng.integers(0, len(bas), n_plants)]
+    plant_bas = pd.DataFrame(
+        {
+            "Plant Id": plant_ids.astype(str),
+            "State": "XX",
+            "NERC Region": "XX",
+            "Balancing Authority Code": plant_ba,
+            "Balancing Authority Name": plant_ba,
+        }
+    )
+    return (
+        SimpleNamespace(
+            build_generation_data=lambda **kwargs: generation.copy()
+        ),
+        SimpleNamespace(
+            eia860_balancing_authority=lambda *args, **kwargs: (
+                plant_bas.copy()
+            )
+        ),
+        n_series * hours,
+    )
+
+
+def _rows(obj):
+    """Number of rows (or entries) of a stage's input or result."""
+    if obj is None:
+        return None
+    if isinstance(obj, (pd.DataFrame, pd.Series, dict, list)):
+        return len(obj)
+    return None
+
+
+def measure(run, setup=None, repeat=3):
+    """
+    Time a function and measure the peak memory it allocates.
+
+    Parameters
+    ----------
+    run : callable
+        Called with the arguments returned by setup.
+    setup : callable, optional
+        Returns a tuple of arguments for run; called (untimed) before each
+        repeat, so run can modify them.
+    repeat : int, optional
+        Number of timed runs, by default 3. The fastest is reported.
+
+    Returns
+    -------
+    tuple
+        The result of the last run and a dict with seconds (fastest wall
+        time), cpu_seconds (of that run), mean_seconds, and peak_mb.
+    """
+    setup = setup or tuple
+    times = []
+    for _ in range(max(repeat, 1)):
+        args = setup()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = run(*args)
+        times.append(
+            (time.perf_counter() - wall, time.process_time() - cpu)
+        )
+    args = setup()
+    del result
+    tracemalloc.start()
+    try:
+        result = run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds, cpu_seconds = min(times)
+    return result, {
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "mean_seconds": sum(t[0] for t in times) / len(times),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def bench_aggregate_data(fixtures):
+    import electricitylci.generation as generation
+
+    database = fixtures["facility_flows"]
+    with _patched(generation.model_specs, replace_egrid=False):
+        result, stats = measure(
+            lambda db: generation.aggregate_data(db, subregion="BA"),
+            lambda: (database.copy(),),
+            repeat=fixtures["repeat"],
+        )
+    fixtures["aggregated"] = result
+    return _rows(database), result, stats
+
+
+def bench_olcaschema_genprocess(fixtures):
+    import electricitylci.generation as generation
+
+    if "aggregated" not in fixtures:
+        bench_aggregate_data(fixtures)
+    aggregated = fixtures["aggregated"]
+    result, stats = measure(
+        lambda db: generation.olcaschema_genprocess(db, subregion="BA"),
+        lambda: (aggregated.copy(),),
+        repeat=fixtures["repeat"],
+    )
+    fixtures["processes"] = result
+    return _rows(aggregated), result, stats
+
+
+def bench_jsonld_write(fixtures):
+    import electricitylci.olca_jsonld_writer as writer
+
+    if "processes" not in fixtures:
+        bench_olcaschema_genprocess(fixtures)
+    processes = fixtures["processes"]
+    path = os.path.join(fixtures["folder"], "benchmark_jsonld.zip")
+
+    def setup():
+        if os.path.exists(path):
+            os.remove(path)
+        return copy.deepcopy(processes), path
+
+    result, stats = measure(writer.write, setup, repeat=fixtures["repeat"])
+    return _rows(processes), result, stats
+
+
+def bench_plant_emissions(fixtures):
+    import electricitylci.ampd_plant_emissions as ampd
+
+    year = fixtures["year"]
+    data = fixtures["plant_emission_inputs"]
+
+    class SyntheticInputs(ampd.PlantEmissionInputs):
+        def __init__(self):
+            super().__init__(year)
+            self._data.update(data)
+
+    def run(inputs):
+        stage_results = ampd.run_emission_stages(
+            year, max_workers=1, inputs=inputs
+        )
+        return ampd.reconcile_emissions(stage_results, year)
+
+    result, stats = measure(
+        run, lambda: (SyntheticInputs(),), repeat=fixtures["repeat"]
+    )
+    return _rows(data["gen_fuel"]), result, stats
+
+
+def bench_ba_io_trading_model(fixtures):
+    import electricitylci.eia_io_trading as trading
+
+    folder = os.path.join(fixtures["folder"], "trading")
+    os.makedirs(folder, exist_ok=True)
+    eia923, eia860, n_values = synthetic_trading_data_dir(
+        folder,
+        fixtures["sizes"]["plants"],
+        fixtures["sizes"]["regions"],
+        fixtures["year"],
+        fixtures["sizes"]["hours"],
+        fixtures["rng"],
+    )
+    with _patched(
+        trading,
+        data_dir=folder,
+        output_dir=folder,
+        eia923=eia923,
+        eia860=eia860,
+    ):
+        result, stats = measure(
+            lambda: trading.ba_io_trading_model(fixtures["year"], "BA"),
+            repeat=fixtures["repeat"],
+        )
+    return n_values, result["BA"], stats
+
+
+BENCHMARKS = {
+    "aggregate_data": bench_aggregate_data,
+    "olcaschema_genprocess": bench_olcaschema_genprocess,
+    "olca_jsonld_writer.write": bench_jsonld_write,
+    "generate_plant_emissions": bench_plant_emissions,
+    "ba_io_trading_model": bench_ba_io_trading_model,
+}
+
+
+def run_benchmarks(
+    plants=1000, flows=50, regions=20, hours=8760, year=2016, repeat=3,
+    benchmarks=None, seed=0,
+):
+    """
+    Run the benchmarks for one set of input sizes.
+
+    Parameters
+    ----------
+    plants, flows, regions, hours : int, optional
+        Size of the synthetic inputs.
+    year : int, optional
+        Year of the synthetic data, by default 2016. The Canadian import
+        files that ba_io_trading_model reads cover 2014-2018.
+    repeat : int, optional
+        Number of timed runs of each benchmark, by default 3.
+    benchmarks : list, optional
+        Names of the benchmarks (keys of BENCHMARKS) to run, by default all
+        of them.
+    seed : int, optional
+        Seed for the synthetic data.
+
+    Returns
+    -------
+    list
+        A dict for each benchmark with the sizes, rows_in, rows_out, and
+        the statistics from measure, or the reason it was skipped.
+    """
+    if config.model_specs is None:
+        config.model_specs = config.build_model_class()
+    if benchmarks is None:
+        benchmarks = list(BENCHMARKS)
+    rng = np.random.default_rng(seed)
+    sizes = {
+        "plants": plants, "flows": flows, "regions": regions, "hours": hours
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        fixtures = {
+            "folder": folder,
+            "year": year,
+            "repeat": repeat,
+            "rng": rng,
+            "sizes": sizes,
+            "facility_flows": synthetic_facility_flows(
+                plants, flows, regions, year, rng
+            ),
+            "plant_emission_inputs": synthetic_plant_emission_inputs(
+                plants, year, rng
+            ),
+        }
+        for name in benchmarks:
+            print(f"Benchmarking {name} with {sizes}")
+            record = {"benchmark": name, **sizes}
+            try:
+                rows_in, result, stats = BENCHMARKS[name](fixtures)
+            except ImportError as e:
+                module_logger.warning(f"Skipping {name}: {e}")
+                record["skipped"] = str(e)
+            else:
+                record.update(
+                    rows_in=rows_in, rows_out=_rows(result), **stats
+                )
+            results.append(record)
+    return results
+
+
+def format_results(results):
+    """Return the results of run_benchmarks as a table."""
+    table = pd.DataFrame(results)
+    columns = [
+        "benchmark", "plants", "flows", "regions", "hours", "rows_in",
+        "rows_out", "seconds", "cpu_seconds", "mean_seconds", "peak_mb",
+        "skipped",
+    ]
+    return table[[c for c in columns if c in table.columns]].to_string(
+        index=False, float_format=lambda x: f"{x:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the slowest stages with synthetic inputs"
+    )
+    parser.add_argument(
+        "-c", "--model_config", help="specify model configuration",
+        default="ELCI_1"
+    )
+    parser.add_argument("--plants", type=int, nargs="+", default=[1000])
+    parser.add_argument("--flows", type=int, nargs="+", default=[50])
+    parser.add_argument("--regions", type=int, nargs="+", default=[20])
+    parser.add_argument("--hours", type=int, nargs="+", default=[8760])
+    parser.add_argument("--year", type=int, default=2016)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--benchmark", nargs="+", choices=list(BENCHMARKS), default=None,
+        help="benchmarks to run, by default all of them"
+    )
+    parser.add_argument(
+        "--json", help="save the results to this json file", default=None
+    )
+    args = parser.parse_args()
+    config.model_specs = config.build_model_class(args.model_config)
+    results = []
+    for plants, flows, regions, hours in itertools.product(
+        args.plants, args.flows, args.regions, args.hours
+    ):
+        results.extend(
+            run_benchmarks(
+                plants, flows, regions, hours, year=args.year,
+                repeat=args.repeat, benchmarks=args.benchmark,
+            )
+        )
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
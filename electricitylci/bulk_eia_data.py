@@ -1,28 +1,409 @@
 """Extract hourly real-time EIA data from the bulk-download zip file."""
 
 import pandas as pd
+import numpy as np
 import json
+import re
 from os.path import join
 import os
 import zipfile
-import requests
 import logging
 from electricitylci.globals import data_dir
+from electricitylci.downloads import fetch
+
+module_logger = logging.getLogger("bulk_eia_data.py")
 
 
 def download_EBA():
     """Add docstring."""
     url = 'http://api.eia.gov/bulk/EBA.zip'
     print(f"Downloading eia bulk data from {url}...", end="")
-    r = requests.get(url)
-    os.makedirs(join(data_dir, 'bulk_data'), exist_ok=True)
-    output = open(join(data_dir, 'bulk_data', 'EBA.zip'), 'wb')
-    output.write(r.content)
-    output.close()
+    fetch(url, join(data_dir, 'bulk_data', 'EBA.zip'))
     print(f"complete.")
 
 
 path = join(data_dir, 'bulk_data', 'EBA.zip')
+index_path = join(data_dir, 'bulk_data', 'EBA_series_index.json')
+
+_SERIES_ID_RE = re.compile(rb'"series_id"\s*:\s*"([^"]+)"')
+_series_index_memo = {}
+
+
+def series_type(series_id):
+    """
+    Return the type of a bulk data series, e.g., 'EBA.NG.H' for the series
+    'EBA.CISO-ALL.NG.H' and 'EBA.ID.H' for 'EBA.CISO-BANC.ID.H'.
+    """
+    try:
+        return 'EBA.' + series_id.split('-', 1)[1].split('.', 1)[1]
+    except IndexError:
+        return None
+
+
+def build_series_index(zip_path=path):
+    """
+    Scan EBA.txt once and record the byte offset and length of the line for
+    each series. Only the series_id is read from each line, the data are not
+    parsed.
+
+    Parameters
+    ----------
+    zip_path : str, optional
+        Path to EBA.zip
+
+    Returns
+    -------
+    dict
+        Keys are series ids, values are [offset, length] in the uncompressed
+        EBA.txt.
+    """
+    logging.info("Indexing bulk data series")
+    series_index = {}
+    offset = 0
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        with z.open('EBA.txt') as f:
+            for line in f:
+                match = _SERIES_ID_RE.search(line, 0, 512)
+                if match is None:
+                    match = _SERIES_ID_RE.search(line)
+                if match is not None:
+                    series_index[match.group(1).decode()] = [offset, len(line)]
+                offset += len(line)
+    return series_index
+
+
+def get_series_index(zip_path=path):
+    """
+    Return the series index for EBA.zip, building it if it does not exist or
+    if the zip file has changed since it was built. The index is saved next
+    to the zip file.
+
+    Parameters
+    ----------
+    zip_path : str, optional
+        Path to EBA.zip
+
+    Returns
+    -------
+    dict
+        See build_series_index.
+    """
+    stat = os.stat(zip_path)
+    zip_id = [stat.st_size, stat.st_mtime_ns]
+    memo_key = (zip_path, *zip_id)
+    if memo_key in _series_index_memo:
+        return _series_index_memo[memo_key]
+    idx_path = join(os.path.dirname(zip_path), os.path.basename(index_path))
+    series_index = None
+    if os.path.exists(idx_path):
+        try:
+            with open(idx_path, 'r') as f:
+                saved = json.load(f)
+            if saved['zip'] == zip_id:
+                series_index = saved['series']
+        except (ValueError, KeyError):
+            module_logger.warning(f"Unable to read {idx_path}, rebuilding it")
+    if series_index is None:
+        series_index = build_series_index(zip_path)
+        with open(idx_path, 'w') as f:
+            json.dump({'zip': zip_id, 'series': series_index}, f)
+    _series_index_memo[memo_key] = series_index
+    return series_index
+
+
+def select_series(series_index, data_type, series_filter=None):
+    """
+    Return the series ids of a single type, e.g. 'EBA.NG.H'.
+
+    Parameters
+    ----------
+    series_index : dict
+        See get_series_index.
+    data_type : str
+        Series type as returned by series_type.
+    series_filter : function, optional
+        Called with each series id; series are kept if it returns True.
+
+    Returns
+    -------
+    list
+    """
+    return [
+        s for s in series_index
+        if series_type(s) == data_type
+        and (series_filter is None or series_filter(s))
+    ]
+
+
+def _days_from_civil(year, month, day):
+    """
+    Days since 1970-01-01 of proleptic Gregorian dates, computed with
+    integer arithmetic on arrays (H. Hinnant's days_from_civil algorithm).
+    """
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = (
+        year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    )
+    return era * 146097 + day_of_era - 719468
+
+
+_DAYS_IN_MONTH = np.array([31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _char_codes(dates, width):
+    """Return the character codes of strings padded to width as an int
+    array with one row per string."""
+    dates = np.asarray(dates, dtype=f'U{width}')
+    return dates.reshape(-1, 1).view(np.uint32).reshape(-1, width).astype(np.int64)
+
+
+def _hours_since_epoch(chars):
+    """
+    Parse the '%Y%m%dT%H' at the start of each row of character codes.
+
+    Returns
+    -------
+    hours : numpy.ndarray
+        Hours since 1970-01-01T00.
+    valid : numpy.ndarray
+        True for the rows that are valid dates in the format.
+    """
+    digits = chars[:, :11] - ord('0')
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 9] * 10 + digits[:, 10]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_ok = (month >= 1) & (month <= 12)
+    month_days = _DAYS_IN_MONTH[np.where(month_ok, month, 1) - 1] - (
+        (month == 2) & ~leap
+    )
+    date_digits = digits[:, [0, 1, 2, 3, 4, 5, 6, 7, 9, 10]]
+    valid = (
+        ((date_digits >= 0) & (date_digits <= 9)).all(axis=1)
+        & (chars[:, 8] == ord('T'))
+        & month_ok
+        & (day >= 1) & (day <= month_days)
+        & (hour <= 23)
+    )
+    return _days_from_civil(year, month, day) * 24 + hour, valid
+
+
+def _to_datetime64(hours, valid):
+    """Convert hours since the epoch to datetime64[ns], NaT where not
+    valid."""
+    datetimes = hours.astype('datetime64[h]').astype('datetime64[ns]')
+    datetimes[~valid] = np.datetime64('NaT')
+    return datetimes
+
+
+def parse_utc_hours(dates):
+    """
+    Parse dates in the bulk data UTC format ('%Y%m%dT%HZ', e.g.,
+    '20190214T04Z') with integer arithmetic on the characters.
+
+    Parameters
+    ----------
+    dates : array
+        Strings.
+
+    Returns
+    -------
+    datetimes : numpy.ndarray
+        datetime64[ns] (naive, UTC); NaT where a date is not in the format.
+    valid : numpy.ndarray
+        True for the dates in the format.
+    """
+    chars = _char_codes(dates, 13)
+    hours, valid = _hours_since_epoch(chars)
+    valid &= (chars[:, 11] == ord('Z')) & (chars[:, 12] == 0)
+    return _to_datetime64(hours, valid), valid
+
+
+def parse_local_hours(dates):
+    """
+    Parse dates in the bulk data local time format ('%Y%m%dT%H-05', with
+    the UTC offset in hours) with integer arithmetic on the characters and
+    convert them to UTC.
+
+    Parameters
+    ----------
+    dates : array
+        Strings.
+
+    Returns
+    -------
+    datetimes : numpy.ndarray
+        datetime64[ns] (naive, UTC); NaT where a date is not in the format.
+    valid : numpy.ndarray
+        True for the dates in the format.
+    """
+    chars = _char_codes(dates, 15)
+    hours, valid = _hours_since_epoch(chars)
+    offset_digits = chars[:, 12:14] - ord('0')
+    valid &= (
+        ((chars[:, 11] == ord('-')) | (chars[:, 11] == ord('+')))
+        & ((offset_digits >= 0) & (offset_digits <= 9)).all(axis=1)
+        & (chars[:, 14] == 0)
+    )
+    offset = np.where(chars[:, 11] == ord('-'), -1, 1) * (
+        offset_digits[:, 0] * 10 + offset_digits[:, 1]
+    )
+    return _to_datetime64(hours - offset, valid), valid
+
+
+def _parse_hours(dates):
+    """
+    Parse dates that are all in the UTC format or all in the local time
+    format to naive UTC datetime64[ns]. Returns None if they are not.
+    """
+    datetimes, valid = parse_utc_hours(dates)
+    if valid.all():
+        return datetimes
+    datetimes, valid = parse_local_hours(dates)
+    if valid.all():
+        return datetimes
+    return None
+
+
+def _parse_series_data(data, year=None):
+    """
+    Convert the "data" list of a bulk series to datetime64 and float64
+    arrays, optionally keeping only the given (UTC) year. Returns None if the
+    dates are not in a recognized format.
+    """
+    dates = np.array([x[0] for x in data], dtype=str)
+    values = np.array([x[1] for x in data], dtype=np.float64)
+    if year is not None:
+        keep = np.char.startswith(dates, str(year))
+        dates = dates[keep]
+        values = values[keep]
+    datetime = _parse_hours(dates)
+    if datetime is None:
+        return None
+    return datetime, values
+
+
+def _parse_rows(rows):
+    """
+    Parse the "data" lists of rows from EBA.txt in one batch.
+
+    The dates of all rows are concatenated and parsed at once. Rows whose
+    dates are not all in the UTC format are parsed with the local time
+    format instead and rows that are in neither format are dropped, as
+    before.
+
+    Returns
+    -------
+    kept : list
+        The rows that were parsed.
+    lengths : numpy.ndarray
+        Number of data points in each kept row.
+    datetimes : pandas.DatetimeIndex
+        UTC datetimes of all kept rows.
+    values : numpy.ndarray
+    """
+    lengths = np.array([len(row['data']) for row in rows], dtype=np.int64)
+    dates = np.array(
+        [x[0] for row in rows for x in row['data']], dtype=str
+    )
+    values = np.array(
+        [x[1] for row in rows for x in row['data']], dtype=np.float64
+    )
+    datetimes, valid = parse_utc_hours(dates)
+    starts = np.concatenate([[0], np.cumsum(lengths)])
+    row_of_point = np.repeat(np.arange(len(rows)), lengths)
+    row_valid = np.bincount(
+        row_of_point, weights=~valid, minlength=len(rows)
+    ) == 0
+    keep_row = row_valid.copy()
+    for i in np.flatnonzero(~row_valid):
+        row_datetimes = _parse_hours(dates[starts[i]:starts[i + 1]])
+        if row_datetimes is not None:
+            datetimes[starts[i]:starts[i + 1]] = row_datetimes
+            keep_row[i] = True
+    keep_point = keep_row[row_of_point]
+    kept = [row for row, k in zip(rows, keep_row) if k]
+    return (
+        kept,
+        lengths[keep_row],
+        pd.DatetimeIndex(datetimes[keep_point]).tz_localize('UTC'),
+        values[keep_point],
+    )
+
+
+def load_series(series_ids, year=None, zip_path=path):
+    """
+    Read and parse only the given series from EBA.txt.
+
+    Parameters
+    ----------
+    series_ids : list
+        Series ids, e.g., from select_series.
+    year : int, optional
+        If given, only data for this (UTC) year are kept.
+    zip_path : str, optional
+        Path to EBA.zip
+
+    Returns
+    -------
+    list
+        (series_id, datetime64 array, float64 array) for each series with
+        dates in a recognized format.
+    """
+    series_index = get_series_index(zip_path)
+    # Read in file order so that the zip member is only decompressed once.
+    locations = sorted(
+        (series_index[s][0], series_index[s][1], s) for s in series_ids
+    )
+    series = []
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        with z.open('EBA.txt') as f:
+            for offset, length, series_id in locations:
+                f.seek(offset)
+                row = json.loads(f.read(length))
+                parsed = _parse_series_data(row.get('data', []), year)
+                if parsed is None:
+                    continue
+                series.append((series_id, *parsed))
+    return series
+
+
+def series_to_df(series, data_type):
+    """
+    Turn series loaded with load_series into a dataframe with region,
+    datetime, and data columns (the same format as row_to_df).
+    """
+    lengths = [len(s[1]) for s in series]
+    regions = [s[0].split('-')[0][4:] for s in series]
+    df = pd.DataFrame({
+        "region": np.repeat(regions, lengths),
+        "datetime": pd.DatetimeIndex(
+            np.concatenate([s[1] for s in series]) if series
+            else np.array([], dtype='datetime64[ns]')
+        ).tz_localize('UTC'),
+        data_type: np.concatenate([s[2] for s in series]) if series
+        else np.array([], dtype=np.float64),
+    })
+    return df
+
+
+def ba_exchange_series_to_df(series, data_type='ba_to_ba'):
+    """
+    Turn BA-to-BA interchange series loaded with load_series into a
+    dataframe with from_region, to_region, datetime, and data columns (the
+    same format as ba_exchange_to_df).
+    """
+    df = series_to_df(series, data_type)
+    lengths = [len(s[1]) for s in series]
+    to_regions = [s[0].split('-')[1][:-5] for s in series]
+    df.rename(columns={"region": "from_region"}, inplace=True)
+    df.insert(1, "to_region", np.repeat(to_regions, lengths))
+    return df
+
 
 if __name__=="__main__":
     try:
@@ -85,39 +466,13 @@ def row_to_df(rows, data_type):
     dataframe
         Data for all regions in a single df with datatimes converted and UTC
     """
-    tuple_list = []
-    for row in rows:
-
-        # "data" is of form:
-        # [['20190214T04Z', -102],
-        # ['20190214T03Z', -107],
-        # ['20190214T02Z', -108],
-        # ['20190214T01Z', -103]]
-        try:
-            datetime = pd.to_datetime([x[0] for x in row['data']],
-                                      utc=True, format='%Y%m%dT%HZ')
-        except ValueError:
-            try:
-                datetime = pd.to_datetime([x[0]+":00" for x in row['data']],
-                                          format='%Y%m%dT%H%z')
-            except ValueError:
-                continue
-        data = [x[1] for x in row['data']]
-        region = row['series_id'].split('-')[0][4:]
-
-#        df_data = {
-#            'region': region,
-#            'datetime': datetime,
-#            data_type: data,
-#        }
-#        region_list=[region for x in datetime]
-#        _df = pd.DataFrame(df_data)
-#        tuple_list.append(_df)
-        tuple_data=[x for x in zip([region]*len(datetime), list(datetime), data)]
-        tuple_list.extend(tuple_data)
-    df=pd.DataFrame(tuple_list, columns=["region", "datetime", data_type])
-#    df = pd.concat(df_list).reset_index(drop=True)
-
+    rows, lengths, datetimes, values = _parse_rows(rows)
+    regions = [row['series_id'].split('-')[0][4:] for row in rows]
+    df = pd.DataFrame({
+        "region": np.repeat(np.array(regions, dtype=object), lengths),
+        "datetime": datetimes,
+        data_type: values,
+    })
     return df
 
 
@@ -136,38 +491,13 @@ def ba_exchange_to_df(rows, data_type='ba_to_ba'):
     dataframe
         Data for all regions in a single df with datatimes converted and UTC
     """
-    tuple_list = []
-    for row in rows:
-
-        # "data" is of form:
-        # [['20190214T04Z', -102],
-        # ['20190214T03Z', -107],
-        # ['20190214T02Z', -108],
-        # ['20190214T01Z', -103]]
-        try:
-            datetime = pd.to_datetime([x[0] for x in row['data']],
-                                      utc=True, format='%Y%m%dT%HZ')
-        except ValueError:
-            try:
-                datetime = pd.to_datetime([x[0]+"00" for x in row['data']],
-                                          format='%Y%m%dT%H%z')
-            except ValueError:
-                continue
-        data = [x[1] for x in row['data']]
-        from_region = row['series_id'].split('-')[0][4:]
-        to_region = row['series_id'].split('-')[1][:-5]
-
-#        df_data = {
-#            'from_region': from_region,
-#            'to_region': to_region,
-#            'datetime': datetime,
-#            data_type: data,
-#        }
-        tuple_data = [x for x in zip([from_region]*len(datetime), [to_region]*len(datetime), datetime, data)]
-        tuple_list.extend(tuple_data)
-#        _df = pd.DataFrame(df_data)
-#        df_list.append(_df)
-
-#    df = pd.concat(df_list).reset_index(drop=True)
-    df=pd.DataFrame(tuple_list, columns=["from_region", "to_region", "datetime", data_type])
+    rows, lengths, datetimes, values = _parse_rows(rows)
+    from_regions = [row['series_id'].split('-')[0][4:] for row in rows]
+    to_regions = [row['series_id'].split('-')[1][:-5] for row in rows]
+    df = pd.DataFrame({
+        "from_region": np.repeat(np.array(from_regions, dtype=object), lengths),
+        "to_region": np.repeat(np.array(to_regions, dtype=object), lengths),
+        "datetime": datetimes,
+        data_type: values,
+    })
     return df
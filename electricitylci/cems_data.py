@@ -18,10 +18,13 @@ copies or substantial portions of the Software.
 """
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 # from pudl.settings import SETTINGS
 # import pudl.constants as pc
 from electricitylci.globals import data_dir, output_dir
+from electricitylci.utils import open_zip_member
 import logging
+import zipfile
 
 data_years = {
     'epacems': tuple(range(1995, 2019)),
@@ -196,6 +199,17 @@ cems_col_names = {
         'COUNT_OP_TIME': 'count_op_time'
 }
 
+cems_group_cols = ['state', 'plant_id_eia', 'facility_id']
+
+cems_cols_to_sum = [
+        'gross_load_mwh',
+        'steam_load_1000_lbs',
+        'so2_mass_tons',
+        'nox_mass_tons',
+        'co2_mass_tons',
+        'heat_content_mmbtu'
+]
+
 
 def get_epacems_dir(year):
     """
@@ -239,13 +253,25 @@ def read_cems_csv(filename):
     Read one CEMS CSV file.
 
     Note that some columns are not read. See epacems_columns_to_ignores.
+    The downloaded files are zipped; they are read in place, with the
+    decompression done in a background thread while the csv is parsed.
     """
-    df = pd.read_csv(
-        filename,
-        index_col=False,
-        usecols=lambda col: col not in epacems_columns_to_ignore,
-        dtype=epacems_csv_dtypes,
-    ).rename(columns=epacems_rename_dict)
+    if zipfile.is_zipfile(filename):
+        with open_zip_member(filename) as f:
+            df = pd.read_csv(
+                f,
+                index_col=False,
+                usecols=lambda col: col not in epacems_columns_to_ignore,
+                dtype=epacems_csv_dtypes,
+            )
+    else:
+        df = pd.read_csv(
+            filename,
+            index_col=False,
+            usecols=lambda col: col not in epacems_columns_to_ignore,
+            dtype=epacems_csv_dtypes,
+        )
+    df = df.rename(columns=epacems_rename_dict)
     return df
 
 
@@ -256,7 +282,8 @@ def extract(epacems_years, states, verbose=True):
     This function is the main function of this file. It returns a generator
     for extracted DataFrames.
     """
-    # TODO: this is really slow. Can we do some parallel processing?
+    # This keeps every hourly/daily record in memory. Use
+    # extract_plant_totals when only plant-level sums are needed.
     logging.info("Extracting EPA CEMS data...")
     dfs = []
     for year in epacems_years:
@@ -278,11 +305,66 @@ def extract(epacems_years, states, verbose=True):
     return dfs
 
 
-import urllib
-import ftplib
-import zipfile
+def _sum_cems_file(filename):
+    """
+    Read one CEMS CSV file and sum the emissions and generation for each
+    facility. Used by extract_plant_totals; it's a module level function so
+    that it can be sent to worker processes.
+    """
+    logging.info(f"Reading {os.path.basename(filename)}")
+    df = read_cems_csv(filename).rename(columns=cems_col_names)
+    # Columns missing from a file are summed as zeros, which is what the
+    # groupby-sum over the concatenated files used to produce.
+    df = df.reindex(columns=cems_group_cols + cems_cols_to_sum)
+    return df.groupby(by=cems_group_cols, as_index=False)[
+        cems_cols_to_sum
+    ].sum()
+
+
+def extract_plant_totals(epacems_years, states, max_workers=None):
+    """
+    Extract the EPA CEMS data and sum it by state, plant, and facility.
+
+    Each file is summed as soon as it is read, in a pool of worker processes,
+    and the per-file sums are then combined. Only one file per worker is held
+    in memory at a time.
+
+    Parameters
+    ----------
+    epacems_years : list
+        Years of data to read.
+    states : list
+        State abbreviations to read.
+    max_workers : int, optional
+        Number of worker processes, by default the number of CPUs. Use 1 to
+        read the files in this process.
+
+    Returns
+    -------
+    dataframe
+        Columns are cems_group_cols and cems_cols_to_sum.
+    """
+    logging.info("Extracting EPA CEMS data...")
+    filenames = [
+        get_epacems_file(year, qtr, state)
+        for year in epacems_years
+        for state in states
+        for qtr in range(1, 5)
+    ]
+    if max_workers == 1:
+        partial_sums = [_sum_cems_file(f) for f in filenames]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            partial_sums = list(executor.map(_sum_cems_file, filenames))
+    df = pd.concat(partial_sums, ignore_index=True)
+    return df.groupby(by=cems_group_cols, as_index=False)[
+        cems_cols_to_sum
+    ].sum()
+
+
 import shutil
 import warnings
+import electricitylci.downloads as downloads
 # import pudl.constants as pc
 # from pudl.settings import SETTINGS
 
@@ -344,7 +426,7 @@ def source_url(source, year, qtr=None, state=None):
 
     base_url = 'ftp://newftp.epa.gov/dmdnload/emissions/daily/quarterly/'
 
-    download_url = '{base_url}/{year}/DLY_{year}{state}Q{qtr}.zip'.format(
+    download_url = '{base_url}{year}/DLY_{year}{state}Q{qtr}.zip'.format(
             base_url=base_url, year=year,
             state=state.lower(), qtr=str(qtr)
     )
@@ -526,116 +608,22 @@ def download(source, year, states, datadir=data_dir, verbose=True):
                 f"Downloading {source} data for {year}...\n    {src_urls[0]}")
         else:
             print(f"Downloading {source} data for {year}...")
-    url_schemes = {urllib.parse.urlparse(url).scheme for url in src_urls}
-    # Pass all the URLs at once, rather than looping here, because that way
-    # we can use the same FTP connection for all of the src_urls
-    # (without going all the way to a global FTP cache)
-    if url_schemes == {"ftp"}:
-        _download_FTP(src_urls, tmp_files)
-    else:
-        _download_default(src_urls, tmp_files)
-    return tmp_files
-
-
-def _download_FTP(src_urls, tmp_files, allow_retry=True):
-    assert len(src_urls) == len(tmp_files) > 0
-    parsed_urls = [urllib.parse.urlparse(url) for url in src_urls]
-    domains = {url.netloc for url in parsed_urls}
-    within_domain_paths = [url.path for url in parsed_urls]
-    if len(domains) > 1:
-        # This should never be true, but it seems good to check
-        raise NotImplementedError(
-            "I don't yet know how to download from multiple domains")
-    domain = domains.pop()
-    ftp = ftplib.FTP(domain)
-    login_result = ftp.login()
-    assert login_result.startswith("230"), \
-        f"Failed to login to {domain}: {login_result}"
-    url_to_retry = []
-    tmp_to_retry = []
-    error_messages = []
-    for path, tmp_file, src_url in zip(within_domain_paths, tmp_files, src_urls):
-        with open(tmp_file, "wb") as f:
-            try:
-                ftp.retrbinary(f"RETR {path}", f.write)
-            except ftplib.all_errors as e:
-                error_messages.append(e)
-                url_to_retry.append(src_url)
-                tmp_to_retry.append(tmp_file)
-    # Now retry failures recursively
-    num_failed = len(url_to_retry)
-    if num_failed > 0:
-        if allow_retry and len(src_urls) == 1:
-            # If there was only one URL and it failed, retry once.
-            return _download_FTP(url_to_retry, tmp_to_retry, allow_retry=False)
-        elif allow_retry and src_urls != url_to_retry:
-            # If there were multiple URLs and at least one didn't fail,
-            # keep retrying until all fail or all succeed.
-            return _download_FTP(url_to_retry,
-                                 tmp_to_retry,
-                                 allow_retry=allow_retry
-                                 )
-        if url_to_retry == src_urls:
-            err_msg = (
-                f"Download failed for all {num_failed} URLs. " +
-                "Maybe the server is down?\n" +
-                "Here are the failure messages:\n " +
-                " \n".join(error_messages)
-            )
-        if not allow_retry:
+    # The files are downloaded concurrently; failures are reported once the
+    # others have finished.
+    failed = downloads.fetch_many(zip(src_urls, tmp_files), raise_errors=False)
+    if failed:
+        if len(failed) == len(src_urls):
             err_msg = (
-                f"Download failed for {num_failed} URLs and no more " +
-                "retries are allowed.\n" +
-                "Here are the failure messages:\n " +
-                " \n".join(error_messages)
+                f"Download failed for all {len(failed)} URLs. " +
+                "Maybe the server is down?\n"
             )
-        warnings.warn(err_msg)
-
-
-def _download_default(src_urls, tmp_files, allow_retry=True):
-    """Download URLs to files. Designed to be called by `download` function.
-
-    Args:
-        src_urls (list of str): the source URLs to download.
-        tmp_files (list of str): the corresponding files to save.
-        allow_retry (bool): Should the function call itself again to
-            retry the download? (Default will try twice for a single file, or
-            until all files fail)
-    Returns:
-        None
-
-    If the file cannot be downloaded, the program will issue a warning.
-    """
-    assert len(src_urls) == len(tmp_files) > 0
-    url_to_retry = []
-    tmp_to_retry = []
-    for src_url, tmp_file in zip(src_urls, tmp_files):
-        try:
-            outfile, _ = urllib.request.urlretrieve(src_url, filename=tmp_file)
-        except urllib.error.URLError:
-            url_to_retry.append(src_url)
-            tmp_to_retry.append(tmp_to_retry)
-    # Now retry failures recursively
-    num_failed = len(url_to_retry)
-    if num_failed > 0:
-        if allow_retry and len(src_urls) == 1:
-            # If there was only one URL and it failed, retry once.
-            return _download_default(url_to_retry,
-                                     tmp_to_retry,
-                                     allow_retry=False
-                                     )
-        elif allow_retry and src_urls != url_to_retry:
-            # If there were multiple URLs and at least one didn't fail,
-            # keep retrying until all fail or all succeed.
-            return _download_default(url_to_retry,
-                                     tmp_to_retry,
-                                     allow_retry=allow_retry
-                                     )
-        if url_to_retry == src_urls:
-            err_msg = f"ERROR: Download failed for all {num_failed} URLs. Maybe the server is down?"
-        if not allow_retry:
-            err_msg = f"ERROR: Download failed for {num_failed} URLs and no more retries are allowed"
-        warnings.warn(err_msg)
+        else:
+            err_msg = f"Download failed for {len(failed)} URLs.\n"
+        warnings.warn(
+            err_msg + "Here are the failure messages:\n " +
+            " \n".join(str(e) for e in failed.values())
+        )
+    return tmp_files
 
 
 def organize(source, year, states, unzip=True,
@@ -793,30 +781,33 @@ def update(source, year, states, clobber=False, unzip=True, verbose=True,
                  verbose=verbose, no_download=no_download)
 
 
-def build_cems_df(year):
-    """Add docstring."""
+def build_cems_df(year, max_workers=None):
+    """
+    Download (if necessary) the EPA CEMS data for all states for the given
+    year and sum it for each facility.
+
+    Parameters
+    ----------
+    year : int
+        Year of data
+    max_workers : int, optional
+        Number of processes used to read the files, by default the number
+        of CPUs.
+
+    Returns
+    -------
+    dataframe
+        Columns are state, plant_id_eia, facility_id, gross_load_mwh,
+        steam_load_1000_lbs, so2_mass_tons, nox_mass_tons, co2_mass_tons,
+        and heat_content_mmbtu.
+    """
     states = cems_states.keys()
     update('epacems', year, states)
-    raw_dfs = extract(
+    summary_df = extract_plant_totals(
             epacems_years=[year],
             states=states,
-            verbose=True
+            max_workers=max_workers
         )
-    df = pd.concat(raw_dfs)
-    df.rename(columns=cems_col_names, inplace=True)
-    cols_to_sum = [
-            'gross_load_mwh',
-            'steam_load_1000_lbs',
-            'so2_mass_tons',
-            'nox_mass_tons',
-            'co2_mass_tons',
-            'heat_content_mmbtu'
-    ]
-    summary_df = df.groupby(
-            by=['state', 'plant_id_eia', 'facility_id'],
-            group_keys=False,
-            as_index=False
-            )[cols_to_sum].sum()
     return summary_df
 
 
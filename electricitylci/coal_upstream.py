@@ -9,9 +9,15 @@ from electricitylci.globals import data_dir, output_dir
 from electricitylci.eia923_generation import eia923_download
 import os
 from os.path import join
-from electricitylci.utils import find_file_in_folder
-import requests
+from electricitylci.utils import (
+    find_file_in_folder,
+    find_data_file,
+    open_data_file,
+    data_file_name,
+)
+from electricitylci.downloads import fetch, DownloadError
 import electricitylci.PhysicalQuantities as pq
+from electricitylci.factored_inventory import FactoredInventory
 import numpy as np
 
 coal_type_codes={'BIT': 'B',
@@ -47,13 +53,9 @@ def eia_7a_download(year, save_path):
     name = 'coalpublic{}.xls'.format(year)
     url = eia7a_base_url + name
     try:
-        os.makedirs(save_path)
         print('Downloading EIA 7-A data...')
-        eia_7a_file = requests.get(url)
-        # eia_7a_file.retrieve(url,data_dir+'/'+name)
-        open(save_path+'/'+name, 'wb').write(eia_7a_file.content)
-        # download_unzip(url,data_dir)
-    except:
+        fetch(url, join(save_path, name))
+    except DownloadError:
         print('Error downloading eia-7a: try manually downloading from:\n'+
               url)
 
@@ -72,42 +74,31 @@ def read_eia923_fuel_receipts(year):
     if not os.path.exists(expected_923_folder):
         print('Downloading EIA-923 files')
         eia923_download(year=year, save_path=expected_923_folder)
-
-        eia923_path, eia923_name = find_file_in_folder(
-            folder_path=expected_923_folder,
-            file_pattern_match=['2_3_4_5'],
-            return_name=True
-        )
+    else:
+        print('Loading data from previously downloaded excel file')
+    all_files = os.listdir(expected_923_folder)
+    # Check for both csv and year<_Final> in case multiple years
+    # or other csv files exist
+    csv_file = [f for f in all_files
+                if '.csv' in f
+                and '_page_5_reduced.csv' in f]
+    if csv_file:
+        csv_path = os.path.join(expected_923_folder, csv_file[0])
+        eia_fuel_receipts_df=pd.read_csv(csv_path, low_memory=False)
+    else:
+        # The excel file is read from the downloaded zip file if it
+        # hasn't been extracted.
+        eia923_file = find_data_file(
+                folder_path=expected_923_folder,
+                file_pattern_match=['2_3_4_5'],
+                exclude_ext='.csv')
         eia_fuel_receipts_df = pd.read_excel(
-                eia923_path, sheet_name='Page 5 Fuel Receipts and Costs',
-                skiprows=4, usecols="A:E,H:M,P:Q")
-        csv_fn = eia923_name.split('.')[0] + '_page_5_reduced.csv'
+            open_data_file(eia923_file),
+            sheet_name='Page 5 Fuel Receipts and Costs',
+            skiprows=4, usecols="A:E,H:M,P:Q")
+        csv_fn = data_file_name(eia923_file).split('.')[0] + '_page_5_reduced.csv'
         csv_path = join(expected_923_folder, csv_fn)
         eia_fuel_receipts_df.to_csv(csv_path, index=False)
-    else:
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        print('Loading data from previously downloaded excel file')
-        all_files = os.listdir(expected_923_folder)
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [f for f in all_files
-                    if '.csv' in f
-                    and '_page_5_reduced.csv' in f]
-        if csv_file:
-            csv_path = os.path.join(expected_923_folder, csv_file[0])
-            eia_fuel_receipts_df=pd.read_csv(csv_path, low_memory=False)
-        else:
-            eia923_path, eia923_name = find_file_in_folder(
-                    folder_path=expected_923_folder,
-                    file_pattern_match=['2_3_4_5'],
-                    return_name=True)
-            eia_fuel_receipts_df = pd.read_excel(
-                eia923_path, sheet_name='Page 5 Fuel Receipts and Costs',
-                skiprows=4, usecols="A:E,H:M,P:Q")
-            csv_fn = eia923_name.split('.')[0] + '_page_5_reduced.csv'
-            csv_path = join(expected_923_folder, csv_fn)
-            eia_fuel_receipts_df.to_csv(csv_path, index=False)
     _clean_columns(eia_fuel_receipts_df)
     return eia_fuel_receipts_df
 
@@ -122,11 +113,6 @@ def _coal_code(row):
     return coal_code_str
 
 
-def _transport_code(row):
-    transport_str=transport_dict[row['coal_source_code']]
-    return transport_str
-
-
 def generate_upstream_coal_map(year):
     from electricitylci.globals import STATE_ABBREV
     from electricitylci.eia923_generation import eia923_generation_and_fuel
@@ -259,11 +245,12 @@ def generate_upstream_coal_map(year):
     return final_df
 
 
-def generate_upstream_coal(year):
+def _coal_inventories(year):
     from ast import literal_eval
     """
-    Generate the annual coal mining and transportation emissions (in kg) for
-    each plant in EIA923.
+    Coal mining emissions per ton of coal for each coal code and
+    transportation emissions per kg-km for each mode, and the coal use and
+    transportation of each plant in EIA923.
 
     Parameters
     ----------
@@ -272,7 +259,8 @@ def generate_upstream_coal(year):
 
     Returns
     ----------
-    dataframe
+    tuple
+        FactoredInventory objects for mining and transportation.
     """
 #    coal_cleaning_percent = 1
 
@@ -329,7 +317,12 @@ def generate_upstream_coal(year):
     # mining the same type of coal. For imports, this will be the weighted average
     # of all of the same type of coal production in the US.
 #    missing_scens=list(merged_input_eia_coal_a.loc[merged_input_eia_coal_a["FlowName"].isna(),"coal_source_code"].unique())
-    existing_scens_merge=coal_input_eia.loc[~coal_input_eia["coal_source_code"].isin(missing_scens), :].merge(
+    # The inventories of the missing scenarios are weighted by the total
+    # quantity of each coal code rather than the quantity of each plant,
+    # which gives the same weighted means.
+    coal_code_quantity=coal_input_eia.groupby(
+            "coal_source_code", as_index=False)["quantity"].sum()
+    existing_scens_merge=coal_code_quantity.loc[~coal_code_quantity["coal_source_code"].isin(missing_scens), :].merge(
             coal_mining_inventory,
             left_on=["coal_source_code"],
             right_on=["Coal Code"],
@@ -382,90 +375,56 @@ def generate_upstream_coal(year):
                 )
         missing_scens_df_list.append(scen_inventory_df)
     missing_scens_df=pd.concat(missing_scens_df_list).reset_index(drop=True)
-    missing_scens_merge=coal_input_eia.loc[coal_input_eia["coal_source_code"].isin(missing_scens),:].merge(
-            missing_scens_df,
-            left_on=["coal_source_code"],
-            right_on=["Coal Code"],
-            how="left"
-            )
-    
-    coal_mining_inventory_df = pd.concat([existing_scens_merge,missing_scens_merge],sort=False).reset_index(drop=True)
+    coal_mining_inventory_df = pd.concat(
+            [coal_mining_inventory, missing_scens_df],sort=False).reset_index(drop=True)
     
-    
-    # Multiply coal mining emission factor by coal quantity; 
+    # Coal mining emission factors are per ton of coal;
     # convert to kg - coal input in tons (US)
     coal_mining_inventory_df["FlowAmount"] = (
-            pq.convert(1,'ton','kg')*
-            coal_mining_inventory_df["p50"].multiply(
-                    coal_mining_inventory_df['quantity'],axis = "index")
-            )
-    
-    coal_mining_inventory_df["Source"]="Mining"
-    coal_mining_inventory_df=coal_mining_inventory_df[["plant_id","coal_source_code","quantity","FlowName","FlowAmount","Compartment","input","Source","FlowUUID","ElementaryFlowPrimeContext","Unit","FlowType"]]
-    # Keep the plant ID and air emissions columns
-#    merged_input_eia_coal_a = merged_input_eia_coal_a[
-#            ['plant_id','coal_source_code','quantity'] + column_air_emission]
-    
-    # Groupby the plant ID since some plants have multiple row entries 
-    # (receive coal from multiple basins)
-#    merged_input_eia_coal_grouped = (
-#            merged_input_eia_coal_a.groupby(
-#                    by=['plant_id','coal_source_code'],
-#                    as_index=False)[['quantity',"FlowAmount"]].sum())
-#    merged_input_eia_coal_grouped = merged_input_eia_coal_a.reset_index(drop=True)
-    
-    # Melting the database on Plant ID
-#    melted_database_air = merged_input_eia_coal_a.melt(
-#            id_vars = ['plant_id','coal_source_code','quantity'], 
-#            var_name = 'FlowName', 
-#            value_name = 'FlowAmount')
+            pq.convert(1,'ton','kg')*coal_mining_inventory_df["p50"])
+    coal_mining_inventory_df.rename(
+            columns={"Coal Code":"coal_source_code"}, inplace=True)
+    coal_mining_inventory_df=coal_mining_inventory_df[["coal_source_code","FlowName","FlowAmount","Compartment","input","FlowUUID","ElementaryFlowPrimeContext","Unit","FlowType"]]
+    coal_mining_activity=coal_input_eia[["plant_id","coal_source_code","quantity"]].copy()
+    coal_mining_activity["Source"]="Mining"
     
     
     # Repeat the same methods for emissions from transportation 
     coal_transportation = coal_transportation.melt(
             'Plant Government ID',var_name = 'Transport')
     coal_transportation["value"]=coal_transportation["value"]*pq.convert(1,"ton","kg")*pq.convert(1,"mi","km")
-    merged_transport_coal = coal_transportation.merge(
-            coal_inventory_transportation, 
-            left_on = ['Transport'], 
-            right_on =['Modes'],
-            how = 'left')
-    
-    # multiply transportation emission factor (kg/kg-mi) by total transportation
-    # (ton-miles)
-    column_air_emission=[x for x in coal_inventory_transportation.columns[1:] if "Unnamed" not in x]
-    merged_transport_coal[column_air_emission] = (
-            # pq.convert(1,'ton','kg')*
-            merged_transport_coal[column_air_emission].multiply(
-                    merged_transport_coal['value'],axis = "index"))
-    
-    merged_transport_coal.rename(columns={'Plant Government ID':'plant_id'},
-                                 inplace=True)
+    coal_transportation.rename(columns={'Plant Government ID':'plant_id',
+                                        'value':'quantity'},
+                               inplace=True)
     
     # Groupby the plant ID since some plants have multiple row entries 
     # (receive coal from multiple basins)
-    merged_transport_coal= merged_transport_coal.groupby(
-            ['plant_id','Transport'])[['value']+column_air_emission].sum()
-    merged_transport_coal= merged_transport_coal.reset_index()
+    coal_transport_activity = coal_transportation.groupby(
+            ['plant_id','Transport'],as_index=False)['quantity'].sum()
+    coal_transport_activity['coal_source_code']=coal_transport_activity[
+            'Transport'].map(transport_dict)
+    coal_transport_activity.drop(columns=['Transport'],inplace=True)
+    coal_transport_activity['Source'] = 'Transportation'
     
-    # Keep the plant ID and emissions columns
-    merged_transport_coal = (
-            merged_transport_coal[
-                    ['plant_id','Transport','value'] + column_air_emission])
-    merged_transport_coal.rename(columns={'Transport':'coal_source_code',
-                                          'value':'quantity'},
-                                 inplace=True)
-    # Melting the database on Plant ID
-    melted_database_transport = merged_transport_coal.melt(
-            id_vars = ['plant_id','coal_source_code','quantity'], 
+    # Transportation emission factors (kg/kg-km) for each mode that the
+    # plants use. Modes missing from the inventory have no emissions.
+    column_air_emission=[x for x in coal_inventory_transportation.columns[1:] if "Unnamed" not in x]
+    transport_modes = pd.DataFrame(
+            {'Modes': coal_transportation['Transport'].unique()}).merge(
+            coal_inventory_transportation[['Modes'] + column_air_emission],
+            on = ['Modes'],
+            how = 'left')
+    melted_database_transport = transport_modes.melt(
+            id_vars = ['Modes'], 
             var_name = 'FlowName', 
             value_name = 'FlowAmount')
-    melted_database_transport['coal_source_code']=melted_database_transport.apply(
-            _transport_code,axis=1)
+    melted_database_transport['FlowAmount']=melted_database_transport['FlowAmount'].fillna(0)
+    melted_database_transport['coal_source_code']=melted_database_transport[
+            'Modes'].map(transport_dict)
+    melted_database_transport.drop(columns=['Modes'],inplace=True)
     # Adding to new columns for the compartment (water) and 
     # The source of the emissisons (mining). 
     melted_database_transport['Compartment'] = 'emission/air'
-    melted_database_transport['Source'] = 'Transportation'
     melted_database_transport["ElementaryFlowPrimeContext"]="emission"
     melted_database_transport["FlowType"]="ELEMENTARY_FLOW"
     melted_database_transport=melted_database_transport.merge(
@@ -485,21 +444,63 @@ def generate_upstream_coal(year):
             inplace=True
             )
     melted_database_transport["input"]=False
-    merged_coal_upstream = pd.concat([coal_mining_inventory_df, 
-                                      melted_database_transport],sort=False).reset_index(drop=True)
-    merged_coal_upstream['FuelCategory']='COAL'
-    merged_coal_upstream.rename(columns={
-            'coal_source_code':'stage_code',
-            'Source':'stage'
-            },inplace=True)
-    zero_rows = merged_coal_upstream.loc[merged_coal_upstream["quantity"]==0,:].index
-    merged_coal_upstream.drop(zero_rows,inplace=True)
+    
+    inventories = []
+    for flows, plants in [
+            (coal_mining_inventory_df, coal_mining_activity),
+            (melted_database_transport, coal_transport_activity)]:
+        plants = plants.loc[plants["quantity"]!=0,:].copy()
+        plants['FuelCategory']='COAL'
+        plants.rename(columns={
+                'coal_source_code':'stage_code',
+                'Source':'stage'
+                },inplace=True)
+        plants["Year"]=year
+        plants["Source"]="netl"
+        flows = flows.rename(columns={'coal_source_code':'stage_code'})
+        inventories.append(FactoredInventory(flows, plants, on="stage_code"))
+    return tuple(inventories)
+
+
+def coal_inventory(year):
+    """
+    Coal mining and transportation emissions per unit of coal and the coal
+    use and transportation of each plant in EIA923, without the plants and
+    flows that don't match. See generate_upstream_coal.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use
+
+    Returns
+    ----------
+    FactoredInventory
+    """
+    return FactoredInventory.concat(_coal_inventories(year))
+
+
+def generate_upstream_coal(year):
+    """
+    Generate the annual coal mining and transportation emissions (in kg) for
+    each plant in EIA923.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use
+
+    Returns
+    ----------
+    dataframe
+    """
+    merged_coal_upstream = pd.concat(
+            [inventory.expand() for inventory in _coal_inventories(year)],
+            sort=False).reset_index(drop=True)
     merged_coal_upstream.sort_values(
             ['plant_id','stage','stage_code','Compartment','FlowName'],
             inplace=True)
     merged_coal_upstream.reset_index(drop=True,inplace=True)
-    merged_coal_upstream["Year"]=year
-    merged_coal_upstream["Source"]="netl"
     return merged_coal_upstream
 
 if __name__=='__main__':
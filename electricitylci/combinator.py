@@ -4,34 +4,62 @@ from electricitylci.globals import output_dir, data_dir
 import electricitylci.generation as gen
 import electricitylci.import_impacts as import_impacts
 from electricitylci.model_config import model_specs
+from electricitylci.factored_inventory import (
+    FactoredInventory,
+    KEY_COLUMN,
+    SCALE_COLUMN,
+)
+import electricitylci.schema as schema
 
 import logging
+from functools import lru_cache
+
+module_logger = logging.getLogger("combinator.py")
+
 
 # I added this section to populate a ba_codes variable that could be used
 # by other modules without having to re-read the excel files. The purpose
 # is to try and provide a common source for balancing authority names, as well
-# as FERC an EIA region names.
-module_logger = logging.getLogger("combinator.py")
-ba_codes = pd.concat(
-    [
-        pd.read_excel(
-            f"{data_dir}/BA_Codes_930.xlsx", header=4, sheet_name="US"
-        ),
-        pd.read_excel(
-            f"{data_dir}/BA_Codes_930.xlsx", header=4, sheet_name="Canada"
-        ),
-    ]
-)
-ba_codes.rename(
-    columns={
-        "etag ID": "BA_Acronym",
-        "Entity Name": "BA_Name",
-        "NCR_ID#": "NRC_ID",
-        "Region": "Region",
-    },
-    inplace=True,
-)
-ba_codes.set_index("BA_Acronym", inplace=True)
+# as FERC an EIA region names. The excel file is read the first time ba_codes
+# is requested rather than on import (see __getattr__ below).
+@lru_cache(maxsize=1)
+def get_ba_codes():
+    """
+    Read the balancing authority codes, names, and FERC and EIA regions for
+    the US and Canada.
+
+    Returns
+    -------
+    dataframe
+        Indexed by the balancing authority acronym (BA_Acronym).
+    """
+    ba_codes = pd.concat(
+        [
+            pd.read_excel(
+                f"{data_dir}/BA_Codes_930.xlsx", header=4, sheet_name="US"
+            ),
+            pd.read_excel(
+                f"{data_dir}/BA_Codes_930.xlsx", header=4, sheet_name="Canada"
+            ),
+        ]
+    )
+    ba_codes.rename(
+        columns={
+            "etag ID": "BA_Acronym",
+            "Entity Name": "BA_Name",
+            "NCR_ID#": "NRC_ID",
+            "Region": "Region",
+        },
+        inplace=True,
+    )
+    ba_codes.set_index("BA_Acronym", inplace=True)
+    return ba_codes
+
+
+def __getattr__(name):
+    if name == "ba_codes":
+        return get_ba_codes()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def fill_nans(df, eia_gen_year, key_column="FacilityID", target_columns=[], dropna=True):
@@ -126,14 +154,18 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
 
     Parameters
     ----------
-    *arg : dataframes
+    *arg : dataframes or FactoredInventory
         The dataframes to be combined, generated by the upstream modules or
         renewables modules (electricitylci.nuclear_upstream, .petroleum_upstream,
-        .solar_upstream, etc.)
+        .solar_upstream, etc.). If they are all FactoredInventory objects
+        (e.g., from nuclear_upstream.nuclear_inventory), the flows are mapped
+        without expanding them to every plant.
 
     Returns
     -------
-    datafame
+    datafame or FactoredInventory
+        A FactoredInventory if all of the databases were FactoredInventory
+        objects.
 
     if kwarg group_name is used then the function will return a tuple containing
     the mapped dataframe and lists of tuples for the unique mapped and unmapped flows.
@@ -154,8 +186,27 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
         "NETL database/resources": "NETL database/resources",
     }
     print(f"Concatenating and flow-mapping {len(arg)} upstream databases.")
+    factored = len(arg) > 0 and all(
+        isinstance(df, FactoredInventory) for df in arg
+    )
     upstream_df_list = list()
     for df in arg:
+        if isinstance(df, FactoredInventory):
+            if not factored:
+                df = df.expand()
+            else:
+                # The flows are mapped once, for all of the plants.
+                flows = df.intensities.copy()
+                if "Compartment_path" not in flows.columns:
+                    flows["Compartment_path"] = float("nan")
+                    flows["Compartment_path"].fillna(
+                            flows["Compartment"].map(compartment_mapping),
+                            inplace=True
+                            )
+                upstream_df_list.append(
+                    FactoredInventory(flows, df.activity, df.on, df.scale, df.how)
+                )
+                continue
         if isinstance(df, pd.DataFrame):
             if "Compartment_path" not in df.columns:
                 df["Compartment_path"] = float("nan")
@@ -163,7 +214,12 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
                         df["Compartment"].map(compartment_mapping), inplace=True
                         )
             upstream_df_list.append(df)
-    upstream_df = pd.concat(upstream_df_list, ignore_index=True, sort=False)
+    if factored:
+        upstream_inventory = FactoredInventory.concat(upstream_df_list)
+        upstream_df = upstream_inventory.intensities
+        plant_columns = upstream_inventory.activity.columns
+    else:
+        upstream_df = pd.concat(upstream_df_list, ignore_index=True, sort=False)
     module_logger.info("Creating flow mapping database")
     flow_mapping = fedefl.get_flowmapping('eLCI')
     flow_mapping["SourceFlowName"] = flow_mapping["SourceFlowName"].str.lower()
@@ -181,6 +237,8 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
         upstream_df["Compartment_path"].str.lower().str.rstrip()
     )
     upstream_columns=upstream_df.columns
+    if factored:
+        upstream_columns = upstream_columns.union(plant_columns)
     groupby_cols = [
         "fuel_type",
         "stage_code",
@@ -196,7 +254,13 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
     ]
     upstream_df["Unit"].fillna("<blank>", inplace=True)
     module_logger.info("Grouping upstream database")
-    if "Electricity" in upstream_df.columns:
+    if factored:
+        # The quantity and electricity of each plant stay in the activity.
+        groupby_cols[groupby_cols.index("plant_id")] = KEY_COLUMN
+        upstream_df_grp = upstream_df.groupby(
+            groupby_cols, as_index=False
+        ).agg({"FlowAmount": "sum"})
+    elif "Electricity" in upstream_df.columns:
         upstream_df_grp = upstream_df.groupby(
             groupby_cols, as_index=False
         ).agg({"FlowAmount": "sum", "quantity": "mean", "Electricity": "mean"})
@@ -221,7 +285,12 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
         columns=mapped_column_dict, copy=False
     )
     upstream_mapped_df.drop_duplicates(
-        subset=["plant_id", "FlowName", "Compartment_path", "FlowAmount"],
+        subset=[
+            KEY_COLUMN if factored else "plant_id",
+            "FlowName",
+            "Compartment_path",
+            "FlowAmount",
+        ],
         inplace=True,
     )
     upstream_mapped_df.dropna(subset=["FlowName"], inplace=True)
@@ -265,6 +334,14 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
         final_columns = final_columns + ["Electricity"]
     if "input" in upstream_columns:
         final_columns = final_columns+["input"]
+    if factored:
+        activity_columns = [
+            c for c in ["plant_id", "quantity", "Electricity"]
+            if c in final_columns
+        ] + [KEY_COLUMN, SCALE_COLUMN]
+        final_columns = [
+            c for c in final_columns if c not in activity_columns
+        ] + [KEY_COLUMN]
 
     # I added the section below to help generate lists of matched and unmatched
     # flows. Because of the groupby, it's expensive enough not to run everytime.
@@ -304,8 +381,24 @@ def concat_map_upstream_databases(eia_gen_year, *arg, **kwargs):
                     f.write(f"{x}\n")
                 f.close()
             upstream_mapped_df = upstream_mapped_df[final_columns]
+            if factored:
+                upstream_mapped_df = FactoredInventory(
+                    upstream_mapped_df,
+                    upstream_inventory.activity[activity_columns],
+                    on=KEY_COLUMN,
+                    scale=SCALE_COLUMN,
+                    how="inner",
+                )
             return upstream_mapped_df, unmatched_list, matched_list
     upstream_mapped_df = upstream_mapped_df[final_columns]
+    if factored:
+        upstream_mapped_df = FactoredInventory(
+            upstream_mapped_df,
+            upstream_inventory.activity[activity_columns],
+            on=KEY_COLUMN,
+            scale=SCALE_COLUMN,
+            how="inner",
+        )
     return upstream_mapped_df
 
 
@@ -326,6 +419,7 @@ def concat_clean_upstream_and_plant(pl_df, up_df):
     -------
     dataframe
     """
+    ba_codes = get_ba_codes()
     region_cols = [
         "NERC",
         "Balancing Authority Code",
@@ -340,7 +434,7 @@ def concat_clean_upstream_and_plant(pl_df, up_df):
         how="left",
     )
     #    up_df.dropna(subset=region_cols + ["Electricity"], inplace=True)
-    combined_df = pd.concat([pl_df, up_df], ignore_index=True)
+    combined_df = schema.concat([pl_df, up_df], ignore_index=True)
     combined_df["Balancing Authority Name"] = combined_df[
         "Balancing Authority Code"
     ].map(ba_codes["BA_Name"])
@@ -383,11 +477,12 @@ def concat_clean_upstream_and_plant(pl_df, up_df):
         < model_specs.min_plant_percent_generation_from_primary_fuel_category / 100
     )
     if model_specs.keep_mixed_plant_category:
+        schema.add_categories(combined_df, "FuelCategory", "MIXED")
         combined_df.loc[generation_filter, "FuelCategory"] = "MIXED"
         combined_df.loc[generation_filter, "PrimaryFuel"] = "Mixed Fuel Type"
     else:
         combined_df = combined_df.loc[~generation_filter]
-    return combined_df
+    return schema.enforce_schema(combined_df)
 
 
 def add_fuel_inputs(gen_df, upstream_df, upstream_dict):
@@ -476,7 +571,7 @@ def add_fuel_inputs(gen_df, upstream_df, upstream_dict):
     fuel_df["FuelCategory"] = fuel_df["FacilityID"].map(
         fuel_cat_key["FuelCategory"]
     )
-    gen_plus_up_df = pd.concat([gen_df, fuel_df], ignore_index=True)
+    gen_plus_up_df = schema.concat([gen_df, fuel_df], ignore_index=True)
     gen_plus_up_df = fill_nans(gen_plus_up_df, model_specs.eia_gen_year)
     # Taking out anything with New Brunswick System Operator so that
     # these fuel inputs (for a very small US portion of NBSO) don't get mapped
@@ -486,7 +581,7 @@ def add_fuel_inputs(gen_df, upstream_df, upstream_dict):
         != "New Brunswick System Operator",
         :,
     ].reset_index(drop=True)
-    return gen_plus_up_df
+    return schema.enforce_schema(gen_plus_up_df)
 
 
 if __name__ == "__main__":
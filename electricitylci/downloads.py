@@ -0,0 +1,312 @@
+"""
+Download manager for the EIA and EPA source files.
+
+Files are streamed to disk in chunks rather than held in memory. A partial
+download is kept next to the destination with a ".part" suffix and resumed
+with an HTTP range request (or an FTP REST command) when the download is
+retried. Several files can be downloaded at once with a bounded thread pool.
+
+If mirror_dir is set, every file that is downloaded is also saved there,
+under the host name and path of its url, and its SHA-256 checksum is
+recorded in the mirror's checksum manifest. Files that are already in the
+mirror are copied from it (after their checksum is verified) instead of
+being downloaded, so a populated mirror can be copied to a machine without
+internet access and used with offline set to True.
+"""
+
+import ftplib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+
+import requests
+
+from electricitylci.globals import data_dir
+
+module_logger = logging.getLogger("downloads.py")
+
+# Folder for files that are only needed until they are extracted.
+staging_dir = join(data_dir, "downloads")
+
+# Folder for the local mirror of downloaded files. None means no mirror.
+mirror_dir = None
+# If True, files are only taken from the mirror and never downloaded.
+offline = False
+# Default size of the thread pool used by fetch_many.
+max_workers = 4
+
+CHUNK_SIZE = 1 << 20
+RETRIES = 3
+TIMEOUT = 60
+MANIFEST_NAME = "checksums.json"
+
+_manifest_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """Exception raised when a file cannot be downloaded."""
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def mirror_path(url):
+    """
+    Return the path of the file for url in the mirror, or None if there is
+    no mirror.
+    """
+    if mirror_dir is None:
+        return None
+    parsed = urllib.parse.urlparse(url)
+    parts = [p for p in parsed.path.split("/") if p not in ("", ".", "..")]
+    return join(mirror_dir, parsed.netloc.replace(":", "_"), *parts)
+
+
+def staging_path(url):
+    """
+    Return a path in the staging folder for a file that is downloaded only
+    to be extracted. The name is unique to the url so that a partial
+    download is only resumed from the same url.
+    """
+    name = os.path.basename(urllib.parse.urlparse(url).path) or "download"
+    url_hash = hashlib.sha256(url.encode()).hexdigest()[:8]
+    return join(staging_dir, f"{url_hash}_{name}")
+
+
+def _read_manifest():
+    try:
+        with open(join(mirror_dir, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _record_checksum(url, sha256):
+    with _manifest_lock:
+        manifest = _read_manifest()
+        manifest[url] = sha256
+        os.makedirs(mirror_dir, exist_ok=True)
+        tmp_path = join(mirror_dir, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, join(mirror_dir, MANIFEST_NAME))
+
+
+def _from_mirror(url, dest, sha256):
+    """Copy url from the mirror to dest. Returns False if it isn't there or
+    its checksum doesn't match."""
+    src = mirror_path(url)
+    if src is None or not os.path.exists(src):
+        return False
+    expected = sha256 or _read_manifest().get(url)
+    if expected is not None and file_sha256(src) != expected:
+        module_logger.warning(f"Checksum mismatch for {src}, ignoring it")
+        return False
+    if os.path.abspath(src) != os.path.abspath(dest):
+        shutil.copyfile(src, dest)
+    return True
+
+
+def _to_mirror(url, dest, sha256):
+    dst = mirror_path(url)
+    if os.path.abspath(dst) != os.path.abspath(dest):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copyfile(dest, dst + ".tmp")
+        os.replace(dst + ".tmp", dst)
+    _record_checksum(url, sha256)
+
+
+def _download_http(url, part_path, timeout):
+    """Append the rest of url to part_path, resuming from its size."""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 416:
+            # The partial file is already complete.
+            return
+        r.raise_for_status()
+        if offset and r.status_code != 206:
+            # The server ignored the range, start over.
+            offset = 0
+        # Content-Length is the encoded size if the response is compressed.
+        expected = None
+        if "Content-Encoding" not in r.headers:
+            expected = r.headers.get("Content-Length")
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+    if expected is not None and os.path.getsize(part_path) != offset + int(expected):
+        raise DownloadError(f"Incomplete download of {url}")
+
+
+_ftp_connections = threading.local()
+
+
+def _ftp_connection(host):
+    """Return this thread's FTP connection to host, logging in if needed."""
+    connections = getattr(_ftp_connections, "connections", None)
+    if connections is None:
+        connections = _ftp_connections.connections = {}
+    ftp = connections.get(host)
+    if ftp is None:
+        ftp = ftplib.FTP(host, timeout=TIMEOUT)
+        login_result = ftp.login()
+        if not login_result.startswith("230"):
+            raise DownloadError(f"Failed to login to {host}: {login_result}")
+        connections[host] = ftp
+    return ftp
+
+
+def _download_ftp(url, part_path, timeout):
+    """Append the rest of url to part_path, resuming from its size."""
+    parsed = urllib.parse.urlparse(url)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    ftp = _ftp_connection(parsed.netloc)
+    try:
+        with open(part_path, "ab" if offset else "wb") as f:
+            ftp.retrbinary(
+                f"RETR {parsed.path}", f.write, blocksize=CHUNK_SIZE,
+                rest=offset or None
+            )
+    except ftplib.all_errors:
+        # Reconnect on the next attempt.
+        _ftp_connections.connections.pop(parsed.netloc, None)
+        raise
+
+
+def fetch(url, dest, sha256=None, retries=RETRIES, timeout=TIMEOUT):
+    """
+    Download url to dest, or copy it from the mirror if it is there.
+
+    Parameters
+    ----------
+    url : str
+        http(s) or ftp url.
+    dest : str
+        Path of the downloaded file. Its folder is created if necessary.
+    sha256 : str, optional
+        Expected SHA-256 hex digest of the file.
+    retries : int, optional
+        Number of times a failed download is retried (resuming where it
+        stopped), by default 3.
+    timeout : float, optional
+        Connection and read timeout in seconds, by default 60.
+
+    Returns
+    -------
+    str
+        dest
+
+    Raises
+    ------
+    DownloadError
+        If the file is not in the mirror and offline is True, or if it
+        could not be downloaded.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    if _from_mirror(url, dest, sha256):
+        module_logger.info(f"Using mirrored copy of {url}")
+        return dest
+    if offline:
+        raise DownloadError(f"{url} is not in the mirror and offline is set")
+
+    scheme = urllib.parse.urlparse(url).scheme
+    if scheme == "ftp":
+        download = _download_ftp
+        errors = ftplib.all_errors + (DownloadError,)
+    elif scheme in ("http", "https"):
+        download = _download_http
+        errors = (requests.RequestException, DownloadError)
+    else:
+        raise DownloadError(f"Unsupported url scheme: {url}")
+
+    part_path = dest + ".part"
+    for attempt in range(retries + 1):
+        try:
+            download(url, part_path, timeout)
+            break
+        except errors as e:
+            # Client errors such as 404 won't go away on retry.
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            permanent = (
+                status is not None and 400 <= status < 500
+                and status not in (408, 429)
+            )
+            if attempt == retries or permanent:
+                raise DownloadError(f"Download of {url} failed: {e}") from e
+            module_logger.warning(
+                f"Download of {url} failed ({e}), retrying"
+            )
+            time.sleep(2 ** attempt)
+
+    digest = file_sha256(part_path)
+    if sha256 is not None and digest != sha256:
+        os.remove(part_path)
+        raise DownloadError(f"Checksum mismatch for {url}")
+    os.replace(part_path, dest)
+    if mirror_dir is not None:
+        _to_mirror(url, dest, digest)
+    return dest
+
+
+def fetch_many(downloads, workers=None, raise_errors=True, **kwargs):
+    """
+    Download several files at once.
+
+    Parameters
+    ----------
+    downloads : list
+        (url, dest) pairs.
+    workers : int, optional
+        Number of downloads at a time, by default max_workers.
+    raise_errors : bool, optional
+        If True (default), a DownloadError listing all of the failed
+        downloads is raised after the others have finished. If False, the
+        failures are returned.
+    **kwargs
+        Passed to fetch.
+
+    Returns
+    -------
+    dict
+        Keys are the urls that failed and values the errors; empty if
+        all of the downloads succeeded.
+    """
+    downloads = list(downloads)
+    if workers is None:
+        workers = max_workers
+    failed = {}
+    if not downloads:
+        return failed
+    with ThreadPoolExecutor(max_workers=min(workers, len(downloads))) as executor:
+        futures = [
+            (url, executor.submit(fetch, url, dest, **kwargs))
+            for url, dest in downloads
+        ]
+        for url, future in futures:
+            try:
+                future.result()
+            except DownloadError as e:
+                failed[url] = e
+    if failed and raise_errors:
+        raise DownloadError(
+            f"Download failed for {len(failed)} of {len(downloads)} files:\n"
+            + "\n".join(str(e) for e in failed.values())
+        )
+    return failed
@@ -1,4 +1,6 @@
 # Scoring based on USEPA 2016: Guidance on Data Quality Assessment for Life Cycle Inventory Data
+import numpy as np
+import pandas as pd
 
 flow_data_quality_fields = ['Reliability_Score', 'TemporalCorrelation', 'GeographicalCorrelation',
                             'TechnologicalCorrelation', 'DataCollection']
@@ -11,18 +13,56 @@ data_collection_lower_bound_to_dqi = {.4: 4, .6: 3, .8: 2, 1: 1, None: 5}
 technological_correlation_lower_bound_to_dqi = {.4: 4, .6: 3, .8: 2, 1: 1, None: 5}
 
 
+def _bounds_and_scores(bound_to_dqi):
+    """
+    Return the upper bounds of a bound to score dictionary in increasing
+    order, and the score for each bound followed by the score for values
+    above the last bound or missing.
+    """
+    bounds = sorted(k for k in bound_to_dqi if k is not None)
+    scores = [bound_to_dqi[b] for b in bounds] + [bound_to_dqi[None]]
+    return np.array(bounds, dtype=float), np.array(scores, dtype=np.int8)
+
+
+def lookup_scores_with_bound_key(raw_scores, bound_to_dqi):
+    """
+    Score an array of raw values with a bound to score dictionary.
+
+    The score of a value is the score of the smallest bound that is greater
+    than or equal to it, so values at or below the first bound (including
+    negative values) get the score of the first bound. Values above the
+    largest bound and missing values get the score of the None key.
+
+    Parameters
+    ----------
+    raw_scores : array-like
+        Raw indicator values, e.g., the age of the data in years or the
+        fraction of generation.
+    bound_to_dqi : dict
+        Upper bounds and their scores, with the score for values outside of
+        the bounds under the None key (e.g.,
+        temporal_correlation_lower_bound_to_dqi). Works for any of the flow
+        data quality indicators.
+
+    Returns
+    -------
+    numpy.ndarray
+        int8 scores, or a series with the same index if raw_scores is a
+        series.
+    """
+    bounds, scores = _bounds_and_scores(bound_to_dqi)
+    values = np.asarray(pd.to_numeric(raw_scores, errors="coerce"), dtype=float)
+    # right=True gives the index of the first bound >= the value; NaN goes
+    # past the last bound.
+    result = scores[np.digitize(values, bounds, right=True)]
+    if isinstance(raw_scores, pd.Series):
+        return pd.Series(result, index=raw_scores.index, name=raw_scores.name)
+    return result
+
+
 def lookup_score_with_bound_key(raw_score, bound_to_dqi):
-    breakpoints = list(bound_to_dqi.keys())
-    if raw_score <= breakpoints[0]:
-        score = bound_to_dqi[breakpoints[0]]
-    elif (raw_score > breakpoints[0]) & (raw_score <= breakpoints[1]):
-        score = bound_to_dqi[breakpoints[1]]
-    elif (raw_score > breakpoints[1]) & (raw_score <= breakpoints[2]):
-        score = bound_to_dqi[breakpoints[2]]
-    elif (raw_score > breakpoints[2]) & (raw_score <= breakpoints[3]):
-        score = bound_to_dqi[breakpoints[3]]
-    elif (raw_score<0):
-        print('Error: ')
-    else:
-        score = bound_to_dqi[None]
-    return score
+    """
+    Score a single raw value with a bound to score dictionary. See
+    lookup_scores_with_bound_key.
+    """
+    return int(lookup_scores_with_bound_key([raw_score], bound_to_dqi)[0])
@@ -1,31 +1,13 @@
 import pandas as pd
-import stewi
+from functools import lru_cache
 from os.path import join
 from electricitylci.globals import data_dir
-from electricitylci.model_config import model_specs
+import electricitylci.model_config as config
 
-# get egrid facility file from stewi
-egrid_facilities = stewi.getInventoryFacilities("eGRID", model_specs.egrid_year)
-egrid_facilities.rename(columns={'Plant primary coal/oil/gas/ other fossil fuel category': 'FuelCategory', 'Plant primary fuel': 'PrimaryFuel', 'eGRID subregion acronym': 'Subregion', 'NERC region acronym': 'NERC'}, inplace=True)
-
-# Remove NERC from original egrid output in stewi because there are mismatches in the original data with more than 1 NERC per egrid subregion
-egrid_facilities = egrid_facilities.drop(columns='NERC')
-# Bring in eGRID subregion-NERC mapping
-egrid_nerc = pd.read_csv(join(data_dir, 'egrid_subregion_to_NERC.csv'), low_memory=False)
-egrid_facilities = pd.merge(egrid_facilities, egrid_nerc, on='Subregion', how='left')
-
-len(egrid_facilities)
-# 2016:9709
-
-egrid_subregions = list(pd.unique(egrid_facilities['Subregion']))
-# Remove nan if present
-egrid_subregions = [x for x in egrid_subregions if str(x) != 'nan']
-len(egrid_subregions)
-
-# 2016: 26
-# egrid_subregions = ['AZNM']
-
-egrid_primary_fuel_categories = sorted(pd.unique(egrid_facilities['FuelCategory'].dropna()))
+# The eGRID facility data are loaded on first use rather than on import. The
+# module attributes egrid_facilities, egrid_subregions,
+# egrid_primary_fuel_categories, and egrid_facilities_fuel_cat_per_gen are
+# still available (see __getattr__ at the bottom of this module).
 
 # correspondence between fuel category and percent_gen
 fuel_cat_to_per_gen = {'BIOMASS': 'Plant biomass generation percent (resource mix)',
@@ -39,13 +21,7 @@ fuel_cat_to_per_gen = {'BIOMASS': 'Plant biomass generation percent (resource mi
                        'OTHF': 'Plant other unknown / purchased fuel generation percent (resource mix)',
                        'SOLAR': 'Plant solar generation percent (resource mix)',
                        'WIND': 'Plant wind generation percent (resource mix)'}
-# get subset of facility file with only these data
-list(fuel_cat_to_per_gen.values())
-cols_to_keep = ['FacilityID', 'FuelCategory']
 per_gen_cols = list(fuel_cat_to_per_gen.values())
-cols_to_keep = cols_to_keep + per_gen_cols
-egrid_facilities_fuel_cat_per_gen = egrid_facilities[cols_to_keep]
-egrid_facilities_fuel_cat_per_gen = egrid_facilities_fuel_cat_per_gen[egrid_facilities_fuel_cat_per_gen['FuelCategory'].notnull()]
 
 
 def add_percent_generation_from_primary_fuel_category_col(x):
@@ -54,19 +30,142 @@ def add_percent_generation_from_primary_fuel_category_col(x):
     return x
 
 
+@lru_cache(maxsize=4)
+def _load_egrid_facilities(egrid_year):
+    """
+    Read the eGRID facility file from stewi for the given year and add the
+    NERC region and the percent generation from the facility's fuel category.
+
+    Parameters
+    ----------
+    egrid_year : int
+        The eGRID year.
+
+    Returns
+    -------
+    tuple
+        (egrid_facilities, egrid_facilities_fuel_cat_per_gen) dataframes
+    """
+    import stewi
+
+    # get egrid facility file from stewi
+    egrid_facilities = stewi.getInventoryFacilities("eGRID", egrid_year)
+    egrid_facilities.rename(columns={'Plant primary coal/oil/gas/ other fossil fuel category': 'FuelCategory', 'Plant primary fuel': 'PrimaryFuel', 'eGRID subregion acronym': 'Subregion', 'NERC region acronym': 'NERC'}, inplace=True)
+
+    # Remove NERC from original egrid output in stewi because there are mismatches in the original data with more than 1 NERC per egrid subregion
+    egrid_facilities = egrid_facilities.drop(columns='NERC')
+    # Bring in eGRID subregion-NERC mapping
+    egrid_nerc = pd.read_csv(join(data_dir, 'egrid_subregion_to_NERC.csv'), low_memory=False)
+    egrid_facilities = pd.merge(egrid_facilities, egrid_nerc, on='Subregion', how='left')
+    # 2016:9709
+
+    # get subset of facility file with only these data
+    cols_to_keep = ['FacilityID', 'FuelCategory'] + per_gen_cols
+    egrid_facilities_fuel_cat_per_gen = egrid_facilities[cols_to_keep]
+    egrid_facilities_fuel_cat_per_gen = egrid_facilities_fuel_cat_per_gen[egrid_facilities_fuel_cat_per_gen['FuelCategory'].notnull()]
+
+    # Add the percent generation from primary fuel cat to its own column
+    egrid_facilities_fuel_cat_per_gen['PercentGenerationfromDesignatedFuelCategory'] = 0
+    egrid_facilities_fuel_cat_per_gen = egrid_facilities_fuel_cat_per_gen.apply(add_percent_generation_from_primary_fuel_category_col, axis=1)
+    egrid_facilities_fuel_cat_per_gen = egrid_facilities_fuel_cat_per_gen.drop(columns=per_gen_cols)
+    egrid_facilities = egrid_facilities.drop(columns=per_gen_cols)
+
+    # Merge back into facilities
+    egrid_facilities = pd.merge(egrid_facilities, egrid_facilities_fuel_cat_per_gen, on=['FacilityID', 'FuelCategory'], how='left')
+    return egrid_facilities, egrid_facilities_fuel_cat_per_gen
+
+
+def get_egrid_facilities():
+    """
+    Return the eGRID facility dataframe for the eGRID year in the model specs.
+    The data are read on the first call and reused afterwards.
+
+    Returns
+    -------
+    dataframe
+    """
+    return _load_egrid_facilities(config.model_specs.egrid_year)[0]
+
+
+def get_egrid_facilities_fuel_cat_per_gen():
+    """
+    Return the facility IDs, fuel categories, and the percent generation from
+    the fuel category for the eGRID year in the model specs.
+
+    Returns
+    -------
+    dataframe
+    """
+    return _load_egrid_facilities(config.model_specs.egrid_year)[1]
+
+
+@lru_cache(maxsize=4)
+def _egrid_subregions(egrid_year):
+    """
+    Return the eGRID subregions in the eGRID facility data for the given
+    year, in the order they first appear.
+
+    Parameters
+    ----------
+    egrid_year : int
+        The eGRID year.
+
+    Returns
+    -------
+    tuple
+    """
+    egrid_facilities = _load_egrid_facilities(egrid_year)[0]
+    egrid_subregions = pd.unique(egrid_facilities['Subregion'])
+    # Remove nan if present
+    # 2016: 26
+    return tuple(x for x in egrid_subregions if str(x) != 'nan')
+
+
+def get_egrid_subregions():
+    """
+    Return the eGRID subregions in the eGRID facility data for the eGRID
+    year in the model specs. They are found on the first call and reused
+    afterwards (e.g., for each region checked by
+    process_dictionary_writer.con_process_ref).
+
+    Returns
+    -------
+    tuple
+    """
+    return _egrid_subregions(config.model_specs.egrid_year)
+
+
+def get_egrid_primary_fuel_categories():
+    """
+    Return the sorted list of primary fuel categories in the eGRID facility
+    data.
+
+    Returns
+    -------
+    list
+    """
+    return sorted(pd.unique(get_egrid_facilities()['FuelCategory'].dropna()))
+
+
 def list_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min():
-    passing_facilties = egrid_facilities_fuel_cat_per_gen[egrid_facilities_fuel_cat_per_gen['PercentGenerationfromDesignatedFuelCategory'] > model_specs.min_plant_percent_generation_from_primary_fuel_category]
+    egrid_facilities_fuel_cat_per_gen = get_egrid_facilities_fuel_cat_per_gen()
+    passing_facilties = egrid_facilities_fuel_cat_per_gen[egrid_facilities_fuel_cat_per_gen['PercentGenerationfromDesignatedFuelCategory'] > config.model_specs.min_plant_percent_generation_from_primary_fuel_category]
     # Delete duplicates by creating a set
     facility_ids_passing = list(set(passing_facilties['FacilityID']))
     return facility_ids_passing
 
 
-# Add the percent generation from primary fuel cat to its own column
-egrid_facilities_fuel_cat_per_gen['PercentGenerationfromDesignatedFuelCategory'] = 0
-egrid_facilities_fuel_cat_per_gen = egrid_facilities_fuel_cat_per_gen.apply(add_percent_generation_from_primary_fuel_category_col, axis=1)
-egrid_facilities_fuel_cat_per_gen = egrid_facilities_fuel_cat_per_gen.drop(columns=per_gen_cols)
-egrid_facilities = egrid_facilities.drop(columns=per_gen_cols)
+_lazy_attributes = {
+    'egrid_facilities': get_egrid_facilities,
+    'egrid_facilities_fuel_cat_per_gen': get_egrid_facilities_fuel_cat_per_gen,
+    'egrid_subregions': get_egrid_subregions,
+    'egrid_primary_fuel_categories': get_egrid_primary_fuel_categories,
+}
 
 
-# Merge back into facilities
-egrid_facilities = pd.merge(egrid_facilities, egrid_facilities_fuel_cat_per_gen, on=['FacilityID', 'FuelCategory'], how='left')
+def __getattr__(name):
+    # Keeps "from electricitylci.egrid_facilities import egrid_facilities"
+    # working while deferring the data load until the name is requested.
+    if name in _lazy_attributes:
+        return _lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
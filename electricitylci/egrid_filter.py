@@ -1,81 +1,148 @@
 # Creates the data for electricity generation processes by fuel type and eGRID subregion
-# Uses global variables set in the globals file that define fifile:///C:/Users/TGhosh/Dropbox/Electricity_LCI/2. Electric_Refactor after July/ElectricityLCI/electricitylci/%23%23_____code%23for%23developer.pylters
+# Uses global variables set in the globals file that define filters
+#
+# The filtering is run the first time one of its results is requested (e.g.,
+# "from electricitylci.egrid_filter import egrid_facilities_to_include") and
+# the results are reused afterwards. See __getattr__ at the bottom of this
+# module.
 import warnings
 import pandas as pd
+from functools import lru_cache
+import electricitylci.model_config as config
 warnings.filterwarnings("ignore")
 
-from electricitylci.model_config import model_specs
-from electricitylci.egrid_facilities import egrid_facilities, list_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min
-from electricitylci.egrid_energy import list_egrid_facilities_with_positive_generation, list_egrid_facilities_in_efficiency_range, egrid_net_generation
-from electricitylci.egrid_emissions_and_waste_by_facility import emissions_and_wastes_by_facility
-from electricitylci.egrid_FRS_matches import list_FRS_ids_filtered_for_NAICS
-
-# Get lists of egrid facilities
-all_egrid_facility_ids = list(egrid_facilities['FacilityID'])
-len(all_egrid_facility_ids)
-# ELCI_1: 9709
-
-# Facility filtering
-# Start with facilities with a not null generation value
-egrid_facilities_selected_on_generation = list(egrid_net_generation['FacilityID'])
-# Replace this list with just net positive generators if true
-if model_specs.include_only_egrid_facilities_with_positive_generation:
-    egrid_facilities_selected_on_generation = list_egrid_facilities_with_positive_generation()
-len(egrid_facilities_selected_on_generation)
-# ELCI_1: 7538
-
-# Get facilities in efficiency range
-
-egrid_facilities_in_desired_efficiency_range = all_egrid_facility_ids
-if model_specs.filter_on_efficiency:
-    egrid_facilities_in_desired_efficiency_range = list_egrid_facilities_in_efficiency_range(model_specs.egrid_facility_efficiency_filters['lower_efficiency'],
-                                          model_specs.egrid_facility_efficiency_filters['upper_efficiency'])
-len(egrid_facilities_in_desired_efficiency_range)
-# ELCI_1: 7407
-
-# Get facilities with percent generation over threshold from the fuel category they are assigned to
-egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min = all_egrid_facility_ids
-if model_specs.filter_on_min_plant_percent_generation_from_primary_fuel and not model_specs.keep_mixed_plant_category:
-    egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min = list_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min()
-len(egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min)
-# ELCI_1: 7095
-
-# Use a python set to find the intersection
-egrid_facilities_to_include = list(set(egrid_facilities_selected_on_generation)
-                                   & set(egrid_facilities_in_desired_efficiency_range)
-                                   & set(egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min))
-len(egrid_facilities_to_include)
-# ELCI_1:7001
-
-# Get the generation data for these facilities only
-electricity_for_selected_egrid_facilities = egrid_net_generation[egrid_net_generation['FacilityID'].isin(egrid_facilities_to_include)]
-len(electricity_for_selected_egrid_facilities)
-
-# Emissions and wastes filtering
-# Start with all emissions and wastes; these are in this file
-emissions_and_waste_for_selected_egrid_facilities = emissions_and_wastes_by_facility[emissions_and_wastes_by_facility['eGRID_ID'].isin(egrid_facilities_to_include)]
-
-len(pd.unique(emissions_and_wastes_by_facility['eGRID_ID']))
-# len(emissions_and_waste_by_facility_for_selected_egrid_facilities.drop_duplicates())
-
-# emissions_and_waste_by_facility_for_selected_egrid_facilities['eGRID_ID'] = emissions_and_waste_by_facility_for_selected_egrid_facilities['eGRID_ID'].apply(pd.to_numeric, errors = 'coerce')
-
-# NAICS Filtering
-# Apply only to the non-egrid data
-# Pull egrid data out first
-egrid_emissions_for_selected_egrid_facilities = emissions_and_waste_for_selected_egrid_facilities[emissions_and_waste_for_selected_egrid_facilities['Source'] == 'eGRID']
-# 2016: 22842
-
-# Separate out nonegrid emissions and wastes
-nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities = emissions_and_waste_for_selected_egrid_facilities[emissions_and_waste_for_selected_egrid_facilities['Source'] != 'eGRID']
-
-# includes only the non_egrid_emissions for facilities not filtered out with NAICS
-if model_specs.filter_non_egrid_emission_on_NAICS:
-    # Get list of facilities meeting NAICS criteria
-    frs_ids_meeting_NAICS_criteria = list_FRS_ids_filtered_for_NAICS()
-    nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities = nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities[nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities['FRS_ID'].isin(frs_ids_meeting_NAICS_criteria)]
-
-# Join the datasets back together
-emissions_and_waste_for_selected_egrid_facilities = pd.concat([egrid_emissions_for_selected_egrid_facilities, nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities])
-len(emissions_and_waste_for_selected_egrid_facilities)
-# for egrid 2016,TRI 2016,NEI 2016,RCRAInfo 2015: 90792
+
+@lru_cache(maxsize=4)
+def _filter_egrid_facilities(egrid_year, inventories_of_interest):
+    """
+    Apply the facility filters in the model specs to the eGRID facilities
+    and the emissions and wastes by facility.
+
+    Parameters
+    ----------
+    egrid_year : int
+        The eGRID year; only used so that results for different model specs
+        are memoized separately.
+    inventories_of_interest : tuple
+        Sorted (inventory, year) pairs; see egrid_year.
+
+    Returns
+    -------
+    dict
+        The intermediate and final facility lists and dataframes, keyed by the
+        names that this module exposes as attributes.
+    """
+    from electricitylci.egrid_facilities import egrid_facilities, list_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min
+    from electricitylci.egrid_energy import list_egrid_facilities_with_positive_generation, list_egrid_facilities_in_efficiency_range, egrid_net_generation
+    from electricitylci.egrid_emissions_and_waste_by_facility import emissions_and_wastes_by_facility
+    from electricitylci.egrid_FRS_matches import list_FRS_ids_filtered_for_NAICS
+    model_specs = config.model_specs
+
+    # Get lists of egrid facilities
+    all_egrid_facility_ids = list(egrid_facilities['FacilityID'])
+    # ELCI_1: 9709
+
+    # Facility filtering
+    # Start with facilities with a not null generation value
+    egrid_facilities_selected_on_generation = list(egrid_net_generation['FacilityID'])
+    # Replace this list with just net positive generators if true
+    if model_specs.include_only_egrid_facilities_with_positive_generation:
+        egrid_facilities_selected_on_generation = list_egrid_facilities_with_positive_generation()
+    # ELCI_1: 7538
+
+    # Get facilities in efficiency range
+    egrid_facilities_in_desired_efficiency_range = all_egrid_facility_ids
+    if model_specs.filter_on_efficiency:
+        egrid_facilities_in_desired_efficiency_range = list_egrid_facilities_in_efficiency_range(model_specs.egrid_facility_efficiency_filters['lower_efficiency'],
+                                              model_specs.egrid_facility_efficiency_filters['upper_efficiency'])
+    # ELCI_1: 7407
+
+    # Get facilities with percent generation over threshold from the fuel category they are assigned to
+    egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min = all_egrid_facility_ids
+    if model_specs.filter_on_min_plant_percent_generation_from_primary_fuel and not model_specs.keep_mixed_plant_category:
+        egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min = list_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min()
+    # ELCI_1: 7095
+
+    # Use a python set to find the intersection
+    egrid_facilities_to_include = list(set(egrid_facilities_selected_on_generation)
+                                       & set(egrid_facilities_in_desired_efficiency_range)
+                                       & set(egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min))
+    # ELCI_1:7001
+
+    # Get the generation data for these facilities only
+    electricity_for_selected_egrid_facilities = egrid_net_generation[egrid_net_generation['FacilityID'].isin(egrid_facilities_to_include)]
+
+    # Emissions and wastes filtering
+    # Start with all emissions and wastes; these are in this file
+    emissions_and_waste_for_selected_egrid_facilities = emissions_and_wastes_by_facility[emissions_and_wastes_by_facility['eGRID_ID'].isin(egrid_facilities_to_include)]
+
+    # NAICS Filtering
+    # Apply only to the non-egrid data
+    # Pull egrid data out first
+    egrid_emissions_for_selected_egrid_facilities = emissions_and_waste_for_selected_egrid_facilities[emissions_and_waste_for_selected_egrid_facilities['Source'] == 'eGRID']
+    # 2016: 22842
+
+    # Separate out nonegrid emissions and wastes
+    nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities = emissions_and_waste_for_selected_egrid_facilities[emissions_and_waste_for_selected_egrid_facilities['Source'] != 'eGRID']
+
+    # includes only the non_egrid_emissions for facilities not filtered out with NAICS
+    if model_specs.filter_non_egrid_emission_on_NAICS:
+        # Get list of facilities meeting NAICS criteria
+        frs_ids_meeting_NAICS_criteria = list_FRS_ids_filtered_for_NAICS()
+        nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities = nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities[nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities['FRS_ID'].isin(frs_ids_meeting_NAICS_criteria)]
+
+    # Join the datasets back together
+    emissions_and_waste_for_selected_egrid_facilities = pd.concat([egrid_emissions_for_selected_egrid_facilities, nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities])
+    # for egrid 2016,TRI 2016,NEI 2016,RCRAInfo 2015: 90792
+
+    return {
+        'all_egrid_facility_ids': all_egrid_facility_ids,
+        'egrid_facilities_selected_on_generation': egrid_facilities_selected_on_generation,
+        'egrid_facilities_in_desired_efficiency_range': egrid_facilities_in_desired_efficiency_range,
+        'egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min': egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min,
+        'egrid_facilities_to_include': egrid_facilities_to_include,
+        'electricity_for_selected_egrid_facilities': electricity_for_selected_egrid_facilities,
+        'egrid_emissions_for_selected_egrid_facilities': egrid_emissions_for_selected_egrid_facilities,
+        'nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities': nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities,
+        'emissions_and_waste_for_selected_egrid_facilities': emissions_and_waste_for_selected_egrid_facilities,
+    }
+
+
+def get_egrid_filter_results():
+    """
+    Return the filtered eGRID facility lists and dataframes for the current
+    model specs. The filters are applied on the first call only.
+
+    Returns
+    -------
+    dict
+        Keys are the attribute names exposed by this module, e.g.,
+        'egrid_facilities_to_include' and
+        'emissions_and_waste_for_selected_egrid_facilities'.
+    """
+    model_specs = config.model_specs
+    return _filter_egrid_facilities(
+        model_specs.egrid_year,
+        tuple(sorted(model_specs.inventories_of_interest.items())),
+    )
+
+
+_result_names = (
+    'all_egrid_facility_ids',
+    'egrid_facilities_selected_on_generation',
+    'egrid_facilities_in_desired_efficiency_range',
+    'egrid_facilities_w_percent_generation_from_primary_fuel_category_greater_than_min',
+    'egrid_facilities_to_include',
+    'electricity_for_selected_egrid_facilities',
+    'egrid_emissions_for_selected_egrid_facilities',
+    'nonegrid_emissions_and_waste_by_facility_for_selected_egrid_facilities',
+    'emissions_and_waste_for_selected_egrid_facilities',
+)
+
+
+def __getattr__(name):
+    # Keeps "from electricitylci.egrid_filter import ..." working while
+    # deferring the filtering until one of the results is requested.
+    if name in _result_names:
+        return get_egrid_filter_results()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
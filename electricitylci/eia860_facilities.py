@@ -14,10 +14,10 @@ from os.path import join
 import requests
 from electricitylci.globals import data_dir, EIA860_BASE_URL
 from electricitylci.utils import (
-    download_unzip,
-    find_file_in_folder,
+    download_zip,
     create_ba_region_map,
 )
+from electricitylci.eia_extract_cache import load_eia_sheet
 
 
 def _clean_columns(df):
@@ -34,15 +34,16 @@ def _clean_columns(df):
 
 def eia860_download(year, save_path):
     """
-    Download and unzip one year of EIA 860 annual data to a subfolder
-    of the data directory
+    Download one year of EIA 860 annual data to a subfolder of the data
+    directory. The zip file is not extracted; the sheets are read from it
+    in place.
 
     Parameters
     ----------
     year : int or str
         The year of data to download and save
     save_path : path or str
-        A folder where the zip file contents should be extracted
+        A folder where the zip file should be saved
 
     """
     current_url = EIA860_BASE_URL + "xls/eia860{}.zip".format(year)
@@ -50,9 +51,9 @@ def eia860_download(year, save_path):
 
     # try to download using the most current year url format
     try:
-        download_unzip(current_url, save_path)
+        download_zip(current_url, save_path)
     except ValueError:
-        download_unzip(archive_url, save_path)
+        download_zip(archive_url, save_path)
 
 
 def load_eia860_excel(eia860_path, sheet="Plant", header=1):
@@ -74,73 +75,59 @@ def load_eia860_excel(eia860_path, sheet="Plant", header=1):
     return eia
 
 
-def eia860_balancing_authority(year, regional_aggregation=None):
+def _load_eia860_sheet(
+    year, file_pattern_match, sheet, cache_name, csv_pattern_match=None
+):
+    """
+    Load a sheet of the EIA-860 excel files for the given year, downloading
+    the files if necessary. The sheet is read from the columnar cache in the
+    EIA-860 folder when available (see electricitylci.eia_extract_cache).
 
+    Parameters
+    ----------
+    year : int or str
+        Year of data to load
+    file_pattern_match : list
+        Strings that the name of the excel file must contain.
+    sheet : str
+        Name of the sheet to read.
+    cache_name : str
+        Name of the cached file.
+    csv_pattern_match : list, optional
+        Strings that the name of a csv copy of the sheet saved by earlier
+        versions of this module must contain.
+
+    Returns
+    -------
+    dataframe
+    """
     expected_860_folder = join(data_dir, "eia860_{}".format(year))
 
-    if not os.path.exists(expected_860_folder):
+    def _download(folder):
         print("Downloading EIA-860 files")
-        eia860_download(year=year, save_path=expected_860_folder)
-
-        eia860_path, eia860_name = find_file_in_folder(
-            folder_path=expected_860_folder,
-            file_pattern_match=["2___Plant"],
-            return_name=True,
-        )
-        # eia860_files = os.listdir(expected_860_folder)
-
-        # # would be more elegent with glob but this works to identify the
-        # # Schedule_2_3_4_5 file
-        # for f in eia860_files:
-        #     if '2___Plant' in f:
-        #         plant_file = f
-
-        # eia860_path = join(expected_860_folder, plant_file)
-
-        # colstokeep = group_cols + sum_cols
-        eia = load_eia860_excel(eia860_path)
-
-        # Save as csv for easier access in future
-        csv_fn = eia860_name.split(".")[0] + ".csv"
-        csv_path = join(expected_860_folder, csv_fn)
-        eia.to_csv(csv_path, index=False)
-
-    else:
-        all_files = os.listdir(expected_860_folder)
-
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if ".csv" in f and "Plant_Y{}".format(year) in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-860 plant data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_860_folder, fn)
-            eia = pd.read_csv(csv_path, dtype={"Plant Id": str},low_memory=False)
-
-        else:
-            print("Loading data from previously downloaded excel file")
-            eia860_path, eia860_name = find_file_in_folder(
-                folder_path=expected_860_folder,
-                file_pattern_match=["2___Plant"],
-                return_name=True,
-            )
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2___Plant' in f:
-            #         plant_file = f
-            # eia860_path = join(expected_860_folder, plant_file)
-            eia = load_eia860_excel(eia860_path)
-
-            csv_fn = eia860_name.split(".")[0] + ".csv"
-            csv_path = join(expected_860_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+        eia860_download(year=year, save_path=folder)
+
+    return load_eia_sheet(
+        expected_860_folder,
+        _download,
+        file_pattern_match,
+        lambda eia860_path: load_eia860_excel(eia860_path, sheet, 1),
+        cache_name,
+        csv_pattern_match=csv_pattern_match,
+        csv_dtype={"Plant Id": str},
+        str_cols=["Plant Id"],
+    )
+
+
+def eia860_balancing_authority(year, regional_aggregation=None):
+
+    eia = _load_eia860_sheet(
+        year,
+        file_pattern_match=["2___Plant"],
+        sheet="Plant",
+        cache_name="eia860_plant",
+        csv_pattern_match=["Plant_Y{}".format(year)],
+    )
 
     ba_cols = [
         "Plant Id",
@@ -167,278 +154,55 @@ def eia860_primary_capacity(year):
 
 
 def eia860_EnviroAssoc_so2(year):
-    expected_860_folder = join(data_dir, "eia860_{}".format(year))
-
-    if not os.path.exists(expected_860_folder):
-        print("Downloading EIA-860 files")
-        eia860_download(year=year, save_path=expected_860_folder)
-
-        eia860_path, eia860_name = find_file_in_folder(
-            folder_path=expected_860_folder,
-            file_pattern_match=["6_1_EnviroAssoc", "xlsx"],
-            return_name=True,
-        )
-        # eia860_files = os.listdir(expected_860_folder)
-
-        # # would be more elegent with glob but this works to identify the
-        # # Schedule_2_3_4_5 file
-        # for f in eia860_files:
-        #     if '2___Plant' in f:
-        #         plant_file = f
-
-        # eia860_path = join(expected_860_folder, plant_file)
-
-        # colstokeep = group_cols + sum_cols
-        eia = load_eia860_excel(eia860_path, "Boiler SO2", 1)
-
-        # Save as csv for easier access in future
-        csv_fn = eia860_name.split(".")[0] + "_boiler_so2.csv"
-        csv_path = join(expected_860_folder, csv_fn)
-        eia.to_csv(csv_path, index=False)
-
-    else:
-        all_files = os.listdir(expected_860_folder)
-
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if "_boiler_so2.csv" in f
-            and "6_1_EnviroAssoc_Y{}".format(year) in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-860 plant data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_860_folder, fn)
-            eia = pd.read_csv(csv_path, dtype={"Plant Id": str},low_memory=False)
-
-        else:
-            print("Loading data from previously downloaded excel file")
-            eia860_path, eia860_name = find_file_in_folder(
-                folder_path=expected_860_folder,
-                file_pattern_match=["6_1_EnviroAssoc", "xlsx"],
-                return_name=True,
-            )
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2___Plant' in f:
-            #         plant_file = f
-            # eia860_path = join(expected_860_folder, plant_file)
-            eia = load_eia860_excel(eia860_path, "Boiler SO2", 1)
-
-            csv_fn = eia860_name.split(".")[0] + "_boiler_so2.csv"
-            csv_path = join(expected_860_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia860_sheet(
+        year,
+        file_pattern_match=["6_1_EnviroAssoc", "xls"],
+        sheet="Boiler SO2",
+        cache_name="eia860_boiler_so2",
+        csv_pattern_match=[
+            "_boiler_so2", "6_1_EnviroAssoc_Y{}".format(year)
+        ],
+    )
     eia = _clean_columns(eia)
     return eia
 
 
 def eia860_boiler_info_design(year):
-    expected_860_folder = join(data_dir, "eia860_{}".format(year))
-
-    if not os.path.exists(expected_860_folder):
-        print("Downloading EIA-860 files")
-        eia860_download(year=year, save_path=expected_860_folder)
-
-        eia860_path, eia860_name = find_file_in_folder(
-            folder_path=expected_860_folder,
-            file_pattern_match=["6_2_EnviroEquip", "xlsx"],
-            return_name=True,
-        )
-
-        eia = load_eia860_excel(
-            eia860_path, "Boiler Info & Design Parameters", 1
-        )
-
-        # Save as csv for easier access in future
-        csv_fn = eia860_name.split(".")[0] + "_boiler_info.csv"
-        csv_path = join(expected_860_folder, csv_fn)
-        eia.to_csv(csv_path, index=False)
-
-    else:
-        all_files = os.listdir(expected_860_folder)
-
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if "_boiler_info.csv" in f
-            and "6_2_EnviroEquip_Y{}".format(year) in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-860 plant data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_860_folder, fn)
-            eia = pd.read_csv(csv_path, dtype={"Plant Id": str},low_memory=False)
-
-        else:
-            print("Loading data from previously downloaded excel file")
-            eia860_path, eia860_name = find_file_in_folder(
-                folder_path=expected_860_folder,
-                file_pattern_match=["6_2_EnviroEquip", "xlsx"],
-                return_name=True,
-            )
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2___Plant' in f:
-            #         plant_file = f
-            # eia860_path = join(expected_860_folder, plant_file)
-            eia = load_eia860_excel(
-                eia860_path, "Boiler Info & Design Parameters", 1
-            )
-
-            csv_fn = eia860_name.split(".")[0] + "_boiler_info.csv"
-            csv_path = join(expected_860_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia860_sheet(
+        year,
+        file_pattern_match=["6_2_EnviroEquip", "xls"],
+        sheet="Boiler Info & Design Parameters",
+        cache_name="eia860_boiler_info",
+        csv_pattern_match=[
+            "_boiler_info", "6_2_EnviroEquip_Y{}".format(year)
+        ],
+    )
     eia = _clean_columns(eia)
     return eia
 
 
 def eia860_EnviroAssoc_nox(year):
-    expected_860_folder = join(data_dir, "eia860_{}".format(year))
-
-    if not os.path.exists(expected_860_folder):
-        print("Downloading EIA-860 files")
-        eia860_download(year=year, save_path=expected_860_folder)
-
-        eia860_path, eia860_name = find_file_in_folder(
-            folder_path=expected_860_folder,
-            file_pattern_match=["6_1_EnviroAssoc", "xlsx"],
-            return_name=True,
-        )
-        # eia860_files = os.listdir(expected_860_folder)
-
-        # # would be more elegent with glob but this works to identify the
-        # # Schedule_2_3_4_5 file
-        # for f in eia860_files:
-        #     if '2___Plant' in f:
-        #         plant_file = f
-
-        # eia860_path = join(expected_860_folder, plant_file)
-
-        # colstokeep = group_cols + sum_cols
-        eia = load_eia860_excel(eia860_path, "Boiler NOx", 1)
-
-        # Save as csv for easier access in future
-        csv_fn = eia860_name.split(".")[0] + "_boiler_nox.csv"
-        csv_path = join(expected_860_folder, csv_fn)
-        eia.to_csv(csv_path, index=False)
-
-    else:
-        all_files = os.listdir(expected_860_folder)
-
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if "_boiler_nox.csv" in f
-            and "6_1_EnviroAssoc_Y{}".format(year) in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-860 plant data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_860_folder, fn)
-            eia = pd.read_csv(csv_path, dtype={"Plant Id": str},low_memory=False)
-
-        else:
-            print("Loading data from previously downloaded excel file")
-            eia860_path, eia860_name = find_file_in_folder(
-                folder_path=expected_860_folder,
-                file_pattern_match=["6_1_EnviroAssoc", "xlsx"],
-                return_name=True,
-            )
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2___Plant' in f:
-            #         plant_file = f
-            # eia860_path = join(expected_860_folder, plant_file)
-            eia = load_eia860_excel(eia860_path, "Boiler NOx", 1)
-
-            csv_fn = eia860_name.split(".")[0] + "_boiler_nox.csv"
-            csv_path = join(expected_860_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia860_sheet(
+        year,
+        file_pattern_match=["6_1_EnviroAssoc", "xls"],
+        sheet="Boiler NOx",
+        cache_name="eia860_boiler_nox",
+        csv_pattern_match=[
+            "_boiler_nox", "6_1_EnviroAssoc_Y{}".format(year)
+        ],
+    )
     eia = _clean_columns(eia)
     return eia
 
-def eia860_generator_info(year):
-    expected_860_folder = join(data_dir, "eia860_{}".format(year))
 
-    if not os.path.exists(expected_860_folder):
-        print("Downloading EIA-860 files")
-        eia860_download(year=year, save_path=expected_860_folder)
-
-        eia860_path, eia860_name = find_file_in_folder(
-            folder_path=expected_860_folder,
-            file_pattern_match=["3_1_Generator", "xlsx"],
-            return_name=True,
-        )
-        # eia860_files = os.listdir(expected_860_folder)
-
-        # # would be more elegent with glob but this works to identify the
-        # # Schedule_2_3_4_5 file
-        # for f in eia860_files:
-        #     if '2___Plant' in f:
-        #         plant_file = f
-
-        # eia860_path = join(expected_860_folder, plant_file)
-
-        # colstokeep = group_cols + sum_cols
-        eia = load_eia860_excel(eia860_path, "Operable", 1)
-
-        # Save as csv for easier access in future
-        csv_fn = eia860_name.split(".")[0] + "_generator_operable.csv"
-        csv_path = join(expected_860_folder, csv_fn)
-        eia.to_csv(csv_path, index=False)
-
-    else:
-        all_files = os.listdir(expected_860_folder)
-
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if "_generator_operable.csv" in f
-            and "3_1_Generator" in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-860 plant data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_860_folder, fn)
-            eia = pd.read_csv(csv_path, dtype={"Plant Id": str},low_memory=False)
-
-        else:
-            print("Loading data from previously downloaded excel file")
-            eia860_path, eia860_name = find_file_in_folder(
-                folder_path=expected_860_folder,
-                file_pattern_match=["3_1_Generator", "xlsx"],
-                return_name=True,
-            )
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2___Plant' in f:
-            #         plant_file = f
-            # eia860_path = join(expected_860_folder, plant_file)
-            eia = load_eia860_excel(eia860_path, "Operable", 1)
-
-            csv_fn = eia860_name.split(".")[0] + "_generator_operable.csv"
-            csv_path = join(expected_860_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+def eia860_generator_info(year):
+    eia = _load_eia860_sheet(
+        year,
+        file_pattern_match=["3_1_Generator", "xls"],
+        sheet="Operable",
+        cache_name="eia860_generator_operable",
+        csv_pattern_match=["_generator_operable", "3_1_Generator"],
+    )
     eia = _clean_columns(eia)
     return eia
 
@@ -5,7 +5,8 @@ import os
 from os.path import join
 import requests
 from electricitylci.globals import data_dir, EIA923_BASE_URL, FUEL_CAT_CODES
-from electricitylci.utils import download_unzip, find_file_in_folder
+from electricitylci.utils import download_zip
+from electricitylci.eia_extract_cache import load_eia_sheet
 from electricitylci.model_config import model_specs
 
 from electricitylci.eia860_facilities import eia860_balancing_authority
@@ -53,15 +54,16 @@ def _clean_columns(df):
 
 def eia923_download(year, save_path):
     """
-    Download and unzip one year of EIA 923 annual data to a subfolder
-    of the data directory
+    Download one year of EIA 923 annual data to a subfolder of the data
+    directory. The zip file is not extracted; the sheets are read from it
+    in place.
 
     Parameters
     ----------
     year : int or str
         The year of data to download and save
     save_path : path or str
-        A folder where the zip file contents should be extracted
+        A folder where the zip file should be saved
 
     """
     current_url = EIA923_BASE_URL + "xls/f923_{}.zip".format(year)
@@ -69,9 +71,9 @@ def eia923_download(year, save_path):
 
     # try to download using the most current year url format
     try:
-        download_unzip(current_url, save_path)
+        download_zip(current_url, save_path)
     except ValueError:
-        download_unzip(archive_url, save_path)
+        download_zip(archive_url, save_path)
 
 
 def load_eia923_excel(eia923_path, page="1"):
@@ -105,6 +107,47 @@ def load_eia923_excel(eia923_path, page="1"):
     return eia
 
 
+def _load_eia923_page(year, page="1"):
+    """
+    Load a page of the EIA-923 excel files for the given year, downloading
+    the files if necessary. The page is read from the columnar cache in the
+    EIA-923 folder when available (see electricitylci.eia_extract_cache).
+
+    Parameters
+    ----------
+    year : int or str
+        Year of data to load
+    page : str, optional
+        Key in EIA923_PAGES, by default "1". Page "8c" is read from the
+        Schedule 8 file, all others from the Schedule 2, 3, 4, 5 file.
+
+    Returns
+    -------
+    dataframe
+    """
+    expected_923_folder = join(data_dir, "f923_{}".format(year))
+
+    def _download(folder):
+        print("Downloading EIA-923 files")
+        eia923_download(year=year, save_path=folder)
+
+    if page == "8c":
+        file_pattern_match = ["Schedule_8", "xls"]
+    else:
+        file_pattern_match = ["2_3_4_5", "xls"]
+    id_cols = ["Plant Id", "YEAR", "NAICS Code"]
+    return load_eia_sheet(
+        expected_923_folder,
+        _download,
+        file_pattern_match,
+        lambda eia923_path: load_eia923_excel(eia923_path, page=page),
+        "eia923_page_{}".format(page),
+        csv_pattern_match=["{}_Final".format(year), "page_{}".format(page)],
+        csv_dtype={col: str for col in id_cols},
+        str_cols=id_cols,
+    )
+
+
 # This function is called multiple times by the various upstream modules.
 # lru_cache allows us to only read from the csv only once.
 @lru_cache(maxsize=10)
@@ -135,76 +178,7 @@ def eia923_download_extract(
         generation and fuel consumption data.
 
     """
-    expected_923_folder = join(data_dir, "f923_{}".format(year))
-
-    if not os.path.exists(expected_923_folder):
-        print("Downloading EIA-923 files")
-        eia923_download(year=year, save_path=expected_923_folder)
-
-        eia923_path, eia923_name = find_file_in_folder(
-            folder_path=expected_923_folder,
-            file_pattern_match=["2_3_4_5"],
-            return_name=True,
-        )
-        # eia923_files = os.listdir(expected_923_folder)
-
-        # # would be more elegent with glob but this works to identify the
-        # # Schedule_2_3_4_5 file
-        # for f in eia923_files:
-        #     if '2_3_4_5' in f:
-        #         gen_file = f
-
-        # eia923_path = join(expected_923_folder, gen_file)
-
-        # colstokeep = group_cols + sum_cols
-        eia = load_eia923_excel(eia923_path)
-
-        # Save as csv for easier access in future
-        csv_fn = eia923_name.split(".")[0] + "page_1.csv"
-        csv_path = join(expected_923_folder, csv_fn)
-        eia.to_csv(csv_path, index=False)
-
-    else:
-        all_files = os.listdir(expected_923_folder)
-
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if ".csv" in f and "{}_Final".format(year) in f and "page_1" in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-923 data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_923_folder, fn)
-            eia = pd.read_csv(
-                csv_path,
-                dtype={"Plant Id": str, "YEAR": str, "NAICS Code": str},
-                low_memory=False,
-            )
-
-        else:
-
-            eia923_path, eia923_name = find_file_in_folder(
-                folder_path=expected_923_folder,
-                file_pattern_match=["2_3_4_5", "xlsx"],
-                return_name=True,
-            )
-
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2_3_4_5' in f:
-            #         gen_file = f
-            # eia923_path = join(expected_923_folder, gen_file)
-            eia = load_eia923_excel(eia923_path)
-
-            csv_fn = eia923_name.split(".")[0] + "_page_1.csv"
-            csv_path = join(expected_923_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia923_page(year, page="1")
 
     # EIA_923 = eia
     # Grouping similar facilities together.
@@ -440,178 +414,19 @@ def build_generation_data(
 
 
 def eia923_generation_and_fuel(year):
-    expected_923_folder = join(data_dir, "f923_{}".format(year))
-
-    if not os.path.exists(expected_923_folder):
-        print("Downloading EIA-923 files")
-        eia923_download(year=year, save_path=expected_923_folder)
-
-        eia923_path, eia923_name = find_file_in_folder(
-            folder_path=expected_923_folder,
-            file_pattern_match=["2_3_4_5", "xlsx"],
-            return_name=True,
-        )
-        # Save as csv for easier access in future
-        csv_fn = eia923_name.split(".")[0] + "page_1.csv"
-        csv_path = join(expected_923_folder, csv_fn)
-        eia = load_eia923_excel(expected_923_folder, page="1")
-        eia.to_csv(csv_path, index=False)
-    else:
-        all_files = os.listdir(expected_923_folder)
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if ".csv" in f and "{}_Final".format(year) in f and "page_1" in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-923 data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_923_folder, fn)
-            eia = pd.read_csv(
-                csv_path,
-                dtype={"Plant Id": str, "YEAR": str, "NAICS Code": str},
-                low_memory=False,
-            )
-        else:
-
-            eia923_path, eia923_name = find_file_in_folder(
-                folder_path=expected_923_folder,
-                file_pattern_match=["2_3_4_5", "xlsx"],
-                return_name=True,
-            )
-
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2_3_4_5' in f:
-            #         gen_file = f
-            # eia923_path = join(expected_923_folder, gen_file)
-            eia = load_eia923_excel(eia923_path, page="1")
-            csv_fn = eia923_name.split(".")[0] + "_page_1.csv"
-            csv_path = join(expected_923_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia923_page(year, page="1")
     eia = _clean_columns(eia)
     return eia
 
 
 def eia923_boiler_fuel(year):
-    expected_923_folder = join(data_dir, "f923_{}".format(year))
-
-    if not os.path.exists(expected_923_folder):
-        print("Downloading EIA-923 files")
-        eia923_download(year=year, save_path=expected_923_folder)
-
-        eia923_path, eia923_name = find_file_in_folder(
-            folder_path=expected_923_folder,
-            file_pattern_match=["2_3_4_5", "xlsx"],
-            return_name=True,
-        )
-        # Save as csv for easier access in future
-        csv_fn = eia923_name.split(".")[0] + "page_3.csv"
-        csv_path = join(expected_923_folder, csv_fn)
-        eia = load_eia923_excel(expected_923_folder, page="3")
-        eia.to_csv(csv_path, index=False)
-    else:
-        all_files = os.listdir(expected_923_folder)
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if ".csv" in f and "{}_Final".format(year) in f and "page_3" in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-923 data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_923_folder, fn)
-            eia = pd.read_csv(
-                csv_path,
-                dtype={"Plant Id": str, "YEAR": str, "NAICS Code": str},
-                low_memory=False,
-            )
-        else:
-
-            eia923_path, eia923_name = find_file_in_folder(
-                folder_path=expected_923_folder,
-                file_pattern_match=["2_3_4_5", "xlsx"],
-                return_name=True,
-            )
-
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2_3_4_5' in f:
-            #         gen_file = f
-            # eia923_path = join(expected_923_folder, gen_file)
-            eia = load_eia923_excel(eia923_path, page="3")
-            csv_fn = eia923_name.split(".")[0] + "_page_3.csv"
-            csv_path = join(expected_923_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia923_page(year, page="3")
     eia = _clean_columns(eia)
     return eia
 
 
 def eia923_sched8_aec(year):
-    expected_923_folder = join(data_dir, "f923_{}".format(year))
-
-    if not os.path.exists(expected_923_folder):
-        print("Downloading EIA-923 files")
-        eia923_download(year=year, save_path=expected_923_folder)
-
-        eia923_path, eia923_name = find_file_in_folder(
-            folder_path=expected_923_folder,
-            file_pattern_match=["Schedule_8", "xlsx"],
-            return_name=True,
-        )
-        # Save as csv for easier access in future
-        csv_fn = eia923_name.split(".")[0] + "page_8c.csv"
-        csv_path = join(expected_923_folder, csv_fn)
-        eia = load_eia923_excel(expected_923_folder, page="8c")
-        eia.to_csv(csv_path, index=False)
-    else:
-        all_files = os.listdir(expected_923_folder)
-        # Check for both csv and year<_Final> in case multiple years
-        # or other csv files exist
-        csv_file = [
-            f
-            for f in all_files
-            if ".csv" in f and "{}_Final".format(year) in f and "page_8c" in f
-        ]
-
-        # Read and return the existing csv file if it exists
-        if csv_file:
-            print("Loading {} EIA-923 data from csv file".format(year))
-            fn = csv_file[0]
-            csv_path = join(expected_923_folder, fn)
-            eia = pd.read_csv(
-                csv_path,
-                dtype={"Plant Id": str, "YEAR": str, "NAICS Code": str},
-                low_memory=False,
-            )
-        else:
-
-            eia923_path, eia923_name = find_file_in_folder(
-                folder_path=expected_923_folder,
-                file_pattern_match=["Schedule_8", "xlsx"],
-                return_name=True,
-            )
-
-            # # would be more elegent with glob but this works to identify the
-            # # Schedule_2_3_4_5 file
-            # for f in all_files:
-            #     if '2_3_4_5' in f:
-            #         gen_file = f
-            # eia923_path = join(expected_923_folder, gen_file)
-            eia = load_eia923_excel(eia923_path, page="8c")
-            csv_fn = eia923_name.split(".")[0] + "_page_8c.csv"
-            csv_path = join(expected_923_folder, csv_fn)
-            eia.to_csv(csv_path, index=False)
+    eia = _load_eia923_page(year, page="8c")
     eia = _clean_columns(eia)
     return eia
 
@@ -0,0 +1,211 @@
+"""
+Typed, columnar cache for the sheets read from the EIA-923 and EIA-860
+excel files.
+
+Reading the excel files (or the csv copies that used to be saved next to
+them) is among the slowest steps of a model run and the same sheets are read
+by several modules. The first time a sheet is requested it is read from the
+excel file and saved as an uncompressed feather file in the same folder.
+String columns with few unique values are stored as categories. Subsequent
+reads memory-map the feather file, which avoids parsing entirely. The cached
+file is rebuilt if the excel file is newer than it.
+
+The excel files are read from inside the downloaded zip files, so the
+archives don't need to be extracted. Folders extracted by earlier versions of
+this package are still read.
+"""
+
+import logging
+import os
+from os.path import join
+
+import pandas as pd
+
+from electricitylci.utils import (
+    data_file_mtime,
+    data_file_name,
+    find_data_file,
+    open_data_file,
+)
+
+module_logger = logging.getLogger("eia_extract_cache.py")
+
+# Bump this if the way sheets are stored changes so that old cache files are
+# not used.
+CACHE_VERSION = 1
+
+# Object columns with a ratio of unique values to rows below this are stored
+# as categories.
+CATEGORY_THRESHOLD = 0.5
+
+
+def to_typed_frame(df, str_cols=()):
+    """
+    Prepare a dataframe read from excel or csv for columnar storage.
+
+    Object columns that mix strings and numbers are converted to strings
+    (missing values are kept) and object columns with few unique values are
+    converted to categories.
+
+    Parameters
+    ----------
+    df : dataframe
+    str_cols : list, optional
+        Columns that should be stored as strings, never as categories.
+
+    Returns
+    -------
+    dataframe
+    """
+    df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        values = df[col]
+        notnull = values.notnull()
+        if not values[notnull].map(type).eq(str).all():
+            values = values.where(~notnull, values.astype(str))
+        if (
+            col not in str_cols
+            and len(values) > 0
+            and values.nunique() / len(values) < CATEGORY_THRESHOLD
+        ):
+            values = values.astype("category")
+        df[col] = values
+    return df
+
+
+def write_extract(df, path):
+    """
+    Write a typed dataframe to an uncompressed feather file so that it can be
+    memory-mapped when read.
+
+    Parameters
+    ----------
+    df : dataframe
+    path : str
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    feather.write_feather(table, path + ".tmp", compression="uncompressed")
+    os.replace(path + ".tmp", path)
+
+
+def read_extract(path, categorical=False):
+    """
+    Memory-map a feather file written by write_extract.
+
+    Parameters
+    ----------
+    path : str
+    categorical : bool, optional
+        If False (default), category columns are returned as object columns
+        so that the dataframe has the same dtypes as the original excel or
+        csv read. Grouping on category columns includes unobserved
+        combinations unless observed=True is used, so categories are only
+        returned when requested.
+
+    Returns
+    -------
+    dataframe
+    """
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, memory_map=True)
+    df = table.to_pandas()
+    if not categorical:
+        for col in df.columns[df.dtypes == "category"]:
+            df[col] = df[col].astype(object)
+    return df
+
+
+def load_eia_sheet(
+    folder,
+    download_func,
+    file_pattern_match,
+    sheet_loader,
+    cache_name,
+    csv_pattern_match=None,
+    csv_dtype=None,
+    str_cols=(),
+    categorical=False,
+):
+    """
+    Return a sheet from an EIA excel file, downloading the files and building
+    the columnar cache if necessary.
+
+    Parameters
+    ----------
+    folder : str
+        Folder that the EIA files are (or will be) extracted to.
+    download_func : function
+        Called with the folder as its only argument if the folder does not
+        exist.
+    file_pattern_match : list
+        Strings that the name of the excel file must contain.
+    sheet_loader : function
+        Called with the path to the excel file, or a buffer holding it if it
+        is inside a downloaded zip file; returns the sheet as a dataframe.
+    cache_name : str
+        Name of the cached file, e.g., "eia923_page_1".
+    csv_pattern_match : list, optional
+        Strings that the name of a csv copy of the sheet saved by earlier
+        versions of this package must contain. If one exists it is used
+        instead of the excel file to build the cache.
+    csv_dtype : dict, optional
+        dtypes used when reading the csv copy.
+    str_cols : list, optional
+        Columns that should never be stored as categories.
+    categorical : bool, optional
+        Passed to read_extract.
+
+    Returns
+    -------
+    dataframe
+    """
+    if not os.path.exists(folder):
+        download_func(folder)
+
+    excel_path = find_data_file(folder, file_pattern_match, exclude_ext=".csv")
+    cache_path = join(folder, f"{cache_name}_v{CACHE_VERSION}.feather")
+    if os.path.exists(cache_path) and (
+        excel_path is None
+        or os.path.getmtime(cache_path) >= data_file_mtime(excel_path)
+    ):
+        try:
+            return read_extract(cache_path, categorical)
+        except Exception as e:
+            module_logger.warning(
+                f"Unable to read {cache_path} ({e}), rebuilding it"
+            )
+
+    csv_path = None
+    if csv_pattern_match:
+        csv_path = find_data_file(folder, csv_pattern_match + [".csv"])
+    if csv_path is not None and (
+        excel_path is None
+        or data_file_mtime(csv_path) >= data_file_mtime(excel_path)
+    ):
+        print(f"Loading {data_file_name(csv_path)} from csv file")
+        df = pd.read_csv(
+            open_data_file(csv_path), dtype=csv_dtype, low_memory=False
+        )
+    elif excel_path is not None:
+        print(f"Loading {data_file_name(excel_path)} from excel file")
+        df = sheet_loader(open_data_file(excel_path))
+    else:
+        raise FileNotFoundError(
+            f"No file matching {file_pattern_match} found in {folder}"
+        )
+
+    df = to_typed_frame(df, str_cols)
+    try:
+        write_extract(df, cache_path)
+    except Exception as e:
+        # The data are still usable, they just won't be cached.
+        module_logger.warning(f"Unable to cache {cache_name} ({e})")
+    if not categorical:
+        for col in df.columns[df.dtypes == "category"]:
+            df[col] = df[col].astype(object)
+    return df
@@ -12,7 +12,14 @@ import logging
 
 
 from electricitylci.globals import data_dir, output_dir
-from electricitylci.bulk_eia_data import download_EBA, row_to_df, ba_exchange_to_df
+from electricitylci.bulk_eia_data import (
+    download_EBA,
+    get_series_index,
+    select_series,
+    load_series,
+    series_to_df,
+    ba_exchange_series_to_df,
+)
 from electricitylci.model_config import model_specs
 import electricitylci.eia923_generation as eia923
 import electricitylci.eia860_facilities as eia860
@@ -51,6 +58,73 @@ from electricitylci.process_dictionary_writer import *
 """
 
 
+def trading_consumption_matrix(trade, inflow, consumption):
+    """
+    Solve the trading model of Qu et al. (2018) for the matrix H, where
+    H[i, j] is the electricity generated in region i that is consumed in
+    region j.
+
+    H = (I - B)^-1 c_hat, where B = T x_hat^-1. Rather than inverting x_hat
+    and I - B, this uses I - B = (x_hat - T) x_hat^-1, so that
+    H = x_hat (x_hat - T)^-1 c_hat. A sparse LU factorization of x_hat - T
+    is solved for c_hat and the rows of the result are scaled by x. This is
+    cheaper and more accurate than the explicit inverses, and the trade
+    matrix is mostly zeros.
+
+    Several periods can be solved at once by passing stacked arrays. The
+    systems for all of the periods are placed on the diagonal of one block
+    diagonal matrix, which is factored and solved in a single call.
+
+    Parameters
+    ----------
+    trade : numpy.ndarray
+        Square matrix of trade between regions, T[i, j] from i to j, or a
+        stack of them with shape (periods, regions, regions).
+    inflow : numpy.ndarray
+        Total inflow (generation plus imports) of each region, with shape
+        (regions,) or (periods, regions); must not contain zeros.
+    consumption : numpy.ndarray
+        Consumption of each region, with the same shape as inflow.
+
+    Returns
+    -------
+    numpy.ndarray
+        The matrix H, or a stack of them if trade is a stack.
+    """
+    from scipy import sparse
+    from scipy.sparse.linalg import splu
+
+    trade = np.asarray(trade, dtype=float)
+    stacked = trade.ndim == 3
+    if not stacked:
+        trade = trade[np.newaxis]
+    n_periods, n = trade.shape[:2]
+    inflow = np.asarray(inflow, dtype=float).reshape(n_periods, n)
+    consumption = np.asarray(consumption, dtype=float).reshape(n_periods, n)
+
+    # x_hat - T for each period, offset along the diagonal
+    period, row, col = np.nonzero(trade)
+    diagonal = np.arange(n_periods * n)
+    a = sparse.csc_matrix(
+        (
+            np.concatenate([inflow.ravel(), -trade[period, row, col]]),
+            (
+                np.concatenate([diagonal, period * n + row]),
+                np.concatenate([diagonal, period * n + col]),
+            ),
+        ),
+        shape=(n_periods * n, n_periods * n),
+    )
+    # c_hat for each period, stacked vertically
+    c_hat = np.zeros((n_periods * n, n))
+    c_hat[diagonal, np.tile(np.arange(n), n_periods)] = consumption.ravel()
+    y = splu(a).solve(c_hat).reshape(n_periods, n, n)
+    h = inflow[:, :, np.newaxis] * y
+    if not stacked:
+        h = h[0]
+    return h
+
+
 def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
     REGION_NAMES = [
         'California', 'Carolinas', 'Central',
@@ -93,44 +167,34 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
 
 #    download_EBA()
     path = join(data_dir, 'bulk_data', 'EBA.zip')
-    NET_GEN_ROWS = []
-    BA_TO_BA_ROWS = []
-    DEMAND_ROWS=[]
-    TOTAL_INTERCHANGE_ROWS=[]
-    try:
-        logging.info("Using existing bulk data download")
-        z = zipfile.ZipFile(path, 'r')
-
-    except FileNotFoundError:
+    if not os.path.exists(path):
         logging.info("Downloading new bulk data")
         download_EBA()
-        z = zipfile.ZipFile(path, 'r')
-    logging.info("Loading bulk data to json")
-    with z.open('EBA.txt') as f:
-        for line in f:
-            # All but one BA is currently reporting net generation in UTC and local time
-            # for that one BA (GRMA) only UTC time is reported - so only pulling that
-            # for now.
-            if b'EBA.NG.H' in line and b'EBA.NG.HL' not in line:
-                NET_GEN_ROWS.append(json.loads(line))
-            # Similarly there are 5 interchanges that report interchange in UTC but not in
-            # local time.
-            elif b'EBA.ID.H' in line and b'EBA.ID.HL' not in line:
-                exchange_line=json.loads(line)
-                if exchange_line['series_id'].split('-')[0][4:] not in REGION_ACRONYMS:
-#                    try:
-                        # Adding this check here to hopefully save some time down the road.
-                        # dummy_date=datetime.strptime(exchange_line['data'][0][0],'%Y%m%dT%HZ')
-                        BA_TO_BA_ROWS.append(exchange_line)
-                        # good_date_count+=1
-#                    except ValueError:
-                        # bad_date_count+=1
-#                        continue
-            # Keeping these here just in case
-            elif b'EBA.D.H' in line and b'EBA.D.HL' not in line:
-                DEMAND_ROWS.append(json.loads(line))
-#            elif b'EBA.TI.H' in line:
-#                TOTAL_INTERCHANGE_ROWS.append(json.loads(line))
+    else:
+        logging.info("Using existing bulk data download")
+    # Only the series of interest for the given year are parsed; the
+    # location of each series in EBA.txt is indexed on first use.
+    logging.info("Loading bulk data series")
+    series_index = get_series_index(path)
+    # All but one BA is currently reporting net generation in UTC and local time
+    # for that one BA (GRMA) only UTC time is reported - so only pulling that
+    # for now.
+    NET_GEN_ROWS = load_series(
+        select_series(series_index, 'EBA.NG.H'), year, path
+    )
+    # Similarly there are 5 interchanges that report interchange in UTC but not in
+    # local time.
+    BA_TO_BA_ROWS = load_series(
+        select_series(
+            series_index,
+            'EBA.ID.H',
+            lambda s: s.split('-')[0][4:] not in REGION_ACRONYMS
+        ),
+        year,
+        path
+    )
+    # Only the names of the demand series are used.
+    DEMAND_ROWS = select_series(series_index, 'EBA.D.H')
     logging.info(f"Net gen rows: {len(NET_GEN_ROWS)}; BA to BA rows:{len(BA_TO_BA_ROWS)}; Demand rows:{len(DEMAND_ROWS)}")
     eia923_gen=eia923.build_generation_data(generation_years=[year])
     eia860_df=eia860.eia860_balancing_authority(year)
@@ -151,7 +215,7 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
 
     # Net Generation Data Import
     logging.info("Generating df with datetime")
-    df_net_gen = row_to_df(NET_GEN_ROWS, 'net_gen')
+    df_net_gen = series_to_df(NET_GEN_ROWS, 'net_gen')
     del(NET_GEN_ROWS)
     logging.info("Pivoting")
     df_net_gen = df_net_gen.pivot(index = 'datetime', columns = 'region', values = 'net_gen')
@@ -231,7 +295,7 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
     # Group and resample trading data so that it is on an annual basis
 
     logging.info("Creating trading dataframe")
-    df_ba_trade = ba_exchange_to_df(BA_TO_BA_ROWS, data_type='ba_to_ba')
+    df_ba_trade = ba_exchange_series_to_df(BA_TO_BA_ROWS, data_type='ba_to_ba')
     del(BA_TO_BA_ROWS)
     df_ba_trade = df_ba_trade.set_index('datetime')
     df_ba_trade['transacting regions'] = df_ba_trade['from_region'] + '-' + df_ba_trade['to_region']
@@ -366,34 +430,19 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
     # Perform trading calculations as provided in Qu et al (2018) to
     # determine the composition of a BA consumption mix
 
-    # Create total inflow vector x and then convert to a diagonal matrix x-hat
+    # Create total inflow vector x
     logging.info("Inflow vector")
-    x = []
-    for i in range (len(df_net_gen_sum)):
-        x.append(df_net_gen_sum.iloc[i] + df_trade_pivot.sum(axis = 0).iloc[i])
-
-    x_np = np.array(x)
-
-    # If values are zero, x_hat matrix will be singular, set BAAs with 0 to small value (1)
-    df_x = pd.DataFrame(data = x_np, index = df_trade_pivot.index)
-    df_x = df_x.rename(columns = {0:'inflow'})
-    df_x.loc[df_x['inflow'] == 0] = 1
-
-    x_np = df_x.values
-
-    x_hat = np.diagflat(x_np)
-
+    x_np = (
+        df_net_gen_sum.iloc[:, 0].values + df_trade_pivot.sum(axis=0).values
+    )
 
-    # Create consumption vector c and then convert to a digaonal matrix c-hat
-    # Calculate c based on x and T
+    # Create consumption vector c, calculated based on x and T
     logging.info("consumption vector")
-    c = []
+    c_np = x_np - df_trade_pivot.sum(axis=1).values
 
-    for i in range(len(df_net_gen_sum)):
-        c.append(x[i] - df_trade_pivot.sum(axis = 1).iloc[i])
-
-    c_np = np.array(c)
-    c_hat = np.diagflat(c_np)
+    # If values are zero, the trading matrix will be singular, set BAAs with
+    # 0 to small value (1)
+    x_np = np.where(x_np == 0, 1, x_np)
 
     # Convert df_trade_pivot to matrix
     T = df_trade_pivot.values
@@ -409,23 +458,8 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
     T_split = np.multiply(T, interconnect_mat)
 
     # Matrix trading math (see Qu et al. 2018 ES&T paper)
-    x_hat_inv = np.linalg.inv(x_hat)
-
-    B = np.matmul(T_split, x_hat_inv)
-
-    I = np.identity(len(df_net_gen_sum))
-
-    diff_I_B = I - B
-
-    G = np.linalg.inv(diff_I_B)
-
-    c_hat_x_hat_inv = np.matmul(c_hat, x_hat_inv)
-
-    G_c = np.matmul(G, c_hat)
-    H = np.matmul(G,c_hat, x_hat_inv)
+    H = trading_consumption_matrix(T_split, x_np, c_np)
 
-    df_G = pd.DataFrame(G)
-    df_B = pd.DataFrame(B)
     df_H = pd.DataFrame(H)
 
     # Convert H to pandas dataframe, populate index and columns
@@ -500,14 +534,14 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
     BAA_zero_trade = [x for x in list(BAA_final_trade["import BAA"].unique()) if BAA_final_trade.loc[BAA_final_trade["import BAA"]==x,"fraction"].sum()==0]
     BAAs_from_zero_trade_with_demand = []
     for d_row in DEMAND_ROWS:
-        if d_row["series_id"].split('.')[1].split('-')[0] in BAA_zero_trade:
-            BAAs_from_zero_trade_with_demand.append(d_row["series_id"].split('.')[1].split('-')[0])
+        if d_row.split('.')[1].split('-')[0] in BAA_zero_trade:
+            BAAs_from_zero_trade_with_demand.append(d_row.split('.')[1].split('-')[0])
     BAAs_from_zero_trade_with_demand = list(set(BAAs_from_zero_trade_with_demand))
     del(DEMAND_ROWS)
     for baa in BAAs_from_zero_trade_with_demand:
-        BAA_final_trade.at[(BAA_final_trade["import BAA"]==baa)&(BAA_final_trade["export BAA"]==baa),"fraction"]=1
+        BAA_final_trade.loc[(BAA_final_trade["import BAA"]==baa)&(BAA_final_trade["export BAA"]==baa),"fraction"]=1
     for baa in list(set(BAA_zero_trade)-set(BAAs_from_zero_trade_with_demand)):
-        BAA_final_trade.at[(BAA_final_trade["import BAA"]==baa)&(BAA_final_trade["export BAA"]==baa),"fraction"]=1E-15
+        BAA_final_trade.loc[(BAA_final_trade["import BAA"]==baa)&(BAA_final_trade["export BAA"]==baa),"fraction"]=1E-15
         #Was later decided to not create consumption mixes for BAs that don't have imports.
         BAA_final_trade.drop(BAA_final_trade[BAA_final_trade["import BAA"]==baa].index,inplace=True)
     BAA_final_trade.to_csv(output_dir + '/BAA_final_trade_{}.csv'.format(year))
@@ -544,6 +578,265 @@ def ba_io_trading_model(year=None, subregion=None, regions_to_keep=None):
     return {'BA':BAA_final_trade,'FERC':ferc_final_trade,'US':us_final_trade}
 
 
+def _reconcile_interchange(exchange_1_2, exchange_2_1):
+    """
+    Pick the exchange between two BAs from the values reported by each of
+    them, using the same rules as ba_io_trading_model: the reports must have
+    opposite signs and be non-zero, the mean of the two is used if they are
+    within 20% of each other, otherwise the exporter's value is used.
+
+    Parameters
+    ----------
+    exchange_1_2 : numpy.ndarray
+        Interchange from BAA1 to BAA2 as reported by BAA1.
+    exchange_2_1 : numpy.ndarray
+        Interchange from BAA2 to BAA1 as reported by BAA2.
+
+    Returns
+    -------
+    amount : numpy.ndarray
+        Amount exchanged, 0 where the reports are inconsistent.
+    one_exports : numpy.ndarray
+        True where BAA1 is the exporter.
+    """
+    abs_1_2 = np.abs(exchange_1_2)
+    abs_2_1 = np.abs(exchange_2_1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent_diff = (
+            np.abs(abs_1_2 / abs_2_1 - 1) + np.abs(abs_2_1 / abs_1_2 - 1)
+        ) / 2
+    percent_diff = np.where(np.isnan(percent_diff), 0, percent_diff)
+    amount = np.where(
+        percent_diff < 0.2,
+        (abs_1_2 + abs_2_1) / 2,
+        np.where(exchange_1_2 > 0, exchange_1_2, exchange_2_1),
+    )
+    keep = ((exchange_1_2 > 0) & (exchange_2_1 < 0)) | (
+        (exchange_1_2 < 0) & (exchange_2_1 > 0)
+    )
+    return np.where(keep, amount, 0), exchange_1_2 > 0
+
+
+def ba_io_trading_cube(year=None, freq="M", chunk_size=None, write=True):
+    """
+    Solve the trading model for each hour, day, or month of a year and
+    return the consumption mix of each BA and FERC region over time.
+
+    This follows ba_io_trading_model, but the hourly EIA-930 net generation
+    and interchange are summed by period rather than over the whole year
+    and the trading systems for all of the periods are solved in batches
+    (see trading_consumption_matrix). The differences from the annual model
+    are:
+
+    * the interchange reported by each BA in a pair is matched by name;
+      pairs where only one BA reports are dropped, as are pairs with
+      inconsistent reports in that period. The annual model matches the
+      reports by their position after sorting, so a pair with one report
+      shifts the matches of the pairs after it.
+    * the interchange reported by TVA, ERCO, ISNE, and NYIS is used. The
+      annual model drops it because those codes are also EIA region codes.
+    * the annual Canadian imports and generation are spread evenly over
+      the hours of the year.
+    * net generation is not checked against EIA-923, which is only
+      available annually.
+
+    Parameters
+    ----------
+    year : int, optional
+        Data year, by default model_specs.NETL_IO_trading_year.
+    freq : str, optional
+        Pandas offset alias for the periods, e.g., "H" for hourly, "D" for
+        daily, or "M" (default) for monthly.
+    chunk_size : int, optional
+        Number of periods solved together. By default this is chosen to
+        keep each batch to around 64 MB.
+    write : bool, optional
+        If True (default), each cube is written to a parquet file in the
+        output directory.
+
+    Returns
+    -------
+    dict
+        Long-format dataframes keyed by "BA" and "FERC", with the columns
+        period, import region (import BAA or import ferc region), export BAA,
+        and fraction. Rows with a fraction of 0 are omitted.
+    """
+    if year is None:
+        year = model_specs.NETL_IO_trading_year
+
+    df_BA = pd.read_excel(data_dir + '/BA_Codes_930.xlsx', sheet_name='US', header=4)
+    df_BA_CA = pd.read_excel(data_dir + '/BA_Codes_930.xlsx', sheet_name='Canada', header=4)
+    df_BA_NA = pd.concat([df_BA, df_BA_CA])
+    df_BA_NA.rename(columns={'etag ID': 'BA_Acronym'}, inplace=True)
+    us_bas = df_BA['etag ID'].tolist()
+    ba_to_ferc = df_BA_NA.set_index('BA_Acronym')['FERC_Region_Abbr']
+
+    df_CA_Imports_Gen = pd.read_csv(data_dir + '/CA_Imports_Gen.csv', index_col=0)[str(year)]
+    df_CA_Imports_Rows = pd.read_csv(data_dir + '/CA_Imports_Rows.csv', index_col=0)
+    df_CA_Imports_Rows = df_CA_Imports_Rows.pivot(columns='us_ba', values=str(year))
+    df_CA_Imports_Cols = pd.read_csv(data_dir + '/CA_Imports_Cols.csv', index_col=0)
+    regions = sorted(set(us_bas) | set(df_CA_Imports_Gen.index))
+    n = len(regions)
+
+    path = join(data_dir, 'bulk_data', 'EBA.zip')
+    if not os.path.exists(path):
+        logging.info("Downloading new bulk data")
+        download_EBA()
+    series_index = get_series_index(path)
+    df_net_gen = series_to_df(
+        load_series(select_series(series_index, 'EBA.NG.H'), year, path),
+        'net_gen'
+    )
+    df_ba_trade = ba_exchange_series_to_df(
+        load_series(
+            select_series(
+                series_index,
+                'EBA.ID.H',
+                lambda s: (
+                    s.split('-')[0][4:] in us_bas
+                    and s.split('-')[1][:-5] in us_bas
+                )
+            ),
+            year,
+            path
+        )
+    )
+
+    # Hours of the year and the period each belongs to
+    hours = pd.date_range(
+        f'{year}-01-01 00:00', f'{year}-12-31 23:00', freq='H', tz='UTC'
+    )
+    period_hours = pd.Series(1, index=hours).resample(freq).sum()
+    periods = period_hours.index
+    n_periods = len(periods)
+
+    net_gen = (
+        df_net_gen.pivot(index='datetime', columns='region', values='net_gen')
+        .reindex(index=hours, columns=regions)
+        .fillna(0)
+        .resample(freq).sum()
+        .values
+    )
+    ca_rows = [regions.index(r) for r in df_CA_Imports_Gen.index]
+    hour_share = period_hours.values / len(hours)
+    net_gen[:, ca_rows] += np.outer(hour_share, df_CA_Imports_Gen.values)
+
+    logging.info(f"Reconciling interchange for {n_periods} periods")
+    exchange = (
+        df_ba_trade.assign(
+            pair=df_ba_trade['from_region'] + '-' + df_ba_trade['to_region']
+        )
+        .pivot(index='datetime', columns='pair', values='ba_to_ba')
+        .reindex(index=hours)
+        .fillna(0)
+        .resample(freq).sum()
+    )
+    pairs = sorted({
+        tuple(sorted(p.split('-', 1))) for p in exchange.columns
+    })
+    exchange = exchange.reindex(
+        columns=[f'{a}-{b}' for a, b in pairs] + [f'{b}-{a}' for a, b in pairs],
+        fill_value=0
+    ).values
+    amount, one_exports = _reconcile_interchange(
+        exchange[:, :len(pairs)], exchange[:, len(pairs):]
+    )
+    ba_1 = np.array([regions.index(a) for a, b in pairs], dtype=int)
+    ba_2 = np.array([regions.index(b) for a, b in pairs], dtype=int)
+    from_1 = np.where(one_exports, amount, 0)
+    from_2 = np.where(one_exports, 0, amount)
+    del exchange, amount, one_exports
+
+    # Canadian imports and exports
+    ca_trade = (
+        pd.concat([df_CA_Imports_Rows, df_CA_Imports_Cols])
+        .groupby(level=0).sum()
+        .reindex(index=regions, columns=regions)
+        .fillna(0)
+        .values
+    )
+
+    # Prevent trading between the eastern and western interconnects
+    no_trade = [
+        (regions.index(exporter),
+         [regions.index(r) for r in importers if r in regions])
+        for exporter, importers in [
+            ('SWPP', ['EPE', 'PNM', 'PSCO', 'WACM']),
+            ('WAUE', ['WAUW', 'WACM']),
+        ]
+        if exporter in regions
+    ]
+
+    # Same BAs as the annual model; those without plants in EIA-860 have
+    # no emissions data.
+    eia860_df = eia860.eia860_balancing_authority(year)
+    eia860_bas = set(eia860_df["Balancing Authority Code"].dropna()) | set(
+        df_CA_Imports_Cols.columns
+    )
+    keep = np.array([r in eia860_bas for r in regions])
+    kept_regions = np.array(regions)[keep]
+    ferc = ba_to_ferc.reindex(kept_regions).values
+    ferc_regions = sorted(set(ferc[pd.notnull(ferc)]) - {'CAN'})
+    ferc_onehot = (ferc[:, np.newaxis] == np.array(ferc_regions)).astype(float)
+
+    if chunk_size is None:
+        chunk_size = max(1, 2 ** 23 // (n * n))
+    cubes = {'BA': [], 'FERC': []}
+    logging.info(f"Solving trading model for {n_periods} periods")
+    for start in range(0, n_periods, chunk_size):
+        stop = min(start + chunk_size, n_periods)
+        # The trade matrices are only built for the periods in the batch.
+        trade = hour_share[start:stop, np.newaxis, np.newaxis] * ca_trade
+        period_idx = np.arange(stop - start)[:, np.newaxis]
+        trade[period_idx, ba_1, ba_2] += from_1[start:stop]
+        trade[period_idx, ba_2, ba_1] += from_2[start:stop]
+        for exporter, importers in no_trade:
+            trade[:, exporter, importers] = 0
+        inflow = net_gen[start:stop] + trade.sum(axis=1)
+        consumption = inflow - trade.sum(axis=2)
+        inflow = np.where(inflow == 0, 1, inflow)
+        h = trading_consumption_matrix(
+            trade, inflow, consumption
+        )[:, keep][:, :, keep]
+        # Drop the tiny values left by the solve, as in the annual model
+        with np.errstate(divide="ignore", invalid="ignore"):
+            h = np.where(
+                np.abs(h) / h.sum(axis=1, keepdims=True) < 0.00001,
+                0,
+                np.abs(h)
+            )
+        for level, values, import_regions in [
+            ('BA', h, kept_regions),
+            ('FERC', h @ ferc_onehot, np.array(ferc_regions)),
+        ]:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fraction = values / values.sum(axis=1, keepdims=True)
+            p, e, i = np.nonzero(np.nan_to_num(fraction))
+            cubes[level].append(pd.DataFrame({
+                'period': periods[start + p],
+                'import': import_regions[i],
+                'export BAA': kept_regions[e],
+                'fraction': fraction[p, e, i],
+            }))
+
+    cube_dict = {}
+    for level, import_col, name in [
+        ('BA', 'import BAA', 'BAA'),
+        ('FERC', 'import ferc region', 'ferc'),
+    ]:
+        cube = pd.concat(cubes[level], ignore_index=True)
+        cube.rename(columns={'import': import_col}, inplace=True)
+        for col in [import_col, 'export BAA']:
+            cube[col] = cube[col].astype('category')
+        cube_dict[level] = cube
+        if write:
+            cube.to_parquet(
+                join(output_dir, f'{name}_consumption_mix_{freq}_{year}.parquet'),
+                index=False
+            )
+    return cube_dict
+
+
 if __name__=='__main__':
     year=2016
     subregion = 'BA'
@@ -556,6 +849,7 @@ def olca_schema_consumption_mix(database, gen_dict, subregion="BA"):
 
     from electricitylci.generation import eia_facility_fuel_region
     from electricitylci.globals import data_dir, output_dir
+    from electricitylci.utils import ProviderIndex
     from electricitylci.process_dictionary_writer import (
         exchange_table_creation_ref,
         exchange,
@@ -574,6 +868,7 @@ def olca_schema_consumption_mix(database, gen_dict, subregion="BA"):
 # DELETE ABOVE
 
     consumption_mix_dict = {}
+    gen_index = ProviderIndex(gen_dict)
     if subregion == "FERC":
         aggregation_column = "import ferc region"
         region = list(pd.unique(database[aggregation_column]))
@@ -588,51 +883,45 @@ def olca_schema_consumption_mix(database, gen_dict, subregion="BA"):
         export_column = "export_name"
         region=["US"]
     
+    # Only the first row with a positive fraction for each import and export
+    # region is used, so they are found in one pass.
+    positive = database.loc[
+        (database['fraction'] > 0) & database[export_column].notna(), :
+    ]
+    if subregion == "US":
+        region_rows = {"US": positive.drop_duplicates(subset=[export_column])}
+    else:
+        first_rows = positive.drop_duplicates(
+            subset=[aggregation_column, export_column]
+        )
+        region_rows = dict(
+            tuple(first_rows.groupby(aggregation_column, sort=False))
+        )
     for reg in region:
-        if subregion =="US":
-            database_reg = database
-        else:
-            database_reg = database.loc[database[aggregation_column] == reg, :]
+        database_reg = region_rows.get(reg, positive.iloc[0:0])
 
         exchanges_list = []
 
-        database_filt = database['fraction'] > 0
-        database_reg = database_reg[database_filt]
-
         exchange(exchange_table_creation_ref_cons(database_reg), exchanges_list)
 
-
-        for export_region in list(database_reg[export_column].unique()):
-
-            database_f1 = database_reg[
-                database_reg[export_column] == export_region
-            ]
-            if database_f1.empty != True:
-                ra = exchange_table_creation_input_con_mix(
-                    database_f1, export_region
+        for export_region, fraction in zip(
+            database_reg[export_column], database_reg['fraction']
+        ):
+            ra = exchange_table_creation_input_con_mix(
+                fraction, export_region
+            )
+            ra["quantitativeReference"] = False
+            provider = gen_index.provider(
+                'Electricity; at grid; generation mix - ' + export_region
+            )
+            if provider is None:
+                logging.warning(
+                    f"Trouble matching dictionary for {export_region} - {reg}"
                 )
-                ra["quantitativeReference"] = False
-                ra['amount'] = database_reg.loc[database_reg[export_column] == export_region,'fraction'].values[0]
-                matching_dict = None
-                for gen in gen_dict:
-                    if (
-                        gen_dict[gen]["name"]
-                        == 'Electricity; at grid; generation mix - ' + export_region
-                    ):
-                        matching_dict = gen_dict[export_region]
-                        break
-                if matching_dict is None:
-                    logging.warning(
-                        f"Trouble matching dictionary for {export_region} - {reg}"
-                    )
-                else:
-                    ra["provider"] = {
-                        "name": matching_dict["name"],
-                        "@id": matching_dict["uuid"],
-                        "category": matching_dict["category"].split("/"),
-                    }
-                exchange(ra, exchanges_list)
-                   # Writing final file
+            else:
+                ra["provider"] = provider
+            exchange(ra, exchanges_list)
+        # Writing final file
         final = process_table_creation_con_mix(reg, exchanges_list)
         final["name"] = f"Electricity; at grid; consumption mix - {reg} - {subregion}"
         consumption_mix_dict[f"{reg} - {subregion}"] = final
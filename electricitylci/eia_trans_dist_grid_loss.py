@@ -4,10 +4,10 @@
 import pandas as pd
 import numpy as np
 import os
-import urllib.request
+import zipfile
 from electricitylci.globals import output_dir, data_dir
+from electricitylci.downloads import fetch_many, DownloadError
 import logging
-from xlrd import XLRDError
 from functools import lru_cache
 
 # %%
@@ -96,53 +96,53 @@ def eia_trans_dist_download_extract(year):
     else:
         os.mkdir(f"{data_dir}/t_and_d_{year}")
         os.chdir(f"{data_dir}/t_and_d_{year}")
+    # Download the missing state files at once. The most current year has a
+    # different url - no "archive/year" - so files that aren't found (or
+    # aren't excel files) in the archive are downloaded from there.
+    missing = [
+        key for key in state_abbrev
+        if not os.path.exists(f"{state_abbrev[key]}.xlsx")
+    ]
+    for base_url in [
+        f"https://www.eia.gov/electricity/state/archive/{year}/",
+        "https://www.eia.gov/electricity/state/",
+    ]:
+        if not missing:
+            break
+        print(f"Downloading data for {len(missing)} states")
+        fetch_many(
+            [
+                (
+                    f"{base_url}{key}/xls/{state_abbrev[key]}.xlsx",
+                    f"{state_abbrev[key]}.xlsx"
+                )
+                for key in missing
+            ],
+            raise_errors=False
+        )
+        for key in missing:
+            filename = f"{state_abbrev[key]}.xlsx"
+            if os.path.exists(filename) and not zipfile.is_zipfile(filename):
+                os.remove(filename)
+        missing = [
+            key for key in missing
+            if not os.path.exists(f"{state_abbrev[key]}.xlsx")
+        ]
+    if missing:
+        os.chdir(old_path)
+        raise DownloadError(
+            f"Unable to download the state electricity profiles for {missing}"
+        )
+
     state_df_list = list()
     for key in state_abbrev:
         filename = f"{state_abbrev[key]}.xlsx"
-        if not os.path.exists(filename):
-            url = (
-                "https://www.eia.gov/electricity/state/archive/"
-                + year
-                + "/"
-                + key
-                + "/xls/"
-                + filename
-            )
-            print(f"Downloading data for {state_abbrev[key]}")
-
-            try:
-                urllib.request.urlretrieve(url, filename)
-                df = pd.read_excel(
-                    filename,
-                    sheet_name="10. Source-Disposition",
-                    header=3,
-                    index_col=0,
-                )
-            except XLRDError:
-                # The most current year has a different url - no "archive/year"
-                url = (
-                    "https://www.eia.gov/electricity/state/"
-                    + key
-                    + "/xls/"
-                    + filename
-                )
-                urllib.request.urlretrieve(url, filename)
-                df = pd.read_excel(
-                    filename,
-                    sheet_name="10. Source-Disposition",
-                    header=3,
-                    index_col=0,
-                )
-        else:
-            logging.info(
-                f"Using previously downloaded data for {state_abbrev[key]}"
-            )
-            df = pd.read_excel(
-                filename,
-                sheet_name="10. Source-Disposition",
-                header=3,
-                index_col=0,
-            )
+        df = pd.read_excel(
+            filename,
+            sheet_name="10. Source-Disposition",
+            header=3,
+            index_col=0,
+        )
 
         df.columns = df.columns.str.replace("Year\n", "")
         df = df.loc["Estimated losses"] / (
@@ -237,7 +237,7 @@ def generate_regional_grid_loss(final_database, year, subregion="all"):
     )
     if aggregation_column is not None:
         td_by_region = td_by_plant.groupby(
-            aggregation_column, as_index=False
+            aggregation_column, as_index=False, observed=True
         ).agg({"t_d_losses": wm})
     else:
         td_by_region = pd.DataFrame(
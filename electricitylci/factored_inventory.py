@@ -0,0 +1,321 @@
+"""
+Upstream inventories stored as per-unit flows and plant activity.
+
+Most of the upstream and renewable inventories apply the same life cycle
+inventory (per MWh of generation, per MW of capacity, etc.) to many plants.
+Rather than copying the inventory for every plant, a FactoredInventory keeps
+the inventory once (the intensities) along with the quantity of each plant
+(the activity), and only builds the plant-by-flow rows when they are needed.
+The totals that are used to build the upstream unit processes can be
+calculated without building those rows (see FactoredInventory.stage_totals).
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+module_logger = logging.getLogger("factored_inventory.py")
+
+# Columns added to combined inventories (see FactoredInventory.concat). They
+# are dropped from the expanded inventory.
+KEY_COLUMN = "activity_key"
+SCALE_COLUMN = "activity_scale"
+# Suffix for columns that are in both the activity and the intensities of a
+# combined inventory.
+_DUPLICATE_SUFFIX = "_intensity"
+
+
+def _coalesce(df):
+    """
+    Combine the columns that came from both sides of a merge of a combined
+    inventory. Within each inventory that was combined a column is only on
+    one side, so the values are taken from whichever side has them.
+    """
+    for col in [c for c in df.columns if c.endswith(_DUPLICATE_SUFFIX)]:
+        base = col[: -len(_DUPLICATE_SUFFIX)]
+        if base in df.columns:
+            df[base] = df[base].fillna(df[col])
+            df.drop(columns=col, inplace=True)
+    return df
+
+
+class FactoredInventory:
+    """
+    An inventory for a set of plants made of per-unit flows and the
+    quantity of each plant.
+
+    Columns describing the flows and the stage (stage_code, fuel_type, etc.)
+    normally belong to the intensities and columns describing the plant
+    (plant_id, quantity, Electricity) to the activity.
+
+    Parameters
+    ----------
+    intensities : dataframe
+        One row per flow, with the FlowAmount per unit of activity and any
+        other columns that the expanded rows should have.
+    activity : dataframe
+        One row per plant, with plant_id, its quantity (e.g., net
+        generation in MWh), and any other columns that the expanded rows
+        should have.
+    on : str or list, optional
+        Columns that are in both dataframes and select the intensities that
+        apply to each plant (e.g., the state or construction type). By
+        default every intensity applies to every plant.
+    scale : bool or str, optional
+        If True (default) the FlowAmount of the intensities is multiplied by
+        the quantity of the plant. If False, the FlowAmount is already the
+        total for the plants the intensities are keyed to. A column of the
+        activity to multiply by can also be given.
+    how : str, optional
+        How the activity is joined to the intensities when on is given, as
+        in DataFrame.merge with the activity on the left, by default "left".
+    """
+
+    def __init__(self, intensities, activity, on=None, scale=True, how="left"):
+        self.intensities = intensities
+        self.activity = activity
+        self.on = on
+        self.scale = scale
+        self.how = how
+
+    def __repr__(self):
+        return (
+            f"FactoredInventory({len(self.intensities)} intensities, "
+            f"{len(self.activity)} plants, on={self.on!r})"
+        )
+
+    def _on_columns(self):
+        if self.on is None:
+            return []
+        if isinstance(self.on, str):
+            return [self.on]
+        return list(self.on)
+
+    def _scale_factor(self):
+        """Return the number each intensity is multiplied by for each
+        activity row."""
+        if self.scale is True:
+            return self.activity["quantity"]
+        if self.scale is False:
+            return pd.Series(1.0, index=self.activity.index)
+        return self.activity[self.scale]
+
+    def expand(self):
+        """
+        Build the inventory of each plant.
+
+        Returns
+        -------
+        dataframe
+            The rows of the activity (in order) each followed by the rows of
+            the intensities that apply to it, with the FlowAmount multiplied
+            by the plant's quantity when scale is True.
+        """
+        if self.on is None:
+            expanded = self.activity.merge(
+                self.intensities, how="cross",
+                suffixes=("", _DUPLICATE_SUFFIX)
+            )
+        else:
+            expanded = self.activity.merge(
+                self.intensities, on=self.on, how=self.how,
+                suffixes=("", _DUPLICATE_SUFFIX)
+            )
+        _coalesce(expanded)
+        if self.scale is not False:
+            factor = "quantity" if self.scale is True else self.scale
+            expanded["FlowAmount"] = (
+                expanded["FlowAmount"] * expanded[factor]
+            )
+        expanded.drop(
+            columns=[KEY_COLUMN, SCALE_COLUMN], errors="ignore", inplace=True
+        )
+        module_logger.debug(f"Expanded {self} to {len(expanded)} rows")
+        return expanded
+
+    def _keyed(self, first_key):
+        """
+        Return copies of the intensities and activity that are joined on an
+        integer key starting at first_key (instead of the on columns) and
+        the number of keys used.
+        """
+        on = self._on_columns()
+        activity = self.activity.drop(columns=SCALE_COLUMN, errors="ignore")
+        activity[SCALE_COLUMN] = self._scale_factor().values
+        if not on:
+            intensities = self.intensities.copy()
+            intensities[KEY_COLUMN] = first_key
+            activity[KEY_COLUMN] = first_key
+            return intensities, activity, 1
+        keys = self.activity[on].drop_duplicates().reset_index(drop=True)
+        keys["_new_key"] = np.arange(first_key, first_key + len(keys))
+        activity = activity.merge(keys, on=on, how="left")
+        intensities = self.intensities.merge(keys, on=on, how="inner")
+        # The on columns stay with the activity.
+        intensities.drop(columns=on, inplace=True)
+        if KEY_COLUMN in on:
+            activity.drop(columns=KEY_COLUMN, inplace=True)
+        activity.rename(columns={"_new_key": KEY_COLUMN}, inplace=True)
+        intensities.rename(columns={"_new_key": KEY_COLUMN}, inplace=True)
+        return intensities, activity, len(keys)
+
+    @classmethod
+    def concat(cls, inventories):
+        """
+        Combine several inventories into one.
+
+        The intensities of each inventory are joined to its activity with an
+        integer key column, so inventories that are keyed on different
+        columns or scaled differently can be combined. Intensities that apply
+        to no plant and plants with no intensities are dropped.
+
+        Parameters
+        ----------
+        inventories : list
+            FactoredInventory objects.
+
+        Returns
+        -------
+        FactoredInventory
+        """
+        intensities_list = []
+        activity_list = []
+        next_key = 0
+        for inventory in inventories:
+            intensities, activity, n_keys = inventory._keyed(next_key)
+            intensities_list.append(intensities)
+            activity_list.append(activity)
+            next_key += n_keys
+        return cls(
+            pd.concat(intensities_list, ignore_index=True, sort=False),
+            pd.concat(activity_list, ignore_index=True, sort=False),
+            on=KEY_COLUMN,
+            scale=SCALE_COLUMN,
+            how="inner",
+        )
+
+    def stage_totals(self, by):
+        """
+        Total the FlowAmount and the quantity of the plants for each group of
+        flows, without expanding the inventory.
+
+        This is the same as grouping the expanded inventory by the given
+        columns and plant_id, summing the FlowAmount and averaging the
+        quantity, and then summing both over the plants. The quantity of a
+        plant is taken once for each key (e.g., state or basin) it is under,
+        except for the plants that are under several keys with flows in the
+        same group; only their rows are expanded to count them once.
+
+        Parameters
+        ----------
+        by : list
+            Columns to group by. They can be columns of the intensities or
+            the activity.
+
+        Returns
+        -------
+        dataframe
+            The by columns, quantity, and FlowAmount.
+        """
+        on = self._on_columns()
+        activity = self.activity.loc[self.activity["plant_id"].notna(), :]
+        activity = activity.assign(_scale_factor=self._scale_factor())
+        intensities = self.intensities
+        if not on:
+            on = ["_cross_key"]
+            activity = activity.assign(_cross_key=0)
+            intensities = intensities.assign(_cross_key=0)
+        activity_by = [
+            c for c in by if c in activity.columns and c not in on
+        ]
+        intensity_by = [c for c in by if c not in activity_by]
+        plant_cols = on + activity_by + ["plant_id"]
+        # The scale factor of each key and the quantity of its plants.
+        plants = activity.groupby(
+            plant_cols, as_index=False, dropna=False
+        ).agg(
+            _scale_factor=("_scale_factor", "sum"),
+            _quantity_sum=("quantity", "sum"),
+            _quantity_count=("quantity", "count"),
+        )
+        plants["quantity"] = (
+            plants["_quantity_sum"] / plants["_quantity_count"]
+        )
+        # The number of intensities of each key in each group.
+        key_groups = intensities.groupby(
+            list(dict.fromkeys(on + intensity_by)), as_index=False
+        ).size().rename(columns={"size": "_rows"})
+        repeated = _repeated_plants(plants, key_groups, on, activity_by,
+                                    intensity_by)
+        key_totals = plants.groupby(
+            on + activity_by, as_index=False, dropna=False
+        )["_scale_factor"].sum()
+        key_totals = key_totals.merge(
+            plants.loc[~repeated, :].groupby(
+                on + activity_by, as_index=False, dropna=False
+            )["quantity"].sum(),
+            on=on + activity_by,
+            how="left",
+        )
+        key_totals["quantity"] = key_totals["quantity"].fillna(0)
+        flows = key_totals.merge(
+            intensities, on=on, how="inner",
+            suffixes=("", _DUPLICATE_SUFFIX)
+        )
+        _coalesce(flows)
+        flows["FlowAmount"] = flows["FlowAmount"] * flows["_scale_factor"]
+        flow_totals = flows.groupby(by, as_index=False)["FlowAmount"].sum()
+        quantities = [
+            flows.drop_duplicates(subset=by + on)[by + ["quantity"]]
+        ]
+        if repeated.any():
+            # Average the quantity of each of these plants over the
+            # expanded rows of each group, as grouping the expanded
+            # inventory would.
+            rows = plants.loc[repeated, :].merge(key_groups, on=on)
+            rows["_quantity_sum"] *= rows["_rows"]
+            rows["_quantity_count"] *= rows["_rows"]
+            rows = rows.groupby(by + ["plant_id"], as_index=False)[
+                ["_quantity_sum", "_quantity_count"]
+            ].sum()
+            rows["quantity"] = (
+                rows["_quantity_sum"] / rows["_quantity_count"]
+            )
+            quantities.append(rows[by + ["quantity"]])
+        quantity_totals = pd.concat(quantities, ignore_index=True).groupby(
+            by, as_index=False
+        )["quantity"].sum()
+        return quantity_totals.merge(flow_totals, on=by)
+
+
+def _repeated_plants(plants, key_groups, on, activity_by, intensity_by):
+    """
+    Return a boolean series that is True for the rows of plants (one per
+    key and plant) whose plant is also under another key with flows in one
+    of the same groups.
+    """
+    # Only keys that share a group with another key can repeat a plant.
+    if intensity_by:
+        shared = key_groups.duplicated(intensity_by, keep=False)
+    else:
+        shared = pd.Series(True, index=key_groups.index)
+    shared = key_groups.loc[shared, on].drop_duplicates()
+    candidates = plants.reset_index().merge(shared, on=on)
+    candidates = candidates.loc[
+        candidates.duplicated(activity_by + ["plant_id"], keep=False), :
+    ]
+    repeated = pd.Series(False, index=plants.index)
+    if candidates.empty:
+        return repeated
+    rows = candidates[["index"] + on + activity_by + ["plant_id"]].merge(
+        key_groups, on=on
+    )
+    rows = rows.loc[
+        rows.duplicated(
+            activity_by + ["plant_id"] + intensity_by, keep=False
+        ),
+        "index",
+    ]
+    repeated[rows.unique()] = True
+    return repeated
@@ -11,23 +11,44 @@ import numpy as np
 from electricitylci.globals import output_dir, elci_version
 from electricitylci.utils import make_valid_version_num
 from datetime import datetime
-from electricitylci.dqi import lookup_score_with_bound_key
-from scipy.stats import t, norm
-from scipy.special import erfinv
+from electricitylci.dqi import lookup_scores_with_bound_key
+from electricitylci.schema import add_categories, enforce_schema
+from electricitylci.uncertainty import (
+    group_lognormal_params,
+    lognormal_params_from_upper,
+)
 import ast
 import logging
-from electricitylci.egrid_facilities import egrid_facilities
+from electricitylci.egrid_facilities import get_egrid_facilities
 from electricitylci.eia923_generation import eia923_primary_fuel
 from electricitylci.eia860_facilities import eia860_balancing_authority
 from electricitylci.model_config import model_specs
 
 
 
-egrid_facilities_w_fuel_region = egrid_facilities[['FacilityID','Subregion','PrimaryFuel','FuelCategory','NERC','PercentGenerationfromDesignatedFuelCategory','Balancing Authority Name','Balancing Authority Code']]
-
 module_logger = logging.getLogger("generation.py")
 
 
+def get_egrid_facilities_w_fuel_region():
+    """
+    Return the subset of the eGRID facility data with the facility region and
+    fuel information.
+
+    Returns
+    -------
+    dataframe
+    """
+    return get_egrid_facilities()[['FacilityID','Subregion','PrimaryFuel','FuelCategory','NERC','PercentGenerationfromDesignatedFuelCategory','Balancing Authority Name','Balancing Authority Code']]
+
+
+def __getattr__(name):
+    # egrid_facilities_w_fuel_region used to be created on import, which
+    # required loading the eGRID data from stewi.
+    if name == "egrid_facilities_w_fuel_region":
+        return get_egrid_facilities_w_fuel_region()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def eia_facility_fuel_region(year):
     primary_fuel = eia923_primary_fuel(year=year)
     ba_match = eia860_balancing_authority(year)
@@ -57,7 +78,9 @@ def add_technological_correlation_score(db):
     from electricitylci.dqi import technological_correlation_lower_bound_to_dqi
     # convert PercentGen to fraction
     db['PercentGenerationfromDesignatedFuelCategory'] = db['PercentGenerationfromDesignatedFuelCategory']/100
-    db['TechnologicalCorrelation'] = db['PercentGenerationfromDesignatedFuelCategory'].apply(lambda x: lookup_score_with_bound_key(x,technological_correlation_lower_bound_to_dqi))
+    db['TechnologicalCorrelation'] = lookup_scores_with_bound_key(
+        db['PercentGenerationfromDesignatedFuelCategory'],
+        technological_correlation_lower_bound_to_dqi)
     # db = db.drop(columns='PercentGenerationfromDesignatedFuelCategory')
     return db
 
@@ -75,8 +98,8 @@ def add_temporal_correlation_score(db, electricity_lci_target_year):
     
     # Could be more precise here with year
     db['Age'] =  electricity_lci_target_year - pd.to_numeric(db['Year'])
-    db['TemporalCorrelation'] = db['Age'].apply(
-        lambda x: lookup_score_with_bound_key(x, temporal_correlation_lower_bound_to_dqi))
+    db['TemporalCorrelation'] = lookup_scores_with_bound_key(
+        db['Age'], temporal_correlation_lower_bound_to_dqi)
     # db = db.drop(columns='Age')
     return db
 
@@ -145,7 +168,7 @@ def aggregate_facility_flows(df):
     df_red = df_emissions.drop(df_emissions[df_dupes].index)
     group_db = (
         df_emissions.loc[df_dupes, :]
-        .groupby(groupby_cols, as_index=False).agg(
+        .groupby(groupby_cols, as_index=False, observed=True).agg(
                 {
                         "FlowAmount":"sum",
                         "ReliabilityScore":wm
@@ -259,7 +282,7 @@ def add_data_collection_score(db, elec_df, subregion="BA"):
         how="left",
     )
     reduced_db = db.drop_duplicates(subset=groupby_cols + ["eGRID_ID"])
-    region_elec = reduced_db.groupby(groupby_cols, as_index=False)[
+    region_elec = reduced_db.groupby(groupby_cols, as_index=False, observed=True)[
         "Electricity"
     ].sum()
     region_elec.rename(
@@ -274,10 +297,9 @@ def add_data_collection_score(db, elec_df, subregion="BA"):
     db["Percent_of_Gen_in_EF_Denominator"] = (
         temp_df["electricity_sum"] / temp_df["region_fuel_electricity"]
     )
-    db["DataCollection"] = db["Percent_of_Gen_in_EF_Denominator"].apply(
-        lambda x: lookup_score_with_bound_key(
-            x, data_collection_lower_bound_to_dqi
-        )
+    db["DataCollection"] = lookup_scores_with_bound_key(
+        db["Percent_of_Gen_in_EF_Denominator"],
+        data_collection_lower_bound_to_dqi,
     )
     db = db.drop(columns="Percent_of_Gen_in_EF_Denominator")
     return db
@@ -343,7 +365,7 @@ def calculate_electricity_by_source(db, subregion="BA"):
     # and try to eliminate flows where all sources are single entities.
     source_df = pd.DataFrame()
     source_df = pd.DataFrame(
-        db_powerplant.groupby(["FlowName", "Compartment"])[["Source"]].apply(
+        db_powerplant.groupby(["FlowName", "Compartment"], observed=True)[["Source"]].apply(
             combine_source_by_flow
         ),
         columns=["source_list"],
@@ -363,7 +385,7 @@ def calculate_electricity_by_source(db, subregion="BA"):
     db_multiple_sources = db_powerplant.loc[db_powerplant["source_string"].isna(), :]
     if len(db_multiple_sources) > 0:
         source_df = pd.DataFrame(
-            db_multiple_sources.groupby(groupby_cols)[["Source"]].apply(
+            db_multiple_sources.groupby(groupby_cols, observed=True)[["Source"]].apply(
                 combine_source_lambda
             ),
             columns=["source_list"],
@@ -412,7 +434,7 @@ def calculate_electricity_by_source(db, subregion="BA"):
         #        total_filter = ~fuelcat_all & src_filter
         sub_db = db.loc[src_filter, :]
         sub_db.drop_duplicates(subset=fuel_agg + ["eGRID_ID"], inplace=True)
-        sub_db_group = sub_db.groupby(elec_groupby_cols, as_index=False).agg(
+        sub_db_group = sub_db.groupby(elec_groupby_cols, as_index=False, observed=True).agg(
             {"Electricity": [np.sum, np.mean], "eGRID_ID": "count"}
         )
         sub_db_group.columns = elec_groupby_cols + [
@@ -454,11 +476,7 @@ def create_generation_process_df():
         egrid_facilities_to_include,
         emissions_and_waste_for_selected_egrid_facilities,
     )
-    from electricitylci.generation import (
-        egrid_facilities_w_fuel_region,
-        add_technological_correlation_score,
-        add_temporal_correlation_score,
-    )
+    egrid_facilities_w_fuel_region = get_egrid_facilities_w_fuel_region()
     import electricitylci.emissions_other_sources as em_other
     import electricitylci.ampd_plant_emissions as ampd
     from electricitylci.combinator import ba_codes
@@ -604,6 +622,7 @@ def create_generation_process_df():
         ba_codes["FERC_Region"]
     )
     final_database=edits.check_for_edits(final_database,"generation.py","create_generation_process_df")
+    final_database = enforce_schema(final_database)
     return final_database
 
 
@@ -632,139 +651,16 @@ def aggregate_data(total_db, subregion="BA"):
     """
     from electricitylci.aggregation_selector import subregion_col
 
-    def geometric_mean(p_series, df, cols):
-        # Alternatively we can use scipy.stats.lognorm to fit a distribution
-        # and provide the parameters
-        if (len(p_series) > 3) & (p_series.quantile(0.5) > 0):
-            # result = gmean(p_series.to_numpy()+1)-1
-            module_logger.debug(
-                f"Calculating confidence interval for"
-                f"{df.loc[p_series.index[0],groupby_cols].values}"
-            )
-            module_logger.debug(f"{p_series.values}")
-            with np.errstate(all='raise'):
-                try:
-                    data = p_series.to_numpy()
-                except (ArithmeticError, ValueError, FloatingPointError):
-                    module_logger.debug("Problem with input data")
-                    return None
-                try:
-                    log_data = np.log(data)
-                except (ArithmeticError, ValueError, FloatingPointError):
-                    module_logger.debug("Problem with log function")
-                    return None
-                try:
-                    mean = np.mean(log_data)
-                except (ArithmeticError, ValueError, FloatingPointError):
-                    module_logger.debug("Problem with mean function")
-                    return None
-                l = len(data)
-                try:
-                    sd = np.std(log_data)/np.sqrt(l)
-                    sd2 = sd ** 2
-                except (ArithmeticError, ValueError, FloatingPointError):
-                    module_logger.debug("Problem with std function")
-                    return None
-                try:
-                    pi1, pi2 = t.interval(alpha=0.90, df=l - 2, loc=mean, scale=sd)
-                except (ArithmeticError, ValueError, FloatingPointError):
-                    module_logger.debug("Problem with t function")
-                    return None
-                try:
-                    upper_interval = np.max(
-                        [
-                            mean
-                            + sd2 / 2
-                            + pi2 * np.sqrt(sd2 / l + sd2 ** 2 / (2 * (l - 1))),
-                            mean
-                            + sd2 / 2
-                            - pi2 * np.sqrt(sd2 / l + sd2 ** 2 / (2 * (l - 1))),
-                        ]
-                    )
-                except:
-                    module_logger.debug("Problem with interval function")
-                    return None
-                try:
-                    result = (np.exp(mean), 0, np.exp(upper_interval))
-                except (ArithmeticError, ValueError, FloatingPointError):
-                    module_logger.debug("Unable to calculate geometric_mean")
-                    return None
-                if result is not None:
-                    return result
-                else:
-                    module_logger.debug(
-                        f"Problem generating uncertainty parameters \n"
-                        f"{df.loc[p_series.index[0],groupby_cols].values}\n"
-                        f"{p_series.values}"
-                        f"{p_series.values+1}"
-                    )
-                    return None
-        else:
-            return None
-
-    def calc_geom_std(df):
-        if region_agg is not None:
-            debug_string=f"{df[region_agg]}-{df['FuelCategory']}-{df['FlowName']}"
-        else:
-            debug_string=f"{df['FuelCategory']}-{df['FlowName']}"
-        module_logger.debug(debug_string)
-        if df["uncertaintyLognormParams"] is None:
-            return None, None
-        if isinstance(df["uncertaintyLognormParams"], str):
-            params = ast.literal_eval(df["uncertaintyLognormParams"])
+    def lognormal_upper_bound(params):
+        # uncertaintyLognormParams are (geometric mean, 0, upper bound)
+        if isinstance(params, str):
+            params = ast.literal_eval(params)
         try:
-            length = len(df["uncertaintyLognormParams"])
+            if len(params) == 3:
+                return params[2]
         except TypeError:
-            module_logger.info(
-                f"Error calculating length of uncertaintyLognormParams"
-                f"{df['uncertaintyLognormParams']}"
-            )
-            return None, None
-
-        if length != 3:
-            module_logger.info(
-                f"Error estimating standard deviation - length: {len(params)}"
-            )
-        else:
-            # In some cases, the final emission factor is far different than the
-            # geometric mean of the individual emission factor. Depending on the
-            # severity, this could be a clear sign of outliers having a large impact
-            # on the final emission factor. When the uncertainty is generated for
-            # these cases, the results can be nonsensical - hence we skip them. A more
-            # agressive approach would be to re-assign the emission factor as well.
-            if df["Emission_factor"]>df["uncertaintyLognormParams"][2]:
-                return None, None
-            else:
-                c=np.log(df["uncertaintyLognormParams"][2])-np.log(df["Emission_factor"])
-                b=-2**0.5*erfinv(2*0.95-1)
-                a=0.5
-                sd1=(-b+(b**2-4*a*c)**0.5)/(2*a)
-                sd2=(-b-(b**2-4*a*c)**0.5)/(2*a)
-                if sd1 is not float("nan") and sd2 is not float("nan"):
-                    if sd1<sd2:
-                        geostd=np.exp(sd1)
-                        geomean=np.exp(np.log(df["Emission_factor"])-0.5*sd1**2)
-                    else:
-                        geostd=np.exp(sd2)
-                        geomean=np.exp(np.log(df["Emission_factor"])-0.5*sd2**2)
-                elif sd1 is not float("nan"):
-                    geostd=np.exp(sd1)
-                    geomean=np.exp(np.log(df["Emission_factor"])-0.5*sd1**2)
-                elif sd2 is not float("nan"):
-                    geostd=np.exp(sd2)
-                    geomean=np.exp(np.log(df["Emission_factor"])-0.5*sd2**2)
-                else:
-                    return None, None
-                if (
-                    (geostd is np.inf)
-                    or (geostd is np.NINF)
-                    or (geostd is np.nan)
-                    or (geostd is float("nan"))
-                    or str(geostd) == "nan"
-                    or (geostd == 0)
-                ):
-                    return None, None
-                return str(geomean), str(geostd)
+            pass
+        return float("nan")
 
     region_agg = subregion_col(subregion)
     fuel_agg = ["FuelCategory"]
@@ -796,7 +692,9 @@ def aggregate_data(total_db, subregion="BA"):
             .drop_duplicates(subset="eGRID_ID")
             .set_index("eGRID_ID")
         )
+        add_categories(total_db, "FuelCategory", key_df["FuelCategory"].unique())
         total_db.loc[total_db["FuelCategory"]!="ALL","FuelCategory"]=total_db["eGRID_ID"].map(key_df["FuelCategory"])
+    add_categories(total_db, "FlowUUID", "dummy-uuid")
     total_db["FlowUUID"] = total_db["FlowUUID"].fillna(value="dummy-uuid")
     total_db = aggregate_facility_flows(total_db)
     total_db, electricity_df = calculate_electricity_by_source(
@@ -827,15 +725,14 @@ def aggregate_data(total_db, subregion="BA"):
         return result
 
     wm = lambda x: wtd_mean(x, total_db, groupby_cols)
-    geo_mean = lambda x: geometric_mean(x, total_db, groupby_cols)
-    geo_mean.__name__ = "geo_mean"
     print(
         "Aggregating flow amounts, dqi information, and calculating uncertainty"
     )
 
-    database_f3 = total_db.groupby(
-        groupby_cols + ["Year", "source_string"], as_index=False
-    ).agg(
+    total_db_groupby = total_db.groupby(
+        groupby_cols + ["Year", "source_string"], as_index=False, observed=True
+    )
+    database_f3 = total_db_groupby.agg(
         {
             "FlowAmount": ["sum", "count"],
             "TemporalCorrelation": wm,
@@ -843,7 +740,7 @@ def aggregate_data(total_db, subregion="BA"):
             "GeographicalCorrelation": wm,
             "DataCollection": wm,
             "ReliabilityScore": wm,
-            "facility_emission_factor": ["min", "max", geo_mean],
+            "facility_emission_factor": ["min", "max"],
         }
     )
     database_f3.columns = groupby_cols + [
@@ -858,7 +755,17 @@ def aggregate_data(total_db, subregion="BA"):
         "ReliabilityScore",
         "uncertaintyMin",
         "uncertaintyMax",
-        "uncertaintyLognormParams",
+    ]
+    # Groups are numbered in the same (sorted) order as the rows of
+    # database_f3.
+    geo_mean, upper, valid = group_lognormal_params(
+        total_db["facility_emission_factor"].to_numpy(),
+        total_db_groupby.ngroup().to_numpy(),
+        total_db_groupby.ngroups,
+    )
+    database_f3["uncertaintyLognormParams"] = [
+        (gm, 0, up) if ok else None
+        for gm, up, ok in zip(geo_mean, upper, valid)
     ]
 
     criteria = database_f3["Compartment"] == "input"
@@ -880,7 +787,7 @@ def aggregate_data(total_db, subregion="BA"):
             how="left",
         ).drop_duplicates(subset=groupby_cols)
     else:
-        total_grouped = total_db.groupby(by=groupby_cols, as_index=False)[
+        total_grouped = total_db.groupby(by=groupby_cols, as_index=False, observed=True)[
             "Electricity"
         ].sum()
         canada_db = pd.merge(
@@ -904,32 +811,17 @@ def aggregate_data(total_db, subregion="BA"):
     # particularly with the Canadian mixes.
     database_f3["Emission_factor"].replace(to_replace=float("inf"),value=0,inplace=True)
     database_f3["Emission_factor"].replace(to_replace=float("-inf"),value=0,inplace=True)
-    if region_agg is not None:
-        database_f3["GeomMean"], database_f3["GeomSD"] = zip(
-            *database_f3[
-                [
-                    "Emission_factor",
-                    "uncertaintyLognormParams",
-                    "uncertaintyMin",
-                    "uncertaintyMax",
-                    "FuelCategory",
-                    "FlowName"
-                ]+region_agg
-            ].apply(calc_geom_std, axis=1)
-        )
-    else:
-        database_f3["GeomMean"], database_f3["GeomSD"] = zip(
-            *database_f3[
-                [
-                    "Emission_factor",
-                    "uncertaintyLognormParams",
-                    "uncertaintyMin",
-                    "uncertaintyMax",
-                    "FuelCategory",
-                    "FlowName"
-                ]
-            ].apply(calc_geom_std, axis=1)
-        )
+    geo_mean, geo_sd, valid = lognormal_params_from_upper(
+        database_f3["Emission_factor"].to_numpy(dtype=float),
+        database_f3["uncertaintyLognormParams"].map(lognormal_upper_bound)
+        .to_numpy(dtype=float),
+    )
+    database_f3["GeomMean"] = [
+        str(gm) if ok else None for gm, ok in zip(geo_mean, valid)
+    ]
+    database_f3["GeomSD"] = [
+        str(gsd) if ok else None for gsd, ok in zip(geo_sd, valid)
+    ]
     database_f3.sort_values(by=groupby_cols, inplace=True)
     return database_f3
 
@@ -960,9 +852,9 @@ def olcaschema_genprocess(database, upstream_dict={}, subregion="BA"):
     """
     from electricitylci.process_dictionary_writer import (
         unit,
-        flow_table_creation,
+        flow_tables,
         ref_exchange_creator,
-        uncertainty_table_creation,
+        uncertainty_tables,
         process_doc_creation,
     )
 
@@ -994,88 +886,93 @@ def olcaschema_genprocess(database, upstream_dict={}, subregion="BA"):
         "GeomMean",
         "GeomSD",
     ]   
-    def turn_data_to_dict(data, upstream_dict):
+    cols_for_exchange_dict = [
+        "internalId",
+        "@type",
+        "avoidedProduct",
+        "flow",
+        "flowProperty",
+        "input",
+        "quantitativeReference",
+        "baseUncertainty",
+        "provider",
+        "amount",
+        "amountFormula",
+        "unit",
+        "pedigreeUncertainty",
+        "dqEntry",
+        "uncertainty",
+        "comment",
+    ]
 
-        module_logger.debug(
-            f"Turning flows from {data.name} into dictionaries"
-        )
-        cols_for_exchange_dict = [
-            "internalId",
-            "@type",
-            "avoidedProduct",
-            "flow",
-            "flowProperty",
-            "input",
-            "quantitativeReference",
-            "baseUncertainty",
-            "provider",
-            "amount",
-            "amountFormula",
-            "unit",
-            "pedigreeUncertainty",
-            "dqEntry",
-            "uncertainty",
-            "comment",
-        ]
-        year = ",".join(data["Year"].astype(str).unique())
-        datasources = ",".join(data["source_string"].astype(str).unique())
+    def add_exchange_columns(data, upstream_dict):
+        """Add the exchange fields that only depend on each row to the whole
+        table at once, so that the groups below only need to add the fields
+        that depend on the group."""
         data["Maximum"] = data["uncertaintyMax"]
         data["Minimum"] = data["uncertaintyMin"]
-        data["uncertainty"] = ""
         data["internalId"] = ""
         data["@type"] = "Exchange"
         data["avoidedProduct"] = False
         data["flowProperty"] = ""
         data["input"]=False
+        compartment = data["Compartment"].str.lower()
         input_filter = (
-                (data["Compartment"].str.lower().str.contains("input")) 
-                | (data["Compartment"].str.lower().str.contains("resource"))
-                | (data["Compartment"].str.lower().str.contains("technosphere"))
+                (compartment.str.contains("input"))
+                | (compartment.str.contains("resource"))
+                | (compartment.str.contains("technosphere"))
         )
         data.loc[input_filter, "input"] = True
         data["baseUncertainty"] = ""
-        data["provider"] = ""
-        data["unit"] = data["Unit"]
-#        data["ElementaryFlowPrimeContext"] = data["Compartment"]
-#        default_unit = unit("kg")
-#        data["unit"] = [default_unit] * len(data)
         data["FlowType"]="ELEMENTARY_FLOW"
         product_filter=(
-                (data["Compartment"].str.lower().str.contains("technosphere"))
-                |(data["Compartment"].str.lower().str.contains("valuable"))
+                (compartment.str.contains("technosphere"))
+                |(compartment.str.contains("valuable"))
         )
         data.loc[product_filter,"FlowType"] = "PRODUCT_FLOW"
         waste_filter=(
-                (data["Compartment"].str.lower().str.contains("technosphere"))
+                (compartment.str.contains("technosphere"))
         )
         data.loc[waste_filter,"FlowType"] = "WASTE_FLOW"
-        data["flow"] = ""
         provider_filter = data["stage_code"].isin(upstream_dict.keys())
-        for index, row in data.loc[provider_filter, :].iterrows():
-            provider_dict = {
-                "name": upstream_dict[getattr(row, "stage_code")]["name"],
-                "categoryPath": upstream_dict[getattr(row, "stage_code")][
-                    "category"
-                ],
+        data["provider"] = [
+            {
+                "name": upstream_dict[code]["name"],
+                "categoryPath": upstream_dict[code]["category"],
                 "processType": "UNIT_PROCESS",
-                "@id": upstream_dict[getattr(row, "stage_code")]["uuid"],
+                "@id": upstream_dict[code]["uuid"],
             }
-            data.at[index, "provider"] = provider_dict
-            data.at[index, "unit"] = unit(
-                upstream_dict[getattr(row, "stage_code")]["q_reference_unit"]
-            )
-            data.at[index, "FlowType"] = "PRODUCT_FLOW"
-        for index, row in data.iterrows():
-            data.at[index, "uncertainty"] = uncertainty_table_creation(
-                data.loc[index:index, :]
+            if is_provider else ""
+            for code, is_provider in zip(
+                data["stage_code"].values, provider_filter.values
             )
-            data.at[index, "flow"] = flow_table_creation(
-                data.loc[index:index, :]
+        ]
+        data["unit"] = [
+            unit(upstream_dict[code]["q_reference_unit"])
+            if is_provider else data_unit
+            for code, data_unit, is_provider in zip(
+                data["stage_code"].values,
+                data["Unit"].values,
+                provider_filter.values,
             )
+        ]
+        data.loc[provider_filter, "FlowType"] = "PRODUCT_FLOW"
+        data["uncertainty"] = uncertainty_tables(data)
+        data["flow"] = flow_tables(data)
         data["amount"] = data["Emission_factor"]
         data["amountFormula"] = ""
         data["quantitativeReference"] = False
-        data["dqEntry"] = (
+        data["pedigreeUncertainty"] = ""
+        return data
+
+    def turn_data_to_dict(data):
+
+        module_logger.debug(
+            f"Turning flows from {data.name} into dictionaries"
+        )
+        year = ",".join(data["Year"].astype(str).unique())
+        datasources = ",".join(data["source_string"].astype(str).unique())
+        dq_entry = (
             "("
             + str(round(data["ReliabilityScore"].iloc[0], 1))
             + ";"
@@ -1088,20 +985,28 @@ def olcaschema_genprocess(database, upstream_dict={}, subregion="BA"):
             + str(round(data["DataCollection"].iloc[0], 1))
             + ")"
         )
-        data["pedigreeUncertainty"] = ""
-        data["comment"] = f"{datasources} - {year}"
-        data_for_dict = data[cols_for_exchange_dict]
-        data_for_dict = data_for_dict.append(
-            ref_exchange_creator(), ignore_index=True
+        data_for_dict = data.assign(
+            dqEntry=dq_entry, comment=f"{datasources} - {year}"
+        )[cols_for_exchange_dict]
+        data_for_dict = pd.concat(
+            [data_for_dict, pd.DataFrame([ref_exchange_creator()])],
+            ignore_index=True,
         )
         data_dict = data_for_dict.to_dict("records")
         return data_dict
 
-    database_groupby = database.groupby(by=base_cols)
+    exchange_df = add_exchange_columns(
+        database[base_cols + non_agg_cols].copy(), upstream_dict
+    )
+    database_groupby = exchange_df.groupby(by=base_cols, observed=True)
     process_df = pd.DataFrame(
-        database_groupby[non_agg_cols].apply(
-            turn_data_to_dict, (upstream_dict)
-        )
+        database_groupby[
+            non_agg_cols
+            + [
+                c for c in cols_for_exchange_dict
+                if c not in ["dqEntry", "comment"]
+            ]
+        ].apply(turn_data_to_dict)
     )
     process_df.columns = ["exchanges"]
     process_df.reset_index(inplace=True)
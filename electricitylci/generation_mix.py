@@ -6,45 +6,56 @@ The functions in this script calculate the fraction of each generating source
 import numpy as np
 import pandas as pd
 from electricitylci.process_dictionary_writer import *
-from electricitylci.egrid_facilities import egrid_facilities, egrid_subregions
+from electricitylci.egrid_facilities import (
+    get_egrid_facilities,
+    get_egrid_subregions,
+)
 from electricitylci.model_config import model_specs
-from electricitylci.generation import eia_facility_fuel_region
+from electricitylci.generation import (
+    eia_facility_fuel_region,
+    get_egrid_facilities_w_fuel_region,
+)
+from electricitylci.utils import ProviderIndex
+from functools import lru_cache
 import logging
 
-# Get a subset of the egrid_facilities dataset
-egrid_facilities_w_fuel_region = egrid_facilities[
-    [
-        "FacilityID",
-        "Subregion",
-        "PrimaryFuel",
-        "FuelCategory",
-        "NERC",
-        "PercentGenerationfromDesignatedFuelCategory",
-        "Balancing Authority Name",
-        "Balancing Authority Code",
+
+@lru_cache(maxsize=4)
+def _ref_egrid_subregion_generation_by_fuelcategory_with_NERC(egrid_year):
+    # Get reference regional generation data by fuel type, add in NERC
+    from electricitylci.egrid_energy import (
+        ref_egrid_subregion_generation_by_fuelcategory,
+    )
+
+    egrid_subregions_NERC = get_egrid_facilities()[["Subregion", "FuelCategory", "NERC"]]
+    egrid_subregions_NERC = egrid_subregions_NERC.drop_duplicates()
+    egrid_subregions_NERC = egrid_subregions_NERC[
+        egrid_subregions_NERC["NERC"].notnull()
     ]
-]
+    ref_egrid_subregion_generation_by_fuelcategory_with_NERC = pd.merge(
+        ref_egrid_subregion_generation_by_fuelcategory,
+        egrid_subregions_NERC,
+        on=["Subregion", "FuelCategory"],
+    )
 
-# Get reference regional generation data by fuel type, add in NERC
-from electricitylci.egrid_energy import (
-    ref_egrid_subregion_generation_by_fuelcategory,
-)
+    ref_egrid_subregion_generation_by_fuelcategory_with_NERC = ref_egrid_subregion_generation_by_fuelcategory_with_NERC.rename(
+        columns={"Ref_Electricity_Subregion_FuelCategory": "Electricity"}
+    )
+    return ref_egrid_subregion_generation_by_fuelcategory_with_NERC
 
-egrid_subregions_NERC = egrid_facilities[["Subregion", "FuelCategory", "NERC"]]
-egrid_subregions_NERC = egrid_subregions_NERC.drop_duplicates()
-len(egrid_subregions_NERC)
-egrid_subregions_NERC = egrid_subregions_NERC[
-    egrid_subregions_NERC["NERC"].notnull()
-]
-ref_egrid_subregion_generation_by_fuelcategory_with_NERC = pd.merge(
-    ref_egrid_subregion_generation_by_fuelcategory,
-    egrid_subregions_NERC,
-    on=["Subregion", "FuelCategory"],
-)
 
-ref_egrid_subregion_generation_by_fuelcategory_with_NERC = ref_egrid_subregion_generation_by_fuelcategory_with_NERC.rename(
-    columns={"Ref_Electricity_Subregion_FuelCategory": "Electricity"}
-)
+def get_ref_egrid_subregion_generation_by_fuelcategory_with_NERC():
+    """
+    Return the eGRID reference generation by subregion and fuel category,
+    with the NERC region of each subregion. The data are read on first use.
+
+    Returns
+    -------
+    dataframe
+    """
+    return _ref_egrid_subregion_generation_by_fuelcategory_with_NERC(
+        model_specs.egrid_year
+    )
 
 
 def create_generation_mix_process_df_from_model_generation_data(
@@ -92,6 +103,7 @@ def create_generation_mix_process_df_from_model_generation_data(
         #     database_for_genmix_final['Balancing Authority Name']
         # )
     else:
+        egrid_facilities_w_fuel_region = get_egrid_facilities_w_fuel_region()
         egrid_facilities_w_fuel_region["FacilityID"]=egrid_facilities_w_fuel_region["FacilityID"].astype(int)
         database_for_genmix_final = pd.merge(
             generation_data, egrid_facilities_w_fuel_region, on="FacilityID"
@@ -138,16 +150,16 @@ def create_generation_mix_process_df_from_model_generation_data(
     if model_specs.keep_mixed_plant_category:
         pass
     subregion_fuel_gen = database_for_genmix_final.groupby(
-        group_cols, as_index=False
+        group_cols, as_index=False, observed=True
     )["Electricity"].sum()
 
     # Groupby .transform method returns a dataframe of the same len as the original
     if subregion == "US":
         subregion_total_gen = subregion_fuel_gen["Electricity"].sum()
     else:
-        subregion_total_gen = subregion_fuel_gen.groupby("Subregion")[
-            "Electricity"
-        ].transform("sum")
+        subregion_total_gen = subregion_fuel_gen.groupby(
+            "Subregion", observed=True
+        )["Electricity"].transform("sum")
     subregion_fuel_gen["Generation_Ratio"] = (
         subregion_fuel_gen["Electricity"] / subregion_total_gen
     )
@@ -246,9 +258,12 @@ def create_generation_mix_process_df_from_egrid_ref_data(subregion=None):
     """
     if subregion is None:
         subregion = model_specs.regional_aggregation
+    ref_egrid_subregion_generation_by_fuelcategory_with_NERC = (
+        get_ref_egrid_subregion_generation_by_fuelcategory_with_NERC()
+    )
     # Converting to numeric for better stability and merging
     if subregion == "eGRID":
-        regions = egrid_subregions
+        regions = get_egrid_subregions()
     elif subregion == "NERC":
         regions = list(
             pd.unique(
@@ -307,51 +322,52 @@ def olcaschema_genmix(database, gen_dict, subregion=None):
     if subregion is None:
         subregion = model_specs.regional_aggregation
     generation_mix_dict = {}
+    gen_index = ProviderIndex(gen_dict)
 
     if "Subregion" in database.columns:
         region = list(pd.unique(database["Subregion"]))
     else:
         region = ["US"]
         database["Subregion"] = "US"
+    # Only the first row for each region and fuel is used, so they are found
+    # in one pass and put in the order the fuels appear in the database.
+    fuel_order = {
+        fuel: i for i, fuel in enumerate(database["FuelCategory"].unique())
+    }
+    first_rows = database.drop_duplicates(subset=["Subregion", "FuelCategory"])
+    first_rows = first_rows.iloc[
+        np.argsort(
+            first_rows["FuelCategory"].map(fuel_order).values, kind="stable"
+        )
+    ]
+    region_rows = dict(tuple(
+        first_rows.groupby("Subregion", sort=False, observed=True)
+    ))
     for reg in region:
 
-        database_reg = database[database["Subregion"] == reg]
+        database_reg = region_rows[reg]
         exchanges_list = []
 
         # Creating the reference output
         exchange(exchange_table_creation_ref(database_reg), exchanges_list)
-        for fuelname in list(database["FuelCategory"].unique()):
-            # Reading complete fuel name and heat content information
-            # fuelname = row['Fuelname']
-            # croppping the database according to the current fuel being considered
-            database_f1 = database_reg[
-                database_reg["FuelCategory"] == fuelname
-            ]
-            if database_f1.empty != True:
-                ra = exchange_table_creation_input_genmix(
-                    database_f1, fuelname
+        for k, fuelname in enumerate(database_reg["FuelCategory"]):
+            if pd.isna(fuelname):
+                continue
+            ra = exchange_table_creation_input_genmix(
+                database_reg.iloc[k:k + 1], fuelname
+            )
+            ra["quantitativeReference"] = False
+            provider = gen_index.provider(
+                "Electricity - " + fuelname + " - " + reg
+            )
+            if provider is None:
+                logging.warning(
+                    f"Trouble matching dictionary for {fuelname} - {reg}"
                 )
-                ra["quantitativeReference"] = False
-                matching_dict = None
-                for generator in gen_dict:
-                    if (
-                        gen_dict[generator]["name"]
-                        == "Electricity - " + fuelname + " - " + reg
-                    ):
-                        matching_dict = gen_dict[generator]
-                        break
-                if matching_dict is None:
-                    logging.warning(
-                        f"Trouble matching dictionary for {fuelname} - {reg}"
-                    )
-                else:
-                    ra["provider"] = {
-                        "name": matching_dict["name"],
-                        "@id": matching_dict["uuid"],
-                        "category": matching_dict["category"].split("/"),
-                    }
-                exchange(ra, exchanges_list)
-                # Writing final file
+            else:
+                ra["provider"] = provider
+            exchange(ra, exchanges_list)
+            # Writing final file
 
         final = process_table_creation_genmix(reg, exchanges_list)
 
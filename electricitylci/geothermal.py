@@ -8,16 +8,16 @@ import pandas as pd
 from electricitylci.globals import data_dir, output_dir
 
 from electricitylci.eia923_generation import eia923_download_extract
+from electricitylci.factored_inventory import FactoredInventory
 
-import copy
 
-
-def generate_upstream_geo(year):
+def geothermal_inventory(year):
     """
-    Generate the annual emissions from geothermal power plants. These emissions
-    are from an NETL-developed model that takes into account the insoluble gases
-    present in the geothermal fluid and the type of geothermal power to develop
-    emission factors for those gases.
+    Emissions per MWh from geothermal power plants in each state and the net
+    generation of each plant. These emissions are from an NETL-developed
+    model that takes into account the insoluble gases present in the
+    geothermal fluid and the type of geothermal power to develop emission
+    factors for those gases.
 
     Parameters
     ----------
@@ -26,7 +26,7 @@ def generate_upstream_geo(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
 
     geothermal_state_dict = {
@@ -80,38 +80,52 @@ def generate_upstream_geo(year):
         value_name="FlowAmount",
     )
     geo_lci["stage_code"] = geo_lci["stage_code"].map(geothermal_state_dict)
+    geo_lci.rename(columns={"stage_code": "State"}, inplace=True)
 
-    geo_merged = pd.merge(
-        left=geo_generation_data,
-        right=geo_lci,
-        left_on=["State"],
-        right_on=["stage_code"],
-        how="left",
-    )
-
-    geo_merged.rename(
-        columns={"Net Generation (Megawatthours)": "quantity"}, inplace=True
-    )
-    geo_merged["Electricity"]=geo_merged["quantity"]
-    # Convert the inventory per MWh emissions to an annual emission
-    geo_merged["FlowAmount"] = (
-        geo_merged["FlowAmount"] * geo_merged["quantity"]
-    )
-    geo_merged["Electricity"] = geo_merged["quantity"]
-    # Filling out some columns to be consistent with other upstream dataframes
-    geo_merged["fuel_type"] = "Geothermal"
-    geo_merged["stage_code"] = "Power plant"
-    #    geo_merged.drop(columns=['unit'])
-    geo_merged.rename(columns={"unit":"Unit"},inplace=True)
-    geo_merged.rename(
-        columns={"compartment": "Compartment", "Plant Id": "plant_id"},
+    geo_generation_data.rename(
+        columns={
+            "Net Generation (Megawatthours)": "quantity",
+            "Plant Id": "plant_id",
+        },
         inplace=True,
     )
-    geo_merged["Compartment"].fillna(geo_merged["Directionality"],inplace=True)
+    geo_generation_data["Electricity"] = geo_generation_data["quantity"]
+    # Filling out some columns to be consistent with other upstream dataframes
+    geo_lci["fuel_type"] = "Geothermal"
+    geo_lci["stage_code"] = "Power plant"
+    #    geo_lci.drop(columns=['unit'])
+    geo_lci.rename(columns={"unit":"Unit"},inplace=True)
+    geo_lci.rename(columns={"compartment": "Compartment"}, inplace=True)
+    geo_lci["Compartment"].fillna(geo_lci["Directionality"],inplace=True)
     input_dict={"emission":False,"resource":True}
-    geo_merged["Directionality"]=geo_merged["Directionality"].map(input_dict)
-    geo_merged.rename(columns={"Directionality":"input"},inplace=True)
-    return geo_merged
+    geo_lci["Directionality"]=geo_lci["Directionality"].map(input_dict)
+    geo_lci.rename(columns={"Directionality":"input"},inplace=True)
+    return FactoredInventory(geo_lci, geo_generation_data, on="State")
+
+
+def generate_upstream_geo(year):
+    """
+    Generate the annual emissions from geothermal power plants. These emissions
+    are from an NETL-developed model that takes into account the insoluble gases
+    present in the geothermal fluid and the type of geothermal power to develop
+    emission factors for those gases.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
+
+    Returns
+    ----------
+    dataframe
+    """
+    geo_upstream = geothermal_inventory(year).expand()
+    # Plants in states without an inventory are kept with no flows.
+    geo_upstream["fuel_type"] = geo_upstream["fuel_type"].fillna("Geothermal")
+    geo_upstream["stage_code"] = geo_upstream["stage_code"].fillna(
+        "Power plant"
+    )
+    return geo_upstream
 
 
 if __name__ == "__main__":
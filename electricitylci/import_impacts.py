@@ -41,15 +41,6 @@ def generate_canadian_mixes(us_inventory):
             "output":False,
             "ground":False
             }
-    print("Generating inventory for Canadian balancing authority areas")
-    canadian_mix = pd.read_csv(f"{data_dir}/canadian_imports.csv")
-    baa_codes = list(canadian_mix["Code"].unique())
-    canadian_mix["Balancing Authority Name"]=canadian_mix["Code"].map(ba_codes["BA_Name"])
-    canadian_mix = canadian_mix.melt(
-        id_vars=["Code", "Balancing Authority Name", "Province"],
-        var_name="FuelCategory",
-        value_name="FuelCategory_fraction",
-    )
     if "input" in us_inventory.columns:
         us_inventory.loc[us_inventory["input"].isna(),"input"]=us_inventory["Compartment"].map(input_map)
     else:
@@ -59,6 +50,16 @@ def generate_canadian_mixes(us_inventory):
     # Let's create it.
     if "quantity" not in list(us_inventory.columns):
         us_inventory["quantity"]=float("nan")
+
+    print("Generating inventory for Canadian balancing authority areas")
+    canadian_mix = pd.read_csv(f"{data_dir}/canadian_imports.csv")
+    canadian_mix["Balancing Authority Name"]=canadian_mix["Code"].map(ba_codes["BA_Name"])
+    canadian_mix = canadian_mix.melt(
+        id_vars=["Code", "Balancing Authority Name", "Province"],
+        var_name="FuelCategory",
+        value_name="FuelCategory_fraction",
+    )
+    canadian_mix.dropna(subset=["FuelCategory_fraction"], inplace=True)
     us_inventory_summary = us_inventory.groupby(
         by=[
             "FuelCategory",
@@ -67,7 +68,8 @@ def generate_canadian_mixes(us_inventory):
             #                    'ElementaryFlowPrimeContext',
             "FlowUUID",
             #                    'stage_code',
-        ]
+        ],
+        observed=True,
     )["FlowAmount", "quantity"].sum()
     us_inventory_electricity = us_inventory.drop_duplicates(subset=["FuelCategory","FlowName","FlowUUID","Unit","Electricity"]).groupby(
         by=[
@@ -77,7 +79,8 @@ def generate_canadian_mixes(us_inventory):
             #                    'ElementaryFlowPrimeContext',
             "FlowUUID",
             #                    'stage_code',
-        ]
+        ],
+        observed=True,
     )["Electricity"].sum()
     us_inventory_summary=pd.concat([us_inventory_summary,us_inventory_electricity],axis=1)
     us_inventory_summary = us_inventory_summary.reset_index()
@@ -96,20 +99,17 @@ def generate_canadian_mixes(us_inventory):
     us_inventory_summary["Compartment_path"]=us_inventory_summary["FlowUUID"].map(
         flowuuid_compartment_df["Compartment_path"]
     )
-    ca_mix_list = list()
-    for baa_code in baa_codes:
-        filter_crit = canadian_mix["Code"] == baa_code
-        ca_inventory = pd.merge(
-            left=us_inventory_summary,
-            right=canadian_mix.loc[filter_crit, :],
-            left_on="FuelCategory",
-            right_on="FuelCategory",
-            how="left",
-        )
-        ca_inventory.dropna(subset=["FuelCategory_fraction"], inplace=True)
-        ca_mix_list.append(ca_inventory)
+    # Every U.S. fuel category inventory is paired with the fraction of
+    # that fuel category in each Canadian balancing authority area.
+    ca_mix_inventory = pd.merge(
+        left=us_inventory_summary,
+        right=canadian_mix,
+        left_on="FuelCategory",
+        right_on="FuelCategory",
+        how="inner",
+    )
     blank_df = pd.DataFrame(columns=us_inventory.columns)
-    ca_mix_inventory = pd.concat(ca_mix_list + [blank_df],ignore_index=True)
+    ca_mix_inventory = pd.concat([ca_mix_inventory, blank_df],ignore_index=True)
 
     ca_mix_inventory[
         ["Electricity", "FlowAmount", "quantity"]
@@ -131,6 +131,7 @@ def generate_canadian_mixes(us_inventory):
             "Unit"
         ],
         as_index=False,
+        observed=True,
     )[["Electricity", "FlowAmount", "quantity"]].sum()
     ca_mix_inventory["stage_code"] = "life cycle"
     ca_mix_inventory.sort_values(
@@ -0,0 +1,410 @@
+"""
+Time, memory, and row counts of the stages of a model run.
+
+main() and the functions in electricitylci/__init__.py run their stages
+through stage, call, or instrumented, which add a StageRecord to records with
+the wall and CPU time of the stage, how much the peak resident memory (RSS)
+of the process rose above its memory at the start of the stage, and the
+number of rows passed in and returned. main() saves the records as a json
+run report next to the JSON-LD zip file (see write_report).
+
+Stages can be nested, e.g., the upstream inventories are stages within
+get_upstream_process_df. Each record has the index of the stage it ran
+within, and the peak memory of a stage includes the stages within it.
+
+Setting profile to "cprofile" or "tracemalloc" (main.py's --profile option)
+also profiles the stages named in profile_stages, or all of them if it is
+None. cProfile statistics are saved to profile_dir and the functions with the
+most cumulative time are added to the record; with tracemalloc the peak
+traced memory and the lines that allocated the most memory still held at
+the end of the stage are added. Only the outermost stage being profiled is
+run under cProfile, so the stages within it are included in its profile.
+"""
+
+import cProfile
+import datetime
+import functools
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+from electricitylci.globals import output_dir
+from electricitylci.factored_inventory import FactoredInventory
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+module_logger = logging.getLogger("instrumentation.py")
+
+# Set by main.py from its --profile and --profile_stages options.
+profile = None
+profile_stages = None
+# Folder for the cProfile statistics, by default the "profiles" folder in
+# output_dir. main.py uses a folder next to the JSON-LD zip file.
+profile_dir = None
+
+# The StageRecord of every stage run since the last reset, in the order the
+# stages started.
+records = []
+_active = []
+_profiler = None
+
+
+class StageRecord:
+    """
+    Measurements of one run of a stage.
+
+    Parameters
+    ----------
+    name : str
+    index : int
+        Position of the record in records.
+    parent : int or None
+        Index of the stage this one ran within.
+    """
+
+    def __init__(self, name, index, parent=None):
+        self.name = name
+        self.index = index
+        self.parent = parent
+        self.depth = 0 if parent is None else records[parent].depth + 1
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.rss_start_mb = None
+        self.peak_rss_delta_mb = None
+        self.rows_in = None
+        self.rows_out = None
+        self.error = None
+        # Set when the stage is profiled.
+        self.profile = None
+        self.profile_top = None
+        self.traced_peak_mb = None
+        self.top_allocations = None
+
+    def __repr__(self):
+        return f"StageRecord({self.name!r}, {self.wall_seconds} s)"
+
+    def set_inputs(self, *inputs):
+        """Count the rows of the stage's inputs."""
+        self.rows_in = _sum_rows(inputs)
+
+    def set_output(self, output):
+        """Count the rows of the stage's result."""
+        self.rows_out = count_rows(output)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def count_rows(obj):
+    """
+    Return the number of rows of a stage's input or result: the length of
+    a dataframe, the rows of the intensities and activity of a
+    FactoredInventory, the number of processes in a dictionary of processes
+    (or the total rows of a dictionary of dataframes), and the total rows of
+    a tuple or list. None for anything else.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, FactoredInventory):
+        return len(obj.intensities) + len(obj.activity)
+    if isinstance(obj, dict):
+        if obj and all(
+            isinstance(v, (pd.DataFrame, FactoredInventory))
+            for v in obj.values()
+        ):
+            return _sum_rows(obj.values())
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        return _sum_rows(obj)
+    return None
+
+
+def _sum_rows(objs):
+    counts = [c for c in (count_rows(o) for o in objs) if c is not None]
+    return sum(counts) if counts else None
+
+
+def _proc_status_bytes(field):
+    """Return a memory field (e.g., VmRSS) of /proc/self/status in bytes."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def _reset_rss_peak():
+    """Reset the peak RSS (VmHWM) of the process to its current RSS."""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _max_rss_bytes():
+    """Peak RSS of the process since it started, from getrusage."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _current_rss_bytes():
+    try:
+        return _proc_status_bytes("VmRSS")
+    except OSError:
+        return None
+
+
+class _PeakGauge:
+    """
+    The peak of a memory measure over each of a set of nested stages, for a
+    measure whose peak can be read and reset (e.g., VmHWM or the peak traced
+    by tracemalloc). The peak is reset at the start of each stage, so the
+    peak so far is kept for the stage that was running and included in its
+    peak when it stops.
+    """
+
+    def __init__(self, read_peak, reset_peak):
+        self._read_peak = read_peak
+        self._reset_peak = reset_peak
+        self._peaks = []
+
+    def start(self):
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], self._read_peak())
+        self._reset_peak()
+        self._peaks.append(0)
+
+    def stop(self):
+        peak = max(self._peaks.pop(), self._read_peak())
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        return peak
+
+
+@functools.lru_cache(maxsize=None)
+def _rss_gauge():
+    """Return a _PeakGauge for the RSS if the peak can be reset (Linux), or
+    None."""
+    try:
+        _reset_rss_peak()
+        if _proc_status_bytes("VmHWM") is None:
+            return None
+    except OSError:
+        return None
+    return _PeakGauge(lambda: _proc_status_bytes("VmHWM"), _reset_rss_peak)
+
+
+@functools.lru_cache(maxsize=None)
+def _traced_gauge():
+    """Return a _PeakGauge for the memory traced by tracemalloc. The peak can
+    only be reset in Python 3.9 and later; before that, the peak of a stage
+    is the peak since tracing started."""
+    reset_peak = getattr(tracemalloc, "reset_peak", lambda: None)
+    return _PeakGauge(lambda: tracemalloc.get_traced_memory()[1], reset_peak)
+
+
+def reset():
+    """Clear the records, e.g., at the start of a model run."""
+    records.clear()
+
+
+def _profiled(name):
+    if profile is None:
+        return False
+    if profile_stages is None:
+        return True
+    return name in profile_stages or name.rsplit(".", 1)[-1] in profile_stages
+
+
+def _profile_path(record):
+    folder = profile_dir or os.path.join(output_dir, "profiles")
+    os.makedirs(folder, exist_ok=True)
+    safe_name = "".join(
+        c if c.isalnum() or c in "._-" else "_" for c in record.name
+    )
+    return os.path.join(folder, f"{record.index:03d}_{safe_name}.prof")
+
+
+def _top_functions(profiler, n=10):
+    """The n functions with the most cumulative time in a profile."""
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "function": f"{filename}:{line}({function})",
+            "calls": calls,
+            "cumulative_seconds": cumulative,
+        }
+        for (filename, line, function), (_, calls, _, cumulative, _)
+        in top[:n]
+    ]
+
+
+def _top_allocations(n=10):
+    """The n lines that allocated the most memory that is still held."""
+    stats = tracemalloc.take_snapshot().statistics("lineno")
+    return [
+        {
+            "location": str(stat.traceback),
+            "size_mb": stat.size / 1e6,
+            "count": stat.count,
+        }
+        for stat in stats[:n]
+    ]
+
+
+@contextmanager
+def stage(name, *inputs):
+    """
+    Measure the code in the block as a stage.
+
+    Parameters
+    ----------
+    name : str
+    *inputs
+        The stage's inputs, to count their rows.
+
+    Yields
+    ------
+    StageRecord
+        Call its set_output method with the result of the stage to count
+        its rows.
+    """
+    global _profiler
+    record = StageRecord(
+        name, len(records), _active[-1].index if _active else None
+    )
+    record.set_inputs(*inputs)
+    records.append(record)
+    _active.append(record)
+
+    profiler = None
+    traced = False
+    started_tracing = False
+    if _profiled(name):
+        if profile == "cprofile" and _profiler is None:
+            profiler = _profiler = cProfile.Profile()
+        elif profile == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            _traced_gauge().start()
+            traced = True
+
+    record.rss_start_mb = _mb(_current_rss_bytes())
+    max_rss_start = _max_rss_bytes()
+    rss_peaks = _rss_gauge()
+    if rss_peaks is not None:
+        rss_peaks.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    except BaseException as e:
+        record.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record.wall_seconds = time.perf_counter() - wall_start
+        record.cpu_seconds = time.process_time() - cpu_start
+        if rss_peaks is not None:
+            peak = rss_peaks.stop()
+            if record.rss_start_mb is not None:
+                record.peak_rss_delta_mb = _mb(peak) - record.rss_start_mb
+        elif max_rss_start is not None:
+            # Without a way to reset the peak, only a rise in the peak since
+            # the process started can be seen.
+            record.peak_rss_delta_mb = _mb(_max_rss_bytes() - max_rss_start)
+        if profiler is not None:
+            _profiler = None
+            record.profile = _profile_path(record)
+            profiler.dump_stats(record.profile)
+            record.profile_top = _top_functions(profiler)
+        if traced:
+            record.traced_peak_mb = _mb(_traced_gauge().stop())
+            record.top_allocations = _top_allocations()
+            if started_tracing:
+                tracemalloc.stop()
+        _active.pop()
+        module_logger.info(
+            f"{name}: {record.wall_seconds:.1f} s wall, "
+            f"{record.cpu_seconds:.1f} s CPU, "
+            f"rows {record.rows_in} -> {record.rows_out}"
+        )
+
+
+def _mb(n_bytes):
+    return None if n_bytes is None else n_bytes / 1e6
+
+
+def stage_name(func):
+    """The name of a function's stage, e.g., "generation.aggregate_data"."""
+    module = getattr(func, "__module__", None) or ""
+    name = getattr(func, "__qualname__", None) or repr(func)
+    return f"{module.rsplit('.', 1)[-1]}.{name}" if module else name
+
+
+def call(func, *args, **kwargs):
+    """
+    Return func(*args, **kwargs), measured as a stage named after the
+    function (see stage_name).
+    """
+    with stage(stage_name(func), *args, *kwargs.values()) as record:
+        result = func(*args, **kwargs)
+        record.set_output(result)
+    return result
+
+
+def instrumented(func):
+    """Decorator that measures every call of a function as a stage."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return call(func, *args, **kwargs)
+
+    return wrapper
+
+
+def report_path(jsonld_path):
+    """The path of the run report for a JSON-LD zip file."""
+    return os.path.splitext(jsonld_path)[0] + "_run_report.json"
+
+
+def write_report(path, **run_info):
+    """
+    Save the records as json.
+
+    Parameters
+    ----------
+    path : str
+    **run_info
+        Other values to include in the report (e.g., the model name).
+
+    Returns
+    -------
+    str
+        The path.
+    """
+    report = dict(run_info)
+    report["profile"] = profile
+    report["peak_rss_mb"] = _mb(_max_rss_bytes())
+    report["stages"] = [record.to_dict() for record in records]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
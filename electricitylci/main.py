@@ -3,24 +3,90 @@ import logging
 
 from electricitylci.globals import output_dir
 import electricitylci.model_config as config
-from electricitylci.utils import fill_default_provider_uuids
+from electricitylci.utils import fill_default_provider_uuids, ProviderIndex
+import electricitylci.stage_cache as stage_cache
+import electricitylci.schema as schema
+import electricitylci.downloads as downloads
+import electricitylci.instrumentation as instrumentation
+import electricitylci.olca_jsonld_writer as olca_jsonld_writer
 import argparse
+import os
+import time
 
-def main():
+def main(use_cache=False):
     """This function will generate an openLCA-schema JSON-LD zip file containing
     life cycle inventory for US power plants based on the settings in the
     user-specified configuration file.
+
+    The time, memory, and row counts of each stage are saved to a json run
+    report next to the zip file (see electricitylci.instrumentation), also
+    if the run fails.
+
+    Parameters
+    ----------
+    use_cache : bool, optional
+        If True, the dataframes created by each stage are loaded from (or
+        saved to) the on-disk stage cache so that subsequent runs with the same
+        model configuration and input files skip rebuilding them, by default
+        False
     """
     logger = logging.getLogger("main")
     if config.model_specs is None:
         config.model_specs = config.build_model_class()
+    stage_cache.enabled = use_cache
+    instrumentation.reset()
+    if instrumentation.profile_dir is None:
+        instrumentation.profile_dir = (
+            os.path.splitext(config.model_specs.namestr)[0] + "_profiles"
+        )
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        _run_model(use_cache)
+    finally:
+        report = instrumentation.write_report(
+            instrumentation.report_path(config.model_specs.namestr),
+            model_name=config.model_specs.model_name,
+            jsonld=config.model_specs.namestr,
+            stage_cache=use_cache,
+            wall_seconds=time.perf_counter() - wall_start,
+            cpu_seconds=time.process_time() - cpu_start,
+        )
+        logger.info(f"Run report saved to {report}")
+
+
+def _run_model(use_cache):
+    logger = logging.getLogger("main")
+
+    def run_stage(stage, func, *args, key_parts=(), **kwargs):
+        # Dataframes are passed between stages (and cached) with the dtypes
+        # in electricitylci.schema.
+        with instrumentation.stage(
+            stage, *args, *kwargs.values()
+        ) as record:
+            if use_cache:
+                result = stage_cache.cached_stage(
+                    stage, config.model_specs, func, *args,
+                    key_parts=key_parts, **kwargs
+                )
+            else:
+                result = func(*args, **kwargs)
+            result = schema.enforce_schema(result)
+            record.set_output(result)
+        return result
     # There are essentially two paths - with and without upstream (i.e., fuel)
     # processes.
     if config.model_specs.include_upstream_processes is True:
         # Create dataframe with all generation process data. This will also
         # include upstream and Canadian data.
         print("get generation process")
-        upstream_df = electricitylci.get_upstream_process_df(config.model_specs.eia_gen_year)
+        upstream_df = run_stage(
+            "upstream",
+            electricitylci.get_upstream_process_df,
+            config.model_specs.eia_gen_year,
+            factored=True,
+            key_parts=("factored",)
+        )
         print("write generation process to dict")
         upstream_dict = electricitylci.write_upstream_process_database_to_dict(
             upstream_df
@@ -29,15 +95,29 @@ def main():
         # has to be done here if the information is going to be included in final
         # outputs.
         upstream_dict = electricitylci.write_upstream_dicts_to_jsonld(upstream_dict)
-        generation_process_df = electricitylci.get_generation_process_df(
-            upstream_df=upstream_df, upstream_dict=upstream_dict
+        # The generation stage includes the upstream inventory, so a cached
+        # result is only used with the same upstream processes.
+        if use_cache:
+            upstream_key = (
+                stage_cache.fingerprint(upstream_df),
+                stage_cache.fingerprint(upstream_dict),
+            )
+        else:
+            upstream_key = ()
+        generation_process_df = run_stage(
+            "generation",
+            electricitylci.get_generation_process_df,
+            upstream_df=upstream_df, upstream_dict=upstream_dict,
+            key_parts=upstream_key
         )
     else:
         # Create dataframe with all generation process data. This will also
         # include upstream and Canadian data.
         upstream_dict={}
         upstream_df=None
-        generation_process_df = electricitylci.get_generation_process_df(
+        generation_process_df = run_stage(
+            "generation",
+            electricitylci.get_generation_process_df,
             upstream_df=upstream_df
         )
     print("write gen process to jsonld")
@@ -57,9 +137,16 @@ def main():
     # balancing authority areas.
     print("get gen mix process")
     if config.model_specs.regional_aggregation in ["FERC","US"]:
-        generation_mix_df = electricitylci.get_generation_mix_process_df("BA")
+        generation_mix_df = run_stage(
+            "generation_mix",
+            electricitylci.get_generation_mix_process_df,
+            "BA",
+            key_parts=("BA",)
+        )
     else:
-        generation_mix_df = electricitylci.get_generation_mix_process_df()
+        generation_mix_df = run_stage(
+            "generation_mix", electricitylci.get_generation_mix_process_df
+        )
     print("write gen mix to dict")
     generation_mix_dict = electricitylci.write_generation_mix_database_to_dict(
         generation_mix_df, generation_process_dict)
@@ -72,7 +159,12 @@ def main():
     if config.model_specs.EPA_eGRID_trading is False:
         print("using alt gen method for consumption mix")
         regions_to_keep=list(generation_mix_dict.keys())
-        cons_mix_df_dict = electricitylci.get_consumption_mix_df(regions_to_keep=regions_to_keep)
+        cons_mix_df_dict = run_stage(
+            "consumption_mix",
+            electricitylci.get_consumption_mix_df,
+            regions_to_keep=regions_to_keep,
+            key_parts=tuple(sorted(regions_to_keep))
+        )
         print("write consumption mix to dict")
         cons_mix_dicts={}
         for subreg in cons_mix_df_dict.keys():
@@ -85,10 +177,21 @@ def main():
             cons_mix_dicts[subreg] = electricitylci.write_process_dicts_to_jsonld(
                 cons_mix_dicts[subreg])
         print("get distribution mix")
+        # The distribution mix is built from the generation processes, so a
+        # cached result is only used with the same generation processes.
+        if use_cache:
+            generation_key = (stage_cache.fingerprint(generation_process_df),)
+        else:
+            generation_key = ()
         dist_mix_df_dict={}
         for subreg in cons_mix_dicts.keys():
-            dist_mix_df_dict[subreg] = electricitylci.get_distribution_mix_df(
-                generation_process_df,subregion=subreg)
+            dist_mix_df_dict[subreg] = run_stage(
+                "distribution_mix",
+                electricitylci.get_distribution_mix_df,
+                generation_process_df,
+                subregion=subreg,
+                key_parts=(subreg,) + generation_key
+            )
         print("write dist mix to dict")
         dist_mix_dicts={}
         for subreg in dist_mix_df_dict.keys():
@@ -107,15 +210,22 @@ def main():
         generation_mix_dict = electricitylci.write_process_dicts_to_jsonld(
             generation_mix_dict
         )
-        sur_con_mix_dict = fill_default_provider_uuids(
-            sur_con_mix_dict, generation_mix_dict
+        generation_mix_index = instrumentation.call(
+            ProviderIndex, generation_mix_dict
+        )
+        sur_con_mix_dict = instrumentation.call(
+            fill_default_provider_uuids, sur_con_mix_dict, generation_mix_index
         )
         sur_con_mix_dict = electricitylci.write_process_dicts_to_jsonld(sur_con_mix_dict)
-        sur_con_mix_dict = fill_default_provider_uuids(
-            sur_con_mix_dict, sur_con_mix_dict, generation_mix_dict
+        sur_con_mix_dict = instrumentation.call(
+            fill_default_provider_uuids,
+            sur_con_mix_dict,
+            ProviderIndex(sur_con_mix_dict, generation_mix_index)
         )
         sur_con_mix_dict = electricitylci.write_process_dicts_to_jsonld(sur_con_mix_dict)
-        dist_dict = fill_default_provider_uuids(dist_dict, sur_con_mix_dict)
+        dist_dict = instrumentation.call(
+            fill_default_provider_uuids, dist_dict, sur_con_mix_dict
+        )
         dist_dict = electricitylci.write_process_dicts_to_jsonld(dist_dict)
 
     logger.info(
@@ -127,9 +237,55 @@ def main():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-c", "--model_config", help="specify model configuration", default="")
+    parser.add_argument(
+        "--stage_cache",
+        help="load/save intermediate dataframes from the on-disk stage cache",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--clear_stage_cache",
+        help="remove all results from the stage cache before running",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--mirror_dir",
+        help="folder for a local mirror of the downloaded source files",
+        default=None
+    )
+    parser.add_argument(
+        "--offline",
+        help="only use source files from the mirror, never download them",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--profile",
+        help="profile the stages with cProfile or tracemalloc",
+        choices=["cprofile", "tracemalloc"],
+        default=None
+    )
+    parser.add_argument(
+        "--profile_stages",
+        help="names of the stages to profile (as in the run report), "
+        "by default all of them",
+        nargs="+",
+        default=None
+    )
+    parser.add_argument(
+        "--jsonld_workers",
+        help="number of processes that build the JSON-LD, 0 for one per CPU",
+        type=int,
+        default=1
+    )
     args=parser.parse_args()
+    downloads.mirror_dir = args.mirror_dir
+    downloads.offline = args.offline
+    instrumentation.profile = args.profile
+    instrumentation.profile_stages = args.profile_stages
+    olca_jsonld_writer.workers = args.jsonld_workers or None
     if args.model_config != "":
         config.model_specs=config.build_model_class(args.model_config)
     else:
         config.model_specs=None
-    main()
+    if args.clear_stage_cache:
+        stage_cache.clear_stage_cache()
+    main(use_cache=args.stage_cache)
@@ -1,75 +1,279 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
+"""
+Applies the manual fixes in manual_edits.yml to the dataframes of the modules
+that ask for them (see check_for_edits).
 
+The edits for a module and function are compiled once into a list of
+EditRule objects. The rules are then evaluated in a single pass over integer
+codes for each column that they use, so that each rule only compares small
+arrays of codes rather than the values of the whole column. The rules are
+applied in the order they are in the yaml file, and each rule sees the
+result of the rules before it.
+"""
+
+import logging
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 import yaml
+
 from electricitylci.globals import data_dir
-import logging
 
 module_logger = logging.getLogger("manual_edits.py")
 
 with open(f"{data_dir}/manual_edits.yml", "r") as f:
     manual_edits = yaml.safe_load(f)
 
-def reassign(data, edit_dict):
-    try:
-        if edit_dict["data_source"]=="yaml":
-            logging.info("Re-assigning using data from yaml")
-            # logging.info(f"{edit_dict}")
-            col = edit_dict["column_to_reassign"]
-            # logging.info(f"{col}")
-            in_val = edit_dict["incoming_value"]
-            # logging.info(f"{in_val}")
-            out_val = edit_dict["outgoing_value"]
-            # logging.info(f"{out_val}")
-            combined_filter=data[col]==in_val
-            # logging.info(f"{combined_filter}")
-            for filt in edit_dict["filters"].keys():
-                # logging.info(f"Filters are {edit_dict['filters'][filt]}")
-                combined_filter=(
-                    combined_filter &
-                    data[filt].isin(edit_dict["filters"][filt])
+# The hits and time of each rule the last time the edits for a module and
+# function were applied, keyed by (calling_module, calling_function).
+edit_reports = dict()
+
+
+class EditRule:
+    """
+    One reassign or remove edit from manual_edits.yml.
+
+    Parameters
+    ----------
+    name : str
+        The name of the entry in the yaml file (e.g., "entry_1").
+    edit_dict : dict
+        The entry in the yaml file.
+    """
+
+    def __init__(self, name, edit_dict):
+        self.name = name
+        self.edit_type = edit_dict.get("edit_type")
+        self.data_source = edit_dict.get("data_source")
+        self.filters = {
+            col: list(values) for col, values in
+            (edit_dict.get("filters") or dict()).items()
+        }
+        self.column = edit_dict.get("column_to_reassign")
+        self.incoming_value = edit_dict.get("incoming_value")
+        self.outgoing_value = edit_dict.get("outgoing_value")
+
+    def __repr__(self):
+        return f"EditRule({self.name!r}, {self.edit_type!r})"
+
+    def columns(self):
+        """Return the columns that the rule uses."""
+        if self.edit_type == "reassign":
+            return [self.column] + list(self.filters)
+        return list(self.filters)
+
+    def problem(self):
+        """Return why the rule can't be applied, or None if it can."""
+        if self.data_source != "yaml":
+            return f"unsupported data source {self.data_source!r}"
+        if self.edit_type == "reassign":
+            if None in (
+                self.column, self.incoming_value, self.outgoing_value
+            ):
+                return (
+                    "reassign without column_to_reassign, incoming_value, "
+                    "or outgoing_value"
                 )
-                # logging.info(f"{combined_filter}")
-            data.loc[combined_filter,col]=out_val
-        return data
-    except KeyError:
-        module_logger.warning("Problem found with manual edit - reassign")
-        return data
+            if not self.filters:
+                return "reassign without filters"
+        elif self.edit_type == "remove":
+            if not self.filters:
+                return "remove without filters"
+        else:
+            return f"no handler for edit type {self.edit_type!r}"
+        return None
 
-def remove(data, edit_dict):
-    try:
-        if edit_dict["data_source"]=="yaml":
-            logging.info("Removing using data from yaml")
-            combined_filter=None
-            # logging.info(f"{combined_filter}")
-            for filt in edit_dict["filters"].keys():
-                # logging.info(f"Filters are {edit_dict['filters'][filt]}")
-                if combined_filter is None:
-                    combined_filter=data[filt].isin(edit_dict["filters"][filt])
-                else:
-                    combined_filter=(
-                        combined_filter &
-                        data[filt].isin(edit_dict["filters"][filt])
-                    )
-                # logging.info(f"{combined_filter}")
-            data = data.loc[~combined_filter,:]
-        return data
-    except KeyError:
-        module_logger.warning("Problem found with manual edit - remove")
-        return data
 
-def check_for_edits(data, calling_module, calling_function):
-    try:
-        edits_to_make=manual_edits[calling_module][calling_function]
-        for ed in edits_to_make.keys():
-            module_logger.info(f"Edits found for {calling_module}.{calling_function}")
-            if edits_to_make[ed]["edit_type"]=="reassign":
-                data=reassign(data,edits_to_make[ed])
-            elif edits_to_make[ed]["edit_type"]=="remove":
-                data=remove(data,edits_to_make[ed])
+@lru_cache(maxsize=None)
+def compile_edits(calling_module, calling_function):
+    """
+    Return the rules in manual_edits.yml for a module and function.
+
+    Parameters
+    ----------
+    calling_module : str
+        e.g., "generation.py"
+    calling_function : str
+        e.g., "create_generation_process_df"
+
+    Returns
+    -------
+    tuple
+        EditRule objects in the order they are in the yaml file; empty if
+        there are no edits for the module and function.
+    """
+    edits = (manual_edits or dict()).get(calling_module) or dict()
+    edits = edits.get(calling_function) or dict()
+    return tuple(EditRule(name, edit) for name, edit in edits.items())
+
+
+class _CodedColumn:
+    """
+    The values of a column as integer codes into a list of unique values,
+    so that reassignments can be made to the codes as the rules are applied.
+    """
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Index(uniques)
+        # Missing values get the code -1. Each kind of missing value (None,
+        # NaN, NaT) is given a code of its own so that filters that list it
+        # match the same rows as isin.
+        missing = codes < 0
+        if missing.any():
+            missing_values = series.to_numpy(dtype=object)[missing]
+            na_uniques = pd.Index(pd.unique(missing_values), dtype=object)
+            codes = codes.copy()
+            codes[missing] = len(uniques) + na_uniques.get_indexer(
+                missing_values
+            )
+            uniques = uniques.astype(object).append(na_uniques)
+        self.original = codes
+        self.codes = codes.copy()
+        self.uniques = uniques
+        self.new_values = list()
+
+    def codes_for(self, values):
+        """Return the codes of the values that are in the column."""
+        codes = self.uniques.get_indexer(pd.Index(values))
+        codes = codes[codes >= 0]
+        for i, value in enumerate(self.new_values):
+            if any(value == v for v in values):
+                codes = np.append(codes, len(self.uniques) + i)
+        return codes
+
+    def lookup(self, values):
+        """
+        Return a boolean array that is True at the codes of the values, for
+        indexing with the codes of the rows.
+        """
+        table = np.zeros(len(self.uniques) + len(self.new_values), dtype=bool)
+        table[self.codes_for(values)] = True
+        return table
+
+    def code_for(self, value):
+        """Return the code of a value, adding it if it's new."""
+        codes = self.codes_for([value])
+        if len(codes):
+            return codes[0]
+        self.new_values.append(value)
+        return len(self.uniques) + len(self.new_values) - 1
+
+    def changes(self):
+        """
+        Yield the positions of the rows that were reassigned to each value
+        and the value.
+        """
+        changed = np.flatnonzero(self.codes != self.original)
+        for code in np.unique(self.codes[changed]):
+            if code < len(self.uniques):
+                value = self.uniques[code]
             else:
-                logging.info("Edit found but no handler for function")
-        return data
-    except KeyError:
+                value = self.new_values[code - len(self.uniques)]
+            yield changed[self.codes[changed] == code], value
+
+
+def apply_edits(data, rules):
+    """
+    Apply compiled edit rules to a dataframe.
+
+    Parameters
+    ----------
+    data : dataframe
+    rules : list
+        EditRule objects, as returned by compile_edits.
+
+    Returns
+    -------
+    tuple
+        The edited dataframe and a dataframe with the number of rows each
+        rule reassigned or removed and the time it took.
+    """
+    report = list()
+    coded = dict()
+    keep = np.ones(len(data), dtype=bool)
+    for rule in rules:
+        start = time.perf_counter()
+        problem = rule.problem()
+        missing = [c for c in rule.columns() if c not in data.columns]
+        if problem is None and missing:
+            problem = f"missing columns {missing}"
+        if problem is not None:
+            module_logger.warning(
+                f"Problem found with manual edit {rule.name} - {problem}"
+            )
+            report.append(
+                {"rule": rule.name, "edit_type": rule.edit_type,
+                 "hits": 0, "seconds": 0.0, "problem": problem}
+            )
+            continue
+        for col in rule.columns():
+            if col not in coded:
+                coded[col] = _CodedColumn(data[col])
+        # The first filter is applied to all of the rows and the others only
+        # to the rows that matched it.
+        filters = list(rule.filters.items())
+        if rule.edit_type == "reassign":
+            filters.insert(0, (rule.column, [rule.incoming_value]))
+        col, values = filters[0]
+        rows = np.flatnonzero(coded[col].lookup(values)[coded[col].codes])
+        # Rows that have already been removed can't match.
+        rows = rows[keep[rows]]
+        for col, values in filters[1:]:
+            rows = rows[coded[col].lookup(values)[coded[col].codes[rows]]]
+        if rule.edit_type == "reassign":
+            column = coded[rule.column]
+            column.codes[rows] = column.code_for(rule.outgoing_value)
+        else:
+            keep[rows] = False
+        report.append(
+            {"rule": rule.name, "edit_type": rule.edit_type,
+             "hits": len(rows),
+             "seconds": time.perf_counter() - start, "problem": None}
+        )
+    for col, column in coded.items():
+        for rows, value in column.changes():
+            data.iloc[rows, data.columns.get_loc(col)] = value
+    if not keep.all():
+        data = data.loc[keep, :]
+    return data, pd.DataFrame(
+        report, columns=["rule", "edit_type", "hits", "seconds", "problem"]
+    )
+
+
+def check_for_edits(data, calling_module, calling_function):
+    """
+    Apply the edits in manual_edits.yml for a module and function.
+
+    Parameters
+    ----------
+    data : dataframe
+    calling_module : str
+        e.g., "generation.py"
+    calling_function : str
+        e.g., "create_generation_process_df"
+
+    Returns
+    -------
+    dataframe
+        The edited data, or data unchanged if there are no edits. The hits
+        and time of each rule are logged and kept in edit_reports.
+    """
+    rules = compile_edits(calling_module, calling_function)
+    if not rules:
         module_logger.info("No manual edits found")
-        return data
\ No newline at end of file
+        return data
+    module_logger.info(
+        f"Applying {len(rules)} edits for {calling_module}.{calling_function}"
+    )
+    data, report = apply_edits(data, rules)
+    edit_reports[(calling_module, calling_function)] = report
+    for row in report.itertuples():
+        module_logger.info(
+            f"{row.rule} ({row.edit_type}): {row.hits} rows in "
+            f"{row.seconds:.3f} s"
+        )
+    return data
@@ -11,15 +11,17 @@ from electricitylci.globals import (
 
 from electricitylci.eia923_generation import eia923_download_extract
 import electricitylci.PhysicalQuantities as pq
+from electricitylci.factored_inventory import FactoredInventory
 import logging
 
 module_logger = logging.getLogger(name="natural_gas_upstream.py")
 
 
-def generate_upstream_ng(year):
+def ng_inventory(year):
     """
-    Generate the annual gas extraction, processing and transportation
-    emissions (in kg) for each plant in EIA923.
+    Gas extraction, processing and transportation emissions per MJ of gas
+    for each basin and the gas consumption (in MJ) of each plant in EIA923.
+    See generate_upstream_ng.
 
     Parameters
     ----------
@@ -28,7 +30,7 @@ def generate_upstream_ng(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
     module_logger.info("Generating natural gas inventory")
     # Get the EIA generation data for the specified year, this dataset includes
@@ -81,41 +83,50 @@ def generate_upstream_ng(year):
     ng_lci_stack = pd.DataFrame(ng_lci.stack()).reset_index()
     ng_lci_stack.columns=ng_lci_columns
 
-    # Merge basin data with LCI dataset
-    ng_lci_basin = pd.merge(
-            ng_lci_stack,
-            ng_generation_data_basin,
-            left_on = 'Basin',
-            right_on = 'NG_LCI_Name',
-            how='left')
-
-    # Multiplying with the EIA 923 fuel consumption; conversion factor is
-    # for MMBtu to MJ
+    # The inventory is per MJ of gas; conversion factor is for the EIA 923
+    # fuel consumption in MMBtu to MJ
     btu_to_MJ=pq.convert(10**6,'Btu','MJ')
-    ng_lci_basin["FlowAmount"]=(
-            ng_lci_basin["FlowAmount"]
-            * ng_lci_basin['Total Fuel Consumption MMBtu']
-            * btu_to_MJ
-    )
-
-    ng_lci_basin = ng_lci_basin.rename(columns=
-            {'Total Fuel Consumption MMBtu':'quantity'})
-    ng_lci_basin["quantity"]=ng_lci_basin["quantity"]*btu_to_MJ
+    ng_generation_data_basin = ng_generation_data_basin.rename(columns={
+            'Total Fuel Consumption MMBtu':'quantity',
+            'Plant Id':'plant_id',
+            })
+    ng_generation_data_basin["quantity"]=(
+            ng_generation_data_basin["quantity"]*btu_to_MJ)
     # Output is kg emission for the specified year by facility Id,
     # not normalized to electricity output
-
-    ng_lci_basin['FuelCategory']='GAS'
-    ng_lci_basin.rename(columns={
-            'Plant Id':'plant_id',
-            'NG_LCI_Name':'stage_code',
-            'Stage':'stage'
+    ng_generation_data_basin['Basin']=ng_generation_data_basin['NG_LCI_Name']
+    ng_generation_data_basin.rename(columns={
+            'NG_LCI_Name':'stage_code'
             },inplace=True)
-    ng_lci_basin["Year"]=year
-    ng_lci_basin["Source"]="netl"
-    ng_lci_basin["ElementaryFlowPrimeContext"]="emission"
-    ng_lci_basin.loc[ng_lci_basin["Compartment"].str.contains("resource/"),"ElementaryFlowPrimeContext"]="resource"
-    ng_lci_basin.loc[ng_lci_basin["Compartment"].str.contains("Technosphere/"),"ElementaryFlowPrimeContext"]="technosphere"
-    return ng_lci_basin
+
+    ng_lci_stack['FuelCategory']='GAS'
+    ng_lci_stack["Year"]=year
+    ng_lci_stack["Source"]="netl"
+    ng_lci_stack["ElementaryFlowPrimeContext"]="emission"
+    ng_lci_stack.loc[ng_lci_stack["Compartment"].str.contains("resource/"),"ElementaryFlowPrimeContext"]="resource"
+    ng_lci_stack.loc[ng_lci_stack["Compartment"].str.contains("Technosphere/"),"ElementaryFlowPrimeContext"]="technosphere"
+    return FactoredInventory(
+            ng_lci_stack,
+            ng_generation_data_basin,
+            on='Basin',
+            how='right')
+
+
+def generate_upstream_ng(year):
+    """
+    Generate the annual gas extraction, processing and transportation
+    emissions (in kg) for each plant in EIA923.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
+
+    Returns
+    ----------
+    dataframe
+    """
+    return ng_inventory(year).expand()
 
 
 if __name__=='__main__':
@@ -8,14 +8,13 @@ import pandas as pd
 from electricitylci.globals import data_dir, output_dir
 
 from electricitylci.eia923_generation import eia923_download_extract
+from electricitylci.factored_inventory import FactoredInventory
 
-import copy
 
-
-def generate_upstream_nuc(year):
+def nuclear_inventory(year):
     """
-    Generate the annual uranium extraction, processing and transportation
-    emissions (in kg) for each plant in EIA923.
+    Uranium extraction, processing and transportation emissions per MWh and
+    the net generation of each nuclear plant in EIA923.
 
     Parameters
     ----------
@@ -24,7 +23,7 @@ def generate_upstream_nuc(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
 
     # Get the EIA generation data for the specified year, this dataset includes
@@ -48,50 +47,47 @@ def generate_upstream_nuc(year):
     nuc_generation_data["Plant Id"] = nuc_generation_data["Plant Id"].astype(
         int
     )
+    nuc_generation_data.rename(
+        columns={
+            "Plant Id": "plant_id",
+            "Net Generation (Megawatthours)": "quantity",
+        },
+        inplace=True,
+    )
+    nuc_generation_data["Electricity"] = nuc_generation_data["quantity"]
 
     # Read the nuclear LCI excel file
     nuc_lci = pd.read_csv(data_dir + "/nuclear_LCI.csv", index_col=0,low_memory=False)
     nuc_lci.dropna(subset=["compartment"],inplace=True)
-    # There is no column to merge the inventory and generation data on,
-    # so we iterate through the plants and make a new column in the lci
-    # dataframe using the plant id. And add a copy of that dataframe to a
-    # running list. Finally we concatenate all of the dataframes in the list
-    # together for a final merged dataframe.
-    merged_list = list()
-    for idx1, plant in nuc_generation_data.iterrows():
-        nuc_lci["Plant Id"] = plant["Plant Id"]
-        merged_list.append(copy.copy(nuc_lci))
-    nuc_lci = pd.concat(merged_list)
-    nuc_merged = pd.merge(
-        left=nuc_lci,
-        right=nuc_generation_data,
-        left_on=["Plant Id"],
-        right_on=["Plant Id"],
-        how="left",
-    )
-
-    nuc_merged.rename(
-        columns={"Net Generation (Megawatthours)": "quantity"}, inplace=True
-    )
-
-    # Convert the inventory per MWh emissions to an annual emission
-    nuc_merged["FlowAmount"] = (
-        nuc_merged["FlowAmount"] * nuc_merged["quantity"]
-    )
-    nuc_merged["Electricity"] = nuc_merged["quantity"]
     # Filling out some columns to be consistent with other upstream dataframes
-    nuc_merged["fuel_type"] = "Nuclear"
-    nuc_merged["stage"] = "mine-to-plant"
-    nuc_merged["stage_code"] = "NUC"
-    nuc_merged.rename(columns={"unit":"Unit"},inplace=True)
-    nuc_merged.rename(
-        columns={"compartment": "Compartment", "Plant Id": "plant_id"},
-        inplace=True,
-    )
+    nuc_lci["fuel_type"] = "Nuclear"
+    nuc_lci["stage"] = "mine-to-plant"
+    nuc_lci["stage_code"] = "NUC"
+    nuc_lci.rename(columns={"unit":"Unit"},inplace=True)
+    nuc_lci.rename(columns={"compartment": "Compartment"}, inplace=True)
     input_dict={"emission":False,"resource":True}
-    nuc_merged["directionality"]=nuc_merged["directionality"].map(input_dict)
-    nuc_merged.rename(columns={"directionality":"input"},inplace=True)
-    return nuc_merged
+    nuc_lci["directionality"]=nuc_lci["directionality"].map(input_dict)
+    nuc_lci.rename(columns={"directionality":"input"},inplace=True)
+    # The same inventory applies to every plant, so it is kept per MWh
+    # rather than being copied for each plant.
+    return FactoredInventory(nuc_lci, nuc_generation_data)
+
+
+def generate_upstream_nuc(year):
+    """
+    Generate the annual uranium extraction, processing and transportation
+    emissions (in kg) for each plant in EIA923.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
+
+    Returns
+    ----------
+    dataframe
+    """
+    return nuclear_inventory(year).expand()
 
 
 if __name__ == "__main__":
@@ -1,62 +1,201 @@
 """Add docstring."""
 
 import datetime
+import json
 import pytz
 import logging as log
 import math
 import uuid
+import zipfile
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from typing import Optional
 
 import olca
 import olca.pack as pack
 
+# Number of worker processes that write_process_dicts_to_jsonld passes to
+# write, set by main.py from its --jsonld_workers option.
+workers = 1
 
-def write(processes: dict, file_path: str):
-    """Write the given process dictionary to a olca-schema zip file with the given path."""
-    with pack.Writer(file_path) as writer:
-        list_of_dicts=list()
-        created_ids = set()
-        # for d_vals in processes.values():
-        for p_key in processes.keys():
-                d_vals = processes[p_key]
-                process = olca.Process()
-                process.name = _val(d_vals, 'name')
-                process.version = _val(d_vals, 'version')
-                category_path = _val(d_vals, 'category', default='')
-                location_code = _val(d_vals, 'location', 'name', default='')
-                process.id = _uid(olca.ModelType.PROCESS,
-                                  category_path, location_code, process.name)
-                process.category = _category(
-                    category_path, olca.ModelType.PROCESS, writer, created_ids)
-                process.description = _val(d_vals, 'description')
-                if _val(d_vals,'processType')=="UNIT_PROCESS":
-                    process.process_type = olca.ProcessType.UNIT_PROCESS
-                else:
-                    process.process_type = olca.ProcessType.LCI_RESULT
-                process.location = _location(_val(d_vals, 'location'), writer, created_ids)
-                process.process_documentation = _process_doc(
-                    _val(d_vals, 'processDocumentation'), writer, created_ids)
-                process.last_change = datetime.datetime.now(pytz.utc).isoformat()
-                _process_dq(d_vals, process)
-                process.exchanges = []
-                last_id = 0
-                for e in _val(d_vals, 'exchanges', default=[]):
-                    exchange = _exchange(e, writer, created_ids)
-                    if exchange is not None:
-                        last_id += 1
-                        exchange.internal_id = last_id
-                        process.exchanges.append(exchange)
-                        if exchange.quantitative_reference:
-                            processes[p_key]['q_reference_name']=e['flow']['name']
-                            processes[p_key]['q_reference_id']=exchange.to_json()['flow']['@id']
-                            processes[p_key]['q_reference_cat']=e['flow']['category']
-                            processes[p_key]['q_reference_unit']=e['unit']['name']
+
+def write(processes: dict, file_path: str,
+          max_workers: Optional[int] = 1):
+    """
+    Write the given process dictionary to a olca-schema zip file with the given
+    path.
+
+    By default the processes are built and written one at a time. With
+    max_workers greater than 1 (or None for one per CPU), the openLCA objects
+    for the processes and the categories, locations, actors, sources, and
+    flows they refer to are built and encoded as json in a pool of worker
+    processes. This process only adds the encoded entries to the zip file,
+    skipping the entities that were already written, in the same order as
+    they would be written one at a time, so the zip file and the uuids and
+    reference flows added to the process dictionaries are the same.
+    """
+    if max_workers == 1:
+        with pack.Writer(file_path) as writer:
+            sink = _ZipSink(writer, set())
+            for p_key in processes.keys():
+                process, q_reference = _build_process(processes[p_key], sink)
+                _update_process_dict(processes[p_key], process.id, q_reference)
                 writer.write(process)
-                processes[p_key]['uuid']=process.id
+        return processes
+
+    created_ids = set()
+    with ProcessPoolExecutor(max_workers) as executor, zipfile.ZipFile(
+            file_path, mode='a', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        results = executor.map(
+            _encode_process_entities, processes.values(), chunksize=8)
+        for p_key, (process_entry, groups, q_reference) in zip(
+                processes.keys(), results):
+            d_vals = processes[p_key]
+            exchanges = _val(d_vals, 'exchanges', default=[])
+            for gate_id, exchange_index, entries in groups:
+                if gate_id is not None and gate_id in created_ids:
+                    continue
+                for uid, path, data in entries:
+                    if uid not in created_ids:
+                        zip_file.writestr(path, data)
+                        created_ids.add(uid)
+                if exchange_index is not None:
+                    _mark_waste_flow(_val(exchanges[exchange_index], 'flow'))
+            uid, path, data = process_entry
+            _update_process_dict(d_vals, uid, q_reference)
+            zip_file.writestr(path, data)
     return processes
 
 
+def _encode(entity) -> tuple:
+    """Return the id, path in the zip file, and json of an entity, as
+    pack.Writer would write them."""
+    folder = pack._get_path(entity) or 'unknown'
+    path = '%s/%s.json' % (folder, entity.id)
+    return entity.id, path, json.dumps(entity.to_json()).encode('utf-8')
+
+
+class _ZipSink(object):
+    """Writes the entities that processes refer to straight to the zip file,
+    skipping the ones that were already written."""
+
+    def __init__(self, writer: pack.Writer, created_ids: set):
+        self.writer = writer
+        self.created_ids = created_ids
+        self.exchange_index = None
+
+    def has(self, uid: str) -> bool:
+        return uid in self.created_ids
+
+    def write(self, entity):
+        self.writer.write(entity)
+        self.created_ids.add(entity.id)
+
+    @contextmanager
+    def group(self, uid: str):
+        yield
+
+
+class _EntityCollector(object):
+    """
+    Collects the entities that a process refers to in a worker process.
+
+    Nothing is skipped here because the worker does not know what has already
+    been written. Entities that are only written together with another one
+    (e.g., the categories of a new flow) are collected in a group with the id
+    of that entity, so that the writing process can skip the whole group if
+    the entity was already written, as _ZipSink would have.
+    """
+
+    def __init__(self):
+        self.groups = []
+        self.exchange_index = None
+        self._group = None
+
+    def has(self, uid: str) -> bool:
+        return False
+
+    def write(self, entity):
+        if self._group is not None:
+            self._group[2].append(entity)
+        else:
+            self.groups.append((None, None, [entity]))
+
+    @contextmanager
+    def group(self, uid: str):
+        self._group = (uid, self.exchange_index, [])
+        try:
+            yield
+        finally:
+            self.groups.append(self._group)
+            self._group = None
+
+
+def _build_process(d_vals: dict, sink) -> tuple:
+    """Build the openLCA process for a process dictionary. Returns the process
+    and the (name, id, category, unit) of its reference flow."""
+    process = olca.Process()
+    process.name = _val(d_vals, 'name')
+    process.version = _val(d_vals, 'version')
+    category_path = _val(d_vals, 'category', default='')
+    location_code = _val(d_vals, 'location', 'name', default='')
+    process.id = _uid(olca.ModelType.PROCESS,
+                      category_path, location_code, process.name)
+    process.category = _category(
+        category_path, olca.ModelType.PROCESS, sink)
+    process.description = _val(d_vals, 'description')
+    if _val(d_vals,'processType')=="UNIT_PROCESS":
+        process.process_type = olca.ProcessType.UNIT_PROCESS
+    else:
+        process.process_type = olca.ProcessType.LCI_RESULT
+    process.location = _location(_val(d_vals, 'location'), sink)
+    process.process_documentation = _process_doc(
+        _val(d_vals, 'processDocumentation'), sink)
+    process.last_change = datetime.datetime.now(pytz.utc).isoformat()
+    _process_dq(d_vals, process)
+    process.exchanges = []
+    q_reference = None
+    last_id = 0
+    for i, e in enumerate(_val(d_vals, 'exchanges', default=[])):
+        sink.exchange_index = i
+        exchange = _exchange(e, sink)
+        if exchange is not None:
+            last_id += 1
+            exchange.internal_id = last_id
+            process.exchanges.append(exchange)
+            if exchange.quantitative_reference:
+                q_reference = (
+                    e['flow']['name'],
+                    exchange.to_json()['flow']['@id'],
+                    e['flow']['category'],
+                    e['unit']['name'],
+                )
+    sink.exchange_index = None
+    return process, q_reference
+
+
+def _encode_process_entities(d_vals: dict) -> tuple:
+    """Run in worker processes; see write."""
+    collector = _EntityCollector()
+    process, q_reference = _build_process(d_vals, collector)
+    groups = [
+        (gate_id, exchange_index, [_encode(entity) for entity in entities])
+        for gate_id, exchange_index, entities in collector.groups
+    ]
+    return _encode(process), groups, q_reference
+
+
+def _update_process_dict(d_vals: dict, process_id: str,
+                         q_reference: Optional[tuple]):
+    if q_reference is not None:
+        d_vals['q_reference_name'] = q_reference[0]
+        d_vals['q_reference_id'] = q_reference[1]
+        d_vals['q_reference_cat'] = q_reference[2]
+        d_vals['q_reference_unit'] = q_reference[3]
+    d_vals['uuid'] = process_id
+
+
 def _process_dq(dict_d: dict, process: olca.Process):
     process.dq_entry = _format_dq_entry(
         _val(dict_d, 'processDocumentation', 'dqEntry'))
@@ -68,8 +207,8 @@ def _process_dq(dict_d: dict, process: olca.Process):
         process.exchange_dq_system = olca.ref(olca.DqSystem, edq_uid)
 
 
-def _category(path: str, mtype: olca.ModelType, writer: pack.Writer,
-              created_ids: set) -> Optional[olca.Ref]:
+def _category(path: str, mtype: olca.ModelType,
+              sink: _ZipSink) -> Optional[olca.Ref]:
     if not isinstance(path, str):
         return None
     if path.strip() == '':
@@ -80,21 +219,19 @@ def _category(path: str, mtype: olca.ModelType, writer: pack.Writer,
         uid_path = [str(mtype.value)] + parts[0:(i + 1)]
         uid = _uid(*uid_path)
         name = parts[i].strip()
-        if uid not in created_ids:
+        if not sink.has(uid):
             category = olca.Category()
             category.id = uid
             category.model_type = mtype
             category.name = name
             category.category = parent
-            writer.write(category)
-            created_ids.add(uid)
+            sink.write(category)
         parent = olca.ref(olca.Category, uid, name)
         parent.category_path = uid_path[1:]
     return parent
 
 
-def _exchange(dict_d: dict, writer: pack.Writer,
-              created_ids: set) -> Optional[olca.Exchange]:
+def _exchange(dict_d: dict, sink: _ZipSink) -> Optional[olca.Exchange]:
     if dict_d is None:
         return None
     e = olca.Exchange()
@@ -106,7 +243,7 @@ def _exchange(dict_d: dict, writer: pack.Writer,
     e.unit = _unit(unit_name)
     flowprop = _flow_property(unit_name)
     e.flow_property = flowprop
-    e.flow = _flow(_val(dict_d, 'flow'), flowprop, writer, created_ids)
+    e.flow = _flow(_val(dict_d, 'flow'), flowprop, sink)
     e.dq_entry = _format_dq_entry(_val(dict_d, 'dqEntry'))
     e.uncertainty = _uncertainty(_val(dict_d, 'uncertainty'))
     e.default_provider = _process_ref(_val(dict_d, 'provider'))
@@ -196,8 +333,8 @@ def _flow_property(unit_name: str) -> Optional[olca.Ref]:
     return None
 
 
-def _flow(dict_d: dict, flowprop: olca.Ref, writer: pack.Writer,
-          created_ids: set) -> Optional[olca.Ref]:
+def _flow(dict_d: dict, flowprop: olca.Ref,
+          sink: _ZipSink) -> Optional[olca.Ref]:
     if not isinstance(dict_d, dict):
         return None
     uid = _val(dict_d, 'id')
@@ -223,33 +360,39 @@ def _flow(dict_d: dict, flowprop: olca.Ref, writer: pack.Writer,
         uid = _uid(olca.ModelType.FLOW, category_path, name)
     else:
         uid=orig_uid
-    if uid not in created_ids:
-        flow = olca.Flow()
-        flow.id = uid
-        flow.name = name
-        flow.flow_type = olca.FlowType[_val(
-            dict_d, 'flowType', default='ELEMENTARY_FLOW')]
-        if "waste" in _val(dict_d,'category').lower():
-            dict_d['flowType']="WASTE_FLOW"
-            flow.flow_type=olca.FlowType[_val(
-                dict_d, 'flowType', default='WASTE_FLOW')]
-        # Do not assign flows a location
-        # flow.location = _location(_val(dict_d, 'location'),
-        #                          writer, created_ids)
-        flow.category = _category(category_path, olca.ModelType.FLOW,
-                                  writer, created_ids)
-        propfac = olca.FlowPropertyFactor()
-        propfac.conversion_factor = 1.0
-        propfac.flow_property = flowprop
-        propfac.reference_flow_property = True
-        flow.flow_properties = [propfac]
-        writer.write(flow)
-        created_ids.add(uid)
+    if not sink.has(uid):
+        with sink.group(uid):
+            flow = olca.Flow()
+            flow.id = uid
+            flow.name = name
+            flow.flow_type = olca.FlowType[_val(
+                dict_d, 'flowType', default='ELEMENTARY_FLOW')]
+            if _mark_waste_flow(dict_d):
+                flow.flow_type=olca.FlowType[_val(
+                    dict_d, 'flowType', default='WASTE_FLOW')]
+            # Do not assign flows a location
+            # flow.location = _location(_val(dict_d, 'location'),
+            #                          writer, created_ids)
+            flow.category = _category(category_path, olca.ModelType.FLOW,
+                                      sink)
+            propfac = olca.FlowPropertyFactor()
+            propfac.conversion_factor = 1.0
+            propfac.flow_property = flowprop
+            propfac.reference_flow_property = True
+            flow.flow_properties = [propfac]
+            sink.write(flow)
     return olca.ref(olca.Flow, uid, name)
 
 
-def _location(dict_d: dict, writer: pack.Writer,
-              created_ids: set) -> Optional[olca.Ref]:
+def _mark_waste_flow(dict_d: dict) -> bool:
+    """Set the flow type of flows in a waste category to WASTE_FLOW."""
+    if "waste" in _val(dict_d,'category').lower():
+        dict_d['flowType']="WASTE_FLOW"
+        return True
+    return False
+
+
+def _location(dict_d: dict, sink: _ZipSink) -> Optional[olca.Ref]:
     code = _val(dict_d, 'name')
     if not isinstance(code, str):
         return None
@@ -259,18 +402,16 @@ def _location(dict_d: dict, writer: pack.Writer,
     if isinstance(uid, str) and uid != '':
         return olca.ref(olca.Location, uid, code)
     uid = _uid(olca.ModelType.LOCATION, code)
-    if uid in created_ids:
+    if sink.has(uid):
         return olca.ref(olca.Location, uid, code)
     location = olca.Location()
     location.id = uid
     location.name = code
-    writer.write(location)
-    created_ids.add(uid)
+    sink.write(location)
     return olca.ref(olca.Location, uid, code)
 
 
-def _process_doc(dict_d: dict, writer: pack.Writer,
-                 created_ids: set) -> olca.ProcessDocumentation:
+def _process_doc(dict_d: dict, sink: _ZipSink) -> olca.ProcessDocumentation:
     doc = olca.ProcessDocumentation()
     doc.creation_date = datetime.datetime.now(pytz.utc).isoformat()
     if not isinstance(dict_d, dict):
@@ -295,32 +436,29 @@ def _process_doc(dict_d: dict, writer: pack.Writer,
     doc.from_json({field: _val(dict_d, field) for field in copy_fields})
     doc.valid_from = _format_date(_val(dict_d, 'validFrom'))
     doc.valid_until = _format_date(_val(dict_d, 'validUntil'))
-    doc.reviewer = _actor(_val(dict_d, 'reviewer'), writer, created_ids)
-    doc.data_documentor = _actor(_val(dict_d, 'dataDocumentor'), writer, created_ids)
-    doc.data_generator = _actor(_val(dict_d, 'dataGenerator'), writer, created_ids)
-    doc.data_set_owner = _actor(_val(dict_d, 'dataSetOwner'), writer, created_ids)
-    doc.publication = _source(_val(dict_d, 'publication'), writer, created_ids)
-    doc.sources = [_source(x, writer, created_ids) for x in dict_d["sources"]]
+    doc.reviewer = _actor(_val(dict_d, 'reviewer'), sink)
+    doc.data_documentor = _actor(_val(dict_d, 'dataDocumentor'), sink)
+    doc.data_generator = _actor(_val(dict_d, 'dataGenerator'), sink)
+    doc.data_set_owner = _actor(_val(dict_d, 'dataSetOwner'), sink)
+    doc.publication = _source(_val(dict_d, 'publication'), sink)
+    doc.sources = [_source(x, sink) for x in dict_d["sources"]]
     return doc
 
 
-def _actor(name: str, writer: pack.Writer,
-           created_ids: set) -> Optional[olca.Ref]:
+def _actor(name: str, sink: _ZipSink) -> Optional[olca.Ref]:
     if not isinstance(name, str) or name == '':
         return None
     uid = _uid(olca.ModelType.ACTOR, name)
-    if uid in created_ids:
+    if sink.has(uid):
         return olca.ref(olca.Actor, uid, name)
     actor = olca.Actor()
     actor.id = uid
     actor.name = name
-    writer.write(actor)
-    created_ids.add(uid)
+    sink.write(actor)
     return olca.ref(olca.Actor, uid, name)
 
 
-def _source(src_data: dict, writer: pack.Writer,
-            created_ids: set) -> Optional[olca.Ref]:
+def _source(src_data: dict, sink: _ZipSink) -> Optional[olca.Ref]:
     if not isinstance(src_data, dict) or src_data["Name"] == '':
         return None
     try:
@@ -333,32 +471,32 @@ def _source(src_data: dict, writer: pack.Writer,
     except KeyError:
         category=''
     uid = _uid(olca.ModelType.SOURCE, category, src_data["Name"])
-    if uid in created_ids:
+    if sink.has(uid):
         return olca.ref(olca.Source, uid, src_data["Name"])
-    source = olca.Source()
-    source.id = uid
-    source.name = src_data["Name"]
-    try:
-        source.url = src_data["Url"]
-    except KeyError:
-        source.url = ''
-    try:
-        source.version=src_data["Version"]
-    except KeyError:
-        source.version = '1.0.1'
-    try:
-        source.text_reference = src_data["TextReference"]
-    except KeyError:
-        source.text_reference = src_data["Name"]
-    try:
-        source.year = src_data["Year"]
-    except TypeError:
-        source.year=int(src_data["Year"])
-    except KeyError:
-        source.year=datetime.datetime.now(pytz.utc).year
-    source.category=_category(category,olca.ModelType.SOURCE,writer,created_ids)
-    writer.write(source)
-    created_ids.add(uid)
+    with sink.group(uid):
+        source = olca.Source()
+        source.id = uid
+        source.name = src_data["Name"]
+        try:
+            source.url = src_data["Url"]
+        except KeyError:
+            source.url = ''
+        try:
+            source.version=src_data["Version"]
+        except KeyError:
+            source.version = '1.0.1'
+        try:
+            source.text_reference = src_data["TextReference"]
+        except KeyError:
+            source.text_reference = src_data["Name"]
+        try:
+            source.year = src_data["Year"]
+        except TypeError:
+            source.year=int(src_data["Year"])
+        except KeyError:
+            source.year=datetime.datetime.now(pytz.utc).year
+        source.category=_category(category,olca.ModelType.SOURCE,sink)
+        sink.write(source)
     return olca.ref(olca.Source, uid, src_data["Name"])
 
 
@@ -9,17 +9,17 @@ from os.path import join
 from electricitylci.globals import data_dir, output_dir
 import electricitylci.PhysicalQuantities as pq
 import electricitylci.eia923_generation as eia923
+from electricitylci.factored_inventory import FactoredInventory
 import logging
 
 module_logger=logging.getLogger("petroleum_upstream.py")
 
 
-def generate_petroleum_upstream(year):
+def petroleum_inventory(year):
     """
-    Generate annual.
-    
-    Petroleum extraction, transport, and refining emissions (in kg) for each
-    plant in EIA923.
+    Petroleum extraction, transport, and refining emissions per MJ of fuel
+    for each fuel and PADD and the heat input (in MJ) of each plant in
+    EIA923. See generate_petroleum_upstream.
 
     Parameters
     ----------
@@ -28,7 +28,7 @@ def generate_petroleum_upstream(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
     eia_fuel_receipts_df=read_eia923_fuel_receipts(year)
     petroleum_criteria = (
@@ -125,33 +125,22 @@ def generate_petroleum_upstream(year):
     petroleum_fuel['fuel_padd']=(petroleum_fuel['reported_fuel_type_code']+
                         '_'+petroleum_fuel['padd'].astype(str))
 
-    # Merge the inventories for each fuel with the fuel use by each power plant
-    merged_inventory = combined_lci.merge(
-            right=petroleum_fuel[['plant_id','heat_input','fuel_padd']],
-            left_on='fuel_code',
-            right_on='fuel_padd',
-            how='left').sort_values(['plant_id','fuel_padd','Flow'])
-
-    # convert per MJ inventory to annual emissions using plant heat input
-    merged_inventory['Result']=(
-            merged_inventory['Result']*
-            merged_inventory['heat_input'])
+    # Each plant uses the inventory for its fuel and PADD.
+    petroleum_fuel=petroleum_fuel[['plant_id','heat_input','fuel_padd']].rename(
+            columns={'fuel_padd':'fuel_code','heat_input':'quantity'})
 
     # Cleaning up unneeded columns and renaming
-    merged_inventory.drop(
-            columns=['fuel_padd',
-                     'Sub-category','Flow UUID'],
+    combined_lci.drop(
+            columns=['Sub-category','Flow UUID'],
             inplace=True)
     colnames={
             'Flow':'FlowName',
             'Category':'Compartment',
-            'Result':'FlowAmount',
-            'fuel_code':'stage_code',
-            'heat_input':'quantity'}
-    merged_inventory.rename(columns=colnames,inplace=True)
-    merged_inventory['fuel_type']='Oil'
-    merged_inventory['stage']='well-to-tank'
-    merged_inventory.reset_index(inplace=True,drop=True)
+            'Result':'FlowAmount'}
+    combined_lci.rename(columns=colnames,inplace=True)
+    combined_lci['stage_code']=combined_lci['fuel_code']
+    combined_lci['fuel_type']='Oil'
+    combined_lci['stage']='well-to-tank'
 
     # Change compartment values to be standard'
     compartment_dict={
@@ -160,10 +149,39 @@ def generate_petroleum_upstream(year):
             "NETL database/resources":"NETL database/resources",
             'Emission to water':'water',
             'Emission to soil':'soil'}
-    merged_inventory['Compartment']=merged_inventory['Compartment'].map(
+    combined_lci['Compartment']=combined_lci['Compartment'].map(
             compartment_dict)
-    merged_inventory.dropna(inplace=True)
+    combined_lci.dropna(inplace=True)
+    petroleum_fuel.dropna(inplace=True)
+
+    # The inventories are per MJ, so they are scaled by the plant heat input
+    return FactoredInventory(
+            combined_lci,
+            petroleum_fuel,
+            on='fuel_code',
+            how='inner')
 
+
+def generate_petroleum_upstream(year):
+    """
+    Generate annual.
+    
+    Petroleum extraction, transport, and refining emissions (in kg) for each
+    plant in EIA923.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
+
+    Returns
+    ----------
+    dataframe
+    """
+    merged_inventory=petroleum_inventory(year).expand().sort_values(
+            ['plant_id','stage_code','FlowName'])
+    merged_inventory.drop(columns=['fuel_code'],inplace=True)
+    merged_inventory.reset_index(inplace=True,drop=True)
     return merged_inventory
 
 if __name__=='__main__':
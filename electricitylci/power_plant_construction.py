@@ -9,25 +9,16 @@ import pandas as pd
 from electricitylci.globals import data_dir, output_dir
 import numpy as np
 from electricitylci.eia860_facilities import eia860_generator_info
+from electricitylci.factored_inventory import FactoredInventory
 import re
 
 
-def generate_power_plant_construction(year):
+def construction_inventory(year):
     """
-    Function uses an NETL study.
-    
-    That generated the life cycle inventory for power plant construction using
-    an economic input output model. Two types of plants are considered: sub-
-    critical pulverized coal and a natural gas combined cycle plant. The
-    inventory provided by the study is for an entire plant. This inventory is
-    divided by the net generation capacity of those plants to place the
-    inventory on the basis of a MW and then divided by an assumed plant life of
-    30 years, which is a conservative assumption considering the lifetime of
-    these plants is typically much longer. These per year/per MW impacts are
-    mapped to the fossil power generators in the U.S. where they are scaled by
-    the net generating capacity of the plants (as provided by EIA data). These
-    impacts are eventually divided by the generation for the year in MWh to
-    provide the construction impacts on the basis of the functional unit.
+    Power plant construction inventory per MW of capacity per year for
+    sub-critical pulverized coal and natural gas combined cycle plants, and
+    the nameplate capacity of each fossil generator type at each plant. See
+    generate_power_plant_construction.
 
     Parameters
     ----------
@@ -36,9 +27,7 @@ def generate_power_plant_construction(year):
 
     Returns
     -------
-    dataframe
-        This dataframe provides construction inventory for each power plant
-        reporting to EIA.
+    FactoredInventory
     """
     gen_df = eia860_generator_info(year)
     gen_columns=[
@@ -105,12 +94,42 @@ def generate_power_plant_construction(year):
     inventory["input"]=False
     input_list=["resource" in x for x in inventory["Compartment"]]
     inventory["input"]=input_list
-    construction_df = gen_df_group.merge(inventory,on="const_type",how="left")
-    construction_df["FlowAmount"]=construction_df["FlowAmount"]*construction_df["nameplate_capacity_mw"]
-    construction_df.rename(columns={"nameplate_capacity_mw":"quantity"},inplace=True)
+    inventory["Unit"]=inventory["Unit"].str.replace("mj","MJ")
+    gen_df_group.rename(columns={"nameplate_capacity_mw":"quantity"},inplace=True)
+    inventory["fuel_type"]="Construction"
+    return FactoredInventory(inventory, gen_df_group, on="const_type")
+
+
+def generate_power_plant_construction(year):
+    """
+    Function uses an NETL study.
+    
+    That generated the life cycle inventory for power plant construction using
+    an economic input output model. Two types of plants are considered: sub-
+    critical pulverized coal and a natural gas combined cycle plant. The
+    inventory provided by the study is for an entire plant. This inventory is
+    divided by the net generation capacity of those plants to place the
+    inventory on the basis of a MW and then divided by an assumed plant life of
+    30 years, which is a conservative assumption considering the lifetime of
+    these plants is typically much longer. These per year/per MW impacts are
+    mapped to the fossil power generators in the U.S. where they are scaled by
+    the net generating capacity of the plants (as provided by EIA data). These
+    impacts are eventually divided by the generation for the year in MWh to
+    provide the construction impacts on the basis of the functional unit.
+
+    Parameters
+    ----------
+    year : int
+        Year of EIA data to use to provide net generating capacity
+
+    Returns
+    -------
+    dataframe
+        This dataframe provides construction inventory for each power plant
+        reporting to EIA.
+    """
+    construction_df = construction_inventory(year).expand()
     construction_df.drop(columns=["const_type","energy_source_1","prime_mover"],inplace=True)
-    construction_df["fuel_type"]="Construction"
-    construction_df["Unit"]=construction_df["Unit"].str.replace("mj","MJ")
     return construction_df
 
 if __name__ == "__main__":
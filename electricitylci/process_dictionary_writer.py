@@ -16,7 +16,7 @@ from electricitylci.globals import (
     elci_version
 )
 from electricitylci.utils import make_valid_version_num
-from electricitylci.egrid_facilities import egrid_subregions
+from electricitylci.egrid_facilities import get_egrid_subregions
 from electricitylci.model_config import model_specs
 
 
@@ -180,7 +180,7 @@ def con_process_ref(reg, ref_type="generation"):
     # If not, if the region is an egrid regions, its a generation mix process; otherwise its a surplus pool process
     if ref_type == "consumption":
         name = consumption_mix_name +" - "+reg
-    elif reg in egrid_subregions:
+    elif reg in get_egrid_subregions():
         name = generation_mix_name +" - "+reg
     else:
         name = surplus_pool_name + " - "+reg
@@ -526,20 +526,19 @@ def exchange_table_creation_output(data):
     return ar
 
 
-def uncertainty_table_creation(data):
-    """Add docstring."""
+def _uncertainty_table(geom_mean, geom_sd, maximum, minimum):
+    """Build the uncertainty dictionary for a single exchange."""
     ar = dict()
-    #    print(data["GeomMean"].iloc[0] + ' - ' +data["GeomSD"].iloc[0])
-    if data["GeomMean"].iloc[0] is not None:
-        ar["geomMean"] = str(float(data["GeomMean"].iloc[0]))
-    if data["GeomSD"].iloc[0] is not None:
-        ar["geomSd"] = str(float(data["GeomSD"].iloc[0]))
+    if geom_mean is not None:
+        ar["geomMean"] = str(float(geom_mean))
+    if geom_sd is not None:
+        ar["geomSd"] = str(float(geom_sd))
     ar["distributionType"] = "Logarithmic Normal Distribution"
     ar["mean"] = ""
     ar["meanFormula"] = ""
     ar["geomMeanFormula"] = ""
-    ar["maximum"] = data["Maximum"].iloc[0]
-    ar["minimum"] = data["Minimum"].iloc[0]
+    ar["maximum"] = maximum
+    ar["minimum"] = minimum
     ar["minimumFormula"] = ""
     ar["sd"] = ""
     ar["sdFormula"] = ""
@@ -550,17 +549,55 @@ def uncertainty_table_creation(data):
     return ar
 
 
-def flow_table_creation(data):
+def uncertainty_table_creation(data):
     """Add docstring."""
+    #    print(data["GeomMean"].iloc[0] + ' - ' +data["GeomSD"].iloc[0])
+    return _uncertainty_table(
+        data["GeomMean"].iloc[0],
+        data["GeomSD"].iloc[0],
+        data["Maximum"].iloc[0],
+        data["Minimum"].iloc[0],
+    )
+
+
+def uncertainty_tables(data):
+    """
+    Build the uncertainty dictionaries for every row of data in one pass.
+
+    Equivalent to calling uncertainty_table_creation on each single-row
+    slice of data, without creating the slices.
+
+    Parameters
+    ----------
+    data : dataframe
+        Must contain GeomMean, GeomSD, Maximum, and Minimum columns.
+
+    Returns
+    -------
+    list
+        One dictionary per row, in row order.
+    """
+    return [
+        _uncertainty_table(*row)
+        for row in zip(
+            data["GeomMean"].values,
+            data["GeomSD"].values,
+            data["Maximum"].values,
+            data["Minimum"].values,
+        )
+    ]
+
+
+def _flow_table(flowtype, flow_name, flow_id, comp):
+    """Build the flow dictionary for a single exchange."""
     ar = dict()
-    flowtype = data["FlowType"].iloc[0]
     ar["flowType"] = flowtype
     ar["flowProperties"] = ""
-    ar["name"] = data["FlowName"].iloc[0][
+    ar["name"] = flow_name[
         0:255
     ]  # cutoff name at length 255 if greater than that
-    ar["id"] = data["FlowUUID"].iloc[0]
-    comp = str(data["Compartment"].iloc[0])
+    ar["id"] = flow_id
+    comp = str(comp)
     if (flowtype == "ELEMENTARY_FLOW") & (comp != ""):
         if "emission" in comp or "resource" in comp:
             ar["category"] = (
@@ -589,6 +626,44 @@ def flow_table_creation(data):
     return ar
 
 
+def flow_table_creation(data):
+    """Add docstring."""
+    return _flow_table(
+        data["FlowType"].iloc[0],
+        data["FlowName"].iloc[0],
+        data["FlowUUID"].iloc[0],
+        data["Compartment"].iloc[0],
+    )
+
+
+def flow_tables(data):
+    """
+    Build the flow dictionaries for every row of data in one pass.
+
+    Equivalent to calling flow_table_creation on each single-row slice of
+    data, without creating the slices.
+
+    Parameters
+    ----------
+    data : dataframe
+        Must contain FlowType, FlowName, FlowUUID, and Compartment columns.
+
+    Returns
+    -------
+    list
+        One dictionary per row, in row order.
+    """
+    return [
+        _flow_table(*row)
+        for row in zip(
+            data["FlowType"].values,
+            data["FlowName"].values,
+            data["FlowUUID"].values,
+            data["Compartment"].values,
+        )
+    ]
+
+
 def ref_exchange_creator(electricity_flow=electricity_at_grid_flow):
     """Add docstring."""
     ar = dict()
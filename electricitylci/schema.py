@@ -0,0 +1,203 @@
+"""
+Canonical dtypes for the facility-flow tables.
+
+The generation and combined upstream and generation dataframes have one row
+per facility and flow, so they can have millions of rows. Most of their
+columns repeat a handful of strings (fuel categories, compartments, flow
+names and UUIDs, etc.), which are stored much more compactly as categoricals.
+The integer IDs and data quality scores are also stored with smaller types.
+enforce_schema converts a dataframe to these dtypes and is called where a
+stage returns one of these tables.
+
+Code that works with these tables should allow for categorical columns:
+groupbys use observed=True (otherwise every combination of categories is
+returned) and new values have to be added to the categories (see
+add_categories) before they are assigned to some of the rows of a column.
+Assigning a whole column, e.g., df["stage_code"] = "Power plant", is fine.
+FlowAmount, Electricity, and quantity are left as float64 because they are
+summed over many rows.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+module_logger = logging.getLogger("schema.py")
+
+CATEGORY_COLUMNS = [
+    "FlowName",
+    "FlowUUID",
+    "Compartment",
+    "Compartment_path",
+    "ElementaryFlowPrimeContext",
+    "FuelCategory",
+    "stage_code",
+    "Source",
+    "Unit",
+    "Balancing Authority Code",
+    "Balancing Authority Name",
+    "NERC",
+    "Subregion",
+    "FERC_Region",
+    "EIA_Region",
+]
+# Converted only if the column has no missing values and fits the type.
+INTEGER_COLUMNS = {
+    "eGRID_ID": np.int32,
+    "FacilityID": np.int32,
+    "Year": np.int16,
+}
+FLOAT32_COLUMNS = [
+    "ReliabilityScore",
+    "TemporalCorrelation",
+    "TechnologicalCorrelation",
+    "GeographicalCorrelation",
+    "DataCollection",
+    "PercentGenerationfromDesignatedFuelCategory",
+    "Age",
+]
+
+
+def _to_integer(series, dtype):
+    """Return series as dtype, or unchanged if it can't be converted
+    without changing its values."""
+    if not pd.api.types.is_numeric_dtype(series) or series.dtype == dtype:
+        return series
+    if series.isna().any():
+        return series
+    if len(series) == 0:
+        return series.astype(dtype)
+    info = np.iinfo(dtype)
+    if series.min() < info.min or series.max() > info.max:
+        return series
+    converted = series.astype(dtype)
+    if not np.array_equal(converted.to_numpy(), series.to_numpy()):
+        return series
+    return converted
+
+
+def _is_categorical(series):
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def _memory(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def enforce_schema(df):
+    """
+    Convert the columns of a dataframe that are in the schema to their
+    canonical dtypes. Other columns are left as they are.
+
+    Parameters
+    ----------
+    df : dataframe
+
+    Returns
+    -------
+    dataframe
+        A dataframe with the converted columns (the input is not
+        modified).
+    """
+    if not isinstance(df, pd.DataFrame):
+        return df
+    converted = dict()
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if _is_categorical(series):
+            converted[col] = series.cat.remove_unused_categories()
+        elif pd.api.types.is_object_dtype(series):
+            converted[col] = series.astype("category")
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            converted[col] = _to_integer(df[col], dtype)
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns and (
+            pd.api.types.is_float_dtype(df[col])
+            or pd.api.types.is_integer_dtype(df[col])
+        ):
+            converted[col] = df[col].astype(np.float32)
+    if not converted:
+        return df
+    if module_logger.isEnabledFor(logging.DEBUG):
+        before = _memory(df)
+    result = df.assign(**converted)
+    if module_logger.isEnabledFor(logging.DEBUG):
+        module_logger.debug(
+            f"Enforced schema: {before:.1f} MB to {_memory(result):.1f} MB"
+        )
+    return result
+
+
+def add_categories(df, col, values):
+    """
+    Add values to the categories of a categorical column so that they can be
+    assigned to some of its rows. Does nothing if the column isn't
+    categorical.
+
+    Parameters
+    ----------
+    df : dataframe
+        Modified in place.
+    col : str
+    values : scalar or list-like
+    """
+    if col not in df.columns or not _is_categorical(df[col]):
+        return
+    if np.ndim(values) == 0:
+        values = [values]
+    new = pd.unique(pd.Series(values, dtype=object).dropna())
+    new = [v for v in new if v not in df[col].cat.categories]
+    if new:
+        df[col] = df[col].cat.add_categories(new)
+
+
+def concat(frames, **kwargs):
+    """
+    pd.concat for dataframes that follow the schema. The categories of the
+    categorical columns are combined first so that the columns stay
+    categorical (pd.concat makes them object columns unless the categories
+    are identical).
+
+    Parameters
+    ----------
+    frames : list
+        Dataframes.
+    **kwargs
+        Passed to pd.concat.
+
+    Returns
+    -------
+    dataframe
+    """
+    frames = [f for f in frames if f is not None]
+    for col in CATEGORY_COLUMNS:
+        has_col = [col in f.columns for f in frames]
+        if not any(
+            col in f.columns and _is_categorical(f[col])
+            for f in frames
+        ):
+            continue
+        categories = list()
+        for f in frames:
+            if col not in f.columns:
+                continue
+            if _is_categorical(f[col]):
+                categories.append(pd.Series(f[col].cat.categories))
+            else:
+                categories.append(f[col].dropna())
+        categories = pd.unique(pd.concat(categories, ignore_index=True))
+        try:
+            categories = np.sort(categories)
+        except TypeError:
+            pass
+        dtype = pd.CategoricalDtype(categories)
+        frames = [
+            f.assign(**{col: f[col].astype(dtype)}) if has
+            else f.assign(**{col: pd.Categorical([None] * len(f), dtype=dtype)})
+            for f, has in zip(frames, has_col)
+        ]
+    return pd.concat(frames, **kwargs)
@@ -6,16 +6,13 @@ import pandas as pd
 from electricitylci.globals import output_dir, data_dir
 import numpy as np
 from electricitylci.eia923_generation import eia923_download_extract
+from electricitylci.factored_inventory import FactoredInventory
 
 
-def generate_upstream_solarthermal(year):
+def solarthermal_inventory(year):
     """
-    Generate the annual emissions.
-    
-    For solar thermal plant construction for each plant in EIA923. The emissions
-    inventory file has already allocated the total emissions to construct the
-    entire power plant over its assumed 30 year life. So the emissions returned
-    below represent 1/30th of the total site construction emissions.
+    Annual solar thermal plant construction emissions and net generation of
+    each plant in EIA923. See generate_upstream_solarthermal.
 
     Parameters
     ----------
@@ -24,7 +21,7 @@ def generate_upstream_solarthermal(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
     eia_generation_data = eia923_download_extract(year)
     eia_generation_data['Plant Id']=eia_generation_data['Plant Id'].astype(int)
@@ -51,21 +48,14 @@ def generate_upstream_solarthermal(year):
             value_name='FlowAmount'
     )
     solar_df_t_melt = solar_df_t_melt.astype({'plant_id' : int})
-    solarthermal_upstream=solar_df_t_melt.merge(
-            right=solar_generation_data,
-            left_on='plant_id',
-            right_on='Plant Id',
-            how='left'
-    )
-    solarthermal_upstream.rename(columns=
+    solar_generation_data=solar_generation_data.rename(columns=
             {
                     'Net Generation (Megawatthours)':'Electricity',
-            },
-            inplace=True
+                    'Plant Id':'plant_id',
+            }
     )
-    solarthermal_upstream["quantity"]=solarthermal_upstream["Electricity"]
-    solarthermal_upstream.drop(columns=[
-            'Plant Id',
+    solar_generation_data["quantity"]=solar_generation_data["Electricity"]
+    solar_generation_data.drop(columns=[
             'NAICS Code',
             'Reported Fuel Type Code',
             'YEAR',
@@ -75,18 +65,46 @@ def generate_upstream_solarthermal(year):
             ],inplace=True)
     # These emissions will later be aggregated with any inventory power plant
     # emissions because each facility has its own construction impacts.
-    solarthermal_upstream['stage_code']="Power plant"
-    solarthermal_upstream['fuel_type']='SOLARTHERMAL'
+    solar_df_t_melt['stage_code']="Power plant"
+    solar_df_t_melt['fuel_type']='SOLARTHERMAL'
     compartment_map={
             'Air':'air',
             'Water':'water',
             'Energy':'input'
     }
-    solarthermal_upstream['Compartment']=solarthermal_upstream['Compartment'].map(compartment_map)
-    # solarthermal_upstream['Compartment']=solarthermal_upstream['Compartment'].str.lower()
-    solarthermal_upstream["Unit"]="kg"
-    solarthermal_upstream["input"]=False
-    return solarthermal_upstream
+    solar_df_t_melt['Compartment']=solar_df_t_melt['Compartment'].map(compartment_map)
+    # solar_df_t_melt['Compartment']=solar_df_t_melt['Compartment'].str.lower()
+    solar_df_t_melt["Unit"]="kg"
+    solar_df_t_melt["input"]=False
+    # The inventory is already the annual total for each plant.
+    return FactoredInventory(
+            solar_df_t_melt,
+            solar_generation_data,
+            on='plant_id',
+            scale=False,
+            how='right'
+    )
+
+
+def generate_upstream_solarthermal(year):
+    """
+    Generate the annual emissions.
+    
+    For solar thermal plant construction for each plant in EIA923. The emissions
+    inventory file has already allocated the total emissions to construct the
+    entire power plant over its assumed 30 year life. So the emissions returned
+    below represent 1/30th of the total site construction emissions.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
+
+    Returns
+    ----------
+    dataframe
+    """
+    return solarthermal_inventory(year).expand()
 
 
 if __name__=='__main__':
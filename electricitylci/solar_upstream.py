@@ -6,17 +6,13 @@ import pandas as pd
 from electricitylci.globals import output_dir, data_dir
 import numpy as np
 from electricitylci.eia923_generation import eia923_download_extract
+from electricitylci.factored_inventory import FactoredInventory
 
 
-def generate_upstream_solar(year):
+def solar_inventory(year):
     """
-    Generate the annual emissions.
-    
-    For solar panel construction for each plant in EIA923. The emissions
-    inventory file has already allocated the total emissions to construct panels
-    and balance of system for the entire power plant over the assumed 30 year
-    life of the panels. So the emissions returned below represent 1/30th of the
-    total site construction emissions.
+    Annual solar panel construction emissions and net generation of each
+    plant in EIA923. See generate_upstream_solar.
 
     Parameters
     ----------
@@ -25,7 +21,7 @@ def generate_upstream_solar(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
     eia_generation_data = eia923_download_extract(year)
     eia_generation_data['Plant Id']=eia_generation_data['Plant Id'].astype(int)
@@ -52,21 +48,14 @@ def generate_upstream_solar(year):
             value_name='FlowAmount'
     )
     solar_df_t_melt = solar_df_t_melt.astype({'plant_id' : int})
-    solar_upstream=solar_df_t_melt.merge(
-            right=solar_generation_data,
-            left_on='plant_id',
-            right_on='Plant Id',
-            how='left'
-    )
-    solar_upstream.rename(columns=
+    solar_generation_data=solar_generation_data.rename(columns=
             {
                     'Net Generation (Megawatthours)':'quantity',
-            },
-            inplace=True
+                    'Plant Id':'plant_id',
+            }
     )
-    solar_upstream["Electricity"]=solar_upstream["quantity"]
-    solar_upstream.drop(columns=[
-            'Plant Id',
+    solar_generation_data["Electricity"]=solar_generation_data["quantity"]
+    solar_generation_data.drop(columns=[
             'NAICS Code',
             'Reported Fuel Type Code',
             'YEAR',
@@ -76,19 +65,48 @@ def generate_upstream_solar(year):
             ],inplace=True)
     # These emissions will later be aggregated with any inventory power plant
     # emissions because each facility has its own construction impacts.
-    solar_upstream['stage_code']="Power plant"
-    solar_upstream['fuel_type']='SOLAR'
+    solar_df_t_melt['stage_code']="Power plant"
+    solar_df_t_melt['fuel_type']='SOLAR'
     compartment_map={
             'Air':'air',
             'Water':'water',
             'Energy':'input'
     }
-    solar_upstream['Compartment']=solar_upstream['Compartment'].map(compartment_map)
-    solar_upstream["Unit"]="kg"
-    solar_upstream["input"]=False
-    # solar_upstream['Compartment']=solar_upstream['Compartment'].str.lower()
+    solar_df_t_melt['Compartment']=solar_df_t_melt['Compartment'].map(compartment_map)
+    solar_df_t_melt["Unit"]="kg"
+    solar_df_t_melt["input"]=False
+    # solar_df_t_melt['Compartment']=solar_df_t_melt['Compartment'].str.lower()
+
+    # The inventory is already the annual total for each plant.
+    return FactoredInventory(
+            solar_df_t_melt,
+            solar_generation_data,
+            on='plant_id',
+            scale=False,
+            how='right'
+    )
+
+
+def generate_upstream_solar(year):
+    """
+    Generate the annual emissions.
+    
+    For solar panel construction for each plant in EIA923. The emissions
+    inventory file has already allocated the total emissions to construct panels
+    and balance of system for the entire power plant over the assumed 30 year
+    life of the panels. So the emissions returned below represent 1/30th of the
+    total site construction emissions.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
 
-    return solar_upstream
+    Returns
+    ----------
+    dataframe
+    """
+    return solar_inventory(year).expand()
 
 
 if __name__=='__main__':
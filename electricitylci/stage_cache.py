@@ -0,0 +1,436 @@
+"""
+Persistent on-disk cache for the dataframes produced by each stage of the
+main.py pipeline.
+
+Each stage result is stored in a columnar (parquet) file whose name contains a
+hash of the model specs that the stage depends on, the arguments that
+distinguish one call of the stage from another (including fingerprints of
+the dataframes passed in from earlier stages), and fingerprints (size and
+modification time) of the raw input files in the data directory that the
+stage reads. Re-running
+the model with only writer-side changes (e.g., the JSON-LD output) will load
+the stage results from disk rather than rebuilding them.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from os.path import join
+
+import pandas as pd
+
+from electricitylci.globals import data_dir, elci_version
+from electricitylci.factored_inventory import FactoredInventory
+
+module_logger = logging.getLogger("stage_cache.py")
+
+stage_cache_dir = join(data_dir, "stage_cache")
+
+# Set by main.py from its --stage_cache option. Functions that cache their
+# own intermediate stages (e.g., ampd_plant_emissions) use this by default.
+enabled = False
+
+# Model spec fields that change the facility-level data and, as a result,
+# everything downstream of it.
+_GENERATION_FIELDS = [
+    "electricity_lci_target_year",
+    "egrid_year",
+    "eia_gen_year",
+    "replace_egrid",
+    "include_renewable_generation",
+    "include_netl_water",
+    "include_upstream_processes",
+    "inventories_of_interest",
+    "include_only_egrid_facilities_with_positive_generation",
+    "filter_on_efficiency",
+    "egrid_facility_efficiency_filters",
+    "filter_on_min_plant_percent_generation_from_primary_fuel",
+    "min_plant_percent_generation_from_primary_fuel_category",
+    "keep_mixed_plant_category",
+    "filter_non_egrid_emission_on_NAICS",
+    "fedelemflowlist_version",
+    "regional_aggregation",
+    "fuel_name_file",
+    "post_process_generation_emission_factors",
+]
+
+# Model spec fields used to assign a primary fuel to each plant.
+_PRIMARY_FUEL_FIELDS = [
+    "min_plant_percent_generation_from_primary_fuel_category",
+    "keep_mixed_plant_category",
+]
+
+# The model spec fields that each stage depends on.
+STAGE_SPEC_FIELDS = {
+    "upstream": ["eia_gen_year", "fedelemflowlist_version"],
+    "generation": _GENERATION_FIELDS,
+    "generation_mix": _GENERATION_FIELDS + [
+        "gen_mix_from_model_generation_data"
+    ],
+    "consumption_mix": _GENERATION_FIELDS + [
+        "net_trading", "EPA_eGRID_trading"
+    ],
+    "distribution_mix": _GENERATION_FIELDS + [
+        "efficiency_of_distribution_grid"
+    ],
+    # Stages of ampd_plant_emissions.generate_plant_emissions
+    "plant_emissions_net_gen": _PRIMARY_FUEL_FIELDS,
+    "plant_emissions_co2_ch4_n2o": [],
+    "plant_emissions_so2": [],
+    "plant_emissions_nox": [],
+    "plant_emissions_ampd": [],
+    "plant_emissions": _PRIMARY_FUEL_FIELDS + ["fedelemflowlist_version"],
+}
+
+# Raw inputs in the data directory that each stage reads, relative to
+# data_dir. Files derived from these (e.g., csv files converted from the EIA
+# excel files) are deliberately left out so that creating them during a run
+# does not change the fingerprint. Each stage only fingerprints its own
+# inputs, so files downloaded by a later stage don't change its key.
+_COMMON_PATTERNS = ["*.csv", "*.xlsx", "*.yml"]
+_EIA_PATTERNS = [
+    "f923_{eia_gen_year}/*.xls*",
+    "f923_{eia_gen_year}/*.zip",
+    "eia860_{eia_gen_year}/*.xls*",
+    "eia860_{eia_gen_year}/*.zip",
+]
+_CEMS_PATTERNS = ["epacems{eia_gen_year}/*.zip"]
+_PLANT_EMISSION_PATTERNS = ["EFs/*"] + _EIA_PATTERNS + _CEMS_PATTERNS
+STAGE_SOURCE_PATTERNS = {
+    "upstream": _COMMON_PATTERNS + _EIA_PATTERNS + [
+        "EFs/*",
+        "petroleum_inventory/*",
+        "f7a_{eia_gen_year}/*",
+    ],
+    "generation": _COMMON_PATTERNS + _PLANT_EMISSION_PATTERNS,
+    "generation_mix": _COMMON_PATTERNS + _EIA_PATTERNS,
+    "consumption_mix": _COMMON_PATTERNS + _EIA_PATTERNS + [
+        "bulk_data/EBA.zip"
+    ],
+    "distribution_mix": _COMMON_PATTERNS + _PLANT_EMISSION_PATTERNS + [
+        "t_and_d_{eia_gen_year}/*.xlsx"
+    ],
+    "plant_emissions_net_gen": _EIA_PATTERNS,
+    "plant_emissions_co2_ch4_n2o": ["EFs/*"] + _EIA_PATTERNS,
+    "plant_emissions_so2": ["EFs/*"] + _EIA_PATTERNS,
+    "plant_emissions_nox": ["EFs/*"] + _EIA_PATTERNS,
+    "plant_emissions_ampd": _EIA_PATTERNS + _CEMS_PATTERNS,
+    "plant_emissions": _PLANT_EMISSION_PATTERNS,
+}
+_DERIVED_SUFFIXES = ("fromstewicombo.csv",)
+
+
+def fingerprint_files(paths):
+    """
+    Create a list of (name, size, modification time) entries for the given
+    files. Directories and files that do not exist are skipped.
+
+    Parameters
+    ----------
+    paths : list
+        File paths to fingerprint.
+
+    Returns
+    -------
+    list
+    """
+    fingerprint = []
+    for p in sorted(paths):
+        if not os.path.isfile(p):
+            continue
+        stat = os.stat(p)
+        fingerprint.append(
+            (os.path.relpath(p, data_dir), stat.st_size, stat.st_mtime_ns)
+        )
+    return fingerprint
+
+
+def source_fingerprint(model_specs, patterns=None, year=None):
+    """
+    Fingerprint the raw input files used by the model for the years set in
+    the model specs.
+
+    Parameters
+    ----------
+    model_specs : ModelSpecs
+        The model configuration, used to fill in years in the file patterns.
+    patterns : list, optional
+        Glob patterns relative to the data directory, by default the patterns
+        for the inputs of all of the stages.
+    year : int, optional
+        Year used in the file patterns instead of the eia_gen_year in the
+        model specs.
+
+    Returns
+    -------
+    list
+    """
+    if patterns is None:
+        patterns = sorted(set().union(*STAGE_SOURCE_PATTERNS.values()))
+    if year is None:
+        year = model_specs.eia_gen_year
+    paths = set()
+    for pattern in patterns:
+        pattern = pattern.format(eia_gen_year=year)
+        paths.update(
+            p for p in glob.glob(join(data_dir, pattern))
+            if not p.endswith(_DERIVED_SUFFIXES)
+        )
+    return fingerprint_files(paths)
+
+
+def hash_frame(df):
+    """
+    Create a stable hash of a dataframe's contents, index, and column names.
+
+    Parameters
+    ----------
+    df : dataframe
+
+    Returns
+    -------
+    str
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+
+def fingerprint(obj):
+    """
+    Create a stable hash of a stage input, e.g., the upstream inventory or
+    dictionary of upstream processes passed to the generation stage, to use
+    as a key part.
+
+    Parameters
+    ----------
+    obj : dataframe, FactoredInventory, or json-serializable object
+
+    Returns
+    -------
+    str
+    """
+    if isinstance(obj, pd.DataFrame):
+        return hash_frame(obj)
+    if isinstance(obj, FactoredInventory):
+        return hash_frame(obj.intensities) + hash_frame(obj.activity)
+    h = hashlib.sha256()
+    h.update(json.dumps(obj, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def stage_key(stage, model_specs, key_parts=(), source_year=None):
+    """
+    Build the cache key for a stage.
+
+    Parameters
+    ----------
+    stage : str
+        One of the keys in STAGE_SPEC_FIELDS.
+    model_specs : ModelSpecs
+        The model configuration.
+    key_parts : tuple, optional
+        Any additional, json-serializable, values that distinguish calls to
+        the same stage (e.g., the subregion).
+    source_year : int, optional
+        Year of the input files to fingerprint, by default the eia_gen_year
+        in the model specs. Only the files in the stage's
+        STAGE_SOURCE_PATTERNS are fingerprinted.
+
+    Returns
+    -------
+    str
+        A hex digest used in the name of the cached file.
+    """
+    specs = {
+        field: getattr(model_specs, field, None)
+        for field in STAGE_SPEC_FIELDS[stage]
+    }
+    key_source = {
+        "stage": stage,
+        "version": elci_version,
+        "specs": specs,
+        "key_parts": list(key_parts),
+        "sources": source_fingerprint(
+            model_specs, STAGE_SOURCE_PATTERNS[stage], year=source_year
+        ),
+    }
+    key_string = json.dumps(key_source, sort_keys=True, default=str)
+    return hashlib.sha256(key_string.encode()).hexdigest()[:20]
+
+
+def _write_frame(df, path_stem):
+    """Write a dataframe to parquet, falling back to pickle if the dataframe
+    contains object columns that cannot be stored in parquet."""
+    try:
+        df.to_parquet(path_stem + ".parquet.tmp")
+        os.replace(path_stem + ".parquet.tmp", path_stem + ".parquet")
+    except (ImportError, ValueError, TypeError, NotImplementedError) as e:
+        module_logger.warning(
+            f"Unable to store {os.path.basename(path_stem)} as parquet ({e}), "
+            f"using pickle instead"
+        )
+        if os.path.exists(path_stem + ".parquet.tmp"):
+            os.remove(path_stem + ".parquet.tmp")
+        df.to_pickle(path_stem + ".pkl.tmp")
+        os.replace(path_stem + ".pkl.tmp", path_stem + ".pkl")
+
+
+def _read_frame(path_stem):
+    """Read a dataframe written by _write_frame. Returns None if missing."""
+    if os.path.exists(path_stem + ".parquet"):
+        return pd.read_parquet(path_stem + ".parquet")
+    if os.path.exists(path_stem + ".pkl"):
+        return pd.read_pickle(path_stem + ".pkl")
+    return None
+
+
+def load_stage(stage, key):
+    """
+    Load a stage result from the cache.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage.
+    key : str
+        Cache key as generated by stage_key.
+
+    Returns
+    -------
+    dataframe, dictionary of dataframes, FactoredInventory, or None
+        None is returned if the stage is not in the cache.
+    """
+    stem = join(stage_cache_dir, f"{stage}_{key}")
+    manifest_path = stem + ".json"
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest["kind"] == "dict":
+            result = {}
+            for name in manifest["names"]:
+                result[name] = _read_frame(join(stem, name))
+                if result[name] is None:
+                    return None
+        elif manifest["kind"] == "factored":
+            intensities = _read_frame(join(stem, "intensities"))
+            activity = _read_frame(join(stem, "activity"))
+            if intensities is None or activity is None:
+                return None
+            result = FactoredInventory(
+                intensities, activity, **manifest["factored"]
+            )
+        else:
+            result = _read_frame(stem)
+    except (OSError, ValueError, KeyError, pickle.UnpicklingError) as e:
+        module_logger.warning(f"Unable to read cached {stage} ({e})")
+        return None
+    return result
+
+
+def save_stage(stage, key, result, key_parts=()):
+    """
+    Save a stage result to the cache.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage.
+    key : str
+        Cache key as generated by stage_key.
+    result : dataframe, dictionary of dataframes, or FactoredInventory
+        The stage result.
+    key_parts : tuple, optional
+        The additional values used to generate the key. These are only
+        written to the manifest for reference.
+    """
+    os.makedirs(stage_cache_dir, exist_ok=True)
+    stem = join(stage_cache_dir, f"{stage}_{key}")
+    if isinstance(result, dict):
+        os.makedirs(stem, exist_ok=True)
+        for name, df in result.items():
+            _write_frame(df, join(stem, str(name)))
+        manifest = {"kind": "dict", "names": [str(x) for x in result]}
+    elif isinstance(result, pd.DataFrame):
+        _write_frame(result, stem)
+        manifest = {"kind": "frame"}
+    elif isinstance(result, FactoredInventory):
+        os.makedirs(stem, exist_ok=True)
+        _write_frame(result.intensities, join(stem, "intensities"))
+        _write_frame(result.activity, join(stem, "activity"))
+        manifest = {
+            "kind": "factored",
+            "factored": {
+                "on": result.on,
+                "scale": result.scale,
+                "how": result.how,
+            },
+        }
+    else:
+        module_logger.warning(
+            f"Stage {stage} returned {type(result)}, which is not cached"
+        )
+        return
+    manifest["stage"] = stage
+    manifest["version"] = elci_version
+    manifest["key_parts"] = [str(x) for x in key_parts]
+    # The manifest is written last so that a partially written stage is
+    # never read back.
+    with open(stem + ".json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def cached_stage(
+    stage, model_specs, func, *args, key_parts=(), source_year=None, **kwargs
+):
+    """
+    Return the result of func(*args, **kwargs), loading it from the stage
+    cache when a result for the same model specs, key parts, and input files
+    exists, and saving it to the cache otherwise. The result is saved under
+    a key built after func runs, so that input files it downloaded are
+    included in the fingerprint.
+
+    Parameters
+    ----------
+    stage : str
+        One of the keys in STAGE_SPEC_FIELDS.
+    model_specs : ModelSpecs
+        The model configuration.
+    func : function
+        The function that builds the stage result.
+    key_parts : tuple, optional
+        Additional json-serializable values that distinguish calls to the
+        same stage.
+    source_year : int, optional
+        Year of the input files to fingerprint, by default the eia_gen_year
+        in the model specs.
+
+    Returns
+    -------
+    dataframe, dictionary of dataframes, or FactoredInventory
+    """
+    key = stage_key(stage, model_specs, key_parts, source_year)
+    result = load_stage(stage, key)
+    if result is not None:
+        module_logger.info(f"Loaded {stage} from the stage cache")
+        return result
+    result = func(*args, **kwargs)
+    # The stage may have downloaded its input files, so the key is built
+    # again now that they exist; it's the key the next run will look up.
+    key = stage_key(stage, model_specs, key_parts, source_year)
+    save_stage(stage, key, result, key_parts)
+    return result
+
+
+def clear_stage_cache():
+    """Delete all cached stage results."""
+    if os.path.exists(stage_cache_dir):
+        shutil.rmtree(stage_cache_dir)
+        module_logger.info(f"Removed stage cache at {stage_cache_dir}")
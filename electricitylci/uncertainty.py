@@ -0,0 +1,165 @@
+"""
+Lognormal uncertainty parameters for aggregated emission factors.
+
+These functions replace the per-group geometric_mean and per-row
+calc_geom_std functions that were nested in generation.aggregate_data. They
+compute the parameters for all groups (or rows) at once and return a mask of
+the entries that have valid parameters instead of catching exceptions for
+each one. The arithmetic is the same as in the original functions; the
+group sums are added in a different order, so results can differ from them
+by floating point rounding.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.special import erfinv
+from scipy.stats import t
+
+module_logger = logging.getLogger("uncertainty.py")
+
+
+def _group_mean_std(values, codes, sizes):
+    """Return the mean and (population) standard deviation of values for
+    each group, from the group sums of the values and of their squared
+    deviations from the group mean."""
+    n_groups = len(sizes)
+    safe_sizes = np.where(sizes > 0, sizes, 1)
+    means = np.bincount(codes, weights=values, minlength=n_groups) / safe_sizes
+    deviations = values - means[codes]
+    stds = np.sqrt(
+        np.bincount(
+            codes, weights=np.square(deviations), minlength=n_groups
+        )
+        / safe_sizes
+    )
+    return means, stds
+
+
+def group_lognormal_params(values, codes, n_groups, confidence=0.90):
+    """
+    Calculate the geometric mean and the upper end of the t-based confidence
+    interval for the lognormal mean of each group of emission factors.
+
+    Groups with 3 or fewer values, a median of 0 or less, values that are
+    zero, negative, or infinite, or no spread in their values do not get
+    parameters.
+
+    Parameters
+    ----------
+    values : array
+        Facility emission factors.
+    codes : array
+        Group number (0 to n_groups - 1) of each value, e.g., from
+        GroupBy.ngroup; values with negative or NaN codes are ignored.
+    n_groups : int
+        Number of groups.
+    confidence : float, optional
+        Confidence level of the interval, by default 0.90.
+
+    Returns
+    -------
+    geo_mean : array
+        Geometric mean of each group.
+    upper : array
+        Upper end of the confidence interval for each group.
+    valid : array
+        True for the groups that have parameters. The other entries of
+        geo_mean and upper are meaningless.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.asarray(codes)
+    with np.errstate(invalid="ignore"):
+        in_group = codes >= 0
+    values = values[in_group]
+    codes = codes[in_group].astype(np.int64)
+
+    sizes = np.bincount(codes, minlength=n_groups)
+    group_stats = (
+        pd.Series(values)
+        .groupby(codes)
+        .agg(["median", "min", "max"])
+        .reindex(range(n_groups))
+    )
+    medians = group_stats["median"].to_numpy()
+    # The spread of a group of equal values is exactly 0, which the group
+    # sums don't always give.
+    equal_values = (group_stats["min"] == group_stats["max"]).to_numpy()
+    valid = (sizes > 3) & (medians > 0)
+    # np.log and np.std raise for these under np.errstate(all="raise")
+    not_positive_finite = ~((values > 0) & (values < np.inf)) & ~np.isnan(values)
+    valid &= np.bincount(codes, weights=not_positive_finite, minlength=n_groups) == 0
+
+    with np.errstate(all="ignore"):
+        log_values = np.log(values)
+        mean, std = _group_mean_std(log_values, codes, sizes)
+        std[equal_values] = 0.0
+        l = sizes.astype(np.float64)
+        sd = std / np.sqrt(l)
+        sd2 = np.square(sd)
+        # t.interval(confidence, df, loc, scale) without the argument checks,
+        # which fail for a scale of 0.
+        q2 = (1.0 + np.asarray(confidence)) / 2
+        pi2 = t.ppf(q2, np.maximum(l - 2, 1)) * sd + mean
+        spread = pi2 * np.sqrt(sd2 / l + np.square(sd2) / (2 * (l - 1)))
+        upper_interval = np.maximum(
+            mean + sd2 / 2 + spread, mean + sd2 / 2 - spread
+        )
+        geo_mean = np.exp(mean)
+        upper = np.exp(upper_interval)
+    # NaN values propagate to the parameters rather than being flagged, as
+    # they did in the original function.
+    valid &= (sd > 0) | np.isnan(sd)
+    # Overflow and underflow in np.exp
+    tiny = np.finfo(np.float64).tiny
+    valid &= ~(np.isinf(geo_mean) | (geo_mean < tiny))
+    valid &= ~(np.isinf(upper) | (upper < tiny))
+
+    module_logger.debug(
+        f"{valid.sum()} of {n_groups} groups have lognormal parameters"
+    )
+    return geo_mean, upper, valid
+
+
+def lognormal_params_from_upper(emission_factor, upper, confidence=0.95):
+    """
+    Calculate the geometric mean and geometric standard deviation of a
+    lognormal distribution with the given arithmetic mean (the emission
+    factor) and upper bound at the given confidence level.
+
+    In some cases the emission factor is far from the geometric mean of the
+    individual facility emission factors, which can be a sign of outliers
+    having a large impact on the emission factor. The parameters are
+    nonsensical in these cases so they are skipped when the emission factor is
+    greater than the upper bound.
+
+    Parameters
+    ----------
+    emission_factor : array
+    upper : array
+        Upper bound of the distribution, e.g., from group_lognormal_params;
+        NaN where there is none.
+    confidence : float, optional
+        By default 0.95.
+
+    Returns
+    -------
+    geo_mean : array
+    geo_sd : array
+    valid : array
+        True for the entries that have parameters.
+    """
+    emission_factor = np.asarray(emission_factor, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    with np.errstate(all="ignore"):
+        c = np.log(upper) - np.log(emission_factor)
+        b = -2**0.5 * erfinv(2 * confidence - 1)
+        a = 0.5
+        # The smaller root of a*sd**2 + b*sd + c = 0
+        sd = (-b - np.sqrt(b**2 - 4 * a * c)) / (2 * a)
+        geo_sd = np.exp(sd)
+        geo_mean = np.exp(np.log(emission_factor) - 0.5 * np.square(sd))
+        valid = ~(emission_factor > upper)
+    valid &= ~np.isnan(geo_sd) & (geo_sd != 0)
+    return geo_mean, geo_sd, valid
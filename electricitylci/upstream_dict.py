@@ -20,6 +20,7 @@ from electricitylci.process_dictionary_writer import (
         process_description_creation
 )
 from electricitylci.utils import make_valid_version_num
+from electricitylci.factored_inventory import FactoredInventory
 from electricitylci.globals import elci_version
 
 module_logger=logging.getLogger("upstream_dict.py")
@@ -258,7 +259,7 @@ def olcaschema_genupstream_processes(merged):
 
     Parameters
     ----------
-    merged: dataframe
+    merged: dataframe or FactoredInventory
         Dataframe containing the inventory for upstream processes used by
         eletricity generation.
 
@@ -298,25 +299,29 @@ def olcaschema_genupstream_processes(merged):
     #    merged_summary = merged.groupby([
     #            'fuel_type','stage_code','FlowName','Compartment'],as_index=False
     #            )['quantity','FlowAmount'].sum()
-    # First going to keep plant IDs to account for possible emission repeats
-    # for the same compartment, leading to erroneously low emission factors
-    merged_summary = merged.groupby(
-        [
-            "FuelCategory",
-            "stage_code",
-            "FlowName",
-            "FlowUUID",
-            "Compartment",
-            "plant_id",
-            "Unit",
-            "input"
-        ],
-        as_index=False,
-    ).agg({"FlowAmount": "sum", "quantity": "mean"})
-    merged_summary = merged_summary.groupby(
-        ["FuelCategory", "stage_code", "FlowName", "FlowUUID", "Compartment","Unit","input"],
-        as_index=False,
-    )["quantity", "FlowAmount"].sum()
+    summary_cols = [
+        "FuelCategory",
+        "stage_code",
+        "FlowName",
+        "FlowUUID",
+        "Compartment",
+        "Unit",
+        "input"
+    ]
+    if isinstance(merged, FactoredInventory):
+        # Same totals as below, calculated from the per-unit flows.
+        merged_summary = merged.stage_totals(summary_cols)
+    else:
+        # First going to keep plant IDs to account for possible emission repeats
+        # for the same compartment, leading to erroneously low emission factors
+        merged_summary = merged.groupby(
+            summary_cols + ["plant_id"],
+            as_index=False,
+        ).agg({"FlowAmount": "sum", "quantity": "mean"})
+        merged_summary = merged_summary.groupby(
+            summary_cols,
+            as_index=False,
+        )["quantity", "FlowAmount"].sum()
     # ng_rows = merged_summary['fuel_type']=='Natural gas'
 
     # For natural gas extraction there are extraction and transportation stages
@@ -3,10 +3,12 @@
 import io
 import zipfile
 import os
+import queue
+import threading
+from collections import namedtuple
 from os.path import join
 from electricitylci.globals import data_dir
 
-import requests
 import pandas as pd
 import logging
 
@@ -25,14 +27,210 @@ def download_unzip(url, unzip_path):
         Destination to unzip the data
 
     """
-    r = requests.get(url)
-    content_type = r.headers["Content-Type"]
-    if "zip" not in content_type and "-stream" not in content_type:
-        print(content_type)
+    from electricitylci.downloads import fetch, staging_path, DownloadError
+
+    # The zip file is kept in the staging folder until it is extracted so
+    # that an interrupted download can be resumed by the next call.
+    zip_path = staging_path(url)
+    try:
+        fetch(url, zip_path)
+    except DownloadError as e:
+        raise ValueError(f"Unable to download {url}: {e.message}") from e
+    if not zipfile.is_zipfile(zip_path):
+        os.remove(zip_path)
+        raise ValueError("URL does not point to valid zip file")
+    with zipfile.ZipFile(zip_path) as z:
+        z.extractall(path=unzip_path)
+    os.remove(zip_path)
+
+
+def download_zip(url, save_path):
+    """
+    Download a zip file from url to a given folder without extracting it.
+    The readers open the members they need in place (see find_data_file).
+
+    Parameters
+    ----------
+    url : str
+        Valid url to download the zip file
+    save_path : str or path object
+        Folder to save the zip file in
+
+    Returns
+    -------
+    str
+        Path to the zip file
+    """
+    from electricitylci.downloads import fetch, DownloadError
+
+    zip_path = join(save_path, os.path.basename(url.split("?")[0]))
+    try:
+        fetch(url, zip_path)
+    except DownloadError as e:
+        raise ValueError(f"Unable to download {url}: {e.message}") from e
+    if not zipfile.is_zipfile(zip_path):
+        os.remove(zip_path)
         raise ValueError("URL does not point to valid zip file")
+    return zip_path
+
 
-    z = zipfile.ZipFile(io.BytesIO(r.content))
-    z.extractall(path=unzip_path)
+ZipMember = namedtuple("ZipMember", ["zip_path", "name"])
+ZipMember.__doc__ = "A file inside a zip archive."
+
+
+def find_data_file(folder_path, file_pattern_match, exclude_ext=None):
+    """
+    Find a data file by the strings in its name, whether it was extracted
+    to the folder or is still inside a zip file in the folder.
+
+    Parameters
+    ----------
+    folder_path : str
+    file_pattern_match : list
+        Strings that the name of the file must all contain.
+    exclude_ext : str or tuple, optional
+        Extensions of files to ignore.
+
+    Returns
+    -------
+    str or ZipMember
+        The last matching file in the folder (as find_file_in_folder) or, if
+        there is none, the last matching member of a zip file in the folder.
+        None if neither exists.
+    """
+    def matches(name):
+        if exclude_ext and name.endswith(exclude_ext):
+            return False
+        return all(p in name for p in file_pattern_match)
+
+    match = None
+    zip_files = []
+    for f in sorted(os.listdir(folder_path)):
+        if f.endswith(".zip"):
+            zip_files.append(f)
+        elif matches(f):
+            match = join(folder_path, f)
+    if match is not None:
+        return match
+    for f in zip_files:
+        zip_path = join(folder_path, f)
+        with zipfile.ZipFile(zip_path) as z:
+            for name in z.namelist():
+                if matches(os.path.basename(name)):
+                    match = ZipMember(zip_path, name)
+    return match
+
+
+def data_file_mtime(source):
+    """Return the modification time of a file found with find_data_file."""
+    if isinstance(source, ZipMember):
+        return os.path.getmtime(source.zip_path)
+    return os.path.getmtime(source)
+
+
+def data_file_name(source):
+    """Return the file name of a file found with find_data_file."""
+    if isinstance(source, ZipMember):
+        return os.path.basename(source.name)
+    return os.path.basename(source)
+
+
+def open_data_file(source):
+    """
+    Return something pandas can read a file found with find_data_file from:
+    the path for an extracted file, or a buffer holding the decompressed
+    member of a zip file (excel readers need to seek within the file).
+    """
+    if isinstance(source, ZipMember):
+        with zipfile.ZipFile(source.zip_path) as z:
+            return io.BytesIO(z.read(source.name))
+    return source
+
+
+class ThreadedZipReader(io.RawIOBase):
+    """
+    Read-only stream of a zip file member that is decompressed in a
+    background thread. Up to queue_size chunks are decompressed ahead of
+    the reader, so that decompression overlaps with parsing (zlib releases
+    the GIL).
+
+    Parameters
+    ----------
+    zip_path : str
+    member : str, optional
+        Name of the member, by default the first member of the archive.
+    chunk_size : int, optional
+    queue_size : int, optional
+    """
+
+    def __init__(self, zip_path, member=None, chunk_size=1 << 20, queue_size=8):
+        super().__init__()
+        self._zip_path = zip_path
+        self._member = member
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._buffer = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._decompress, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _decompress(self):
+        try:
+            with zipfile.ZipFile(self._zip_path) as z:
+                member = self._member or z.namelist()[0]
+                with z.open(member) as f:
+                    while True:
+                        chunk = f.read(self._chunk_size)
+                        if not self._put(chunk) or not chunk:
+                            return
+        except Exception as e:
+            self._put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._eof:
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if not item:
+                self._eof = True
+            else:
+                self._buffer = memoryview(item)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        super().close()
+
+
+def open_zip_member(zip_path, member=None):
+    """
+    Open a zip file member for reading with decompression in a background
+    thread (see ThreadedZipReader).
+
+    Returns
+    -------
+    io.BufferedReader
+    """
+    return io.BufferedReader(
+        ThreadedZipReader(zip_path, member), buffer_size=1 << 20
+    )
 
 
 def find_file_in_folder(folder_path, file_pattern_match, return_name=True):
@@ -87,6 +285,68 @@ def create_ba_region_map(
     return map_series
 
 
+class ProviderIndex(object):
+    """
+    Look up processes in one or more openLCA-schema process dictionaries by
+    name.
+
+    The index is built once and extended with add; dictionaries added first
+    take precedence when several processes have the same name. The index
+    holds the process entries themselves, so UUIDs assigned to them later
+    (e.g., by olca_jsonld_writer.write) are found without rebuilding it.
+
+    Parameters
+    ----------
+    *process_dicts: dictionary or ProviderIndex
+        Dictionaries of processes to index, in order of precedence.
+    """
+
+    def __init__(self, *process_dicts):
+        self._entries = {}
+        for process_dict in process_dicts:
+            self.add(process_dict)
+
+    def add(self, process_dict):
+        """Index the processes in process_dict (a dictionary or another
+        ProviderIndex) after those already indexed."""
+        if isinstance(process_dict, ProviderIndex):
+            for name, entries in process_dict._entries.items():
+                self._entries.setdefault(name, []).extend(entries)
+            return
+        for entry in process_dict.values():
+            self._entries.setdefault(entry["name"], []).append(entry)
+
+    def get(self, name, default=None):
+        """Return the first process with the given name."""
+        entries = self._entries.get(name)
+        if not entries:
+            return default
+        return entries[0]
+
+    def uuid(self, name):
+        """Return the UUID of the first process with the given name that
+        has one, or None."""
+        for entry in self._entries.get(name, []):
+            if isinstance(entry.get("uuid"), str):
+                return entry["uuid"]
+        return None
+
+    def provider(self, name):
+        """
+        Return the default provider dictionary for an exchange whose
+        provider is the first process with the given name, or None if there
+        is no such process.
+        """
+        entry = self.get(name)
+        if entry is None:
+            return None
+        return {
+            "name": entry["name"],
+            "@id": entry["uuid"],
+            "category": entry["category"].split("/"),
+        }
+
+
 def fill_default_provider_uuids(dict_to_fill, *args):
     """
     Fills in UUIDs.
@@ -102,9 +362,9 @@ def fill_default_provider_uuids(dict_to_fill, *args):
         A dictionary in the openLCA schema with processes that have
         input exchanges with default provider names provided but not
         UUIDs
-    *args: dictionary
+    *args: dictionary or ProviderIndex
         Any number of dictionaries to search for matching processes
-        for the UUIDs
+        for the UUIDs, or an index of them that can be reused across calls.
 
     Returns
     -------
@@ -112,25 +372,22 @@ def fill_default_provider_uuids(dict_to_fill, *args):
         The dict_to_fill input with UUIDs filled in where matching
         processes were found.
     """
-    found = False
     dict_list = list(args)
-    list_of_dicts = [isinstance(x,dict) for x in dict_list]
+    list_of_dicts = [isinstance(x, (dict, ProviderIndex)) for x in dict_list]
     print("Attempting to find UUIDs for default providers...")
     if all(list_of_dicts):
+        if len(dict_list) == 1 and isinstance(dict_list[0], ProviderIndex):
+            provider_index = dict_list[0]
+        else:
+            provider_index = ProviderIndex(*dict_list)
         for key in dict_to_fill.keys():
             for exch in dict_to_fill[key]['exchanges']:
                 if exch['input'] is True and isinstance(exch['provider'],dict):
-                    found=False
-                    for src_dict in args:
-                        for src_key in src_dict.keys():
-                            if src_dict[src_key]["name"]==exch["provider"]["name"] and isinstance(src_dict[src_key]["uuid"],str):
-                                exch["provider"]["@id"]=src_dict[src_key]["uuid"]
-                                module_logger.debug(f"UUID for {exch['provider']} found")
-                                found = True
-                                break;
-                        if found:
-                            break;
-                    if not found:
+                    uuid = provider_index.uuid(exch["provider"]["name"])
+                    if uuid is not None:
+                        exch["provider"]["@id"]=uuid
+                        module_logger.debug(f"UUID for {exch['provider']} found")
+                    else:
                         module_logger.info(f"UUID for {exch['provider']} not found")
     else:
         module_logger.warning(f"All arguments into function must be dictionaries")
@@ -7,17 +7,13 @@ import pandas as pd
 from electricitylci.globals import output_dir, data_dir
 import numpy as np
 from electricitylci.eia923_generation import eia923_download_extract
+from electricitylci.factored_inventory import FactoredInventory
 
 
-def generate_upstream_wind(year):
+def wind_inventory(year):
     """
-    Generate the annual emissions.
-    
-    For wind farm construction for each plant in EIA923. The emissions inventory
-    file has already allocated the total emissions to construct the turbines and
-    balance of system for the entire wind farm over the assumed 20 year life of
-    the panels. So the emissions returned below represent 1/20th of the total
-    site construction emissions.
+    Annual wind farm construction emissions and net generation of each plant
+    in EIA923. See generate_upstream_wind.
 
     Parameters
     ----------
@@ -26,7 +22,7 @@ def generate_upstream_wind(year):
 
     Returns
     ----------
-    dataframe
+    FactoredInventory
     """
     eia_generation_data = eia923_download_extract(year)
     eia_generation_data["Plant Id"] = eia_generation_data["Plant Id"].astype(
@@ -54,19 +50,15 @@ def generate_upstream_wind(year):
         value_name="FlowAmount",
     )
     wind_df_t_melt = wind_df_t_melt.astype({'plant_id' : int})
-    wind_upstream = wind_df_t_melt.merge(
-        right=wind_generation_data,
-        left_on="plant_id",
-        right_on="Plant Id",
-        how="left",
-    )
-    wind_upstream.rename(
-        columns={"Net Generation (Megawatthours)": "quantity"}, inplace=True
+    wind_generation_data = wind_generation_data.rename(
+        columns={
+            "Net Generation (Megawatthours)": "quantity",
+            "Plant Id": "plant_id",
+        }
     )
-    wind_upstream["Electricity"]=wind_upstream["quantity"]
-    wind_upstream.drop(
+    wind_generation_data["Electricity"]=wind_generation_data["quantity"]
+    wind_generation_data.drop(
         columns=[
-            "Plant Id",
             "NAICS Code",
             "Reported Fuel Type Code",
             "YEAR",
@@ -78,17 +70,46 @@ def generate_upstream_wind(year):
     )
     # These emissions will later be aggregated with any inventory power plant
     # emissions because each facility has its own construction impacts.
-    wind_upstream["stage_code"] = "Power plant"
-    wind_upstream["fuel_type"] = "WIND"
+    wind_df_t_melt["stage_code"] = "Power plant"
+    wind_df_t_melt["fuel_type"] = "WIND"
     compartment_map = {"Air": "air", "Water": "water", "Energy": "input"}
-    wind_upstream["Compartment"] = wind_upstream["Compartment"].map(
+    wind_df_t_melt["Compartment"] = wind_df_t_melt["Compartment"].map(
         compartment_map
     )
-    wind_upstream["input"]=False
-    wind_upstream.loc[wind_upstream["Compartment"]=="input","input"]=True
-    wind_upstream["Unit"]="kg"
-    # wind_upstream['Compartment']=wind_upstream['Compartment'].str.lower()
-    return wind_upstream
+    wind_df_t_melt["input"]=False
+    wind_df_t_melt.loc[wind_df_t_melt["Compartment"]=="input","input"]=True
+    wind_df_t_melt["Unit"]="kg"
+    # wind_df_t_melt['Compartment']=wind_df_t_melt['Compartment'].str.lower()
+    # The inventory is already the annual total for each plant.
+    return FactoredInventory(
+        wind_df_t_melt,
+        wind_generation_data,
+        on="plant_id",
+        scale=False,
+        how="right",
+    )
+
+
+def generate_upstream_wind(year):
+    """
+    Generate the annual emissions.
+    
+    For wind farm construction for each plant in EIA923. The emissions inventory
+    file has already allocated the total emissions to construct the turbines and
+    balance of system for the entire wind farm over the assumed 20 year life of
+    the panels. So the emissions returned below represent 1/20th of the total
+    site construction emissions.
+
+    Parameters
+    ----------
+    year: int
+        Year of EIA-923 fuel data to use.
+
+    Returns
+    ----------
+    dataframe
+    """
+    return wind_inventory(year).expand()
 
 
 if __name__ == "__main__":
@@ -22,7 +22,8 @@ setup(
         'sympy>=1.2',
         'xlrd>=1.1',
         'pyyaml>=5.1',
-        'requests>=2.2'
+        'requests>=2.2',
+        'pyarrow>=0.17'
         ],
     long_description=open('README.md').read(),
     classifiers=[
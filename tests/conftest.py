@@ -0,0 +1,7 @@
+import electricitylci.model_config as config
+
+# Modules such as ampd_plant_emissions import model_specs from model_config
+# when they are imported, so the specs are built before the tests are
+# collected, as main.py does before running the model.
+if not hasattr(config, "model_specs"):
+    config.model_specs = config.build_model_class("ELCI_1")
@@ -0,0 +1,463 @@
+"""
+Equivalence tests for the columnar plant emission calculations.
+
+Each test runs a function of ampd_plant_emissions and the row-wise version
+it replaced on the same small fixture and checks that the results are equal.
+The row-wise versions below are copied from generate_plant_emissions as it
+was before the rewrite. They were nested functions that read their emission
+factor tables from the enclosing function, so those tables are arguments
+here, and columns are selected with lists rather than tuples so they run
+with current pandas; the calculations are unchanged.
+
+emissions_logic_CO2, emissions_logic_SO2, and emissions_logic_NOx were
+defined in the old function but never called. The emission sources were
+chosen with between() criteria in the old function, so that code
+(baseline_source_choice) is the reference for choose_emission_sources.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import electricitylci.ampd_plant_emissions as ampd
+
+# Row-wise versions from the original generate_plant_emissions ##############
+def baseline_gen_fuel_co2_ch4_n2o_emissions(
+    eia923_gen_fuel_sub, ef_co2_ch4_n2o
+):
+    emissions = pd.DataFrame()
+
+    for row in ef_co2_ch4_n2o.itertuples():
+
+        fuel_type = eia923_gen_fuel_sub.loc[
+            eia923_gen_fuel_sub["reported_fuel_type_code"].astype(str)
+            == str(row.EIA_Fuel_Type_Code)
+        ].copy()
+
+        fuel_type["CO2 (Tons)"] = (row.ton_CO2_mmBtu) * fuel_type[
+            "total_fuel_consumption_mmbtu"
+        ].astype(float, errors="ignore")
+        fuel_type["CH4 (lbs)"] = (row.pound_methane_per_mmbtu) * fuel_type[
+            "total_fuel_consumption_mmbtu"
+        ].astype(float, errors="ignore")
+        fuel_type["N2O (lbs)"] = (row.pound_n2o_per_mmBtu) * fuel_type[
+            "total_fuel_consumption_mmbtu"
+        ].astype(float, errors="ignore")
+
+        emissions = pd.concat([emissions, fuel_type])
+
+    emissions_agg = emissions.groupby(
+        ["plant_id", "plant_name", "operator_name"]
+    )[
+        [
+            "CO2 (Tons)",
+            "CH4 (lbs)",
+            "N2O (lbs)",
+            "total_fuel_consumption_mmbtu",
+            "total_fuel_consumption_quantity",
+        ]
+    ].sum()
+    emissions_agg = emissions_agg.reset_index()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
+
+    return emissions_agg
+
+
+def eia_boiler_nox(row):
+    if row["nox_emission_rate_entire_year_lbs_mmbtu"] > 0:
+        return row["NOx Based on Annual Rate (lbs)"]
+    else:
+        return row["NOx (lbs)"]
+
+
+def baseline_boiler_nox_emissions(eia923_boiler_firing_type, ef_nox, eia_nox_rate):
+    emissions = eia923_boiler_firing_type.merge(
+        ef_nox,
+        left_on=[
+            "reported_fuel_type_code",
+            "reported_prime_mover",
+            "firing_type_1",
+        ],
+        right_on=[
+            "Reported_Fuel_Type_Code",
+            "Reported_Prime_Mover",
+            "Boiler_Firing_Type_Code",
+        ],
+        how="left",
+    )
+    emissions["NOx (lbs)"] = emissions["Emission_Factor"] * emissions[
+        "total_fuel_consumption_quantity"
+    ].astype(float, errors="ignore")
+
+    emissions.dropna(subset=["NOx (lbs)"], inplace=True)
+    emissions["total_fuel_consumption_mmbtu"] = emissions[
+        ampd.FUEL_HEAT_QUANTITY_MONTHLY
+    ].sum(axis=1)
+    emissions_boiler = emissions.merge(
+        eia_nox_rate, on=["plant_id", "boiler_id"], how="left"
+    )
+    emissions_boiler["NOx Based on Annual Rate (lbs)"] = (
+        emissions_boiler["total_fuel_consumption_mmbtu"]
+        * emissions_boiler["nox_emission_rate_entire_year_lbs_mmbtu"]
+    )
+    emissions_boiler = emissions_boiler.assign(
+        NOx_lbs=emissions_boiler.apply(eia_boiler_nox, axis=1)
+    )
+    emissions_agg = emissions_boiler.groupby(
+        ["plant_id", "plant_name", "operator_name"], as_index=False
+    )[
+        [
+            "NOx_lbs",
+            "total_fuel_consumption_quantity",
+            "total_fuel_consumption_mmbtu",
+        ]
+    ].sum()
+    emissions_agg["plant_id"] = emissions_agg["plant_id"].astype(str)
+    emissions_agg = emissions_agg.rename(columns={"NOx_lbs": "NOx (lbs)"})
+    return emissions_agg
+
+
+def baseline_wtd_sulfur_content(eia923_boiler):
+    sulfur_content = pd.DataFrame()
+    eia923_boiler_drop_na = eia923_boiler.dropna(
+        subset=["reported_fuel_type_code"]
+    )
+    eia923_boiler_unique_fuel_codes = (
+        eia923_boiler[["reported_fuel_type_code"]]
+        .drop_duplicates()
+        .dropna()
+    )
+    eia923_boiler_unique_fuel_codes.columns = ["reported_fuel_type_code"]
+
+    for row in eia923_boiler_unique_fuel_codes.itertuples():
+        fuel_type = eia923_boiler_drop_na.loc[
+            eia923_boiler_drop_na["reported_fuel_type_code"].astype(str)
+            == str(row.reported_fuel_type_code)
+        ].copy()
+        fuel_type["Sulfur Weighted"] = (
+            np.multiply(
+                fuel_type[ampd.FUEL_QUANTITY_MONTHLY],
+                fuel_type[ampd.SULFUR_CONTENT_MONTHLY],
+            )
+        ).sum(axis=1, skipna=True)
+        frames = [sulfur_content, fuel_type]
+        sulfur_content = pd.concat(frames)
+    sulfur_content_agg = sulfur_content.groupby(
+        ["reported_fuel_type_code"], as_index=False
+    )[["Sulfur Weighted", "total_fuel_consumption_quantity"]].sum()
+    sulfur_content_agg["Avg Sulfur Content (%)"] = (
+        sulfur_content_agg["Sulfur Weighted"]
+        / sulfur_content_agg["total_fuel_consumption_quantity"]
+    )
+    sulfur_content_agg = sulfur_content_agg[
+        ["reported_fuel_type_code", "Avg Sulfur Content (%)"]
+    ]
+
+    return sulfur_content_agg
+
+
+def baseline_plant_fuel_class(
+    eia_gen_fuel_net_gen_output, min_percent, keep_mixed
+):
+    def eia_primary_fuel(row):
+        if row["Primary Fuel %"] < min_percent / 100:
+            return "Mixed Fuel Type"
+        else:
+            return row["Primary Fuel"]
+
+    eia_gen_fuel_net_gen_output["Primary Fuel"] = eia_gen_fuel_net_gen_output[
+        ampd.PRIMARY_FUEL_CODES
+    ].idxmax(axis=1)
+    eia_gen_fuel_net_gen_output[
+        "Primary Fuel Net Generation (MWh)"
+    ] = eia_gen_fuel_net_gen_output[ampd.PRIMARY_FUEL_CODES].max(axis=1)
+    eia_gen_fuel_net_gen_output["Primary Fuel %"] = (
+        eia_gen_fuel_net_gen_output["Primary Fuel Net Generation (MWh)"]
+        / eia_gen_fuel_net_gen_output["Annual Net Generation (MWh)"]
+    )
+    eia_gen_fuel_net_gen_output = eia_gen_fuel_net_gen_output.assign(
+        Primary_Fuel=eia_gen_fuel_net_gen_output.apply(
+            eia_primary_fuel, axis=1
+        )
+    )
+    if not keep_mixed:
+        eia_gen_fuel_net_gen_output = eia_gen_fuel_net_gen_output.loc[
+                eia_gen_fuel_net_gen_output["Primary_Fuel"]!="Mixed Fuel Type", :
+                ]
+    plant_fuel_class = eia_gen_fuel_net_gen_output[
+        ["plant_id", "Primary_Fuel", "Primary Fuel %"]
+    ].copy()
+    plant_fuel_class["plant_id"] = plant_fuel_class["plant_id"].astype(str)
+    return plant_fuel_class
+
+
+def baseline_source_choice(result_agg):
+    result_agg_final = result_agg.copy()
+    result_agg_final["CO2_emissions_tons"] = result_agg_final["CO2 (Tons)"]
+    result_agg_final["CO2_Source"] = "ap42"
+    fuel_input_criteria = result_agg_final["ampd Heat Input (MMBtu)"].between(
+        result_agg_final["total_fuel_consumption_mmbtu"] * 0.8,
+        result_agg_final["total_fuel_consumption_mmbtu"] * 1.2,
+    )
+    emission_criteria = result_agg_final["ampd CO2 (Tons)"].between(
+        result_agg_final["CO2 (Tons)"] * (1 / 100),
+        result_agg_final["CO2 (Tons)"] * 100,
+    )
+    total_criteria = (fuel_input_criteria) & (emission_criteria)
+    result_agg_final.loc[
+        total_criteria, "CO2_emissions_tons"
+    ] = result_agg_final.loc[total_criteria, "ampd CO2 (Tons)"]
+    result_agg_final.loc[total_criteria, "CO2_Source"] = "ampd"
+
+    result_agg_final["SO2_emissions_lbs"] = result_agg_final["SO2 (lbs)"]
+    result_agg_final["SO2_Source"] = "ap42"
+    emission_criteria = result_agg_final["ampd SO2 (lbs)"].between(
+        result_agg_final["SO2 (lbs)"] * (1 / 100),
+        result_agg_final["SO2 (lbs)"] * 100,
+    )
+    total_criteria = (fuel_input_criteria) & (emission_criteria)
+    result_agg_final.loc[
+        total_criteria, "SO2_emissions_lbs"
+    ] = result_agg_final.loc[total_criteria, "ampd SO2 (lbs)"]
+    result_agg_final.loc[total_criteria, "SO2_Source"] = "ampd"
+
+    result_agg_final["NOx_emissions_lbs"] = result_agg_final["NOx (lbs)"]
+    result_agg_final["NOx_Source"] = "ap42"
+    emission_criteria = result_agg_final["ampd NOX (lbs)"].between(
+        result_agg_final["NOx (lbs)"] * (1 / 100),
+        result_agg_final["NOx (lbs)"] * 100,
+    )
+    total_criteria = (fuel_input_criteria) & (emission_criteria)
+    result_agg_final.loc[
+        total_criteria, "NOx_emissions_lbs"
+    ] = result_agg_final.loc[total_criteria, "ampd NOX (lbs)"]
+    result_agg_final.loc[total_criteria, "NOx_Source"] = "ampd"
+    return result_agg_final[
+        [
+            "plant_id",
+            "CO2_emissions_tons",
+            "SO2_emissions_lbs",
+            "NOx_emissions_lbs",
+            "CO2_Source",
+            "SO2_Source",
+            "NOx_Source",
+        ]
+    ]
+
+
+# Fixtures ##################################################################
+@pytest.fixture
+def ef_co2_ch4_n2o():
+    # Fuel codes are compared as strings; 1 is a numeric code in the table.
+    return pd.DataFrame(
+        {
+            "EIA_Fuel_Type_Code": ["NG", "BIT", "DFO", 1],
+            "ton_CO2_mmBtu": [0.0585, 0.1033, 0.0811, 0.05],
+            "pound_methane_per_mmbtu": [0.002, 0.022, 0.006, 0.0],
+            "pound_n2o_per_mmBtu": [0.0002, 0.0035, 0.0013, np.nan],
+        }
+    )
+
+
+@pytest.fixture
+def gen_fuel_sub():
+    return pd.DataFrame(
+        {
+            "plant_id": [1, 1, 2, 2, 3, 4, 5, 6],
+            "plant_name": "Plant",
+            "operator_name": "Operator",
+            "reported_fuel_type_code": [
+                "NG", "BIT", "NG", "WND", "DFO", "1", "NG", "BIT",
+            ],
+            # 0, NaN, and a fuel without factors (WND)
+            "total_fuel_consumption_mmbtu": [
+                1000.0, 2500.0, 0.0, 10.0, np.nan, 300.0, 50.0, 75.0,
+            ],
+            "total_fuel_consumption_quantity": [
+                1.0, 120.0, 0.0, 0.0, 5.0, np.nan, 2.0, 3.0,
+            ],
+        }
+    )
+
+
+def _boiler_rows(n, rng):
+    df = pd.DataFrame(
+        {
+            "plant_id": [1, 1, 2, 3, 3, 4, 5, 6][:n],
+            "boiler_id": ["1", "2", "1", "1", "2", "1", "1", "1"][:n],
+            "plant_name": "Plant",
+            "operator_name": "Operator",
+            "reported_fuel_type_code": [
+                "BIT", "NG", "SUB", "BIT", np.nan, "RFO", "NG", "BIT",
+            ][:n],
+            "reported_prime_mover": "ST",
+            "firing_type_1": ["TF", "WF", "TF", "CY", "TF", "TF", "OT", "TF"][:n],
+            "total_fuel_consumption_quantity": [
+                100.0, 50.0, 0.0, 70.0, 20.0, np.nan, 30.0, 40.0,
+            ][:n],
+        }
+    )
+    for month in ampd.MONTHS:
+        df[f"quantity_of_fuel_consumed_{month}"] = rng.uniform(0, 10, n)
+        df[f"sulfur_content_{month}"] = rng.uniform(0, 3, n)
+        df[f"MMBtu {month.capitalize()}"] = rng.uniform(0, 100, n)
+    # NaN and 0 monthly values
+    df.loc[0, "sulfur_content_march"] = np.nan
+    df.loc[1, "quantity_of_fuel_consumed_july"] = np.nan
+    df.loc[3, ampd.FUEL_QUANTITY_MONTHLY] = 0.0
+    df.loc[2, "MMBtu May"] = np.nan
+    return df
+
+
+@pytest.fixture
+def boiler():
+    return _boiler_rows(8, np.random.default_rng(16))
+
+
+@pytest.fixture
+def ef_nox():
+    # No factor for NG with the OT firing type.
+    return pd.DataFrame(
+        {
+            "Reported_Fuel_Type_Code": ["BIT", "NG", "SUB", "BIT", "RFO"],
+            "Reported_Prime_Mover": "ST",
+            "Boiler_Firing_Type_Code": ["TF", "WF", "TF", "CY", "TF"],
+            "Emission_Factor": [22.0, 0.28, 7.4, 33.0, 0.0],
+            "Emission_Factor_Denominator": "short tons",
+        }
+    )
+
+
+@pytest.fixture
+def nox_rate():
+    # A positive rate, a rate of 0, a NaN rate, and boilers with no rate.
+    return pd.DataFrame(
+        {
+            "plant_id": [1, 1, 2, 3],
+            "boiler_id": ["1", "2", "1", "1"],
+            "nox_control_id": ["A", "B", "C", "D"],
+            "nox_emission_rate_entire_year_lbs_mmbtu": [0.15, 0.0, np.nan, 0.4],
+        }
+    )
+
+
+# Tests #####################################################################
+def test_gen_fuel_co2_ch4_n2o_emissions(gen_fuel_sub, ef_co2_ch4_n2o):
+    expected = baseline_gen_fuel_co2_ch4_n2o_emissions(
+        gen_fuel_sub, ef_co2_ch4_n2o
+    )
+    result = ampd.eia_gen_fuel_co2_ch4_n2o_emissions(
+        gen_fuel_sub, ef_co2_ch4_n2o
+    )
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_boiler_nox_emissions(boiler, ef_nox, nox_rate):
+    expected = baseline_boiler_nox_emissions(boiler, ef_nox, nox_rate)
+    result = ampd.eia_boiler_nox_emissions(boiler, ef_nox, nox_rate)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_boiler_nox_uses_annual_rate_only_when_positive(boiler, ef_nox, nox_rate):
+    result = ampd.eia_boiler_nox_emissions(boiler, ef_nox, nox_rate)
+    result = result.set_index("plant_id")["NOx (lbs)"]
+    mmbtu = boiler[ampd.FUEL_HEAT_QUANTITY_MONTHLY].sum(axis=1)
+    # Plant 1: boiler 1 has a rate of 0.15, boiler 2 a rate of 0.
+    assert result["1"] == pytest.approx(mmbtu[0] * 0.15 + 0.28 * 50.0)
+    # Plant 2: NaN rate, so the emission factor is used.
+    assert result["2"] == pytest.approx(7.4 * 0.0)
+    # Plant 5 has no emission factor and is dropped.
+    assert "5" not in result.index
+
+
+# The old code multiplies two dataframes with np.multiply without aligning
+# them, which pandas warns about.
+@pytest.mark.filterwarnings("ignore:Calling a ufunc on non-aligned")
+def test_wtd_sulfur_content(boiler):
+    expected = baseline_wtd_sulfur_content(boiler)
+    result = ampd.eia_wtd_sulfur_content(boiler)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.fixture
+def gen_fuel():
+    """Generation and fuel data in which every primary fuel code has
+    generation, with plants that have a single fuel, mixed fuels, no
+    generation, and missing monthly values."""
+    rows = [
+        (1, "NG", 100.0),
+        (2, "BIT", 60.0),
+        (2, "NG", 40.0),
+        (3, "SUN", 0.0),
+        (4, "WND", np.nan),
+        (5, "NUC", 95.0),
+        (5, "DFO", 5.0),
+        (6, "WAT", -10.0),
+        (6, "SUN", 20.0),
+    ]
+    rows += [
+        (100 + i, code, 1.0) for i, code in enumerate(ampd.PRIMARY_FUEL_CODES)
+    ]
+    df = pd.DataFrame(
+        rows,
+        columns=["plant_id", "reported_fuel_type_code", "monthly_net_gen"],
+    )
+    for month in ampd.MONTHS:
+        df[f"netgen_{month}"] = df["monthly_net_gen"]
+    df.loc[1, "netgen_june"] = np.nan
+    df = df.drop(columns="monthly_net_gen").assign(
+        plant_name="Plant",
+        operator_name="Operator",
+        net_generation_megawatthours=1.0,
+        total_fuel_consumption_mmbtu=1.0,
+    )
+    return df
+
+
+class _Inputs(ampd.PlantEmissionInputs):
+    def __init__(self, year, **data):
+        super().__init__(year)
+        self._data.update(data)
+
+
+@pytest.mark.parametrize("keep_mixed", [True, False])
+@pytest.mark.parametrize("min_percent", [0, 90, 100])
+def test_primary_fuel(gen_fuel, monkeypatch, keep_mixed, min_percent):
+    monkeypatch.setattr(ampd.model_specs, "keep_mixed_plant_category", keep_mixed)
+    monkeypatch.setattr(
+        ampd.model_specs,
+        "min_plant_percent_generation_from_primary_fuel_category",
+        min_percent,
+    )
+    expected = baseline_plant_fuel_class(
+        ampd.eia_gen_fuel_net_gen(gen_fuel), min_percent, keep_mixed
+    )
+    result = ampd.net_generation_stage(_Inputs(2016, gen_fuel=gen_fuel))
+    pd.testing.assert_frame_equal(result["plant_fuel_class"], expected)
+
+
+def test_choose_emission_sources():
+    # CEMS data within and outside the limits, missing CEMS data (plant 8),
+    # estimates of 0, and NaN estimates and fuel consumption.
+    result_agg = pd.DataFrame(
+        {
+            "plant_id": range(1, 9),
+            "CO2 (Tons)": [100.0, 100.0, 100.0, 0.0, np.nan, 100.0, 100.0, 5.0],
+            "SO2 (lbs)": [10.0, 10.0, 0.0, 10.0, 10.0, np.nan, 10.0, 10.0],
+            "NOx (lbs)": [20.0, 0.5, 20.0, 20.0, 20.0, 20.0, np.nan, 20.0],
+            "total_fuel_consumption_mmbtu": [
+                1000.0, 1000.0, 1000.0, 1000.0, 1000.0, np.nan, 0.0, 1000.0,
+            ],
+            "ampd CO2 (Tons)": [
+                90.0, 90.0, 50000.0, 1.0, 90.0, 90.0, 90.0, np.nan,
+            ],
+            "ampd SO2 (lbs)": [11.0, 11.0, 11.0, 11.0, 11.0, 0.1, 11.0, np.nan],
+            "ampd NOX (lbs)": [19.0, 19.0, 19.0, 0.2, 19.0, 19.0, 0.0, np.nan],
+            "ampd Heat Input (MMBtu)": [
+                1100.0, 1300.0, 900.0, 1000.0, 800.0, 1000.0, 0.0, np.nan,
+            ],
+        }
+    )
+    expected = baseline_source_choice(result_agg)
+    result = ampd.choose_emission_sources(result_agg)
+    pd.testing.assert_frame_equal(result[expected.columns], expected)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from electricitylci.dqi import (
+    data_collection_lower_bound_to_dqi,
+    lookup_score_with_bound_key,
+    lookup_scores_with_bound_key,
+    technological_correlation_lower_bound_to_dqi,
+    temporal_correlation_lower_bound_to_dqi,
+)
+
+
+def baseline_lookup_score_with_bound_key(raw_score, bound_to_dqi):
+    """The scalar lookup that lookup_scores_with_bound_key replaced."""
+    breakpoints = list(bound_to_dqi.keys())
+    if raw_score <= breakpoints[0]:
+        score = bound_to_dqi[breakpoints[0]]
+    elif (raw_score > breakpoints[0]) & (raw_score <= breakpoints[1]):
+        score = bound_to_dqi[breakpoints[1]]
+    elif (raw_score > breakpoints[1]) & (raw_score <= breakpoints[2]):
+        score = bound_to_dqi[breakpoints[2]]
+    elif (raw_score > breakpoints[2]) & (raw_score <= breakpoints[3]):
+        score = bound_to_dqi[breakpoints[3]]
+    else:
+        score = bound_to_dqi[None]
+    return score
+
+
+@pytest.mark.parametrize(
+    "raw_score, expected",
+    [
+        (-2, 1),
+        (0, 1),
+        (3, 1),
+        (3.01, 2),
+        (6, 2),
+        (10, 3),
+        (10.5, 4),
+        (15, 4),
+        (15.01, 5),
+        (40, 5),
+        (np.nan, 5),
+    ],
+)
+def test_temporal_correlation_scores(raw_score, expected):
+    bounds = temporal_correlation_lower_bound_to_dqi
+    assert lookup_score_with_bound_key(raw_score, bounds) == expected
+    assert lookup_scores_with_bound_key([raw_score], bounds)[0] == expected
+
+
+@pytest.mark.parametrize(
+    "raw_score, expected",
+    [
+        (-2, 4),
+        (0, 4),
+        (0.4, 4),
+        (0.41, 3),
+        (0.6, 3),
+        (0.8, 2),
+        (0.81, 1),
+        (1, 1),
+        (1.01, 5),
+        (np.nan, 5),
+    ],
+)
+def test_data_collection_scores(raw_score, expected):
+    bounds = data_collection_lower_bound_to_dqi
+    assert lookup_score_with_bound_key(raw_score, bounds) == expected
+    assert lookup_scores_with_bound_key([raw_score], bounds)[0] == expected
+
+
+@pytest.mark.parametrize(
+    "bound_to_dqi, raw_scores",
+    [
+        (temporal_correlation_lower_bound_to_dqi, np.arange(-5, 25, 0.25)),
+        (data_collection_lower_bound_to_dqi, np.arange(-0.5, 1.5, 0.01)),
+        (
+            technological_correlation_lower_bound_to_dqi,
+            np.arange(-0.5, 1.5, 0.01),
+        ),
+    ],
+)
+def test_scores_match_scalar_lookup(bound_to_dqi, raw_scores):
+    raw_scores = pd.Series(np.append(raw_scores, np.nan), name="raw")
+    expected = [
+        baseline_lookup_score_with_bound_key(x, bound_to_dqi)
+        for x in raw_scores
+    ]
+    result = lookup_scores_with_bound_key(raw_scores, bound_to_dqi)
+    assert result.name == "raw"
+    assert result.tolist() == expected
+
+
+def test_temporal_correlation_of_newer_data():
+    from electricitylci.generation import add_temporal_correlation_score
+
+    db = pd.DataFrame({"Year": [2010, 2014, 2016, 2018, 2025, np.nan]})
+    result = add_temporal_correlation_score(db, 2016)
+    # Data newer than the target year has a negative age, which is scored
+    # at the first bound.
+    assert result["TemporalCorrelation"].tolist() == [2, 1, 1, 1, 1, 5]
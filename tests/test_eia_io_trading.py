@@ -0,0 +1,178 @@
+"""
+Tests for ba_io_trading_model and ba_io_trading_cube with the synthetic
+EIA-930 data of electricitylci.benchmark.
+"""
+
+import os
+import zipfile
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import electricitylci.eia_io_trading as trading
+from electricitylci.benchmark import (
+    _patched,
+    synthetic_trading_data_dir,
+    write_synthetic_eba_zip,
+)
+
+YEAR = 2016
+# Balancing authorities whose codes are also EIA region codes; the annual
+# model drops the interchange that they report.
+REGION_CODES = ["TVA", "ERCO", "ISNE", "NYIS"]
+
+
+def annual_net_generation(folder):
+    """Net generation of each BA in the synthetic EBA.zip."""
+    path = os.path.join(folder, "bulk_data", "EBA.zip")
+    series = trading.load_series(
+        trading.select_series(trading.get_series_index(path), "EBA.NG.H"),
+        YEAR,
+        path,
+    )
+    return trading.series_to_df(series, "net_gen").groupby("region")[
+        "net_gen"
+    ].sum()
+
+
+def matching_eia_generation(net_gen):
+    """Replacements for the eia923 and eia860 modules with one plant in each
+    BA that generates the BA's net generation, so that none of it is
+    replaced by the annual model's check against EIA-923."""
+    plant_ids = np.arange(1, len(net_gen) + 1)
+    generation = pd.DataFrame(
+        {"FacilityID": plant_ids, "Electricity": net_gen.values}
+    )
+    plant_bas = pd.DataFrame(
+        {
+            "Plant Id": plant_ids.astype(str),
+            "Balancing Authority Code": net_gen.index,
+        }
+    )
+    return (
+        SimpleNamespace(
+            build_generation_data=lambda **kwargs: generation.copy()
+        ),
+        SimpleNamespace(
+            eia860_balancing_authority=lambda *args, **kwargs: (
+                plant_bas.copy()
+            )
+        ),
+    )
+
+
+@pytest.fixture
+def trading_data(tmp_path):
+    folder = str(tmp_path)
+    eia923, eia860, _ = synthetic_trading_data_dir(
+        folder, 50, 12, YEAR, 72, np.random.default_rng(0)
+    )
+    with _patched(
+        trading,
+        data_dir=folder,
+        output_dir=folder,
+        eia923=eia923,
+        eia860=eia860,
+    ):
+        yield folder
+
+
+def test_zero_trade_balancing_authorities(trading_data):
+    # The Canadian balancing authorities export all of their generation, so
+    # they take the zero-trade branch, where their own share of their
+    # consumption is set.
+    result = trading.ba_io_trading_model(YEAR, "BA")["BA"]
+    assert not result.empty
+    assert np.isfinite(result["fraction"]).all()
+    fractions = result.groupby("import_name")["fraction"].sum()
+    np.testing.assert_allclose(fractions, 1.0, rtol=1e-6)
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+def test_cube_fractions_sum_to_one(trading_data, freq):
+    cubes = trading.ba_io_trading_cube(YEAR, freq, write=False)
+    for level, import_col in [
+        ("BA", "import BAA"),
+        ("FERC", "import ferc region"),
+    ]:
+        cube = cubes[level]
+        assert (cube["fraction"] > 0).all()
+        totals = cube.groupby(["period", import_col], observed=True)[
+            "fraction"
+        ].sum()
+        np.testing.assert_allclose(totals, 1.0, rtol=1e-9)
+    # The Canadian generation is spread over every hour of the year.
+    assert cubes["BA"]["period"].nunique() == (366 if freq == "D" else 8784)
+
+
+def test_cube_chunks(trading_data):
+    expected = trading.ba_io_trading_cube(YEAR, "H", write=False)
+    result = trading.ba_io_trading_cube(YEAR, "H", chunk_size=5, write=False)
+    for level in ["BA", "FERC"]:
+        pd.testing.assert_frame_equal(result[level], expected[level])
+
+
+def test_single_period_cube_matches_annual_model(trading_data):
+    # Every pair of BAs in the synthetic data reports its interchange from
+    # both sides. Without the BAs that are also regions, and with EIA-923
+    # generation that matches the EIA-930 net generation, the differences
+    # between the models don't apply.
+    bas = [
+        ba for ba in annual_net_generation(trading_data).index
+        if ba not in REGION_CODES
+    ]
+    write_synthetic_eba_zip(
+        os.path.join(trading_data, "bulk_data", "EBA.zip"),
+        bas, YEAR, 72, np.random.default_rng(1)
+    )
+    eia923, eia860 = matching_eia_generation(
+        annual_net_generation(trading_data)
+    )
+    with _patched(trading, eia923=eia923, eia860=eia860):
+        annual = trading.ba_io_trading_model(YEAR, "BA")["BA"]
+        cube = trading.ba_io_trading_cube(YEAR, "A", write=False)["BA"]
+    assert cube["period"].nunique() == 1
+    keys = ["import BAA", "export BAA"]
+    cube = cube.astype({col: str for col in keys}).set_index(keys)
+    # BAs with no consumption have no mix in the cube; the annual model
+    # gives them a mix of their own generation.
+    annual = annual.loc[
+        annual["import BAA"].isin(cube.index.get_level_values(0))
+        & (annual["fraction"] > 0),
+        keys + ["fraction"],
+    ].set_index(keys)
+    assert sorted(cube.index) == sorted(annual.index)
+    np.testing.assert_allclose(
+        cube.loc[annual.index, "fraction"], annual["fraction"], rtol=1e-9
+    )
+
+
+def test_cube_drops_one_sided_reports(trading_data):
+    path = os.path.join(trading_data, "bulk_data", "EBA.zip")
+    trades = []
+    trading_consumption_matrix = trading.trading_consumption_matrix
+
+    def solve(trade, inflow, consumption):
+        trades.append(trade.copy())
+        return trading_consumption_matrix(trade, inflow, consumption)
+
+    with _patched(trading, trading_consumption_matrix=solve):
+        trading.ba_io_trading_cube(YEAR, "A", write=False)
+        # Drop one BA's report of its interchange with another.
+        with zipfile.ZipFile(path) as z:
+            lines = z.read("EBA.txt").decode().splitlines(keepends=True)
+        one_sided = next(
+            line for line in lines
+            if '"EBA.' in line and '.ID.H"' in line
+        )
+        with zipfile.ZipFile(path, "w") as z:
+            z.writestr(
+                "EBA.txt", "".join(l for l in lines if l != one_sided)
+            )
+        trading.ba_io_trading_cube(YEAR, "A", write=False)
+    both, one = trades
+    changed = np.argwhere(both != one)
+    assert len(changed) == 1
+    assert one[tuple(changed[0])] == 0
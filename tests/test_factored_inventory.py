@@ -0,0 +1,257 @@
+"""
+Tests for FactoredInventory and the factored path of
+combinator.concat_map_upstream_databases.
+
+The totals calculated from the per-unit flows are compared with grouping
+the expanded inventory, as upstream_dict.olcaschema_genupstream_processes
+does for a dataframe.
+"""
+
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import electricitylci.combinator as combinator
+from electricitylci.factored_inventory import FactoredInventory
+
+BY = ["fuel_type", "stage_code", "FlowName", "Compartment", "Unit", "input"]
+FLOWS = [
+    ("Carbon dioxide", "air", "kg", False),
+    ("Methane", "air", "kg", False),
+    ("Sulfur dioxide", "air", "kg", False),
+    ("Water", "resource", "m3", True),
+]
+
+
+def expanded_totals(inventory, by):
+    """The totals of upstream_dict for an expanded inventory."""
+    expanded = inventory.expand()
+    expanded = expanded.loc[expanded["plant_id"].notna(), :]
+    totals = expanded.groupby(by + ["plant_id"], as_index=False).agg(
+        {"FlowAmount": "sum", "quantity": "mean"}
+    )
+    return totals.groupby(by, as_index=False)[["quantity", "FlowAmount"]].sum()
+
+
+def assert_same_totals(inventory, by=BY):
+    expected = expanded_totals(inventory, by)
+    result = inventory.stage_totals(by)
+    pd.testing.assert_frame_equal(
+        result.sort_values(by).reset_index(drop=True),
+        expected[result.columns].sort_values(by).reset_index(drop=True),
+        check_dtype=False,
+    )
+    return result
+
+
+def intensities(fuel_type, stage_codes, rng, **columns):
+    """Per-unit flows for each stage code and each of the other columns'
+    values."""
+    rows = pd.DataFrame(
+        [
+            (fuel_type, stage_code, name, compartment, unit, is_input)
+            for stage_code in stage_codes
+            for name, compartment, unit, is_input in FLOWS
+        ],
+        columns=BY,
+    )
+    for col, values in columns.items():
+        rows = rows.merge(pd.DataFrame({col: values}), how="cross")
+    rows["FlowAmount"] = rng.uniform(0.1, 2, len(rows))
+    return rows
+
+
+def plants(plant_ids, rng, **columns):
+    activity = pd.DataFrame(
+        {
+            "plant_id": plant_ids,
+            "quantity": rng.uniform(10, 100, len(plant_ids)),
+        }
+    )
+    activity["Electricity"] = activity["quantity"]
+    for col, values in columns.items():
+        activity[col] = rng.choice(values, len(plant_ids))
+    return activity
+
+
+def test_cross_inventory():
+    rng = np.random.default_rng(0)
+    inventory = FactoredInventory(
+        intensities("nuclear", ["NUC"], rng), plants(np.arange(20), rng)
+    )
+    assert len(inventory.expand()) == 20 * len(FLOWS)
+    assert_same_totals(inventory)
+
+
+def test_keyed_inventory():
+    rng = np.random.default_rng(1)
+    activity = plants(np.arange(30), rng, State=["CA", "NV", "UT", "OR"])
+    # Plants in OR have no intensities, and a plant without an id is left
+    # out of the totals.
+    activity.loc[0, "plant_id"] = np.nan
+    inventory = FactoredInventory(
+        intensities("geothermal", ["GEO"], rng, State=["CA", "NV", "UT"]),
+        activity,
+        on="State",
+    )
+    result = assert_same_totals(inventory)
+    assert not result.empty
+
+
+def test_plant_columns_in_by():
+    rng = np.random.default_rng(2)
+    activity = plants(np.arange(30), rng, State=["CA", "NV"])
+    inventory = FactoredInventory(
+        intensities("geothermal", ["GEO"], rng, State=["CA", "NV"]),
+        activity,
+        on="State",
+    )
+    assert_same_totals(inventory, BY + ["State"])
+
+
+def test_plant_under_two_keys_in_the_same_group():
+    # The plant is counted once in the group, as in the expanded inventory
+    # (6.0 rather than 6.0 + 3.0).
+    flows = pd.DataFrame(
+        {
+            "basin": ["A", "B"],
+            "stage_code": ["GAS", "GAS"],
+            "FlowName": ["Methane", "Methane"],
+            "FlowAmount": [1.0, 1.0],
+        }
+    )
+    activity = pd.DataFrame(
+        {
+            "plant_id": [1, 1],
+            "basin": ["A", "B"],
+            "quantity": [6.0, 6.0],
+        }
+    )
+    inventory = FactoredInventory(flows, activity, on="basin")
+    result = assert_same_totals(inventory, ["stage_code", "FlowName"])
+    assert result["quantity"].tolist() == [6.0]
+    assert result["FlowAmount"].tolist() == [12.0]
+
+
+def test_plants_under_several_keys():
+    rng = np.random.default_rng(3)
+    # Each plant is under several basins, some of which share flows, and
+    # has a different quantity in some of them.
+    activity = plants(
+        rng.choice(np.arange(15), 60), rng, basin=["A", "B", "C", "D"]
+    )
+    flows = pd.concat(
+        [
+            intensities("gas", ["EXT"], rng, basin=["A", "B"]),
+            intensities("gas", ["EXT", "TRA"], rng, basin=["C"]),
+            intensities("gas", ["PRO"], rng, basin=["D"]),
+        ],
+        ignore_index=True,
+    )
+    inventory = FactoredInventory(flows, activity, on="basin")
+    assert_same_totals(inventory)
+    assert_same_totals(inventory, ["stage_code", "FlowName"])
+    assert_same_totals(inventory, ["fuel_type"])
+
+
+def inventories(rng):
+    construction = intensities("construction", ["CON"], rng)
+    construction = construction.merge(
+        pd.DataFrame({"const_type": ["coal", "ngcc"]}), how="cross"
+    )
+    construction_plants = plants(np.arange(10, 20), rng)
+    construction_plants["const_type"] = rng.choice(["coal", "ngcc"], 10)
+    construction_plants["capacity"] = rng.uniform(50, 500, 10)
+    return [
+        FactoredInventory(
+            intensities("nuclear", ["NUC"], rng), plants(np.arange(5), rng)
+        ),
+        FactoredInventory(
+            intensities("geothermal", ["GEO"], rng, State=["CA", "NV"]),
+            plants(np.arange(5, 15), rng, State=["CA", "NV"]),
+            on="State",
+        ),
+        FactoredInventory(
+            construction,
+            construction_plants,
+            on="const_type",
+            scale="capacity",
+        ),
+        FactoredInventory(
+            intensities("solar", ["SOL"], rng).assign(FlowAmount=3.0),
+            plants(np.arange(8), rng),
+            scale=False,
+        ),
+    ]
+
+
+def sort(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_concat():
+    parts = inventories(np.random.default_rng(4))
+    inventory = FactoredInventory.concat(parts)
+    expected = pd.concat([part.expand() for part in parts], ignore_index=True)
+    result = inventory.expand()
+    assert sorted(result.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(
+        sort(result), sort(expected[result.columns])
+    )
+    # Plants 10 to 14 are in two of the inventories.
+    assert_same_totals(inventory)
+    assert_same_totals(inventory, ["stage_code"])
+
+
+@pytest.fixture
+def flow_mapping(monkeypatch):
+    mapping = pd.DataFrame(
+        {
+            "SourceFlowName": [name for name, _, _, _ in FLOWS],
+            "SourceFlowContext": [
+                "resource" if compartment == "resource" else
+                f"emission/{compartment}"
+                for _, compartment, _, _ in FLOWS
+            ],
+            "TargetFlowName": [name.upper() for name, _, _, _ in FLOWS],
+            "TargetFlowUUID": [f"uuid-{i}" for i in range(len(FLOWS))],
+            "TargetFlowContext": [
+                "resource/water" if compartment == "resource" else
+                f"emission/{compartment}"
+                for _, compartment, _, _ in FLOWS
+            ],
+            "TargetUnit": [unit for _, _, unit, _ in FLOWS],
+            "ConversionFactor": [1.0, 1.0, 2.0, 1000.0],
+        }
+    )
+    # Methane is left unmapped.
+    mapping = mapping.loc[mapping["SourceFlowName"] != "Methane", :]
+    monkeypatch.setitem(
+        sys.modules,
+        "fedelemflowlist",
+        SimpleNamespace(get_flowmapping=lambda *args: mapping.copy()),
+    )
+
+
+def test_factored_upstream_databases(flow_mapping):
+    parts = inventories(np.random.default_rng(5))
+    by = [
+        "FuelCategory", "stage_code", "FlowName", "FlowUUID", "Compartment",
+        "Unit", "input",
+    ]
+    result = combinator.concat_map_upstream_databases(2016, *parts)
+    assert isinstance(result, FactoredInventory)
+    expected = combinator.concat_map_upstream_databases(
+        2016, *[part.expand() for part in parts]
+    )
+    assert not expected.empty
+    assert "METHANE" not in set(expected["FlowName"])
+    expanded = result.expand()
+    assert sorted(expanded.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(
+        sort(expanded), sort(expected[expanded.columns]), check_dtype=False
+    )
+    assert_same_totals(result, by)
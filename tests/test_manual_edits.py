@@ -0,0 +1,193 @@
+"""
+Equivalence tests for the compiled manual edits.
+
+apply_edits is compared with the reassign and remove functions it replaced,
+applied one edit at a time. Those functions are copied below from
+manual_edits.py as it was before the rewrite, without their logging.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import electricitylci.manual_edits as edits
+
+
+# Functions from the original manual_edits.py ###############################
+def baseline_reassign(data, edit_dict):
+    try:
+        if edit_dict["data_source"]=="yaml":
+            col = edit_dict["column_to_reassign"]
+            in_val = edit_dict["incoming_value"]
+            out_val = edit_dict["outgoing_value"]
+            combined_filter=data[col]==in_val
+            for filt in edit_dict["filters"].keys():
+                combined_filter=(
+                    combined_filter &
+                    data[filt].isin(edit_dict["filters"][filt])
+                )
+            data.loc[combined_filter,col]=out_val
+        return data
+    except KeyError:
+        return data
+
+
+def baseline_remove(data, edit_dict):
+    try:
+        if edit_dict["data_source"]=="yaml":
+            combined_filter=None
+            for filt in edit_dict["filters"].keys():
+                if combined_filter is None:
+                    combined_filter=data[filt].isin(edit_dict["filters"][filt])
+                else:
+                    combined_filter=(
+                        combined_filter &
+                        data[filt].isin(edit_dict["filters"][filt])
+                    )
+            data = data.loc[~combined_filter,:]
+        return data
+    except KeyError:
+        return data
+
+
+def baseline_check_for_edits(data, edits_to_make):
+    for ed in edits_to_make.keys():
+        if edits_to_make[ed]["edit_type"]=="reassign":
+            data=baseline_reassign(data,edits_to_make[ed])
+        elif edits_to_make[ed]["edit_type"]=="remove":
+            data=baseline_remove(data,edits_to_make[ed])
+    return data
+#############################################################################
+
+
+def reassign(column, incoming, outgoing, **filters):
+    return {
+        "edit_type": "reassign",
+        "data_source": "yaml",
+        "column_to_reassign": column,
+        "incoming_value": incoming,
+        "outgoing_value": outgoing,
+        "filters": filters,
+    }
+
+
+def remove(**filters):
+    return {"edit_type": "remove", "data_source": "yaml", "filters": filters}
+
+
+def generation_table(n_rows, rng):
+    """A table with the columns and values that the generation edits in
+    manual_edits.yml use, and some missing values."""
+    facilities = [56938, 58697, 56944, 55077, 60880, 1, 2, 3]
+    data = pd.DataFrame(
+        {
+            "FacilityID": rng.choice(facilities, n_rows),
+            "eGRID_ID": rng.choice(facilities, n_rows),
+            "Source": rng.choice(
+                ["NEI", "eGRID", "RCRA", "TRI", None], n_rows
+            ),
+            "Year": rng.choice([2014, 2015, 2016], n_rows),
+            "FuelCategory": rng.choice(["SOLAR", "GAS", "COAL"], n_rows),
+            "FlowAmount": rng.uniform(0, 10, n_rows),
+        },
+        index=rng.permutation(n_rows) * 2,
+    )
+    data.loc[data.index[::50], "FuelCategory"] = np.nan
+    return data
+
+
+def assert_same_edits(data, edits_to_make):
+    expected = baseline_check_for_edits(data.copy(), edits_to_make)
+    rules = [
+        edits.EditRule(name, edit) for name, edit in edits_to_make.items()
+    ]
+    result, report = edits.apply_edits(data.copy(), rules)
+    pd.testing.assert_frame_equal(result, expected)
+    assert report["rule"].tolist() == list(edits_to_make)
+    return result, report
+
+
+def test_yaml_generation_edits():
+    edits_to_make = (
+        edits.manual_edits["generation.py"]["create_generation_process_df"]
+    )
+    data = generation_table(5000, np.random.default_rng(0))
+    result, report = assert_same_edits(data, edits_to_make)
+    assert len(result) < len(data)
+    assert (report["hits"] > 0).all()
+
+
+def test_remove_then_reassign():
+    edits_to_make = {
+        "entry_1": remove(FacilityID=[56938], Year=[2016]),
+        "entry_2": reassign(
+            "FacilityID", 56938, 58697, Source=["NEI", "eGRID"]
+        ),
+    }
+    data = generation_table(2000, np.random.default_rng(1))
+    result, report = assert_same_edits(data, edits_to_make)
+    assert not (
+        (result["FacilityID"] == 56938) & (result["Year"] == 2016)
+    ).any()
+    assert report["hits"].gt(0).all()
+
+
+def test_later_edits_see_earlier_ones():
+    edits_to_make = {
+        "entry_1": reassign("FuelCategory", "SOLAR", "WIND", Year=[2016]),
+        "entry_2": reassign("FuelCategory", "WIND", "GAS", Source=["NEI"]),
+        "entry_3": remove(FuelCategory=["WIND"], Source=["TRI"]),
+        "entry_4": reassign("Source", "eGRID", "EIA", FuelCategory=["WIND"]),
+    }
+    data = generation_table(2000, np.random.default_rng(2))
+    result, report = assert_same_edits(data, edits_to_make)
+    assert "EIA" in set(result["Source"])
+    assert report["hits"].gt(0).all()
+
+
+def test_missing_values_in_filters():
+    edits_to_make = {
+        "entry_1": reassign("Year", 2016, 2017, Source=[None]),
+        "entry_2": remove(FuelCategory=[np.nan], Year=[2015]),
+    }
+    data = generation_table(2000, np.random.default_rng(3))
+    result, report = assert_same_edits(data, edits_to_make)
+    assert report["hits"].gt(0).all()
+
+
+@pytest.mark.parametrize(
+    "bad_edit, problem",
+    [
+        (remove(Plant=[1]), "missing columns ['Plant']"),
+        (
+            reassign("FuelCategory", "SOLAR", "GAS", Plant=[1]),
+            "missing columns ['Plant']",
+        ),
+        (reassign("Plant", 1, 2, Year=[2016]), "missing columns ['Plant']"),
+        (
+            dict(reassign("FuelCategory", "SOLAR", "GAS", Year=[2016]),
+                 data_source="csv"),
+            "unsupported data source 'csv'",
+        ),
+    ],
+)
+def test_edits_that_cannot_be_applied(bad_edit, problem):
+    edits_to_make = {
+        "entry_1": reassign("FuelCategory", "SOLAR", "GAS", Year=[2016]),
+        "entry_2": bad_edit,
+        "entry_3": remove(FacilityID=[60880]),
+    }
+    data = generation_table(1000, np.random.default_rng(4))
+    _, report = assert_same_edits(data, edits_to_make)
+    assert report["problem"].tolist() == [None, problem, None]
+    assert report["hits"].tolist()[1] == 0
+
+
+def test_categorical_column():
+    edits_to_make = {
+        "entry_1": reassign("FuelCategory", "SOLAR", "GAS", Year=[2016]),
+        "entry_2": remove(FuelCategory=["COAL"], Year=[2014]),
+    }
+    data = generation_table(1000, np.random.default_rng(5))
+    data["FuelCategory"] = data["FuelCategory"].astype("category")
+    assert_same_edits(data, edits_to_make)
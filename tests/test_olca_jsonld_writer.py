@@ -0,0 +1,85 @@
+"""
+The JSON-LD written with a pool of workers must be the same as the JSON-LD
+written one process at a time.
+"""
+
+import copy
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+import electricitylci.olca_jsonld_writer as writer
+from electricitylci.benchmark import _patched, synthetic_facility_flows
+
+# Set to the time the entities were built.
+TIMESTAMPS = {"lastChange", "creationDate"}
+
+
+@pytest.fixture(scope="module")
+def processes():
+    import electricitylci.generation as generation
+
+    database = synthetic_facility_flows(
+        30, 12, 3, 2016, np.random.default_rng(0)
+    )
+    with _patched(generation.model_specs, replace_egrid=False):
+        aggregated = generation.aggregate_data(database, subregion="BA")
+    processes = generation.olcaschema_genprocess(aggregated, subregion="BA")
+    # Flows that are created in the zip file (and marked as waste flows) in
+    # more than one process.
+    for i, d_vals in enumerate(processes.values()):
+        exchange = d_vals["exchanges"][0]
+        for category, uid in [
+            ("Waste flows/ash", "ash-flow-id"),
+            ("Technosphere Flows/coal", ""),
+        ]:
+            new = copy.deepcopy(exchange)
+            new["quantitativeReference"] = False
+            new["flow"] = dict(
+                exchange["flow"], name=f"Flow {category}", id=uid,
+                category=category, flowType="PRODUCT_FLOW"
+            )
+            d_vals["exchanges"].append(new)
+        if i == 3:
+            break
+    return processes
+
+
+def read_zip(path):
+    def strip(obj):
+        if isinstance(obj, dict):
+            return {
+                k: strip(v) for k, v in obj.items() if k not in TIMESTAMPS
+            }
+        if isinstance(obj, list):
+            return [strip(v) for v in obj]
+        return obj
+
+    with zipfile.ZipFile(path) as z:
+        return [
+            (name, strip(json.loads(z.read(name)))) for name in z.namelist()
+        ]
+
+
+def test_pool_writes_the_same_json_ld(processes, tmp_path):
+    serial = writer.write(
+        copy.deepcopy(processes), str(tmp_path / "serial.zip")
+    )
+    pool = writer.write(
+        copy.deepcopy(processes), str(tmp_path / "pool.zip"), max_workers=2
+    )
+    assert pool == serial
+    for d_vals in serial.values():
+        assert d_vals["uuid"]
+        assert d_vals["q_reference_id"]
+    assert any(
+        e["flow"].get("flowType") == "WASTE_FLOW"
+        for d_vals in serial.values() for e in d_vals["exchanges"]
+    )
+    serial_entries = read_zip(tmp_path / "serial.zip")
+    assert read_zip(tmp_path / "pool.zip") == serial_entries
+    names = [name for name, _ in serial_entries]
+    assert len(names) == len(set(names))
+    assert "flows/ash-flow-id.json" in names